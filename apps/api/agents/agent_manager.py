@@ -3,14 +3,21 @@ Bitaca Cinema - Agent Manager
 Orchestrates multi-agent system using Agno framework
 """
 
+import asyncio
 import os
 import time
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from agents.cinema_agent import CinemaAgent
 from agents.cultural_agent import CulturalAgent
 from agents.discovery_agent import DiscoveryAgent
+from agents.llm_router import agent_max_tokens, get_llm_router
+from agents.prompts import count_tokens, get_prompt_stats
+from agents.response_cache import ResponseCache, compute_catalog_version
 from agents.rl_feedback import RLFeedbackIntegration
+from agents.tools.intent_classifier import IntentClassifier
 
 
 class AgentManager:
@@ -40,6 +47,30 @@ class AgentManager:
         if rl_enabled:
             print("✅ RL Feedback System enabled")
 
+        # Response cache for repeated questions (semantic layer is opt-in)
+        self.response_cache = ResponseCache(
+            catalog_version=compute_catalog_version(embeddings_data),
+            max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512)),
+            ttl_seconds=int(os.getenv('RESPONSE_CACHE_TTL', 3600)),
+            semantic_enabled=os.getenv('RESPONSE_CACHE_SEMANTIC', 'false').lower() == 'true',
+            semantic_threshold=float(os.getenv('RESPONSE_CACHE_THRESHOLD', 0.92)),
+            enabled=os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+        )
+
+        # Compiled keyword routing (+ optional embedding centroids, built at startup)
+        self.intent_classifier = IntentClassifier(
+            centroid_min_margin=float(os.getenv('INTENT_CENTROID_MARGIN', 0.02))
+        )
+
+        # Concurrent fan-out for ambiguous routing (opt-in, capped per query)
+        self.fanout_enabled = os.getenv('AGENT_FANOUT_ENABLED', 'false').lower() == 'true'
+        self.fanout_confidence = set(os.getenv('AGENT_FANOUT_CONFIDENCE', 'low').split(','))
+        self.fanout_max_agents = int(os.getenv('AGENT_FANOUT_MAX_AGENTS', 2))
+        self.fanout_max_tokens = int(os.getenv('AGENT_FANOUT_MAX_TOKENS', 12000))
+        self.fanout_timeout = float(os.getenv('AGENT_FANOUT_TIMEOUT', 30))
+        self.fanout_min_chars = int(os.getenv('AGENT_FANOUT_MIN_CHARS', 40))
+        self.fanout_stats = {'runs': 0, 'wins': {}, 'cancelled': 0, 'budget_skipped': 0, 'router_disabled': 0}
+
     async def process_query(self, query: str, intent: str = None, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Main orchestration method - routes query to appropriate agent(s)
@@ -60,86 +91,42 @@ class AgentManager:
             print(f"📊 Intent: {intent}")
 
             # Classify which agent(s) should handle this
-            agent_classification = self._classify_query(query, intent)
+            agent_classification, query_embedding = await self._classify_query(query, intent)
             print(f"🎯 Agent classification: {agent_classification}")
 
+            # Serve repeated questions from cache (history-dependent queries are never cached)
+            use_cache = self.response_cache.enabled and not context
+            filters = agent_classification.get('filters') or {}
+            cache_scope = agent_classification['primary']
+            if filters:
+                # Filtered answers must not be reused for other filters
+                cache_scope += ':' + '|'.join(f"{field}={','.join(sorted(values))}" for field, values in sorted(filters.items()))
+            if use_cache:
+                if self.response_cache.semantic_enabled and query_embedding is None:
+                    query_embedding = await self.discovery_agent.rag_tool.embed_query(query)
+
+                cached = self.response_cache.get(query, intent, cache_scope, query_embedding)
+                if cached:
+                    # Not tracked by RL: the answer was scored when generated (see ResponseCache)
+                    print(f"⚡ Response cache hit ({cache_scope})")
+                    result = dict(cached)
+                    result['metadata'] = {**cached.get('metadata', {}), 'cached': True}
+                    return result
+
             # Route to appropriate agent
             result = None
             agent_name = None
 
             try:
-                if agent_classification['primary'] == 'discovery':
-                    # Discovery agent handles search and recommendations
-                    result = await self.discovery_agent.process_query(
-                        query=query,
-                        search_enabled=agent_classification.get('use_rag', True)
-                    )
-                    agent_name = 'DiscoveryAgent'
-                    result = {
-                        'response': result['response'],
-                        'agent': agent_name,
-                        'productions': result.get('productions', []),
-                        'metadata': {
-                            'search_performed': result.get('search_performed', False),
-                            'intent': intent
-                        }
-                    }
-
-                elif agent_classification['primary'] == 'cultural':
-                    # Cultural agent handles laws and policies
-                    response = await self.cultural_agent.process_query(
-                        query=query,
-                        context=context
-                    )
-                    agent_name = 'CulturalAgent'
-                    result = {
-                        'response': response,
-                        'agent': agent_name,
-                        'metadata': {
-                            'intent': intent,
-                            'topic': 'cultural_laws'
-                        }
-                    }
-
-                elif agent_classification['primary'] == 'cinema':
-                    # Cinema agent handles production details
-                    # Check if we need discovery context first
-                    cinema_context = context or {}
-
-                    if agent_classification.get('needs_search', False):
-                        # First get relevant productions via discovery
-                        try:
-                            search_result = await self.discovery_agent.process_query(
-                                query=query,
-                                search_enabled=True
-                            )
-                            cinema_context['productions'] = search_result.get('productions', [])
-                        except Exception as search_error:
-                            print(f"⚠️ Discovery search for cinema failed: {search_error}")
-
-                    response = await self.cinema_agent.process_query(
-                        query=query,
-                        context=cinema_context
-                    )
-                    agent_name = 'CinemaAgent'
-                    result = {
-                        'response': response,
-                        'agent': agent_name,
-                        'metadata': {
-                            'intent': intent,
-                            'used_discovery': agent_classification.get('needs_search', False)
-                        }
-                    }
-
+                candidates = self._fanout_candidates(query, agent_classification)
+                if len(candidates) > 1:
+                    # Ambiguous routing - race the top candidates, keep the first good answer
+                    result = await self._fan_out(candidates, agent_classification, query, intent, context, filters)
                 else:
-                    # Default to discovery for general queries
-                    discovery_result = await self.discovery_agent.process_query(query=query)
-                    agent_name = 'DiscoveryAgent'
-                    result = {
-                        'response': discovery_result['response'],
-                        'agent': agent_name,
-                        'metadata': {'intent': intent}
-                    }
+                    result = await self._dispatch(
+                        agent_classification['primary'], agent_classification, query, intent, context, filters
+                    )
+                agent_name = result['agent']
 
             except Exception as agent_error:
                 print(f"❌ Agent processing error: {agent_error}")
@@ -154,6 +141,10 @@ class AgentManager:
                 }
                 agent_name = 'FallbackAgent'
 
+            # Cache successful answers only
+            if use_cache and agent_name != 'FallbackAgent':
+                self.response_cache.set(query, intent, cache_scope, result, query_embedding)
+
             # Track with RL feedback system
             try:
                 elapsed_time_ms = (time.time() - start_time) * 1000
@@ -189,100 +180,272 @@ class AgentManager:
                 }
             }
 
-    def _classify_query(self, query: str, intent: str = None) -> Dict[str, Any]:
+    async def _dispatch(self, primary: str, agent_classification: Dict[str, Any], query: str,
+                        intent: str = None, context: Dict[str, Any] = None,
+                        filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Run one agent and wrap its answer in the manager's result format
+
+        Args:
+            primary: Agent key (cinema, cultural, discovery)
+            agent_classification: Routing info from _classify_query
+            query: User query text
+            intent: Detected intent
+            context: Additional context (conversation history, etc.)
+            filters: Metadata constraints extracted from the query
+        """
+        filters = filters or {}
+
+        if primary == 'cultural':
+            # Cultural agent handles laws and policies
+            response = await self.cultural_agent.process_query(
+                query=query,
+                context=context
+            )
+            return {
+                'response': response,
+                'agent': 'CulturalAgent',
+                'metadata': {
+                    'intent': intent,
+                    'topic': 'cultural_laws',
+                    'generated': response != self.cultural_agent.FALLBACK_RESPONSE
+                }
+            }
+
+        if primary == 'cinema':
+            # Cinema agent handles production details
+            # Copy so concurrent agents never share a mutated context
+            cinema_context = dict(context or {})
+
+            if agent_classification.get('needs_search', False):
+                # Retrieval only - the cinema agent makes the single LLM call
+                cinema_context['productions'] = await self.discovery_agent.retrieve_productions(
+                    query=query,
+                    top_k=3,
+                    filters=filters
+                )
+
+            response = await self.cinema_agent.process_query(
+                query=query,
+                context=cinema_context
+            )
+            return {
+                'response': response,
+                'agent': 'CinemaAgent',
+                'metadata': {
+                    'intent': intent,
+                    'used_discovery': agent_classification.get('needs_search', False),
+                    'filters': filters,
+                    'generated': response != self.cinema_agent.FALLBACK_RESPONSE
+                }
+            }
+
+        # Discovery agent handles search, recommendations and general queries
+        discovery_result = await self.discovery_agent.process_query(
+            query=query,
+            search_enabled=agent_classification.get('use_rag', True),
+            filters=filters
+        )
+        return {
+            'response': discovery_result['response'],
+            'agent': 'DiscoveryAgent',
+            'productions': discovery_result.get('productions', []),
+            'metadata': {
+                'search_performed': discovery_result.get('search_performed', False),
+                'intent': intent,
+                'filters': filters,
+                'generated': discovery_result.get('generated', True)
+            }
+        }
+
+    def _estimate_cost(self, agent_key: str, query: str) -> int:
+        """
+        Worst-case tokens of one agent call: prompt (system prompt + query +
+        RAG context) plus the completion it may generate (max_tokens)
+        """
+        agent = self.agents[agent_key]
+        prompt_tokens = agent.system_prompt.tokens + count_tokens(query) + getattr(agent, 'context_tokens', 0)
+        return prompt_tokens + agent_max_tokens(agent.agent)
+
+    def _fanout_candidates(self, query: str, agent_classification: Dict[str, Any]) -> List[str]:
+        """
+        Agents to run for a query
+
+        A single agent unless fan-out is enabled and the routing confidence is
+        low; then the top candidates that fit the per-query token cap. Only
+        through the LLM router can a losing agent be cancelled (its HTTP
+        stream is closed); a direct agent.run in a thread would finish and be
+        billed anyway, so with the router disabled one agent is used.
+        """
+        primary = agent_classification['primary']
+        if (not self.fanout_enabled
+                or agent_classification.get('confidence') not in self.fanout_confidence
+                or primary not in self.agents):
+            return [primary]
+        if not get_llm_router().enabled:
+            self.fanout_stats['router_disabled'] += 1
+            return [primary]
+
+        selected = [primary]
+        budget = self.fanout_max_tokens - self._estimate_cost(primary, query)
+        for candidate in agent_classification.get('candidates', []):
+            if len(selected) >= self.fanout_max_agents:
+                break
+            if candidate in selected or candidate not in self.agents:
+                continue
+            cost = self._estimate_cost(candidate, query)
+            if cost > budget:
+                self.fanout_stats['budget_skipped'] += 1
+                continue
+            selected.append(candidate)
+            budget -= cost
+        return selected
+
+    @staticmethod
+    def _is_acceptable(result: Dict[str, Any], min_chars: int) -> bool:
+        """A generated (non-fallback) answer with some substance"""
+        response = (result.get('response') or '').strip()
+        return result.get('metadata', {}).get('generated', True) and len(response) >= min_chars
+
+    async def _fan_out(self, candidates: List[str], agent_classification: Dict[str, Any], query: str,
+                       intent: str = None, context: Dict[str, Any] = None,
+                       filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Run several agents concurrently and return the first acceptable answer
+
+        The remaining agents are cancelled as soon as a winner is found, so
+        wall-clock latency is bounded by the fastest good agent. When no answer
+        is acceptable before the timeout, the best finished answer (in
+        candidate order) is returned.
+        """
+        self.fanout_stats['runs'] += 1
+        tasks = {}
+        for name in candidates:
+            classification = dict(agent_classification)
+            if name == 'cinema':
+                # Cinema answers are only useful with production context
+                classification['needs_search'] = True
+            task = asyncio.create_task(self._dispatch(name, classification, query, intent, context, filters))
+            tasks[task] = name
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.fanout_timeout
+        pending = set(tasks)
+        finished: Dict[str, Dict[str, Any]] = {}
+        errors: List[BaseException] = []
+        winner = None
+
+        try:
+            while pending and winner is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer the higher-ranked candidate when several finish together
+                for task in sorted(done, key=lambda t: candidates.index(tasks[t])):
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    finished[tasks[task]] = task.result()
+                    if winner is None and self._is_acceptable(task.result(), self.fanout_min_chars):
+                        winner = tasks[task]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if winner is None:
+            ranked = [name for name in candidates if name in finished]
+            if not ranked:
+                if errors:
+                    raise errors[0]
+                raise asyncio.TimeoutError(f"No agent answered within {self.fanout_timeout}s")
+            winner = ranked[0]
+        else:
+            self.fanout_stats['wins'][winner] = self.fanout_stats['wins'].get(winner, 0) + 1
+
+        cancelled = [tasks[task] for task in pending]
+        self.fanout_stats['cancelled'] += len(cancelled)
+
+        result = finished[winner]
+        result['metadata']['fanout'] = {
+            'candidates': candidates,
+            'winner': winner,
+            'cancelled': cancelled
+        }
+        return result
+
+    async def _classify_query(self, query: str, intent: str = None) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
         """
         Classify which agent should handle the query
 
+        Compiled keyword routing first; low-confidence queries are refined by
+        the embedding-centroid classifier (when built) and then by the RL
+        recommendation (when enabled).
+
         Returns:
-            Dict with 'primary' agent and additional routing info
+            (classification, query embedding when one was computed). The
+            classification has the 'primary' agent, ranked 'candidates',
+            routing flags and the metadata 'filters' (tema, eixo, status,
+            diretor) found in the query
         """
-        query_lower = query.lower()
+        classification = self.intent_classifier.route(query, intent)
+
+        query_embedding = None
+        if self.intent_classifier.needs_embedding(classification):
+            # Same (cached) embedding RAG retrieval uses for this query
+            query_embedding = await self.discovery_agent.rag_tool.embed_query(query)
+            classification = self.intent_classifier.refine(classification, query_embedding)
 
-        # Check RL recommendation first if enabled
-        if self.rl_feedback.enabled:
+        # RL only breaks ties the query content could not resolve
+        if self.rl_feedback.enabled and classification['confidence'] == 'low':
             recommended_agent = self.rl_feedback.get_agent_recommendation(
                 query_intent=intent or 'GENERAL',
                 query=query
             )
             if recommended_agent:
                 print(f"[RL] Recommended agent: {recommended_agent}")
-                return {
-                    'primary': recommended_agent.lower(),
+                primary = recommended_agent.lower()
+                classification = {
+                    'primary': primary,
+                    'candidates': [primary] + [name for name in classification['candidates'] if name != primary],
                     'use_rag': recommended_agent == 'Discovery',
+                    'needs_search': recommended_agent == 'Cinema',
                     'confidence': 'rl_recommendation'
                 }
 
-        # Cultural law keywords
-        cultural_keywords = [
-            'lei paulo gustavo', 'paulo gustavo', 'lpg',
-            'pnab', 'aldir blanc', 'política nacional',
-            'edital', 'financiamento', 'verba', 'recurso',
-            'lei de incentivo', 'lei cultural', 'política cultural',
-            'secretaria', 'ministério da cultura'
-        ]
-
-        # Cinema/production keywords
-        cinema_keywords = [
-            'diretor', 'dirigido por', 'quem dirigiu',
-            'sinopse', 'sobre o que', 'enredo', 'história',
-            'tema', 'eixo temático', 'produção',
-            'filme', 'documentário', 'curta'
-        ]
-
-        # Search/discovery keywords
-        search_keywords = [
-            'buscar', 'procurar', 'encontrar', 'pesquisar',
-            'recomendar', 'recomende', 'sugira', 'sugestão',
-            'similar', 'parecido', 'semelhante',
-            'sobre', 'fala de', 'mostra', 'trata'
-        ]
-
-        # Count matches
-        cultural_score = sum(1 for kw in cultural_keywords if kw in query_lower)
-        cinema_score = sum(1 for kw in cinema_keywords if kw in query_lower)
-        search_score = sum(1 for kw in search_keywords if kw in query_lower)
-
-        # Intent-based routing
-        if intent == 'SEARCH' or intent == 'RECOMMEND':
-            return {
-                'primary': 'discovery',
-                'use_rag': True,
-                'confidence': 'high'
-            }
+        classification['filters'] = self.discovery_agent.rag_tool.facets.extract_filters(query)
+        return classification, query_embedding
 
-        # Keyword-based routing
-        if cultural_score > 0:
-            return {
-                'primary': 'cultural',
-                'confidence': 'high' if cultural_score >= 2 else 'medium'
-            }
+    async def build_intent_centroids(self) -> int:
+        """
+        Embed the labelled routing queries and enable the centroid classifier
 
-        if cinema_score > search_score and cinema_score > 0:
-            return {
-                'primary': 'cinema',
-                'needs_search': True,  # Cinema agent may need production context
-                'confidence': 'medium'
-            }
+        Returns:
+            Number of labelled queries embedded
+        """
+        count = await self.intent_classifier.build_centroids(self.discovery_agent.rag_tool.embed_query)
+        print(f"✅ Intent centroids built from {count} labelled queries")
+        return count
 
-        if search_score > 0 or intent in ['SEARCH', 'RECOMMEND']:
-            return {
-                'primary': 'discovery',
-                'use_rag': True,
-                'confidence': 'high'
-            }
+    def find_similar(self, production_title: str = None, production_id=None, top_k: int = 5) -> Optional[Dict[str, Any]]:
+        """
+        Precomputed similar productions (no NIM call)
+        """
+        return self.discovery_agent.find_similar(production_title, production_id, top_k)
 
-        # Default: discovery agent with RAG
-        return {
-            'primary': 'discovery',
-            'use_rag': True,
-            'confidence': 'low'
-        }
+    def stream_recommendation(self, production: Dict[str, Any], similar: list) -> AsyncIterator[str]:
+        """
+        Stream the LLM narrative for a precomputed recommendation
+        """
+        return self.discovery_agent.stream_recommendation(production, similar)
 
-    async def recommend_similar(self, production_title: str) -> Dict[str, Any]:
+    async def recommend_similar(self, production_title: str, top_k: int = 3) -> Dict[str, Any]:
         """
         Delegate to discovery agent for similarity recommendations
         """
-        result = await self.discovery_agent.recommend_similar(production_title)
+        result = await self.discovery_agent.recommend_similar(production_title, top_k=top_k)
         return {
             'response': result['response'],
             'agent': 'DiscoveryAgent',
@@ -309,6 +472,12 @@ class AgentManager:
                 'Cinema production knowledge',
                 'Multi-agent orchestration'
             ],
+            'fanout': {
+                'enabled': self.fanout_enabled,
+                'max_agents': self.fanout_max_agents,
+                'max_tokens': self.fanout_max_tokens,
+                **self.fanout_stats
+            },
             'models_used': [
                 'meta/llama-3.3-70b-instruct (Cinema & Discovery)',
                 'qwen/qwen3-next-80b-a3b-thinking (Cultural reasoning)',
@@ -316,6 +485,30 @@ class AgentManager:
             ]
         }
 
+    def reload_catalog(self, embeddings_data: list) -> Dict[str, Any]:
+        """
+        Swap in a regenerated catalog (blocking - run off the event loop)
+
+        Rebuilds the RAG indexes (the similarity table only when the
+        embeddings changed) and moves the response cache to the new
+        catalog version, so answers about the old catalog stop being served.
+
+        Args:
+            embeddings_data: Items from embeddings.json
+
+        Returns:
+            Productions indexed, catalog and similarity versions
+        """
+        rag_tool = self.discovery_agent.rag_tool
+        rag_tool.load_catalog(embeddings_data)
+        changed = self.response_cache.set_catalog_version(compute_catalog_version(embeddings_data))
+        return {
+            'productions': len(rag_tool.items),
+            'catalog_version': self.response_cache.catalog_version,
+            'catalog_changed': changed,
+            'similarity_version': rag_tool.similarity.version
+        }
+
     async def health_check(self) -> Dict[str, bool]:
         """
         Check health of all agents
@@ -324,11 +517,22 @@ class AgentManager:
             'cinema_agent': self.cinema_agent is not None,
             'cultural_agent': self.cultural_agent is not None,
             'discovery_agent': self.discovery_agent is not None,
-            'embeddings_loaded': len(self.discovery_agent.rag_tool.embeddings) > 0,
+            'embeddings_loaded': len(self.discovery_agent.rag_tool.index) > 0,
             'rl_feedback_enabled': self.rl_feedback.enabled,
+            'response_cache_enabled': self.response_cache.enabled,
             'system_ready': True
         }
 
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get response/query-embedding cache hit-rate metrics and prompt sizes
+        """
+        stats = self.response_cache.get_stats()
+        stats['embeddings'] = self.discovery_agent.rag_tool.embedding_cache.get_stats()
+        stats['embedding_batches'] = self.discovery_agent.rag_tool.embedding_batcher.get_stats()
+        stats['prompts'] = get_prompt_stats()
+        return stats
+
     def get_rl_stats(self) -> Dict[str, Any]:
         """
         Get reinforcement learning statistics
@@ -3,12 +3,157 @@ Auditable Reinforcement Learning Agent for Betting System
 Provides transparent, provably fair odds calculation with full audit trail
 """
 
+import hashlib
 import json
+import math
+import threading
+import time
+import uuid
+from bisect import bisect_right
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
 import numpy as np
 from collections import defaultdict
 
+from agents.ring_buffer import DecisionRing
+
+
+class StateDiscretizer:
+    """
+    Maps battle features to a compact integer state id
+
+    Each feature is bucketed (categorical battle type, bisect on bucket edges
+    for the numeric ones) and the buckets are combined mixed-radix, so the
+    Q-table has at most `n_states` keys and encoding allocates no strings.
+    `decode` gives the bucket ranges back for audit display.
+    """
+
+    DEFAULT_BATTLE_TYPES = ("ai_vs_ai", "human_vs_ai", "human_vs_human")
+    DEFAULT_TOTAL_BETS_EDGES = (1, 5, 10, 25, 50, 100)
+    DEFAULT_BET_SPLIT_EDGES = (0.2, 0.35, 0.45, 0.55, 0.65, 0.8)
+    DEFAULT_ACCURACY_EDGES = (0.4, 0.5, 0.6, 0.7, 0.8)
+
+    def __init__(self,
+                 battle_types: Sequence[str] = DEFAULT_BATTLE_TYPES,
+                 total_bets_edges: Sequence[float] = DEFAULT_TOTAL_BETS_EDGES,
+                 bet_split_edges: Sequence[float] = DEFAULT_BET_SPLIT_EDGES,
+                 accuracy_edges: Sequence[float] = DEFAULT_ACCURACY_EDGES):
+        """
+        Args:
+            battle_types: Known battle types (anything else maps to 'other')
+            total_bets_edges: Ascending bucket edges for the active bet count
+            bet_split_edges: Ascending bucket edges for the bet split (0-1)
+            accuracy_edges: Ascending bucket edges for historical accuracy (0-1)
+        """
+        self.battle_types = tuple(battle_types)
+        self.total_bets_edges = tuple(total_bets_edges)
+        self.bet_split_edges = tuple(bet_split_edges)
+        self.accuracy_edges = tuple(accuracy_edges)
+
+        self._type_index = {battle_type: i for i, battle_type in enumerate(self.battle_types)}
+        # Radix of each feature (battle types + 'other'; numeric: len(edges) + 1 buckets)
+        self._radix = (
+            len(self.battle_types) + 1,
+            len(self.total_bets_edges) + 1,
+            len(self.bet_split_edges) + 1,
+            len(self.accuracy_edges) + 1
+        )
+        self.n_states = int(np.prod(self._radix))
+
+    def encode_features(self, battle_type: str, total_bets: float, bet_split: float, accuracy: float) -> int:
+        """Integer state id of raw feature values"""
+        _, n_bets, n_split, n_accuracy = self._radix
+        type_bucket = self._type_index.get(battle_type, len(self.battle_types))
+        bets_bucket = bisect_right(self.total_bets_edges, total_bets)
+        split_bucket = bisect_right(self.bet_split_edges, bet_split)
+        accuracy_bucket = bisect_right(self.accuracy_edges, accuracy)
+        return ((type_bucket * n_bets + bets_bucket) * n_split + split_bucket) * n_accuracy + accuracy_bucket
+
+    def encode(self, battle_data: Dict) -> int:
+        """Integer state id of a battle"""
+        return self.encode_features(
+            battle_data.get("type", "ai_vs_ai"),
+            battle_data.get("total_bets", 0),
+            battle_data.get("bet_split", 0.5),
+            battle_data.get("accuracy", 0.5)
+        )
+
+    @staticmethod
+    def _bucket_range(edges: Tuple[float, ...], bucket: int) -> List[Optional[float]]:
+        low = edges[bucket - 1] if bucket > 0 else None
+        high = edges[bucket] if bucket < len(edges) else None
+        return [low, high]
+
+    def decode(self, state_id: int) -> Dict[str, Any]:
+        """
+        Bucket description of a state id (audit display)
+
+        Numeric features are [low, high) ranges, None meaning unbounded.
+        """
+        _, n_bets, n_split, n_accuracy = self._radix
+        rest, accuracy_bucket = divmod(int(state_id), n_accuracy)
+        rest, split_bucket = divmod(rest, n_split)
+        type_bucket, bets_bucket = divmod(rest, n_bets)
+        return {
+            "state_id": int(state_id),
+            "battle_type": self.battle_types[type_bucket] if type_bucket < len(self.battle_types) else "other",
+            "total_bets": self._bucket_range(self.total_bets_edges, bets_bucket),
+            "bet_split": self._bucket_range(self.bet_split_edges, split_bucket),
+            "historical_accuracy": self._bucket_range(self.accuracy_edges, accuracy_bucket)
+        }
+
+    def migrate_key(self, key: Union[str, int]) -> Union[int, str]:
+        """
+        State id of a Q-table key from any snapshot format
+
+        Integer ids (or their string form) are kept; legacy json.dumps state
+        hashes are re-bucketed; unknown keys are returned unchanged.
+        """
+        if isinstance(key, (int, np.integer)):
+            return int(key)
+        if key.isdigit():
+            return int(key)
+        if key.startswith("{"):
+            try:
+                features = json.loads(key)
+            except ValueError:
+                return key
+            return self.encode_features(
+                features.get("battle_type", "ai_vs_ai"),
+                features.get("total_bets", 0),
+                features.get("bet_split", 0.5),
+                features.get("historical_accuracy", 0.5)
+            )
+        return key
+
+    def migrate_q_table(self, q_table: Dict[Any, Dict[str, float]]) -> Dict[Any, Dict[str, float]]:
+        """
+        Re-key a Q-table to state ids
+
+        Legacy states that fall into the same bucket are merged by averaging
+        each action's Q-value.
+        """
+        sums: Dict[Any, Dict[str, float]] = {}
+        counts: Dict[Any, Dict[str, int]] = {}
+        for key, actions in q_table.items():
+            state_id = self.migrate_key(key)
+            for action, value in actions.items():
+                sums.setdefault(state_id, {})[action] = sums.get(state_id, {}).get(action, 0.0) + value
+                counts.setdefault(state_id, {})[action] = counts.get(state_id, {}).get(action, 0) + 1
+        return {
+            state_id: {action: total / counts[state_id][action] for action, total in actions.items()}
+            for state_id, actions in sums.items()
+        }
+
+    def get_config(self) -> Dict[str, List]:
+        """Bucket configuration (stored with exported models)"""
+        return {
+            "battle_types": list(self.battle_types),
+            "total_bets_edges": list(self.total_bets_edges),
+            "bet_split_edges": list(self.bet_split_edges),
+            "accuracy_edges": list(self.accuracy_edges)
+        }
+
 
 class BettingRLAgent:
     """
@@ -28,7 +173,10 @@ class BettingRLAgent:
         epsilon: float = 0.1,
         min_odds: float = 1.1,
         max_odds: float = 10.0,
-        target_house_edge: float = 0.05
+        target_house_edge: float = 0.05,
+        history_capacity: int = 1000,
+        audit_sink: Optional[Callable[[Dict], Any]] = None,
+        discretizer: Optional[StateDiscretizer] = None
     ):
         """
         Initialize RL agent
@@ -40,6 +188,9 @@ class BettingRLAgent:
             min_odds: Minimum allowed odds
             max_odds: Maximum allowed odds
             target_house_edge: Target profit margin (5% default)
+            history_capacity: Decisions kept in memory for the audit trail
+            audit_sink: Receives every decision as it is made (e.g. a buffered AuditLogger)
+            discretizer: Battle feature buckets (default StateDiscretizer())
         """
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
@@ -48,11 +199,16 @@ class BettingRLAgent:
         self.max_odds = max_odds
         self.target_house_edge = target_house_edge
 
-        # Q-table: {state_hash: {action: q_value}}
-        self.q_table: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        # Q-table: {state_id: {action: q_value}} (integer ids from the discretizer)
+        self.discretizer = discretizer or StateDiscretizer()
+        self.q_table: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        # Count / sum / sum of squares of all Q-values (kept in step with every write)
+        self._q_count = 0
+        self._q_sum = 0.0
+        self._q_sumsq = 0.0
 
-        # Audit trail
-        self.decision_history: List[Dict] = []
+        # Audit trail (written through to the sink; the ring keeps the recent ones for reads)
+        self.decision_history = DecisionRing(capacity=history_capacity, sink=audit_sink)
 
         # Actions: odds adjustments
         self.actions = [
@@ -71,7 +227,7 @@ class BettingRLAgent:
             "fairness_score": 1.0
         }
 
-    def _get_state(self, battle_data: Dict) -> Tuple[str, Dict]:
+    def _get_state(self, battle_data: Dict) -> Tuple[int, Dict]:
         """
         Extract state from battle data
 
@@ -80,18 +236,29 @@ class BettingRLAgent:
         - total_bets_count: Number of active bets
         - bet_distribution: Percentage split between contestants
         - historical_accuracy: Past win rate prediction accuracy
+
+        Returns:
+            Integer state id (Q-table key) and the raw features
         """
         state_features = {
             "battle_type": battle_data.get("type", "ai_vs_ai"),
-            "total_bets": min(battle_data.get("total_bets", 0), 100),  # Normalize
-            "bet_split": round(battle_data.get("bet_split", 0.5), 2),  # 0-1
-            "historical_accuracy": round(battle_data.get("accuracy", 0.5), 2)
+            "total_bets": battle_data.get("total_bets", 0),
+            "bet_split": battle_data.get("bet_split", 0.5),  # 0-1
+            "historical_accuracy": battle_data.get("accuracy", 0.5)
         }
 
-        # Create hash for Q-table lookup
-        state_hash = json.dumps(state_features, sort_keys=True)
+        state_id = self.discretizer.encode_features(
+            state_features["battle_type"],
+            state_features["total_bets"],
+            state_features["bet_split"],
+            state_features["historical_accuracy"]
+        )
+
+        return state_id, state_features
 
-        return state_hash, state_features
+    def describe_state(self, state_id: int) -> Dict[str, Any]:
+        """Human-readable buckets of a state id (audit display)"""
+        return self.discretizer.decode(state_id)
 
     def _calculate_reward(
         self,
@@ -126,17 +293,21 @@ class BettingRLAgent:
 
     def select_action(
         self,
-        state_hash: str,
+        state_hash: int,
         current_odds: float,
-        mode: str = "exploit"
+        mode: str = "exploit",
+        battle_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None
     ) -> Tuple[str, float, Dict]:
         """
         Select action using epsilon-greedy policy
 
         Args:
-            state_hash: Current state identifier
+            state_hash: Current state id (from _get_state)
             current_odds: Current odds value
             mode: "exploit" or "explore"
+            battle_id: Battle the decision belongs to (audit trail filter)
+            context: Extra fields recorded with the decision (e.g. contestant)
 
         Returns:
             action, new_odds, decision_metadata
@@ -154,6 +325,10 @@ class BettingRLAgent:
                 action = max(q_values.items(), key=lambda x: x[1])[0]
             exploration = False
 
+        # The chosen action gets a Q entry (0.0 for new ones)
+        if action not in self.q_table[state_hash]:
+            self._set_q(state_hash, action, 0.0)
+
         # Apply action to odds
         new_odds = self._apply_action(action, current_odds)
 
@@ -168,8 +343,12 @@ class BettingRLAgent:
             "new_odds": new_odds,
             "epsilon": self.epsilon
         }
+        if battle_id is not None:
+            decision_metadata["battle_id"] = battle_id
+        if context:
+            decision_metadata.update(context)
 
-        # Log decision
+        # Log decision (audited as-is: not modified afterwards)
         self.decision_history.append(decision_metadata)
         self.metrics["total_decisions"] += 1
 
@@ -194,16 +373,18 @@ class BettingRLAgent:
 
     def update_q_value(
         self,
-        state_hash: str,
+        state_hash: int,
         action: str,
         reward: float,
-        next_state_hash: str
+        next_state_hash: int
     ):
         """
         Update Q-value using Q-learning formula
 
         Q(s,a) = Q(s,a) + α * [r + γ * max(Q(s',a')) - Q(s,a)]
         """
+        if action not in self.q_table[state_hash]:
+            self._set_q(state_hash, action, 0.0)
         current_q = self.q_table[state_hash][action]
 
         # Get max Q-value for next state
@@ -215,11 +396,29 @@ class BettingRLAgent:
             reward + self.discount_factor * max_next_q - current_q
         )
 
-        self.q_table[state_hash][action] = new_q
+        self._set_q(state_hash, action, new_q)
 
         # Update metrics
         self._update_metrics(reward)
 
+    def _set_q(self, state_hash: int, action: str, value: float):
+        """Write a Q-value and update the running Q aggregates"""
+        q_values = self.q_table[state_hash]
+        old = q_values.get(action)
+        if old is None:
+            self._q_count += 1
+            old = 0.0
+        self._q_sum += value - old
+        self._q_sumsq += value * value - old * old
+        q_values[action] = value
+
+    def _recompute_q_stats(self):
+        """Rebuild the Q aggregates from the table (after bulk loads)"""
+        values = np.fromiter((q for state in self.q_table.values() for q in state.values()), dtype=np.float64)
+        self._q_count = len(values)
+        self._q_sum = float(values.sum())
+        self._q_sumsq = float(np.dot(values, values))
+
     def _update_metrics(self, reward: float):
         """Update performance metrics"""
         alpha = 0.1  # Smoothing factor
@@ -229,6 +428,19 @@ class BettingRLAgent:
         )
         self.metrics["user_satisfaction"] = max(0, min(1, reward))
 
+    def _rebucket(self, source: StateDiscretizer, key: Any) -> Any:
+        """Map a state id of another discretizer to this one (lower bucket bounds)"""
+        state_id = source.migrate_key(key)
+        if not isinstance(state_id, int):
+            return state_id
+        state = source.decode(state_id)
+        return self.discretizer.encode_features(
+            state["battle_type"],
+            state["total_bets"][0] if state["total_bets"][0] is not None else 0,
+            state["bet_split"][0] if state["bet_split"][0] is not None else 0.0,
+            state["historical_accuracy"][0] if state["historical_accuracy"][0] is not None else 0.0
+        )
+
     def get_audit_trail(
         self,
         battle_id: Optional[str] = None,
@@ -244,14 +456,7 @@ class BettingRLAgent:
         Returns:
             List of decision records
         """
-        if battle_id:
-            filtered = [
-                d for d in self.decision_history
-                if d.get("battle_id") == battle_id
-            ]
-            return filtered[-limit:]
-
-        return self.decision_history[-limit:]
+        return self.decision_history.recent(limit=limit, battle_id=battle_id or None)
 
     def get_fairness_report(self) -> Dict:
         """
@@ -266,23 +471,22 @@ class BettingRLAgent:
                 "message": "No decisions made yet"
             }
 
-        # Calculate metrics
-        total_decisions = len(self.decision_history)
-        exploration_rate = sum(
-            1 for d in self.decision_history if d["exploration"]
-        ) / total_decisions
+        # Calculate metrics (all-time counters, maintained on insert)
+        total_decisions = self.decision_history.total
+        exploration_rate = self.decision_history.exploration_rate
 
-        # Q-value statistics
-        all_q_values = [
-            q for state in self.q_table.values()
-            for q in state.values()
-        ]
+        # Q-value statistics (running aggregates, no table scan)
+        if self._q_count:
+            avg_q = self._q_sum / self._q_count
+            std_q = math.sqrt(max(0.0, self._q_sumsq / self._q_count - avg_q ** 2))
+        else:
+            avg_q = std_q = 0
 
         return {
             "total_decisions": total_decisions,
             "exploration_rate": round(exploration_rate, 3),
-            "avg_q_value": round(np.mean(all_q_values), 3) if all_q_values else 0,
-            "q_value_std": round(np.std(all_q_values), 3) if all_q_values else 0,
+            "avg_q_value": round(avg_q, 3),
+            "q_value_std": round(std_q, 3),
             "target_house_edge": self.target_house_edge,
             "actual_house_edge": round(self.metrics["avg_house_edge"], 3),
             "user_satisfaction": round(self.metrics["user_satisfaction"], 3),
@@ -296,54 +500,196 @@ class BettingRLAgent:
     def export_model(self) -> Dict:
         """Export Q-table and configuration for auditing"""
         return {
-            "q_table": {k: dict(v) for k, v in self.q_table.items()},
+            # JSON/BSON keys must be strings
+            "q_table": {str(k): dict(v) for k, v in self.q_table.items()},
             "config": {
                 "learning_rate": self.learning_rate,
                 "discount_factor": self.discount_factor,
                 "epsilon": self.epsilon,
                 "min_odds": self.min_odds,
                 "max_odds": self.max_odds,
-                "target_house_edge": self.target_house_edge
+                "target_house_edge": self.target_house_edge,
+                "state_encoding": self.discretizer.get_config()
             },
             "metrics": self.metrics,
-            "decision_count": len(self.decision_history),
+            "decision_count": self.decision_history.total,
             "exported_at": datetime.utcnow().isoformat()
         }
 
     def import_model(self, model_data: Dict):
-        """Import Q-table from previous training"""
+        """
+        Import Q-table from previous training
+
+        Snapshots saved with a different bucket configuration (or legacy
+        json.dumps state hashes) are migrated to this agent's state ids.
+        """
+        config = model_data.get("config", {})
         if "q_table" in model_data:
+            q_table = model_data["q_table"]
+            encoding = config.get("state_encoding")
+            if encoding and encoding != self.discretizer.get_config():
+                # Ids from another bucket layout: decode with it, re-bucket at the range start
+                source = StateDiscretizer(**encoding)
+                q_table = {self._rebucket(source, key): values for key, values in q_table.items()}
+            q_table = self.discretizer.migrate_q_table(q_table)
             self.q_table = defaultdict(
                 lambda: defaultdict(float),
-                {k: defaultdict(float, v) for k, v in model_data["q_table"].items()}
+                {k: defaultdict(float, v) for k, v in q_table.items()}
             )
+            self._recompute_q_stats()
 
-        if "config" in model_data:
-            config = model_data["config"]
+        if config:
             self.learning_rate = config.get("learning_rate", self.learning_rate)
             self.discount_factor = config.get("discount_factor", self.discount_factor)
             self.epsilon = config.get("epsilon", self.epsilon)
 
 
+def canonical_json(data: Any) -> str:
+    """Deterministic JSON (sorted keys, no whitespace) used for content hashes"""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def content_hash(data: Any) -> str:
+    """SHA-256 of the canonical JSON of a document"""
+    return hashlib.sha256(canonical_json(data).encode("utf-8")).hexdigest()
+
+
 class AuditLogger:
     """
     Separate audit logging class for MongoDB persistence
+
+    Decisions are buffered and written with insert_many. Model snapshots are
+    stored once in a content-addressed collection (_id = SHA-256 of the
+    canonical snapshot) and referenced by `snapshot_id`. With `hash_chain`
+    each record carries the hash of the battle's previous record from this
+    writer, so edited, reordered or deleted records are detectable.
+
+    Appends only flush when the batch is full (or the oldest record is past
+    max_delay); an owner running an event loop should also call flush() from
+    a worker thread every max_delay seconds so quiet periods are written too.
+    The buffer is guarded by a lock, so that flush may run alongside appends.
     """
 
-    def __init__(self, db_collection):
+    def __init__(
+        self,
+        db_collection,
+        snapshot_collection=None,
+        batch_size: int = 100,
+        max_delay: float = 5.0,
+        hash_chain: bool = False
+    ):
         """
         Initialize audit logger
 
         Args:
             db_collection: MongoDB collection for audit logs
+            snapshot_collection: Collection for model snapshots (default: rl_audit_snapshots)
+            batch_size: Buffered records that trigger a flush
+            max_delay: Seconds a buffered record may wait for the next flush
+            hash_chain: Chain records per battle (tamper evidence)
         """
         self.collection = db_collection
+        self.snapshot_collection = snapshot_collection
+        if self.snapshot_collection is None and hasattr(db_collection, "database"):
+            self.snapshot_collection = db_collection.database["rl_audit_snapshots"]
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.hash_chain = hash_chain
+
+        self.writer_id = uuid.uuid4().hex[:12]
+        self._buffer: List[Dict] = []
+        self._buffer_since = 0.0
+        self._lock = threading.Lock()
+        self._known_snapshots: Set[str] = set()
+        # battle_id -> (seq, hash) of this writer's last record
+        self._chain_heads: Dict[str, Tuple[int, str]] = {}
+
+        self.metrics = {
+            "records": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "snapshots_stored": 0,
+            "snapshots_deduplicated": 0
+        }
+
+    @staticmethod
+    def _now() -> datetime:
+        """Current time at MongoDB precision (milliseconds), so hashes survive a round trip"""
+        now = datetime.utcnow()
+        return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+    @staticmethod
+    def record_hash(record: Dict) -> str:
+        """Chain hash of an audit record (every field except _id and the hash itself)"""
+        content = {k: v for k, v in record.items() if k != "_id"}
+        content["chain"] = {k: v for k, v in record.get("chain", {}).items() if k != "hash"}
+        if isinstance(content.get("timestamp"), datetime):
+            content["timestamp"] = content["timestamp"].isoformat()
+        return content_hash(content)
+
+    def store_snapshot(self, model_snapshot: Dict) -> str:
+        """
+        Store a model snapshot once
+
+        Returns:
+            Content-addressed snapshot id
+        """
+        snapshot_id = content_hash(model_snapshot)
+        if snapshot_id in self._known_snapshots:
+            self.metrics["snapshots_deduplicated"] += 1
+            return snapshot_id
+
+        result = self.snapshot_collection.update_one(
+            {"_id": snapshot_id},
+            {"$setOnInsert": {"model_snapshot": model_snapshot, "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        if getattr(result, "upserted_id", None) is not None:
+            self.metrics["snapshots_stored"] += 1
+        else:
+            self.metrics["snapshots_deduplicated"] += 1
+        self._known_snapshots.add(snapshot_id)
+        return snapshot_id
+
+    def get_snapshot(self, snapshot_id: str) -> Optional[Dict]:
+        """Stored model snapshot (None when missing or its content no longer matches the id)"""
+        doc = self.snapshot_collection.find_one({"_id": snapshot_id})
+        if not doc or content_hash(doc["model_snapshot"]) != snapshot_id:
+            return None
+        return doc["model_snapshot"]
+
+    def _append(self, battle_id: Optional[str], decision_data: Dict, snapshot_id: Optional[str] = None):
+        """Buffer one audit record (chained when enabled)"""
+        audit_record = {
+            "battle_id": battle_id,
+            "timestamp": self._now(),
+            "decision": decision_data,
+            "version": "1.1.0",
+            "auditable": True
+        }
+        if snapshot_id is not None:
+            audit_record["snapshot_id"] = snapshot_id
+        if self.hash_chain:
+            seq, prev = self._chain_heads.get(battle_id, (-1, None))
+            audit_record["chain"] = {"writer": self.writer_id, "seq": seq + 1, "prev": prev}
+            audit_record["chain"]["hash"] = self.record_hash(audit_record)
+            self._chain_heads[battle_id] = (seq + 1, audit_record["chain"]["hash"])
+
+        with self._lock:
+            if not self._buffer:
+                self._buffer_since = time.monotonic()
+            self._buffer.append(audit_record)
+        self.metrics["records"] += 1
+
+    def _maybe_flush(self):
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._buffer_since >= self.max_delay:
+            self.flush()
 
     def log_decision(
         self,
         battle_id: str,
         decision_data: Dict,
-        model_snapshot: Dict
+        model_snapshot: Optional[Dict] = None
     ):
         """
         Log RL decision to database
@@ -351,18 +697,74 @@ class AuditLogger:
         Args:
             battle_id: Battle identifier
             decision_data: Decision metadata from RL agent
-            model_snapshot: Current Q-table snapshot
+            model_snapshot: Current Q-table snapshot (stored once, referenced by hash)
         """
-        audit_record = {
-            "battle_id": battle_id,
-            "timestamp": datetime.utcnow(),
-            "decision": decision_data,
-            "model_snapshot": model_snapshot,
-            "version": "1.0.0",
-            "auditable": True
-        }
+        snapshot_id = self.store_snapshot(model_snapshot) if model_snapshot is not None else None
+        self._append(battle_id, decision_data, snapshot_id)
+        self._maybe_flush()
+
+    def log_decisions(self, decisions: List[Dict], model_snapshot: Optional[Dict] = None):
+        """
+        Log a batch of decisions (e.g. evicted from an agent's in-memory history)
+
+        Args:
+            decisions: Decision metadata records (battle_id taken from each record)
+            model_snapshot: Model the decisions were made with
+        """
+        if not decisions:
+            return
+        snapshot_id = self.store_snapshot(model_snapshot) if model_snapshot is not None else None
+        for decision in decisions:
+            self._append(decision.get("battle_id"), decision, snapshot_id)
+        self._maybe_flush()
+
+    def flush(self):
+        """
+        Write buffered records with one insert_many (safe to call from a worker thread)
+
+        Raises the write error after putting the unwritten records back in the
+        buffer, so nothing is lost and the next flush retries them.
+        """
+        with self._lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+        try:
+            self.collection.insert_many(batch, ordered=True)
+        except Exception as e:
+            # Keep what was not written (ordered insert: a prefix may have landed) for the next flush
+            written = (getattr(e, "details", None) or {}).get("nInserted", 0)
+            with self._lock:
+                if not self._buffer:
+                    self._buffer_since = time.monotonic()
+                self._buffer = batch[written:] + self._buffer
+            self.metrics["flush_errors"] += 1
+            raise
+        self.metrics["flushes"] += 1
+
+    def iter_chain_anomalies(self, records: Iterable[Dict]) -> Iterator[str]:
+        """
+        Check hash chains record by record (constant memory)
+
+        Args:
+            records: Chained records ordered by (chain.writer, chain.seq)
 
-        self.collection.insert_one(audit_record)
+        Yields:
+            Anomaly descriptions (none when every record is intact and linked)
+        """
+        writer, seq, prev = None, -1, None
+        for record in records:
+            chain = record["chain"]
+            if chain.get("writer") != writer:
+                writer, seq, prev = chain.get("writer"), -1, None
+            if self.record_hash(record) != chain.get("hash"):
+                yield f"Record {writer}#{chain.get('seq')} was modified (hash mismatch)"
+            if chain.get("seq") != seq + 1 or chain.get("prev") != prev:
+                yield f"Record {writer}#{chain.get('seq')} breaks the chain (missing or reordered records)"
+            seq, prev = chain.get("seq", 0), chain.get("hash")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"buffered": len(self._buffer), **self.metrics}
 
     def get_decision_chain(
         self,
@@ -384,41 +786,73 @@ class AuditLogger:
 
     def verify_fairness(
         self,
-        battle_id: str
+        battle_id: str,
+        max_anomalies: int = 100
     ) -> Dict:
         """
         Verify that all decisions were fair and auditable
 
+        Streams the battle's records from the cursor (projected to the checked
+        fields) instead of loading the decision chain, so memory stays
+        constant for long battles. Hash chains are checked in a second
+        streamed pass ordered by (writer, seq) when chained records exist.
+
         Args:
             battle_id: Battle identifier
+            max_anomalies: Anomaly messages kept in the report (all are counted)
 
         Returns:
             Verification report
         """
-        decisions = self.get_decision_chain(battle_id)
+        anomalies: List[str] = []
+        anomaly_count = 0
+
+        def report(message: str):
+            nonlocal anomaly_count
+            anomaly_count += 1
+            if len(anomalies) < max_anomalies:
+                anomalies.append(message)
+
+        cursor = self.collection.find(
+            {"battle_id": battle_id},
+            {"_id": 0, "auditable": 1, "decision.q_value": 1, "chain.seq": 1}
+        ).sort([("timestamp", 1), ("_id", 1)])
+
+        total_decisions = 0
+        chained_decisions = 0
+        for i, decision in enumerate(cursor):
+            total_decisions += 1
+            chained_decisions += "chain" in decision
 
-        if not decisions:
-            return {
-                "verified": False,
-                "reason": "No decisions found"
-            }
-
-        # Check for anomalies
-        anomalies = []
-        for i, decision in enumerate(decisions):
             # Check if decision is auditable
             if not decision.get("auditable", False):
-                anomalies.append(f"Decision {i} not marked as auditable")
+                report(f"Decision {i} not marked as auditable")
 
             # Check if Q-values make sense
-            q_value = decision["decision"].get("q_value", 0)
+            q_value = decision.get("decision", {}).get("q_value", 0)
             if abs(q_value) > 100:  # Sanity check
-                anomalies.append(f"Decision {i} has abnormal Q-value: {q_value}")
+                report(f"Decision {i} has abnormal Q-value: {q_value}")
+
+        if not total_decisions:
+            return {
+                "verified": False,
+                "reason": "No decisions found"
+            }
+
+        # Tamper evidence (hash-chained records)
+        if chained_decisions:
+            chained = self.collection.find(
+                {"battle_id": battle_id, "chain": {"$exists": True}}
+            ).sort([("chain.writer", 1), ("chain.seq", 1)])
+            for message in self.iter_chain_anomalies(chained):
+                report(message)
 
         return {
-            "verified": len(anomalies) == 0,
-            "total_decisions": len(decisions),
+            "verified": anomaly_count == 0,
+            "total_decisions": total_decisions,
+            "chained_decisions": chained_decisions,
             "anomalies": anomalies,
+            "anomaly_count": anomaly_count,
             "battle_id": battle_id,
             "verified_at": datetime.utcnow().isoformat()
         }
@@ -0,0 +1,229 @@
+"""
+Bitaca Cinema - Betting Model Service
+Process-wide BettingRLAgent with hot-swapped model snapshots
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from agents.betting_rl_agent import AuditLogger, BettingRLAgent
+
+try:
+    from database import COLLECTIONS, MONGODB_ENABLED, RLDB, get_database
+except ImportError:
+    MONGODB_ENABLED = False
+    COLLECTIONS = {}
+    RLDB = None
+    get_database = None
+
+
+class BettingModelService:
+    """
+    Holds the live BettingRLAgent for the whole process
+
+    The latest rl_model_snapshots document is loaded once; a background task
+    polls the newest snapshot's _id (an indexed find_one on created_at, no
+    model transfer) and only fetches and imports a snapshot when it changed.
+    The replacement agent is built off the event loop and swapped in with a
+    single reference assignment, so readers always see one complete model.
+    Every decision is written through the buffered AuditLogger when it is
+    made, and a second task flushes it from a worker thread every
+    audit_max_delay seconds; the in-memory recent decisions and metrics
+    carry over to the new model.
+    """
+
+    def __init__(self, poll_interval: float = 30.0, history_capacity: int = 1000,
+                 audit_sink: Optional[Callable[[Dict], Any]] = None):
+        """
+        Args:
+            poll_interval: Seconds between snapshot checks (0 disables polling)
+            history_capacity: Recent decisions kept in memory for reads
+            audit_sink: Receives every decision (default: rl_audit_logs when MongoDB is enabled)
+        """
+        self.poll_interval = poll_interval
+        self.history_capacity = history_capacity
+        self.audit_max_delay = float(os.getenv("RL_AUDIT_MAX_DELAY", 5.0))
+        self.audit_logger: Optional[AuditLogger] = None
+        if audit_sink is None and MONGODB_ENABLED and RLDB is not None:
+            audit_sink = self._log_decision
+        self.audit_sink = audit_sink
+
+        self.agent = BettingRLAgent(history_capacity=history_capacity, audit_sink=audit_sink)
+        self.snapshot_id: Optional[str] = None
+        self.snapshot_created_at: Optional[datetime] = None
+        self.loaded_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.metrics = {
+            "checks": 0,
+            "swaps": 0,
+            "errors": 0
+        }
+
+    def _log_decision(self, decision: Dict):
+        """Buffer a decision for rl_audit_logs (logger created on first use)"""
+        if self.audit_logger is None:
+            self.audit_logger = AuditLogger(
+                get_database()[COLLECTIONS["rl_audit_logs"]],
+                batch_size=int(os.getenv("RL_AUDIT_BATCH_SIZE", 100)),
+                max_delay=self.audit_max_delay,
+                hash_chain=os.getenv("RL_AUDIT_HASH_CHAIN", "false").lower() == "true"
+            )
+        try:
+            self.audit_logger.log_decision(decision.get("battle_id"), decision)
+        except Exception as e:
+            # The record is buffered; only the batch write failed and is retried on the next flush
+            self._report_flush_error(e)
+
+    def _report_flush_error(self, error: Exception):
+        buffered = self.audit_logger.get_stats()["buffered"]
+        print(f"⚠️  RL audit flush failed, {buffered} records kept for retry: {error}")
+
+    def _flush_audit_log(self):
+        """Write audit records still buffered in the logger (blocking)"""
+        if self.audit_logger is None:
+            return
+        try:
+            self.audit_logger.flush()
+        except Exception as e:
+            self._report_flush_error(e)
+
+    def _load_if_changed(self) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the latest snapshot when it differs from the loaded one (blocking)
+
+        Returns:
+            Snapshot document, or None when the loaded model is current
+        """
+        if RLDB is None:
+            return None
+        ref = RLDB.get_latest_snapshot_ref()
+        if not ref or str(ref["_id"]) == self.snapshot_id:
+            return None
+        return RLDB.get_model_snapshot(ref["_id"])
+
+    def _build_agent(self, snapshot: Dict[str, Any]) -> BettingRLAgent:
+        """New agent with the snapshot's Q-table (blocking, off the event loop)"""
+        agent = BettingRLAgent(history_capacity=self.history_capacity, audit_sink=self.audit_sink)
+        agent.import_model(snapshot.get("model_data", {}))
+        return agent
+
+    def swap(self, snapshot: Dict[str, Any], agent: Optional[BettingRLAgent] = None):
+        """
+        Make a snapshot the live model
+
+        Args:
+            snapshot: rl_model_snapshots document
+            agent: Agent already built from the snapshot (built here when None)
+        """
+        agent = agent or self._build_agent(snapshot)
+        previous = self.agent
+        agent.decision_history = previous.decision_history
+        agent.metrics = previous.metrics
+
+        self.agent = agent
+        self.snapshot_id = str(snapshot.get("_id")) if snapshot.get("_id") is not None else None
+        self.snapshot_created_at = snapshot.get("created_at")
+        self.loaded_at = datetime.utcnow()
+        self.metrics["swaps"] += 1
+
+    def _prepare(self):
+        """Check for a new snapshot and build its agent (runs in a worker thread)"""
+        snapshot = self._load_if_changed()
+        if snapshot is None:
+            return None
+        return snapshot, self._build_agent(snapshot)
+
+    async def refresh(self) -> bool:
+        """
+        Load the latest snapshot if it changed
+
+        Returns:
+            True when a new model was swapped in
+        """
+        self.metrics["checks"] += 1
+        try:
+            prepared = await asyncio.to_thread(self._prepare)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            print(f"⚠️  RL model refresh failed: {e}")
+            return False
+
+        if prepared is None:
+            return False
+        snapshot, agent = prepared
+        self.swap(snapshot, agent)
+        print(f"🔄 RL model snapshot {self.snapshot_id} loaded")
+        return True
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.refresh()
+
+    async def _flush_loop(self):
+        """Write buffered audit records at least every audit_max_delay seconds"""
+        while True:
+            await asyncio.sleep(self.audit_max_delay)
+            await asyncio.to_thread(self._flush_audit_log)
+
+    async def start(self):
+        """Load the current model, start polling for new snapshots and flushing the audit log"""
+        await self.refresh()
+        if self.poll_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._poll_loop())
+        if self.audit_sink == self._log_decision and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the background tasks and write the audit records still buffered"""
+        for task in (self._task, self._flush_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = self._flush_task = None
+        await asyncio.to_thread(self._flush_audit_log)
+
+    def get_fairness_report(self) -> Dict[str, Any]:
+        """Fairness report of the live model (O(1): running aggregates only)"""
+        report = self.agent.get_fairness_report()
+        report["model"] = self.get_model_info()
+        return report
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """Loaded snapshot and refresh metrics"""
+        return {
+            "snapshot_id": self.snapshot_id,
+            "snapshot_created_at": self.snapshot_created_at.isoformat() if self.snapshot_created_at else None,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "poll_interval": self.poll_interval,
+            **self.metrics
+        }
+
+
+_betting_service: Optional[BettingModelService] = None
+
+
+def get_betting_service() -> BettingModelService:
+    """
+    Get or create the process-wide betting model service
+
+    Returns:
+        BettingModelService instance
+    """
+    global _betting_service
+
+    if _betting_service is None:
+        _betting_service = BettingModelService(
+            poll_interval=float(os.getenv("RL_MODEL_POLL_INTERVAL", 30.0)),
+            history_capacity=int(os.getenv("RL_DECISION_HISTORY", 1000))
+        )
+
+    return _betting_service
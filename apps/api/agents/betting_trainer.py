@@ -0,0 +1,260 @@
+"""
+Offline Batch Trainer for BettingRLAgent
+Replays logged odds decisions as columnar NumPy transitions and runs vectorized Q-learning sweeps
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from agents.betting_rl_agent import BettingRLAgent
+
+
+class TransitionBatch:
+    """
+    Columnar transitions with integer-encoded states and actions
+
+    states / next_states index `state_keys` (the agent's Q-table state ids);
+    next_states is -1 for terminal transitions.
+    """
+
+    def __init__(self, state_keys: List[Any], actions: List[str], states: np.ndarray,
+                 action_ids: np.ndarray, rewards: np.ndarray, next_states: np.ndarray):
+        self.state_keys = state_keys
+        self.actions = actions
+        self.states = states
+        self.action_ids = action_ids
+        self.rewards = rewards
+        self.next_states = next_states
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    @classmethod
+    def from_columns(cls, state_hashes: Iterable[Any], actions_taken: Iterable[str],
+                     rewards: Iterable[float], next_state_hashes: Iterable[Optional[Any]],
+                     actions: List[str]) -> "TransitionBatch":
+        """
+        Encode string columns as integer ids
+
+        Args:
+            state_hashes: State hash per transition
+            actions_taken: Action name per transition
+            rewards: Reward per transition
+            next_state_hashes: Next state hash per transition (None = terminal)
+            actions: Action vocabulary (agent.actions order)
+        """
+        ids: Dict[Any, int] = {}
+        states = np.fromiter((ids.setdefault(h, len(ids)) for h in state_hashes), dtype=np.int32)
+        next_states = np.fromiter(
+            (-1 if h is None else ids.setdefault(h, len(ids)) for h in next_state_hashes),
+            dtype=np.int32
+        )
+
+        action_index = {action: i for i, action in enumerate(actions)}
+        action_ids = np.array([action_index[a] for a in actions_taken], dtype=np.int32)
+
+        return cls(
+            state_keys=list(ids),
+            actions=list(actions),
+            states=states,
+            action_ids=action_ids,
+            rewards=np.asarray(list(rewards), dtype=np.float64),
+            next_states=next_states
+        )
+
+    @classmethod
+    def from_audit_logs(cls, decisions: Iterable[Dict[str, Any]], outcomes: Dict[str, Dict[str, Any]],
+                        agent: BettingRLAgent) -> "TransitionBatch":
+        """
+        Build transitions from rl_audit_logs documents and settled bets
+
+        Decisions are chained per battle in timestamp order (each decision's
+        next state is the battle's following decision; the last one is
+        terminal). The reward follows BettingRLAgent._calculate_reward:
+        prediction accuracy (when the decision recorded a predicted_outcome),
+        house edge of the offered odds and user satisfaction (share of the
+        battle's bets that won). A logged decision 'reward' is used as is.
+        Logged state hashes (including legacy JSON ones) are mapped to the
+        agent's state ids.
+
+        Args:
+            decisions: Audit documents sorted by (battle_id, timestamp)
+            outcomes: battle_id -> {'winner', 'won', 'total'} (RLDB.get_battle_outcomes)
+            agent: Agent providing actions and reward parameters
+        """
+        rows = [
+            (doc.get("battle_id"), doc.get("decision", {}))
+            for doc in decisions
+            if doc.get("decision", {}).get("state_hash") is not None and doc.get("decision", {}).get("action_taken") in agent.actions
+        ]
+
+        state_ids = [agent.discretizer.migrate_key(decision["state_hash"]) for _, decision in rows]
+        state_hashes, actions_taken, rewards, next_hashes = [], [], [], []
+        for i, (battle_id, decision) in enumerate(rows):
+            following = rows[i + 1] if i + 1 < len(rows) else None
+            next_hashes.append(state_ids[i + 1] if following and following[0] == battle_id else None)
+            state_hashes.append(state_ids[i])
+            actions_taken.append(decision["action_taken"])
+
+            if "reward" in decision:
+                rewards.append(float(decision["reward"]))
+                continue
+
+            outcome = outcomes.get(battle_id, {})
+            predicted = decision.get("predicted_outcome")
+            accuracy = 0.0
+            if predicted is not None and outcome.get("winner") is not None:
+                accuracy = 1.0 if predicted == outcome["winner"] else -0.5
+
+            odds = float(decision.get("new_odds") or decision.get("current_odds") or agent.min_odds)
+            edge = -abs((1 - 1 / odds) - agent.target_house_edge) * 10
+            satisfaction = (outcome.get("won", 0) / outcome["total"]) if outcome.get("total") else 0.0
+            rewards.append(accuracy + edge + satisfaction * 0.5)
+
+        return cls.from_columns(state_hashes, actions_taken, rewards, next_hashes, agent.actions)
+
+
+class BatchQTrainer:
+    """
+    Vectorized Q-learning over a replay of logged transitions
+
+    Q-values live in a dense (states x actions) array with a visited mask
+    (the agent's defaultdict semantics: the next-state max only considers
+    actions that have a value). Each epoch shuffles the transitions
+    (experience replay) and applies minibatch updates; transitions hitting
+    the same (state, action) in one minibatch are averaged. With
+    batch_size=1 and shuffle=False the result equals calling
+    BettingRLAgent.update_q_value row by row.
+    """
+
+    def __init__(self, agent: Optional[BettingRLAgent] = None, epochs: int = 5,
+                 batch_size: int = 4096, shuffle: bool = True, seed: int = 0):
+        """
+        Args:
+            agent: Agent providing hyperparameters and the warm-start Q-table
+            epochs: Replay sweeps over the transitions
+            batch_size: Transitions per vectorized update
+            shuffle: Shuffle transitions every epoch
+            seed: RNG seed (training is deterministic for a given seed)
+        """
+        self.agent = agent or BettingRLAgent()
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+
+    def _initial_arrays(self, batch: TransitionBatch):
+        """Q-array and visited mask warm-started from the agent's Q-table"""
+        q_values = np.zeros((len(batch.state_keys), len(batch.actions)), dtype=np.float64)
+        visited = np.zeros_like(q_values, dtype=bool)
+        action_index = {action: i for i, action in enumerate(batch.actions)}
+        for row, key in enumerate(batch.state_keys):
+            for action, value in self.agent.q_table.get(key, {}).items():
+                if action in action_index:
+                    q_values[row, action_index[action]] = value
+                    visited[row, action_index[action]] = True
+        return q_values, visited
+
+    def train(self, batch: TransitionBatch) -> Dict[str, Any]:
+        """
+        Run the replay sweeps
+
+        Returns:
+            Snapshot in BettingRLAgent.export_model format (import_model compatible)
+        """
+        q_values, visited = self._initial_arrays(batch)
+        n_actions = q_values.shape[1]
+        alpha, gamma = self.agent.learning_rate, self.agent.discount_factor
+        flat_q, flat_visited = q_values.reshape(-1), visited.reshape(-1)
+
+        order = np.arange(len(batch))
+        for _ in range(self.epochs):
+            if self.shuffle:
+                self.rng.shuffle(order)
+            for start in range(0, len(order), self.batch_size):
+                index = order[start:start + self.batch_size]
+                states, next_states = batch.states[index], batch.next_states[index]
+                cells = states * n_actions + batch.action_ids[index]
+                # Updated cells exist (value 0.0) before the next-state max, as with the defaultdict
+                flat_visited[cells] = True
+
+                # max Q(s', a') over visited actions (0 for terminal / unseen next states)
+                max_next = np.zeros(len(index))
+                live = next_states >= 0
+                if live.any():
+                    rows = next_states[live]
+                    masked = np.where(visited[rows], q_values[rows], -np.inf).max(axis=1)
+                    max_next[live] = np.where(np.isfinite(masked), masked, 0.0)
+
+                td_error = batch.rewards[index] + gamma * max_next - flat_q[cells]
+                touched, slot = np.unique(cells, return_inverse=True)
+                sums = np.bincount(slot, weights=td_error)
+                counts = np.bincount(slot)
+                flat_q[touched] += alpha * sums / counts
+
+        return self._snapshot(batch, q_values, visited)
+
+    def _snapshot(self, batch: TransitionBatch, q_values: np.ndarray, visited: np.ndarray) -> Dict[str, Any]:
+        # String keys, as in export_model (JSON/BSON)
+        q_table = {str(key): dict(values) for key, values in self.agent.q_table.items() if values}
+        rows, cols = np.nonzero(visited)
+        for row, col in zip(rows, cols):
+            q_table.setdefault(str(batch.state_keys[row]), {})[batch.actions[col]] = float(q_values[row, col])
+
+        model = self.agent.export_model()
+        model["q_table"] = q_table
+        model["decision_count"] = model.get("decision_count", 0) + len(batch)
+        model["training"] = {
+            "transitions": len(batch),
+            "states": len(batch.state_keys),
+            "epochs": self.epochs,
+            "batch_size": self.batch_size,
+            "mean_reward": round(float(batch.rewards.mean()), 4) if len(batch) else 0.0,
+            "trained_at": datetime.utcnow().isoformat()
+        }
+        return model
+
+
+def train_from_database(epochs: int = 5, batch_size: int = 4096, since: Optional[datetime] = None,
+                        save: bool = True) -> Dict[str, Any]:
+    """
+    Retrain from rl_audit_logs + bet_records and store a new model snapshot
+
+    Args:
+        epochs: Replay sweeps
+        batch_size: Transitions per vectorized update
+        since: Only decisions logged after this time (None = all)
+        save: Insert the result into rl_model_snapshots
+
+    Returns:
+        Trained model (import_model format)
+    """
+    from database import RLDB
+
+    agent = BettingRLAgent()
+    latest = RLDB.get_latest_model_snapshot()
+    if latest:
+        agent.import_model(latest["model_data"])
+
+    decisions = RLDB.get_decision_logs(since=since)
+    outcomes = RLDB.get_battle_outcomes()
+    batch = TransitionBatch.from_audit_logs(decisions, outcomes, agent)
+    model = BatchQTrainer(agent, epochs=epochs, batch_size=batch_size).train(batch)
+
+    if save:
+        RLDB.save_model_snapshot(model)
+    return model
+
+
+if __name__ == "__main__":
+    # Nightly retrain: python -m agents.betting_trainer [epochs]
+    import sys
+    import time
+
+    start = time.perf_counter()
+    trained = train_from_database(epochs=int(sys.argv[1]) if len(sys.argv) > 1 else 5)
+    info = trained["training"]
+    print(f"✅ Trained on {info['transitions']} transitions / {info['states']} states "
+          f"in {time.perf_counter() - start:.2f}s")
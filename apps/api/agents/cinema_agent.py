@@ -3,11 +3,16 @@ Bitaca Cinema - Cinema Agent
 Specialized agent for audiovisual productions knowledge
 """
 
+import os
 from typing import Dict, Any
 
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 
+from agents.conversation_memory import render_history
+from agents.llm_router import run_agent
+from agents.prompts import compile_prompt, fit_blocks
+
 
 class CinemaAgent:
     """
@@ -15,6 +20,9 @@ class CinemaAgent:
     Expert in directors, themes, synopses, and production details
     """
 
+    # Canned answer used when the LLM call fails
+    FALLBACK_RESPONSE = "Eae parceiro! Sou do Bitaca Cinema. Te ajudo com informações sobre nossas produções!"
+
     def __init__(self, nvidia_api_key: str, model_id: str = "meta/llama-3.3-70b-instruct"):
         self.nvidia_api_key = nvidia_api_key
         self.model_id = model_id
@@ -43,6 +51,12 @@ class CinemaAgent:
             markdown=True
         )
 
+        # Static system prompt, assembled once (stable prefix for provider-side caching)
+        self.system_prompt = compile_prompt("cinema", self.agent.description, *self.agent.instructions)
+        # Agno sends it verbatim too, so routed and direct calls share the prefix
+        self.agent.system_message = self.system_prompt.text
+        self.context_tokens = int(os.getenv('RAG_CONTEXT_TOKENS', 600))
+
     async def process_query(self, query: str, context: Dict[str, Any] = None) -> str:
         """
         Process a cinema-related query
@@ -59,33 +73,39 @@ class CinemaAgent:
             enhanced_query = query
 
             if context and context.get('productions'):
-                prods = context['productions']
-                context_text = "\n\nProduções relevantes encontradas:\n"
-                for i, prod in enumerate(prods[:3], 1):
-                    context_text += f"\n{i}. **{prod.get('titulo')}**\n"
-                    context_text += f"   - Diretor: {prod.get('diretor')}\n"
-                    context_text += f"   - Tema: {prod.get('tema')}\n"
-                    context_text += f"   - Sinopse: {prod.get('sinopse', '')[:150]}...\n"
-
-                enhanced_query = query + context_text
+                # RAG context trimmed to the token budget (most relevant first)
+                enhanced_query = query + fit_blocks(
+                    [
+                        f"\n{i}. **{prod.get('titulo')}**\n"
+                        f"   - Diretor: {prod.get('diretor')}\n"
+                        f"   - Tema: {prod.get('tema')}\n"
+                        f"   - Sinopse: {(prod.get('sinopse') or '')[:150]}...\n"
+                        for i, prod in enumerate(context['productions'][:3], 1)
+                    ],
+                    self.context_tokens,
+                    header="\n\nProduções relevantes encontradas:\n"
+                )
+
+            # Conversation summary + recent turns (token bounded)
+            enhanced_query += render_history(context)
 
             # Get agent response with error handling
             try:
-                response = self.agent.run(enhanced_query)
-                response_content = response.content if response else None
+                # Routed (NIM/Gemini, hedged) when LLM_ROUTER_ENABLED, else the agent's own model
+                response_content = await run_agent(self.agent, enhanced_query, task='cinema', system_prompt=self.system_prompt)
             except Exception as agent_error:
                 print(f"❌ Cinema agent run error: {agent_error}")
                 response_content = None
 
             # Fallback response
             if not response_content:
-                return "Eae parceiro! Sou do Bitaca Cinema. Te ajudo com informações sobre nossas produções!"
+                return self.FALLBACK_RESPONSE
 
             return response_content
 
         except Exception as e:
             print(f"❌ Cinema agent error: {e}")
-            return "Eae parceiro! Sou do Bitaca Cinema. Te ajudo com informações sobre nossas produções!"
+            return self.FALLBACK_RESPONSE
 
     def get_agent_info(self) -> Dict[str, str]:
         """Get agent information"""
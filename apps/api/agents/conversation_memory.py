@@ -0,0 +1,393 @@
+"""
+Bitaca Cinema - Conversation Memory
+Server-side chat sessions with a token-bounded window and versioned persistence
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from agents.prompts import count_tokens
+
+try:
+    from database import MONGODB_ENABLED, ConversationDB
+except ImportError:
+    MONGODB_ENABLED = False
+    ConversationDB = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of a message (cached count + 1 for the role/separator)"""
+    return count_tokens(text or "") + 1
+
+
+def summarize_turns(summary: str, turns: List[Dict[str, Any]], max_tokens: int) -> str:
+    """
+    Extractive incremental summary (no LLM call)
+
+    Appends one clipped line per evicted turn to the running summary and
+    drops the oldest lines once the summary exceeds its token budget.
+    """
+    lines = [line for line in (summary or "").split("\n") if line]
+    for turn in turns:
+        content = " ".join(turn["content"].split())
+        lines.append(f"{turn['role']}: {content[:160]}{'...' if len(content) > 160 else ''}")
+
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def render_history(context: Optional[Dict[str, Any]], max_tokens: int = 600) -> str:
+    """
+    Render summary + history from an agent context as prompt text
+
+    History is trimmed from the oldest turn to fit max_tokens, so clients
+    that still send full histories cannot blow up the prompt.
+    """
+    if not context:
+        return ""
+
+    summary = context.get("summary") or ""
+    history = context.get("history") or []
+
+    budget = max_tokens - (estimate_tokens(summary) if summary else 0)
+    lines: List[str] = []
+    for message in reversed(history):
+        line = f"{message.get('role')}: {message.get('content', '')}"
+        cost = estimate_tokens(line)
+        if cost > budget:
+            break
+        lines.append(line)
+        budget -= cost
+
+    text = ""
+    if summary:
+        text += f"\n\nResumo da conversa até aqui:\n{summary}\n"
+    if lines:
+        text += "\n\nHistórico recente da conversa:\n" + "\n".join(reversed(lines)) + "\n"
+    return text
+
+
+class ConversationAccessError(Exception):
+    """Conversation belongs to another user"""
+
+
+class ConversationSession:
+    """In-memory state of one conversation"""
+
+    def __init__(self, conversation_id: str, user_id: str = "anonymous",
+                 summary: str = "", window: Optional[List[Dict[str, Any]]] = None,
+                 summarized_count: int = 0, version: int = 0):
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.summary = summary
+        self.window: List[Dict[str, Any]] = list(window or [])
+        self.summarized_count = summarized_count
+        self.version = version
+        self.new_messages = 0
+        self.last_access = time.time()
+
+    def load(self, doc: Dict[str, Any]):
+        """Replace the state with a stored session document"""
+        self.user_id = doc.get("user_id", self.user_id)
+        self.summary = doc.get("summary", "")
+        self.window = list(doc.get("window", []))
+        self.summarized_count = doc.get("summarized_count", 0)
+        self.version = doc.get("version", 0)
+
+    @property
+    def window_tokens(self) -> int:
+        return sum(estimate_tokens(message["content"]) for message in self.window)
+
+    def to_context(self) -> Dict[str, Any]:
+        """Agent context (rolling window + summary of older turns)"""
+        return {
+            "conversation_id": self.conversation_id,
+            "summary": self.summary,
+            "history": [{"role": m["role"], "content": m["content"]} for m in self.window]
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        """Persisted session document"""
+        return {
+            "conversation_id": self.conversation_id,
+            "user_id": self.user_id,
+            "summary": self.summary,
+            "window": self.window,
+            "summarized_count": self.summarized_count,
+            "version": self.version,
+            "new_messages": self.new_messages
+        }
+
+
+class ConversationMemory:
+    """
+    Server-side conversation sessions
+
+    - The window keeps the most recent turns within max_window_tokens;
+      older turns are folded into an incremental summary
+    - Session state lives in MongoDB and is shared by every worker: it is
+      reloaded on each request and saved per turn with a version check
+      (a concurrent writer makes the save fail; the turns are re-applied
+      to the reloaded state and saved again)
+    - The message log is written behind: queued in memory and flushed in
+      batches (insert_many), it is append-only so workers never conflict
+    - Sessions are owned by the user that created them
+    - Sessions are kept in an LRU cache (the only copy without MongoDB)
+    """
+
+    # Save attempts per turn before giving up on a contended session
+    SAVE_ATTEMPTS = 5
+
+    def __init__(self,
+                 max_window_tokens: int = 1200,
+                 min_window_messages: int = 2,
+                 max_summary_tokens: int = 300,
+                 max_sessions: int = 1000,
+                 flush_interval: float = 2.0,
+                 flush_batch_size: int = 100,
+                 summarizer: Optional[Callable[[str, List[Dict[str, Any]]], Awaitable[str]]] = None,
+                 persist: bool = True):
+        """
+        Initialize conversation memory
+
+        Args:
+            max_window_tokens: Token budget of the verbatim window
+            min_window_messages: Messages always kept verbatim
+            max_summary_tokens: Token budget of the running summary
+            max_sessions: Sessions kept in process memory
+            flush_interval: Seconds between message log flushes
+            flush_batch_size: Queued messages that trigger an early flush
+            summarizer: Optional async (summary, turns) -> summary (e.g. an LLM)
+            persist: Use MongoDB (when configured)
+        """
+        self.max_window_tokens = max_window_tokens
+        self.min_window_messages = min_window_messages
+        self.max_summary_tokens = max_summary_tokens
+        self.max_sessions = max_sessions
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.summarizer = summarizer
+        self.persist = persist and MONGODB_ENABLED and ConversationDB is not None
+
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._pending_messages: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.metrics = {
+            "sessions_created": 0,
+            "sessions_loaded": 0,
+            "turns_summarized": 0,
+            "save_conflicts": 0,
+            "save_errors": 0,
+            "flushes": 0,
+            "messages_flushed": 0
+        }
+
+    async def get_session(self, conversation_id: Optional[str] = None,
+                          user_id: str = "anonymous") -> ConversationSession:
+        """
+        Get a session with its latest stored state, or create a new one
+
+        Args:
+            conversation_id: Existing id (None starts a new conversation)
+            user_id: Requesting user (owner of new sessions)
+
+        Raises:
+            ConversationAccessError: The conversation belongs to another user
+        """
+        session = self._sessions.get(conversation_id) if conversation_id else None
+
+        if conversation_id and self.persist:
+            # Other workers may have added turns since this copy was loaded
+            try:
+                doc = await asyncio.to_thread(ConversationDB.load_session, conversation_id)
+            except Exception as e:
+                doc = None
+                print(f"⚠️  Conversation load failed: {e}")
+            if doc:
+                if session is None:
+                    session = ConversationSession(conversation_id, user_id)
+                session.load(doc)
+                self.metrics["sessions_loaded"] += 1
+
+        if session is None:
+            session = ConversationSession(conversation_id or uuid.uuid4().hex, user_id)
+            self.metrics["sessions_created"] += 1
+        elif session.user_id != user_id:
+            raise ConversationAccessError(f"Conversation {session.conversation_id} belongs to another user")
+
+        session.last_access = time.time()
+        self._sessions[session.conversation_id] = session
+        self._sessions.move_to_end(session.conversation_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    async def add_turn(self, session: ConversationSession, role: str, content: str,
+                       intent: Optional[str] = None, agent: Optional[str] = None):
+        """
+        Append a message, compact the window and save the session
+
+        Args:
+            session: Target session
+            role: user or assistant
+            content: Message text
+            intent: Detected intent
+            agent: Agent that produced an assistant message
+        """
+        await self.add_turns(session, [{"role": role, "content": content, "intent": intent, "agent": agent}])
+
+    async def add_turns(self, session: ConversationSession, turns: List[Dict[str, Any]]):
+        """
+        Append several messages with a single session save
+
+        Args:
+            session: Target session
+            turns: Dicts with role, content and optional intent/agent
+        """
+        messages = [{"role": turn["role"], "content": turn["content"], "timestamp": time.time()} for turn in turns]
+
+        for attempt in range(self.SAVE_ATTEMPTS if self.persist else 1):
+            session.window.extend(messages)
+            session.new_messages = len(messages)
+            await self._compact(session)
+            if not self.persist or await self._save(session):
+                break
+            # Lost the race: take the stored state and re-apply these turns
+            self.metrics["save_conflicts"] += 1
+            try:
+                doc = await asyncio.to_thread(ConversationDB.load_session, session.conversation_id)
+            except Exception as e:
+                print(f"⚠️  Conversation reload failed: {e}")
+                break
+            if not doc:
+                break
+            session.load(doc)
+        else:
+            print(f"⚠️  Conversation {session.conversation_id} still contended - turns kept in the message log only")
+        session.new_messages = 0
+
+        self._pending_messages.extend(
+            {
+                "conversation_id": session.conversation_id,
+                "role": turn["role"],
+                "content": turn["content"],
+                "intent": turn.get("intent"),
+                "agent": turn.get("agent")
+            }
+            for turn in turns
+        )
+        if len(self._pending_messages) >= self.flush_batch_size:
+            await self.flush()
+
+    async def _save(self, session: ConversationSession) -> bool:
+        """
+        Write the session if its stored version is still the loaded one
+
+        Returns:
+            False on a version conflict (errors are logged, not retried)
+        """
+        try:
+            saved = await asyncio.to_thread(ConversationDB.save_session, session.to_state(), session.version)
+        except Exception as e:
+            self.metrics["save_errors"] += 1
+            print(f"⚠️  Conversation save failed: {e}")
+            return True
+        if saved:
+            session.version += 1
+        return saved
+
+    async def _compact(self, session: ConversationSession):
+        """Fold the oldest turns into the summary until the window fits"""
+        evicted = []
+        while session.window_tokens > self.max_window_tokens and len(session.window) > self.min_window_messages:
+            evicted.append(session.window.pop(0))
+
+        if not evicted:
+            return
+
+        if self.summarizer is not None:
+            try:
+                session.summary = await self.summarizer(session.summary, evicted)
+            except Exception as e:
+                print(f"⚠️  Summarizer failed, using extractive summary: {e}")
+                session.summary = summarize_turns(session.summary, evicted, self.max_summary_tokens)
+        else:
+            session.summary = summarize_turns(session.summary, evicted, self.max_summary_tokens)
+
+        session.summarized_count += len(evicted)
+        self.metrics["turns_summarized"] += len(evicted)
+
+    async def flush(self):
+        """Write queued messages to the message log"""
+        messages, self._pending_messages = self._pending_messages, []
+        if not self.persist or not messages:
+            return
+
+        try:
+            # pymongo is synchronous - keep the event loop free
+            await asyncio.to_thread(ConversationDB.add_messages, messages)
+            self.metrics["flushes"] += 1
+            self.metrics["messages_flushed"] += len(messages)
+        except Exception as e:
+            print(f"⚠️  Conversation flush failed: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic message log flush"""
+        if self.persist and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the periodic task and flush what is left"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Session and persistence metrics"""
+        return {
+            "sessions": len(self._sessions),
+            "pending_messages": len(self._pending_messages),
+            "persistent": self.persist,
+            "max_window_tokens": self.max_window_tokens,
+            **self.metrics
+        }
+
+
+# Singleton instance
+_conversation_memory: Optional[ConversationMemory] = None
+
+
+def get_conversation_memory() -> ConversationMemory:
+    """
+    Get or create the process-wide conversation memory
+
+    Returns:
+        ConversationMemory instance
+    """
+    global _conversation_memory
+
+    if _conversation_memory is None:
+        _conversation_memory = ConversationMemory(
+            max_window_tokens=int(os.getenv("CONVERSATION_WINDOW_TOKENS", 1200)),
+            max_summary_tokens=int(os.getenv("CONVERSATION_SUMMARY_TOKENS", 300)),
+            max_sessions=int(os.getenv("CONVERSATION_MAX_SESSIONS", 1000)),
+            flush_interval=float(os.getenv("CONVERSATION_FLUSH_INTERVAL", 2.0))
+        )
+
+    return _conversation_memory
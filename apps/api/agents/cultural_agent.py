@@ -8,6 +8,10 @@ from typing import Dict, Any
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 
+from agents.conversation_memory import render_history
+from agents.llm_router import run_agent
+from agents.prompts import compile_prompt
+
 
 class CulturalAgent:
     """
@@ -15,6 +19,9 @@ class CulturalAgent:
     Expert in Lei Paulo Gustavo, PNAB, and cultural funding
     """
 
+    # Canned answer used when the LLM call fails
+    FALLBACK_RESPONSE = "Eae! Te ajudo com informações sobre as leis de fomento cultural, Lei Paulo Gustavo e PNAB!"
+
     def __init__(self, nvidia_api_key: str, model_id: str = "meta/llama-3.3-70b-instruct"):
         self.nvidia_api_key = nvidia_api_key
         self.model_id = model_id
@@ -51,6 +58,11 @@ class CulturalAgent:
             markdown=True
         )
 
+        # Static system prompt, assembled once (stable prefix for provider-side caching)
+        self.system_prompt = compile_prompt("cultural", self.agent.description, *self.agent.instructions)
+        # Agno sends it verbatim too, so routed and direct calls share the prefix
+        self.agent.system_message = self.system_prompt.text
+
     async def process_query(self, query: str, context: Dict[str, Any] = None) -> str:
         """
         Process a cultural policy query
@@ -72,23 +84,26 @@ class CulturalAgent:
                 elif context.get('law_type') == 'pnab':
                     enhanced_query += "\n\nContexto: PNAB - Edital 005/2024 em análise"
 
+                # Conversation summary + recent turns (token bounded)
+                enhanced_query += render_history(context)
+
             # Get agent response with error handling
             try:
-                response = self.agent.run(enhanced_query)
-                response_content = response.content if response else None
+                # Routed (NIM/Gemini, hedged) when LLM_ROUTER_ENABLED, else the agent's own model
+                response_content = await run_agent(self.agent, enhanced_query, task='cultural', system_prompt=self.system_prompt)
             except Exception as agent_error:
                 print(f"❌ Cultural agent run error: {agent_error}")
                 response_content = None
 
             # Fallback response
             if not response_content:
-                return "Eae! Te ajudo com informações sobre as leis de fomento cultural, Lei Paulo Gustavo e PNAB!"
+                return self.FALLBACK_RESPONSE
 
             return response_content
 
         except Exception as e:
             print(f"❌ Cultural agent error: {e}")
-            return "Eae! Te ajudo com informações sobre as leis de fomento cultural, Lei Paulo Gustavo e PNAB!"
+            return self.FALLBACK_RESPONSE
 
     def get_agent_info(self) -> Dict[str, str]:
         """Get agent information"""
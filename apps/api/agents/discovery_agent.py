@@ -3,31 +3,22 @@ Bitaca Cinema - Discovery Agent
 Specialized agent for search and recommendations using RAG
 """
 
-from typing import Dict, Any
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
+from agno.run.agent import RunEvent
 
+from agents.llm_router import get_llm_router, run_agent
+from agents.prompts import compile_prompt, fit_blocks
 from agents.tools.rag_tool import RAGTool
 from deronas_personality import DERONAS_SYSTEM_PROMPT
 
 
-class DiscoveryAgent:
-    """
-    Specialized agent for discovering and recommending productions
-    Uses RAG (Retrieval Augmented Generation) for intelligent search
-    """
+DISCOVERY_DESCRIPTION = "Deronas - A assistente underground e visceral do Bitaca Cinema (powered by NVIDIA Nemotron-4 340B)"
 
-    def __init__(self, nvidia_api_key: str, embeddings_data: list,
-                 model_id: str = "nvidia/llama-3.1-nemotron-ultra-253b-v1"):
-        self.nvidia_api_key = nvidia_api_key
-        self.model_id = model_id
-
-        # Initialize RAG tool
-        self.rag_tool = RAGTool(embeddings_data, nvidia_api_key)
-
-        # Create Agno agent with Deronas personality + discovery expertise
-        deronas_instructions = DERONAS_SYSTEM_PROMPT + """
+DISCOVERY_INSTRUCTIONS = """
 
 # INFORMAÇÕES TÉCNICAS DAS PRODUÇÕES
 Quando recomendar produções, inclua detalhes técnicos:
@@ -46,6 +37,26 @@ Ao recomendar:
 Máximo de 3-4 parágrafos por resposta, mas seja VISCERAL e AUTÊNTICA!
 """
 
+
+class DiscoveryAgent:
+    """
+    Specialized agent for discovering and recommending productions
+    Uses RAG (Retrieval Augmented Generation) for intelligent search
+    """
+
+    def __init__(self, nvidia_api_key: str, embeddings_data: list,
+                 model_id: str = "nvidia/llama-3.1-nemotron-ultra-253b-v1"):
+        self.nvidia_api_key = nvidia_api_key
+        self.model_id = model_id
+
+        # Initialize RAG tool
+        self.rag_tool = RAGTool(embeddings_data, nvidia_api_key)
+
+        # Static system prompt, assembled once (stable prefix for provider-side caching)
+        self.system_prompt = compile_prompt("discovery", DISCOVERY_DESCRIPTION, DERONAS_SYSTEM_PROMPT, DISCOVERY_INSTRUCTIONS)
+        self.context_tokens = int(os.getenv('RAG_CONTEXT_TOKENS', 600))
+
+        # Create Agno agent with Deronas personality + discovery expertise
         self.agent = Agent(
             name="Deronas",
             model=OpenAIChat(
@@ -57,18 +68,22 @@ Máximo de 3-4 parágrafos por resposta, mas seja VISCERAL e AUTÊNTICA!
                 top_p=0.8,
                 max_tokens=4096
             ),
-            description="Deronas - A assistente underground e visceral do Bitaca Cinema (powered by NVIDIA Nemotron-4 340B)",
-            instructions=[deronas_instructions],
+            description=DISCOVERY_DESCRIPTION,
+            instructions=[DERONAS_SYSTEM_PROMPT + DISCOVERY_INSTRUCTIONS],
+            # Compiled prompt sent verbatim, so routed and direct calls share the prefix
+            system_message=self.system_prompt.text,
             markdown=True
         )
 
-    async def process_query(self, query: str, search_enabled: bool = True) -> Dict[str, Any]:
+    async def process_query(self, query: str, search_enabled: bool = True,
+                            filters: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
         """
         Process a discovery/recommendation query
 
         Args:
             query: User search or recommendation request
             search_enabled: Whether to perform RAG search
+            filters: Metadata constraints (tema, eixo, status, diretor)
 
         Returns:
             Dict with response and found productions
@@ -78,33 +93,33 @@ Máximo de 3-4 parágrafos por resposta, mas seja VISCERAL e AUTÊNTICA!
         try:
             # Perform RAG search if enabled
             if search_enabled:
-                try:
-                    found_productions = await self.rag_tool.search_productions(query, top_k=3)
-                    print(f"🔍 RAG Search found {len(found_productions)} productions")
-                except Exception as rag_error:
-                    print(f"⚠️ RAG search failed: {rag_error}")
-                    # Continue without RAG results
+                found_productions = await self.retrieve_productions(query, top_k=3, filters=filters)
 
             # Build context for agent
-            context_text = query
-            if found_productions:
-                context_text += "\n\n**Produções relevantes encontradas:**\n"
-                for i, prod in enumerate(found_productions, 1):
-                    context_text += f"\n{i}. **{prod['titulo']}**\n"
-                    context_text += f"   - Diretor: {prod['diretor']}\n"
-                    context_text += f"   - Eixo temático: {prod['eixo']}\n"
-                    context_text += f"   - Sinopse: {prod['sinopse'][:200]}...\n"
-                    context_text += f"   - Relevância: {prod['similarity']:.0%}\n"
+            # RAG context trimmed to the token budget (most relevant first)
+            context_text = query + fit_blocks(
+                [
+                    f"\n{i}. **{prod['titulo']}**\n"
+                    f"   - Diretor: {prod['diretor']}\n"
+                    f"   - Eixo temático: {prod['eixo']}\n"
+                    f"   - Sinopse: {(prod['sinopse'] or '')[:200]}...\n"
+                    + (f"   - Relevância: {prod['similarity']:.0%}\n" if prod['similarity'] is not None else "")
+                    for i, prod in enumerate(found_productions, 1)
+                ],
+                self.context_tokens,
+                header="\n\n**Produções relevantes encontradas:**\n"
+            )
 
             # Get agent response with error handling
             try:
-                response = self.agent.run(context_text)
-                response_content = response.content if response else None
+                # Routed (NIM/Gemini, hedged) when LLM_ROUTER_ENABLED, else the agent's own model
+                response_content = await run_agent(self.agent, context_text, task='discovery', system_prompt=self.system_prompt)
             except Exception as agent_error:
                 print(f"❌ Agent run error: {agent_error}")
                 response_content = None
 
             # Fallback response if agent fails
+            generated = bool(response_content)
             if not response_content:
                 if found_productions:
                     response_content = f"Eae parceiro! Encontrei algumas produções massa aqui: {', '.join([p['titulo'] for p in found_productions[:3]])}. Dá uma olhada!"
@@ -114,7 +129,8 @@ Máximo de 3-4 parágrafos por resposta, mas seja VISCERAL e AUTÊNTICA!
             return {
                 "response": response_content,
                 "productions": found_productions,
-                "search_performed": search_enabled
+                "search_performed": search_enabled,
+                "generated": generated
             }
 
         except Exception as e:
@@ -123,21 +139,136 @@ Máximo de 3-4 parágrafos por resposta, mas seja VISCERAL e AUTÊNTICA!
             return {
                 "response": "Eae parceiro! Sou a Deronas do Bitaca Cinema. Como posso te ajudar?",
                 "productions": [],
-                "search_performed": False
+                "search_performed": False,
+                "generated": False
             }
 
-    async def recommend_similar(self, production_title: str) -> Dict[str, Any]:
+    async def retrieve_productions(self, query: str, top_k: int = 3,
+                                   filters: Optional[Dict[str, List[str]]] = None) -> list:
+        """
+        Retrieval-only path: run the RAG search without any LLM generation
+
+        Used by AgentManager to gather production context for other agents,
+        so that a single query costs one LLM call instead of two.
+
+        Args:
+            query: User query text
+            top_k: Number of productions to return
+            filters: Metadata constraints (tema, eixo, status, diretor)
+
+        Returns:
+            List of relevant productions (empty if the search fails)
+        """
+        try:
+            found_productions = await self.rag_tool.search_productions(query, top_k=top_k, filters=filters)
+            print(f"🔍 RAG Search found {len(found_productions)} productions")
+            return found_productions
+        except Exception as rag_error:
+            print(f"⚠️ RAG search failed: {rag_error}")
+            # Continue without RAG results
+            return []
+
+    def find_similar(self, production_title: Optional[str] = None, production_id=None,
+                     top_k: int = 5) -> Optional[Dict[str, Any]]:
+        """
+        Instant similar-productions lookup from the precomputed similarity table
+
+        Args:
+            production_title: Production title (accent/case-insensitive)
+            production_id: Production id (takes precedence over the title)
+            top_k: Number of similar productions
+
+        Returns:
+            Dict with 'production' and 'similar', or None if the production is unknown
+        """
+        row = self.rag_tool.find_production(title=production_title, production_id=production_id)
+        if row is None:
+            return None
+
+        return {
+            "production": self.rag_tool.get_production(row),
+            "similar": self.rag_tool.similar_productions(row, top_k=top_k),
+            "similarity_version": self.rag_tool.similarity.version
+        }
+
+    def _recommendation_prompt(self, production: Dict[str, Any], similar: list) -> str:
+        prompt = f"Recomende produções parecidas com **{production['titulo']}** ({production['tema']}) " \
+                 f"e explique a conexão de cada uma com ele."
+        return prompt + fit_blocks(
+            [
+                f"\n{i}. **{prod['titulo']}** - Diretor: {prod['diretor']}\n"
+                f"   - Sinopse: {(prod['sinopse'] or '')[:200]}...\n"
+                f"   - Similaridade: {prod['similarity']:.0%}\n"
+                for i, prod in enumerate(similar, 1)
+            ],
+            self.context_tokens,
+            header="\n\n**Produções similares:**\n"
+        )
+
+    async def stream_recommendation(self, production: Dict[str, Any], similar: list) -> AsyncIterator[str]:
+        """
+        Stream the LLM narrative for a precomputed recommendation
+
+        Args:
+            production: Source production
+            similar: Similar productions (from find_similar)
+
+        Yields:
+            Response text chunks
+        """
+        prompt = self._recommendation_prompt(production, similar)
+
+        router = get_llm_router()
+        if router.enabled:
+            messages = [
+                {"role": "system", "content": self.system_prompt.text},
+                {"role": "user", "content": prompt}
+            ]
+            async for chunk in router.stream(messages, task="discovery", temperature=0.7, top_p=0.8, max_tokens=1024):
+                yield chunk
+            return
+
+        async for event in self.agent.arun(prompt, stream=True):
+            content = getattr(event, "content", None)
+            if getattr(event, "event", None) == RunEvent.run_content.value and isinstance(content, str) and content:
+                yield content
+
+    async def recommend_similar(self, production_title: str, top_k: int = 3) -> Dict[str, Any]:
         """
         Recommend productions similar to a given title
 
+        Known productions use the precomputed similarity table (no embedding
+        call); unknown titles fall back to a RAG search.
+
         Args:
             production_title: Title to find similar productions
+            top_k: Number of productions to recommend
 
         Returns:
             Recommendations dict
         """
-        query = f"produções similares a {production_title}"
-        return await self.process_query(query, search_enabled=True)
+        found = self.find_similar(production_title, top_k=top_k)
+        if found is None:
+            query = f"produções similares a {production_title}"
+            return await self.process_query(query, search_enabled=True)
+
+        try:
+            # Routed (NIM/Gemini, hedged) when LLM_ROUTER_ENABLED, else the agent's own model
+            prompt = self._recommendation_prompt(found["production"], found["similar"])
+            response_content = await run_agent(self.agent, prompt, task='discovery', system_prompt=self.system_prompt)
+        except Exception as agent_error:
+            print(f"❌ Agent run error: {agent_error}")
+            response_content = None
+
+        if not response_content:
+            titles = ", ".join(p["titulo"] for p in found["similar"])
+            response_content = f"Eae parceiro! Se curtiu {found['production']['titulo']}, dá uma olhada em: {titles}!"
+
+        return {
+            "response": response_content,
+            "productions": found["similar"],
+            "search_performed": False
+        }
 
     def get_agent_info(self) -> Dict[str, str]:
         """Get agent information"""
@@ -5,12 +5,29 @@ Specialized agent using Google Gemini for complex reasoning and search
 
 from typing import Dict, Any, Optional
 import asyncio
+import os
 
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from gemini_integration import get_gemini_client, GeminiIntegration
+from agents.conversation_memory import render_history
+from agents.prompts import compile_prompt, fit_blocks
+
+
+# Static Bitaca preamble, compiled once and sent as the system instruction
+GEMINI_SYSTEM_PROMPT = compile_prompt("gemini", """
+Você é um assistente do Bitaca Cinema em Capão Bonito/SP.
+
+Contexto do projeto:
+- Espaço cultural underground e democrático
+- 23 produções audiovisuais financiadas pela Lei Paulo Gustavo
+- Eixos temáticos: Patrimônio & Memória, Cultura Musical, Meio Ambiente
+- Localização: Galeria Bitaca Café Bar
+
+Responda em português brasileiro, sendo acolhedor e informativo.
+""")
 
 
 class GeminiAgent:
@@ -35,6 +52,8 @@ class GeminiAgent:
             self.gemini = None
             self.enabled = False
 
+        self.context_tokens = int(os.getenv('RAG_CONTEXT_TOKENS', 600))
+
     async def process_query(
         self,
         query: str,
@@ -58,42 +77,31 @@ class GeminiAgent:
             return "Gemini agent não está disponível no momento."
 
         try:
-            # Build context prompt
+            # Dynamic context only - the static Bitaca preamble is the system instruction
             context_text = ""
             if context:
                 if context.get('productions'):
-                    context_text += "\n\nProduções relevantes:\n"
-                    for prod in context['productions'][:3]:
-                        context_text += f"- {prod.get('titulo', 'Unknown')}: {prod.get('sinopse', '')[:100]}...\n"
-
-                if context.get('history'):
-                    context_text += "\n\nHistórico da conversa:\n"
-                    for msg in context['history'][-3:]:
-                        context_text += f"{msg['role']}: {msg['content'][:100]}...\n"
-
-            # Enhance prompt with Bitaca context
-            enhanced_prompt = f"""
-            Você é um assistente do Bitaca Cinema em Capão Bonito/SP.
-
-            Contexto do projeto:
-            - Espaço cultural underground e democrático
-            - 23 produções audiovisuais financiadas pela Lei Paulo Gustavo
-            - Eixos temáticos: Patrimônio & Memória, Cultura Musical, Meio Ambiente
-            - Localização: Galeria Bitaca Café Bar
-
-            {context_text}
+                    context_text += fit_blocks(
+                        [
+                            f"- {prod.get('titulo', 'Unknown')}: {(prod.get('sinopse') or '')[:100]}...\n"
+                            for prod in context['productions'][:3]
+                        ],
+                        self.context_tokens,
+                        header="\n\nProduções relevantes:\n"
+                    )
 
-            Query do usuário: {query}
+                # Summary + most recent turns that fit the token budget
+                context_text += render_history(context)
 
-            Responda em português brasileiro, sendo acolhedor e informativo.
-            """
+            enhanced_prompt = f"{context_text}\n\nQuery do usuário: {query}".strip()
 
             # Decide which model and features to use
             if use_thinking or "complex" in query.lower() or "analise" in query.lower():
                 # Use Pro model with thinking for complex queries
                 response = await self.gemini.generate_with_thinking(
                     prompt=enhanced_prompt,
-                    search=use_search
+                    search=use_search,
+                    system_instruction=GEMINI_SYSTEM_PROMPT.text
                 )
             else:
                 # Use Flash for simple queries
@@ -102,7 +110,8 @@ class GeminiAgent:
                     model="flash",
                     thinking_enabled=False,
                     search_enabled=use_search,
-                    temperature=0.7
+                    temperature=0.7,
+                    system_instruction=GEMINI_SYSTEM_PROMPT.text
                 )
 
             return response.get("response", "Não consegui gerar uma resposta.")
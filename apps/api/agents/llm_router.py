@@ -0,0 +1,468 @@
+"""
+Bitaca Cinema - LLM Provider Router
+Latency-aware routing, hedging and failover between NVIDIA NIM models and Gemini
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+try:
+    from gemini_integration import get_gemini_client
+
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+
+# Task class -> eligible backends (preference order when there are no stats yet)
+DEFAULT_ROUTES = {
+    "cinema": ["nim:meta/llama-3.3-70b-instruct", "gemini:flash"],
+    "cultural": ["nim:meta/llama-3.3-70b-instruct", "gemini:flash"],
+    "discovery": ["nim:nvidia/llama-3.1-nemotron-ultra-253b-v1", "nim:meta/llama-3.3-70b-instruct", "gemini:flash"],
+    "chat": ["nim:meta/llama-3.3-70b-instruct", "gemini:flash"]
+}
+
+
+class LLMBackendError(Exception):
+    """A single backend call failed"""
+
+    def __init__(self, backend: str, detail: str, status_code: Optional[int] = None):
+        super().__init__(f"{backend}: {detail}")
+        self.backend = backend
+        self.detail = detail
+        self.status_code = status_code
+
+
+class LLMRouterError(Exception):
+    """Every eligible backend failed"""
+
+    def __init__(self, task: str, errors: List[str]):
+        super().__init__(f"All backends failed for '{task}': {'; '.join(errors) or 'no backend available'}")
+        self.task = task
+        self.errors = errors
+
+
+class BackendStats:
+    """
+    Rolling latency / TTFT / error statistics of one backend
+
+    Also acts as a circuit breaker: after `failure_threshold` consecutive
+    failures the backend is skipped for `cooldown` seconds.
+    """
+
+    def __init__(self, window: int = 50, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.ttfts: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.requests = 0
+        self.hedges_won = 0
+
+    def record_success(self, latency_ms: float, ttft_ms: float):
+        self.requests += 1
+        self.latencies.append(latency_ms)
+        self.ttfts.append(ttft_ms)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.requests += 1
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.time() + self.cooldown
+
+    @property
+    def healthy(self) -> bool:
+        return time.time() >= self.open_until
+
+    @property
+    def error_rate(self) -> float:
+        return 1 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def ttft_percentile(self, percentile: float) -> Optional[float]:
+        return float(sorted(self.ttfts)[int(percentile * (len(self.ttfts) - 1))]) if self.ttfts else None
+
+    def mean_latency(self) -> Optional[float]:
+        return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "requests": self.requests,
+            "error_rate": round(self.error_rate, 3),
+            "mean_latency_ms": round(self.mean_latency() or 0.0, 1),
+            "ttft_p50_ms": round(self.ttft_percentile(0.5) or 0.0, 1),
+            "ttft_p90_ms": round(self.ttft_percentile(0.9) or 0.0, 1),
+            "consecutive_failures": self.consecutive_failures,
+            "hedges_won": self.hedges_won
+        }
+
+
+class NIMBackend:
+    """OpenAI-compatible NVIDIA NIM chat completions (streamed)"""
+
+    provider = "nim"
+
+    def __init__(self, model: str, api_key: str, api_url: str, timeout: float = 60.0):
+        self.model = model
+        self.name = f"nim:{model}"
+        self.api_key = api_key
+        self.url = f"{api_url.rstrip('/')}/chat/completions"
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def stream(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                     top_p: float = 0.9, max_tokens: int = 1024) -> AsyncIterator[str]:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+        try:
+            async with self._client.stream("POST", self.url, headers=headers, json=payload) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    raise LLMBackendError(self.name, body.decode(errors="replace")[:200], response.status_code)
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = (json.loads(data).get("choices") or [{}])[0].get("delta", {})
+                    except ValueError:
+                        continue
+                    if delta.get("content"):
+                        yield delta["content"]
+        except httpx.HTTPError as e:
+            raise LLMBackendError(self.name, str(e) or type(e).__name__)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class GeminiBackend:
+    """Gemini through GeminiIntegration's async stream"""
+
+    provider = "gemini"
+
+    def __init__(self, model: str, gemini):
+        self.model = model
+        self.name = f"gemini:{model}"
+        self.gemini = gemini
+
+    async def stream(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                     top_p: float = 0.9, max_tokens: int = 1024) -> AsyncIterator[str]:
+        # System messages become the (cacheable) system instruction, turns the prompt
+        system = "\n\n".join(message["content"] for message in messages if message["role"] == "system")
+        prompt = "\n\n".join(
+            message["content"] if message["role"] == "user" else f"Resposta anterior: {message['content']}"
+            for message in messages if message["role"] != "system"
+        )
+        try:
+            async for chunk in self.gemini.stream_content(
+                prompt, model=self.model, temperature=temperature, max_tokens=max_tokens,
+                system_instruction=system or None
+            ):
+                yield chunk
+        except Exception as e:
+            raise LLMBackendError(self.name, str(e))
+
+    async def close(self):
+        pass
+
+
+class LLMRouter:
+    """
+    Chooses a backend per request from rolling health statistics
+
+    - Candidates for a task class are the healthy backends of its route,
+      ranked by expected time-to-first-token inflated by error rate
+    - If the first token has not arrived by the hedge deadline (the
+      backend's TTFT p90, or hedge_after_ms without history), the next
+      candidate is started too; the first to produce a token wins and the
+      other stream is cancelled
+    - Failures before the first token fail over to the next candidate
+    """
+
+    def __init__(self,
+                 backends: List[Any],
+                 routes: Dict[str, List[str]],
+                 hedge_after_ms: float = 1500.0,
+                 max_parallel: int = 2,
+                 enabled: bool = True):
+        """
+        Initialize router
+
+        Args:
+            backends: Backend objects (name, provider, stream(), close())
+            routes: Task class -> backend names
+            hedge_after_ms: First-token deadline before hedging (no history)
+            max_parallel: Max concurrent attempts per request
+            enabled: Whether agents should route through this router
+        """
+        self.backends = {backend.name: backend for backend in backends}
+        self.routes = routes
+        self.hedge_after = hedge_after_ms / 1000
+        self.max_parallel = max(1, max_parallel)
+        self.enabled = enabled
+        self.stats: Dict[str, BackendStats] = {name: BackendStats() for name in self.backends}
+
+        self.metrics = {"requests": 0, "hedged": 0, "failovers": 0, "failures": 0}
+
+    def rank(self, task: str) -> List[Any]:
+        """Eligible backends for a task class, best first"""
+        names = [name for name in self.routes.get(task, self.routes.get("chat", [])) if name in self.backends]
+
+        def expected_ttft(position: int, name: str) -> Tuple[int, float, int]:
+            stats = self.stats[name]
+            ttft = stats.ttft_percentile(0.5)
+            # Unknown backends are assumed to answer right at the hedge deadline
+            expected = (ttft / 1000 if ttft is not None else self.hedge_after) * (1 + 4 * stats.error_rate)
+            return (0 if stats.healthy else 1, expected, position)
+
+        ranked = sorted(enumerate(names), key=lambda pair: expected_ttft(*pair))
+        healthy = [self.backends[name] for _, name in ranked if self.stats[name].healthy]
+        # Everything tripped: still try the least bad backend
+        return healthy or [self.backends[name] for _, name in ranked[:1]]
+
+    def _hedge_delay(self, backend) -> float:
+        p90 = self.stats[backend.name].ttft_percentile(0.9)
+        return max(p90 / 1000, 0.2) if p90 is not None and len(self.stats[backend.name].ttfts) >= 5 else self.hedge_after
+
+    async def stream(self, messages: List[Dict[str, str]], task: str = "chat", **params) -> AsyncIterator[str]:
+        """
+        Stream a completion from the best backend (hedged, with failover)
+
+        Args:
+            messages: OpenAI-style messages
+            task: Task class (cinema, cultural, discovery, chat)
+            **params: temperature, top_p, max_tokens
+
+        Yields:
+            Text chunks from the winning backend
+        """
+        self.metrics["requests"] += 1
+        candidates = self.rank(task)
+        errors: List[str] = []
+        attempts: Dict[asyncio.Task, Tuple[Any, AsyncIterator[str], float]] = {}
+        next_candidate = 0
+
+        def launch():
+            nonlocal next_candidate
+            backend = candidates[next_candidate]
+            next_candidate += 1
+            iterator = backend.stream(messages, **params).__aiter__()
+            attempts[asyncio.ensure_future(iterator.__anext__())] = (backend, iterator, time.perf_counter())
+
+        winner = None
+        hedged = False
+        try:
+            if candidates:
+                launch()
+
+            while attempts and winner is None:
+                can_hedge = next_candidate < len(candidates) and len(attempts) < self.max_parallel
+                primary = next(iter(attempts.values()))[0]
+                done, _ = await asyncio.wait(
+                    attempts,
+                    timeout=self._hedge_delay(primary) if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    print(f"⏱️ [Router] No first token from {primary.name} - hedging")
+                    self.metrics["hedged"] += 1
+                    hedged = True
+                    launch()
+                    continue
+
+                for attempt in done:
+                    backend, iterator, started = attempts.pop(attempt)
+                    error = attempt.exception()
+                    if error is None:
+                        winner = (backend, iterator, started, attempt.result())
+                        break
+                    if isinstance(error, StopAsyncIteration):
+                        error = LLMBackendError(backend.name, "empty response")
+                    self.stats[backend.name].record_failure()
+                    errors.append(str(error))
+                    print(f"⚠️ [Router] {backend.name} failed: {error}")
+
+                if winner is None and not attempts and next_candidate < len(candidates):
+                    self.metrics["failovers"] += 1
+                    launch()
+        finally:
+            # Cancel the losing attempts and close their upstream streams
+            for attempt, (_, iterator, _) in attempts.items():
+                attempt.cancel()
+                asyncio.ensure_future(self._close_quietly(attempt, iterator))
+            attempts.clear()
+
+        if winner is None:
+            self.metrics["failures"] += 1
+            raise LLMRouterError(task, errors)
+
+        backend, iterator, started, first_chunk = winner
+        ttft_ms = (time.perf_counter() - started) * 1000
+        if hedged and backend is not candidates[0]:
+            self.stats[backend.name].hedges_won += 1
+
+        try:
+            yield first_chunk
+            async for chunk in iterator:
+                yield chunk
+        except Exception:
+            self.stats[backend.name].record_failure()
+            raise
+        finally:
+            await iterator.aclose()
+        self.stats[backend.name].record_success((time.perf_counter() - started) * 1000, ttft_ms)
+
+    @staticmethod
+    async def _close_quietly(attempt: asyncio.Task, iterator: AsyncIterator[str]):
+        try:
+            await attempt
+        except BaseException:
+            pass
+        try:
+            await iterator.aclose()
+        except BaseException:
+            pass
+
+    async def complete(self, messages: List[Dict[str, str]], task: str = "chat", **params) -> str:
+        """Full completion text (streamed internally to track TTFT and hedge)"""
+        return "".join([chunk async for chunk in self.stream(messages, task=task, **params)])
+
+    async def close(self):
+        """Close backend HTTP clients"""
+        for backend in self.backends.values():
+            await backend.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Router metrics and per-backend health"""
+        return {
+            "enabled": self.enabled,
+            **self.metrics,
+            "hedge_after_ms": self.hedge_after * 1000,
+            "routes": self.routes,
+            "backends": {name: stats.to_dict() for name, stats in self.stats.items()}
+        }
+
+
+def agent_system_prompt(agent) -> str:
+    """System prompt of an Agno agent (description + instructions)"""
+    instructions = agent.instructions or []
+    if isinstance(instructions, str):
+        instructions = [instructions]
+    return "\n\n".join(part for part in [agent.description or "", *instructions] if part)
+
+
+def agent_max_tokens(agent) -> int:
+    """Completion tokens an agent call may generate through the router"""
+    return getattr(agent.model, "max_tokens", None) or 1024
+
+
+async def run_agent(agent, prompt: str, task: str, system_prompt=None) -> Optional[str]:
+    """
+    Run an Agno agent's prompt, through the router when it is enabled
+
+    With the router disabled this is the agent's own (NIM) model call, made
+    in a worker thread so it does not block the event loop. Cancelling that
+    call only abandons the thread (the request still completes and is
+    billed); through the router, cancellation closes the HTTP stream.
+
+    Args:
+        agent: Agno Agent (its instructions and sampling params are reused)
+        prompt: User prompt
+        task: Router task class
+        system_prompt: Precompiled system prompt (default: built from the agent)
+
+    Returns:
+        Response text (None if the agent returned nothing)
+    """
+    router = get_llm_router()
+    if not router.enabled:
+        response = await asyncio.to_thread(agent.run, prompt)
+        return response.content if response else None
+
+    model = agent.model
+    params = {
+        "temperature": getattr(model, "temperature", None) or 0.7,
+        "top_p": getattr(model, "top_p", None) or 0.9,
+        "max_tokens": agent_max_tokens(agent)
+    }
+    messages = [
+        {"role": "system", "content": str(system_prompt) if system_prompt is not None else agent_system_prompt(agent)},
+        {"role": "user", "content": prompt}
+    ]
+    return await router.complete(messages, task=task, **params)
+
+
+# Singleton instance
+_llm_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    """
+    Get or create the process-wide LLM router
+
+    Backends are created from the routes (LLM_ROUTES JSON overrides the
+    defaults); Gemini backends are skipped without GEMINI_API_KEY.
+
+    Returns:
+        LLMRouter instance
+    """
+    global _llm_router
+
+    if _llm_router is None:
+        routes = json.loads(os.getenv("LLM_ROUTES", "null") or "null") or DEFAULT_ROUTES
+        api_key = os.getenv("NVIDIA_API_KEY")
+        api_url = os.getenv("NVIDIA_API_URL", "https://integrate.api.nvidia.com/v1")
+
+        gemini = None
+        if GEMINI_AVAILABLE and os.getenv("GEMINI_API_KEY"):
+            try:
+                gemini = get_gemini_client()
+            except Exception as e:
+                print(f"⚠️ [Router] Gemini backend unavailable: {e}")
+
+        backends = {}
+        for name in {name for names in routes.values() for name in names}:
+            provider, _, model = name.partition(":")
+            if provider == "nim":
+                backends[name] = NIMBackend(model, api_key, api_url)
+            elif provider == "gemini" and gemini is not None:
+                backends[name] = GeminiBackend(model, gemini)
+
+        _llm_router = LLMRouter(
+            backends=list(backends.values()),
+            routes=routes,
+            hedge_after_ms=float(os.getenv("LLM_HEDGE_AFTER_MS", 1500)),
+            max_parallel=int(os.getenv("LLM_MAX_PARALLEL", 2)),
+            enabled=os.getenv("LLM_ROUTER_ENABLED", "false").lower() == "true"
+        )
+
+    return _llm_router
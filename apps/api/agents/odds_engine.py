@@ -0,0 +1,311 @@
+"""
+Bitaca Cinema - Odds Engine
+Pool-based betting odds adjusted by the RL agent's greedy policy
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Set
+
+from agents.betting_rl_agent import BettingRLAgent
+from agents.betting_service import get_betting_service
+
+try:
+    from database import MONGODB_ENABLED, BattlePoolDB
+except ImportError:
+    MONGODB_ENABLED = False
+    BattlePoolDB = None
+
+
+class BattlePool:
+    """Running totals of one battle's betting pool"""
+
+    __slots__ = ("battle_id", "battle_type", "totals", "counts", "total_amount", "total_bets",
+                 "odds", "version", "updated_at")
+
+    def __init__(self, battle_id: str, battle_type: str = "ai_vs_ai"):
+        self.battle_id = battle_id
+        self.battle_type = battle_type
+        self.totals: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {}
+        self.total_amount = 0
+        self.total_bets = 0
+        self.odds: Dict[str, float] = {}
+        self.version = 0
+        self.updated_at: Optional[datetime] = None
+
+    def add(self, bet_on: str, amount: int):
+        """Count one bet"""
+        self.totals[bet_on] = self.totals.get(bet_on, 0) + amount
+        self.counts[bet_on] = self.counts.get(bet_on, 0) + 1
+        self.total_amount += amount
+        self.total_bets += 1
+
+    def load(self, doc: Dict[str, Any]):
+        """Replace totals with a stored pool (BattlePoolDB format)"""
+        self.totals = dict(doc.get("totals", {}))
+        self.counts = dict(doc.get("counts", {}))
+        self.total_amount = doc.get("total_amount", 0)
+        self.total_bets = doc.get("total_bets", 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "battle_id": self.battle_id,
+            "odds": dict(self.odds),
+            "totals": dict(self.totals),
+            "total_amount": self.total_amount,
+            "total_bets": self.total_bets,
+            "version": self.version,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class OddsEngine:
+    """
+    Per-battle odds from running pool totals
+
+    Every bet increments the battle's totals with an atomic $inc on
+    battle_pools (the returned document merges bets placed on other workers),
+    then each contestant's odds are recomputed in O(1):
+
+    1. Parimutuel base: (1 - house edge) * pool / contestant stake, with a
+       `prior` stake per side so thin pools stay near even odds.
+    2. The RL agent's greedy action for the pool state (bet count, the
+       contestant's share) adjusts the base odds; the decision is logged in
+       the agent's audit trail.
+
+    Workers share battle_pools: a quote re-reads the battle's pool (one
+    find_one by battle_id) and reprices when its bet count moved, so no worker
+    prices from stale totals. Updates are pushed to per-battle subscriber
+    queues (SSE endpoint); a poller fans out bets placed on other workers by
+    reading the subscribed battles' pools changed since the last poll.
+    """
+
+    def __init__(self, agent_provider: Callable[[], BettingRLAgent],
+                 prior: float = 100.0, min_sides: int = 2, persist: bool = True,
+                 max_pools: int = 10000, poll_interval: float = 1.0):
+        """
+        Args:
+            agent_provider: Returns the live agent (hot-swapped models)
+            prior: Virtual stake added to every side
+            min_sides: Contestants assumed before any bet names them
+            persist: Back pool totals with BattlePoolDB
+            max_pools: Battles kept in memory (least recently updated dropped first)
+            poll_interval: Seconds between cross-worker update polls (0 disables)
+        """
+        self.agent_provider = agent_provider
+        self.prior = prior
+        self.min_sides = min_sides
+        self.persist = persist and MONGODB_ENABLED and BattlePoolDB is not None
+        self.max_pools = max_pools
+
+        self.poll_interval = poll_interval
+
+        self.pools: Dict[str, BattlePool] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._polled_at = datetime.utcnow()
+
+        self.metrics = {
+            "bets": 0,
+            "pools_loaded": 0,
+            "pools_refreshed": 0,
+            "published": 0,
+            "persist_errors": 0
+        }
+
+    def get_pool(self, battle_id: str) -> BattlePool:
+        """In-memory pool of a battle (loaded from battle_pools on first use)"""
+        pool = self.pools.get(battle_id)
+        if pool is None:
+            pool = self._add_pool(battle_id)
+            if self.persist:
+                try:
+                    stored = BattlePoolDB.get_pool(battle_id)
+                except Exception as e:
+                    stored = None
+                    print(f"⚠️  Battle pool load failed for {battle_id}: {e}")
+                if stored:
+                    pool.load(stored)
+                    self.metrics["pools_loaded"] += 1
+        return pool
+
+    def _add_pool(self, battle_id: str) -> BattlePool:
+        """Cache an empty pool (dropping the least recently updated one when full)"""
+        if len(self.pools) >= self.max_pools:
+            self.pools.pop(next(iter(self.pools)))
+        pool = BattlePool(battle_id)
+        self.pools[battle_id] = pool
+        return pool
+
+    def _price(self, pool: BattlePool, contestant: str, agent: BettingRLAgent) -> float:
+        """Odds of one contestant: parimutuel base adjusted by the greedy RL action"""
+        sides = max(self.min_sides, len(pool.totals) + (contestant not in pool.totals))
+        stake = pool.totals.get(contestant, 0) + self.prior
+        total = pool.total_amount + self.prior * sides
+        base = (1 - agent.target_house_edge) * total / stake
+
+        state_id = agent.discretizer.encode_features(pool.battle_type, pool.total_bets, stake / total, 0.5)
+        _, odds, _ = agent.select_action(
+            state_id, max(agent.min_odds, min(agent.max_odds, base)), mode="exploit",
+            battle_id=pool.battle_id, context={"contestant": contestant}
+        )
+        return odds
+
+    def _reprice(self, pool: BattlePool):
+        """Recompute every contestant's odds after the totals changed"""
+        agent = self.agent_provider()
+        pool.odds = {contestant: self._price(pool, contestant, agent) for contestant in pool.totals}
+        pool.version += 1
+        pool.updated_at = datetime.utcnow()
+
+    def _apply(self, pool: BattlePool, stored: Optional[Dict[str, Any]]) -> bool:
+        """
+        Take stored totals that moved (bets from other workers), reprice and publish
+
+        Returns:
+            True when the pool changed
+        """
+        if not stored or stored.get("total_bets", 0) == pool.total_bets:
+            return False
+        pool.load(stored)
+        self._reprice(pool)
+        self.metrics["pools_refreshed"] += 1
+        self.publish(pool.battle_id, pool.to_dict())
+        return True
+
+    def quote(self, battle_id: str, bet_on: str) -> float:
+        """Current odds for a bet (priced on first request for a new contestant)"""
+        pool = self.pools.get(battle_id)
+        if pool is None:
+            pool = self.get_pool(battle_id)
+        elif self.persist:
+            # Other workers may have taken bets since this pool was priced
+            try:
+                self._apply(pool, BattlePoolDB.get_pool(battle_id))
+            except Exception as e:
+                print(f"⚠️  Battle pool refresh failed for {battle_id}: {e}")
+        odds = pool.odds.get(bet_on)
+        if odds is None:
+            odds = self._price(pool, bet_on, self.agent_provider())
+            pool.odds[bet_on] = odds
+        return odds
+
+    def record_bet(self, battle_id: str, bet_on: str, amount: int) -> Dict[str, Any]:
+        """
+        Add a placed bet to the pool, reprice and publish
+
+        Returns:
+            Pool state with the new odds
+        """
+        pool = self.get_pool(battle_id)
+        stored = None
+        if self.persist:
+            try:
+                stored = BattlePoolDB.add_bet(battle_id, bet_on, amount)
+            except Exception as e:
+                self.metrics["persist_errors"] += 1
+                print(f"⚠️  Battle pool $inc failed for {battle_id}: {e}")
+        if stored:
+            pool.load(stored)
+        else:
+            pool.add(bet_on, amount)
+
+        # Move to the end (most recently updated)
+        self.pools.pop(battle_id, None)
+        self.pools[battle_id] = pool
+
+        self._reprice(pool)
+        self.metrics["bets"] += 1
+
+        update = pool.to_dict()
+        self.publish(battle_id, update)
+        return update
+
+    def subscribe(self, battle_id: str, maxsize: int = 16) -> asyncio.Queue:
+        """Queue receiving the battle's odds updates"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.setdefault(battle_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, battle_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(battle_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[battle_id]
+
+    def publish(self, battle_id: str, update: Dict[str, Any]):
+        """Push an update to subscribers (slow ones skip to the newest odds)"""
+        for queue in self._subscribers.get(battle_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(update)
+            self.metrics["published"] += 1
+
+    async def poll(self):
+        """Publish pools of subscribed battles that changed on other workers"""
+        battle_ids = list(self._subscribers)
+        if not battle_ids or not self.persist:
+            return
+        # Overlap one interval so writes racing the previous poll are not missed
+        since = self._polled_at - timedelta(seconds=max(self.poll_interval, 1.0))
+        self._polled_at = datetime.utcnow()
+        try:
+            changed = await asyncio.to_thread(BattlePoolDB.get_pools_updated_since, battle_ids, since)
+        except Exception as e:
+            print(f"⚠️  Battle pool poll failed: {e}")
+            return
+        for stored in changed:
+            pool = self.pools.get(stored["battle_id"]) or self._add_pool(stored["battle_id"])
+            self._apply(pool, stored)
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.poll()
+
+    def start(self):
+        """Start the cross-worker update poller (needs a running event loop)"""
+        if self.poll_interval > 0 and self.persist and self._task is None:
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pools": len(self.pools),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            **self.metrics
+        }
+
+
+_odds_engine: Optional[OddsEngine] = None
+
+
+def get_odds_engine() -> OddsEngine:
+    """
+    Get or create the process-wide odds engine (prices with the live betting model)
+
+    Returns:
+        OddsEngine instance
+    """
+    global _odds_engine
+
+    if _odds_engine is None:
+        _odds_engine = OddsEngine(
+            agent_provider=lambda: get_betting_service().agent,
+            prior=float(os.getenv("ODDS_POOL_PRIOR", 100.0)),
+            max_pools=int(os.getenv("ODDS_MAX_POOLS", 10000)),
+            poll_interval=float(os.getenv("ODDS_POLL_INTERVAL", 1.0))
+        )
+
+    return _odds_engine
@@ -0,0 +1,305 @@
+"""
+Bitaca Cinema - Agent Response Cache
+Exact + semantic cache for agent answers with TTL, LRU and MongoDB persistence
+"""
+
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timezone
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+try:
+    from database import MONGODB_ENABLED, ResponseCacheDB
+except ImportError:
+    MONGODB_ENABLED = False
+    ResponseCacheDB = None
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for cache keys
+
+    Lowercases, strips accents and punctuation and collapses whitespace,
+    so "Quem dirigiu Ponteia Viola?" and "quem dirigiu ponteia viola"
+    share the same key.
+    """
+    text = unicodedata.normalize("NFKD", query.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def compute_catalog_version(embeddings_data: list) -> str:
+    """
+    Fingerprint the production catalog
+
+    Cached answers are scoped by this version, so regenerating embeddings
+    or changing a synopsis invalidates them automatically.
+    """
+    catalog = [
+        [item.get("id"), item.get("titulo"), item.get("metadata", {})]
+        for item in embeddings_data
+    ]
+    payload = json.dumps(catalog, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+class ResponseCache:
+    """
+    LRU cache of agent answers keyed by normalized query + intent + agent
+
+    Lookup order:
+    1. In-process exact match (normalized query)
+    2. MongoDB exact match (shared between workers)
+    3. Optional semantic match: cosine similarity between query embeddings
+       of entries in the same agent/catalog scope
+
+    Hits are not reported to the RL feedback loop: the answer was scored
+    when it was generated, and a cached reply's latency says nothing about
+    the agent, so counting it would inflate that agent's speed reward.
+    """
+
+    def __init__(self,
+                 catalog_version: str = "",
+                 max_entries: int = 512,
+                 ttl_seconds: int = 3600,
+                 semantic_enabled: bool = False,
+                 semantic_threshold: float = 0.92,
+                 persist: bool = True,
+                 enabled: bool = True):
+        """
+        Initialize response cache
+
+        Args:
+            catalog_version: Catalog fingerprint used to scope entries
+            max_entries: Max entries kept in memory (LRU eviction)
+            ttl_seconds: Entry lifetime
+            semantic_enabled: Reuse answers for semantically similar queries
+            semantic_threshold: Minimum cosine similarity for a semantic hit
+            persist: Persist entries to MongoDB (when configured)
+            enabled: Master switch
+        """
+        self.enabled = enabled
+        self.catalog_version = catalog_version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_enabled = semantic_enabled
+        self.semantic_threshold = semantic_threshold
+        self.persist = persist and MONGODB_ENABLED and ResponseCacheDB is not None
+
+        # key -> {"scope", "result", "embedding", "expires_at"}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self.metrics = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "evictions": 0
+        }
+
+        if self.enabled and self.persist:
+            self._warm_from_db()
+
+    def _scope(self, agent: str) -> str:
+        return f"{self.catalog_version}:{agent}"
+
+    def make_key(self, query: str, intent: Optional[str], agent: str) -> str:
+        """Build cache key from normalized query, intent and agent scope"""
+        raw = f"{self._scope(agent)}:{intent or 'GENERAL'}:{normalize_query(query)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self,
+            query: str,
+            intent: Optional[str],
+            agent: str,
+            query_embedding: Optional[list] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer
+
+        Args:
+            query: User query
+            intent: Detected intent
+            agent: Agent scope (cinema, cultural, discovery)
+            query_embedding: Query embedding for the semantic layer
+
+        Returns:
+            Cached result dict or None
+        """
+        if not self.enabled:
+            return None
+
+        key = self.make_key(query, intent, agent)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry and entry["expires_at"] > now:
+            self._entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return entry["result"]
+        if entry:
+            del self._entries[key]
+
+        if self.persist:
+            try:
+                doc = ResponseCacheDB.get_response(key)
+                if doc:
+                    self._store(key, agent, doc["result"], doc.get("embedding"), now + self.ttl_seconds)
+                    self.metrics["persistent_hits"] += 1
+                    return doc["result"]
+            except Exception as e:
+                print(f"⚠️ Response cache lookup failed: {e}")
+
+        if self.semantic_enabled and query_embedding is not None:
+            result = self._semantic_lookup(agent, query_embedding, now)
+            if result is not None:
+                self.metrics["semantic_hits"] += 1
+                return result
+
+        self.metrics["misses"] += 1
+        return None
+
+    def set(self,
+            query: str,
+            intent: Optional[str],
+            agent: str,
+            result: Dict[str, Any],
+            query_embedding: Optional[list] = None):
+        """
+        Store an agent answer
+
+        Args:
+            query: User query
+            intent: Detected intent
+            agent: Agent scope (cinema, cultural, discovery)
+            result: Result dict returned by AgentManager
+            query_embedding: Query embedding for the semantic layer
+        """
+        if not self.enabled:
+            return
+
+        key = self.make_key(query, intent, agent)
+        expires_at = time.time() + self.ttl_seconds
+        result = dict(result)  # callers keep mutating their own copy
+        self._store(key, agent, result, query_embedding, expires_at)
+
+        if self.persist:
+            embedding = None
+            if query_embedding is not None:
+                embedding = np.asarray(query_embedding, dtype=np.float32).tolist()
+
+            try:
+                ResponseCacheDB.cache_response(
+                    key=key,
+                    catalog_version=self.catalog_version,
+                    agent=agent,
+                    intent=intent or "GENERAL",
+                    query=normalize_query(query),
+                    result=result,
+                    embedding=embedding,
+                    ttl_seconds=self.ttl_seconds
+                )
+            except Exception as e:
+                print(f"⚠️ Response cache write failed: {e}")
+
+    def _store(self, key: str, agent: str, result: Dict[str, Any],
+               query_embedding: Optional[list], expires_at: float):
+        vector = None
+        if query_embedding is not None:
+            vector = np.asarray(query_embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm > 0 else None
+
+        self._entries[key] = {
+            "scope": self._scope(agent),
+            "result": result,
+            "embedding": vector,
+            "expires_at": expires_at
+        }
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.metrics["evictions"] += 1
+
+    def _semantic_lookup(self, agent: str, query_embedding: list, now: float) -> Optional[Dict[str, Any]]:
+        scope = self._scope(agent)
+        keys: List[str] = []
+        vectors = []
+        for key, entry in self._entries.items():
+            if entry["scope"] == scope and entry["embedding"] is not None and entry["expires_at"] > now:
+                keys.append(key)
+                vectors.append(entry["embedding"])
+
+        if not vectors:
+            return None
+
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vec)
+        if norm == 0:
+            return None
+
+        scores = np.stack(vectors) @ (query_vec / norm)
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]]["result"]
+
+    def _warm_from_db(self):
+        """Load recent entries of the current catalog so semantic hits survive restarts"""
+        try:
+            docs = ResponseCacheDB.load_recent(self.catalog_version, limit=self.max_entries)
+            now = time.time()
+            for doc in reversed(docs):
+                # MongoDB returns naive UTC datetimes; .timestamp() would read them as local time
+                expires = doc["expires_at"].replace(tzinfo=timezone.utc)
+                expires_at = min(expires.timestamp(), now + self.ttl_seconds)
+                self._store(doc["key"], doc["agent"], doc["result"], doc.get("embedding"), expires_at)
+            if docs:
+                print(f"✅ Response cache warmed with {len(docs)} entries")
+        except Exception as e:
+            print(f"⚠️ Response cache warm-up failed: {e}")
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        self._entries.clear()
+
+    def set_catalog_version(self, catalog_version: str) -> bool:
+        """
+        Switch to a new catalog (entries of the old one are no longer served)
+
+        Returns:
+            True when the version changed
+        """
+        if catalog_version == self.catalog_version:
+            return False
+        self.catalog_version = catalog_version
+        self.clear()
+        if self.enabled and self.persist:
+            self._warm_from_db()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics"""
+        hits = self.metrics["hits"] + self.metrics["semantic_hits"] + self.metrics["persistent_hits"]
+        lookups = hits + self.metrics["misses"]
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic_enabled": self.semantic_enabled,
+            "semantic_threshold": self.semantic_threshold,
+            "persistent": self.persist,
+            "catalog_version": self.catalog_version,
+            **self.metrics,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,208 @@
+"""
+Bitaca Cinema - Ring Buffers
+Fixed-capacity NumPy histories with running statistics maintained on insert
+"""
+
+import math
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class RunningStats:
+    """All-time count / mean / variance (Welford, O(1) per value)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def push(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class ScoreRing:
+    """
+    Last `capacity` scores with O(1) append and O(1) statistics
+
+    Window sum / sum of squares (mean, variance) and the sums of the first and
+    last `window` scores (improvement rate) are updated on every insert; they
+    are recomputed exactly once per wrap-around so float drift cannot build up.
+    All-time statistics are kept in `total`.
+    """
+
+    def __init__(self, capacity: int = 100, window: int = 20):
+        if window * 2 > capacity:
+            raise ValueError("window must be at most half the capacity")
+        self.capacity = capacity
+        self.window = window
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._head = 0  # Next write position
+        self._size = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._first_sum = 0.0
+        self._last_sum = 0.0
+        self.total = RunningStats()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _at(self, position: int) -> float:
+        """Value at chronological position (0 = oldest)"""
+        start = self._head if self._size == self.capacity else 0
+        return self._values[(start + position) % self.capacity]
+
+    def append(self, value: float):
+        value = float(value)
+        cap, k = self.capacity, self.window
+
+        # Last window: drop the score leaving it
+        if self._size >= k:
+            self._last_sum -= self._at(self._size - k)
+        self._last_sum += value
+
+        if self._size == cap:
+            # Evict the oldest; the first window slides by one
+            evicted = self._values[self._head]
+            self._sum -= evicted
+            self._sumsq -= evicted * evicted
+            self._first_sum += self._at(k) - evicted
+            self._values[self._head] = value
+        else:
+            self._values[self._head] = value
+            self._size += 1
+            if self._size <= k:
+                self._first_sum += value
+
+        self._sum += value
+        self._sumsq += value * value
+        self._head = (self._head + 1) % cap
+        self.total.push(value)
+
+        if self._head == 0:
+            self._recompute()
+
+    def _recompute(self):
+        values = self.values()
+        self._sum = float(values.sum())
+        self._sumsq = float(np.dot(values, values))
+        self._first_sum = float(values[:self.window].sum())
+        self._last_sum = float(values[-self.window:].sum())
+
+    def values(self) -> np.ndarray:
+        """Scores in chronological order (copy)"""
+        if self._size < self.capacity:
+            return self._values[:self._size].copy()
+        return np.roll(self._values, -self._head)
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self._size if self._size else 0.0
+
+    @property
+    def variance(self) -> float:
+        if not self._size:
+            return 0.0
+        return max(0.0, self._sumsq / self._size - self.mean ** 2)
+
+    def improvement_rate(self) -> float:
+        """Percent change of the last `window` mean over the first `window` mean"""
+        if self._size < 2 * self.window or self._first_sum <= 0:
+            return 0.0
+        return (self._last_sum - self._first_sum) / self._first_sum * 100
+
+
+class DecisionRing:
+    """
+    Last `capacity` decision records with O(1) append
+
+    Numeric columns (exploration flag, Q-value, odds) live in NumPy arrays so
+    filters and aggregates are vectorized; all-time counters are maintained on
+    insert. Every record is also handed to `sink` as it is appended (e.g. the
+    buffered Mongo audit log), so the ring is only a read cache of recent
+    decisions and eviction loses nothing.
+    """
+
+    def __init__(self, capacity: int = 1000,
+                 sink: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.capacity = capacity
+        self.sink = sink
+
+        self._records = np.empty(capacity, dtype=object)
+        self._battle_ids = np.empty(capacity, dtype=object)
+        self._exploration = np.zeros(capacity, dtype=bool)
+        self._q_values = np.zeros(capacity, dtype=np.float64)
+        self._head = 0
+        self._size = 0
+
+        self.total = 0
+        self.explorations = 0
+        self.q_stats = RunningStats()
+        self.sink_errors = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+    def append(self, record: Dict[str, Any]):
+        if self.sink is not None:
+            try:
+                self.sink(record)
+            except Exception as e:
+                self.sink_errors += 1
+                print(f"⚠️  Decision sink failed: {e}")
+
+        if self._size < self.capacity:
+            self._size += 1
+
+        exploration = bool(record.get("exploration", False))
+        q_value = float(record.get("q_value", 0.0))
+        self._records[self._head] = record
+        self._battle_ids[self._head] = record.get("battle_id")
+        self._exploration[self._head] = exploration
+        self._q_values[self._head] = q_value
+        self._head = (self._head + 1) % self.capacity
+
+        self.total += 1
+        self.explorations += exploration
+        self.q_stats.push(q_value)
+
+    def _order(self) -> np.ndarray:
+        """Buffer positions in chronological order"""
+        if self._size < self.capacity:
+            return np.arange(self._size)
+        return (np.arange(self.capacity) + self._head) % self.capacity
+
+    def recent(self, limit: int = 100, battle_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Most recent records still in memory (chronological)
+
+        Args:
+            limit: Max number of records
+            battle_id: Only records of this battle
+        """
+        order = self._order()
+        if battle_id is not None:
+            order = order[self._battle_ids[order] == battle_id]
+        if limit <= 0:
+            return []
+        return list(self._records[order[-limit:]])
+
+    @property
+    def exploration_rate(self) -> float:
+        """All-time share of exploratory decisions"""
+        return self.explorations / self.total if self.total else 0.0
@@ -3,41 +3,141 @@ Bitaca Cinema - Deterministic Reinforcement Learning Feedback System
 Constant feedback loop with minimal verbosity
 """
 
+import asyncio
+import fcntl
 import json
 import os
-from typing import Dict, Tuple, Any, Optional
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Any, Optional
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+
+from agents.ring_buffer import ScoreRing
+
+
+# Q-array axes (new values seen at runtime or in a loaded Q-table are appended)
+INTENTS = ("SEARCH", "RECOMMEND", "INFO", "GENERAL")
+AGENT_TYPES = ("Cinema", "Cultural", "Discovery")
+LENGTH_BUCKETS = ("short", "medium", "long")
+ACTIONS = ("respond",)
+
+# Absolute default (independent of the process working directory)
+DEFAULT_Q_TABLE_PATH = os.getenv(
+    "RL_Q_TABLE_PATH",
+    str(Path(__file__).resolve().parent.parent / "data" / "q_table.json")
+)
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]):
+    """Write JSON to a temp file in the same directory, fsync, then rename over path"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
 
 class DeterministicRLAgent:
     """
     Q-Learning agent with deterministic rewards and constant feedback.
     Provides immediate, concise feedback for every interaction.
+
+    Q-values live in a dense array indexed by intent x agent x length bucket
+    x action, so updates, argmax and stats do not scan the table. The JSON
+    file keeps the "intent:agent:length:action" key format.
     """
 
     def __init__(self,
                  alpha: float = 0.1,
                  gamma: float = 0.9,
-                 q_table_path: str = "data/q_table.json"):
+                 q_table_path: Optional[str] = None):
         """
         Initialize RL agent with fixed hyperparameters.
 
         Args:
             alpha: Learning rate (fixed at 0.1 for stable learning)
             gamma: Discount factor (fixed at 0.9 for long-term value)
-            q_table_path: Path to persist Q-table
+            q_table_path: Snapshot path (default RL_Q_TABLE_PATH or apps/api/data/q_table.json)
         """
         self.alpha = alpha  # Learning rate
         self.gamma = gamma  # Discount factor
-        self.q_table: Dict[str, float] = {}
-        self.q_table_path = q_table_path
+        self.q_table_path = q_table_path or DEFAULT_Q_TABLE_PATH
         self.interaction_count = 0
-        self.scores_history = []  # Keep last 100 scores
+        # Shared update log (set by RLFeedbackIntegration); persistence happens off the request path
+        self.update_log: Optional["QTableLog"] = None
+        self.scores_history = ScoreRing(capacity=100, window=20)  # Last 100 scores + running stats
+
+        # Dense Q-array + mask of visited entries (unvisited entries are not exported)
+        self._labels: List[List[str]] = [list(INTENTS), list(AGENT_TYPES), list(LENGTH_BUCKETS), list(ACTIONS)]
+        self._index: List[Dict[str, int]] = [{value: i for i, value in enumerate(axis)} for axis in self._labels]
+        shape = tuple(len(axis) for axis in self._labels)
+        self.q_values = np.zeros(shape, dtype=np.float64)
+        self.visited = np.zeros(shape, dtype=bool)
 
         # Load existing Q-table if available
         self.load_q_table()
 
+    def _axis_index(self, axis: int, value: str, grow: bool = True) -> Optional[int]:
+        """Index of a value on an axis, appending it (and a zero slice) when new"""
+        index = self._index[axis].get(value)
+        if index is None and grow:
+            index = len(self._labels[axis])
+            self._labels[axis].append(value)
+            self._index[axis][value] = index
+            pad = [(0, 0)] * self.q_values.ndim
+            pad[axis] = (0, 1)
+            self.q_values = np.pad(self.q_values, pad)
+            self.visited = np.pad(self.visited, pad)
+        return index
+
+    def _state_index(self, state: str, grow: bool = True) -> Optional[Tuple[int, int, int]]:
+        """(intent, agent, length) indices of an encoded state"""
+        parts = state.split(":")
+        if len(parts) != 3:
+            raise ValueError(f"Invalid RL state: {state}")
+        indices = tuple(self._axis_index(axis, value, grow) for axis, value in enumerate(parts))
+        return None if None in indices else indices
+
+    @property
+    def q_table(self) -> Dict[str, float]:
+        """Visited Q-values in the JSON key format ("intent:agent:length:action")"""
+        labels = self._labels
+        return {
+            f"{labels[0][i]}:{labels[1][a]}:{labels[2][l]}:{labels[3][x]}": float(self.q_values[i, a, l, x])
+            for i, a, l, x in zip(*np.nonzero(self.visited))
+        }
+
+    @q_table.setter
+    def q_table(self, table: Dict[str, float]):
+        self.q_values[...] = 0.0
+        self.visited[...] = False
+        for key, value in table.items():
+            state, _, action = key.rpartition(":")
+            try:
+                index = self._state_index(state) + (self._axis_index(3, action),)
+            except ValueError:
+                continue
+            self.q_values[index] = float(value)
+            self.visited[index] = True
+
+    def get_q_value(self, state: str, action: str) -> float:
+        """Q-value of a state/action pair (0.0 when never visited)"""
+        index = self._state_index(state, grow=False)
+        action_index = self._index[3].get(action)
+        if index is None or action_index is None:
+            return 0.0
+        return float(self.q_values[index + (action_index,)])
+
     def encode_state(self, query_intent: str, agent_type: str,
                      query_length: int) -> str:
         """
@@ -51,8 +151,12 @@ class DeterministicRLAgent:
         Returns:
             State key string
         """
-        length_cat = "short" if query_length < 50 else "medium" if query_length < 150 else "long"
-        return f"{query_intent}:{agent_type}:{length_cat}"
+        return f"{query_intent}:{agent_type}:{self.length_bucket(query_length)}"
+
+    @staticmethod
+    def length_bucket(query_length: int) -> str:
+        """Length category of a query (short/medium/long)"""
+        return "short" if query_length < 50 else "medium" if query_length < 150 else "long"
 
     def calculate_reward(self,
                         intent_matched: bool,
@@ -111,37 +215,46 @@ class DeterministicRLAgent:
         Returns:
             Updated Q-value (for immediate feedback)
         """
-        key = f"{state}:{action}"
+        new_q = self.apply_update(state, action, reward, next_state)
+
+        # Track interaction
+        self.interaction_count += 1
+
+        # Add to history (ring keeps the last 100)
+        self.scores_history.append(new_q)
+
+        # Queue for the shared log (written by a background task)
+        if self.update_log is not None:
+            self.update_log.record(state, action, reward, next_state)
+
+        return new_q
+
+    def apply_update(self, state: str, action: str, reward: float,
+                     next_state: Optional[str] = None) -> float:
+        """
+        Q-learning update without bookkeeping (also used to replay logged updates).
+
+        Returns:
+            Updated Q-value
+        """
+        index = self._state_index(state) + (self._axis_index(3, action),)
 
         # Get current Q-value
-        current_q = self.q_table.get(key, 0.0)
+        current_q = self.q_values[index]
 
-        # Calculate max Q-value of next state
+        # Calculate max Q-value of next state (over the actions visited there)
         max_next_q = 0.0
         if next_state:
-            # Find max Q-value for all actions in next state
-            next_actions = [k for k in self.q_table.keys() if k.startswith(f"{next_state}:")]
-            if next_actions:
-                max_next_q = max(self.q_table.get(a, 0.0) for a in next_actions)
+            next_index = self._state_index(next_state, grow=False)
+            if next_index is not None and self.visited[next_index].any():
+                max_next_q = float(self.q_values[next_index][self.visited[next_index]].max())
 
         # Q-learning update rule (deterministic)
-        new_q = (1 - self.alpha) * current_q + self.alpha * (reward + self.gamma * max_next_q)
+        new_q = float((1 - self.alpha) * current_q + self.alpha * (reward + self.gamma * max_next_q))
 
         # Update Q-table
-        self.q_table[key] = new_q
-
-        # Track interaction
-        self.interaction_count += 1
-
-        # Add to history (keep last 100)
-        self.scores_history.append(new_q)
-        if len(self.scores_history) > 100:
-            self.scores_history.pop(0)
-
-        # Auto-save every 100 interactions
-        if self.interaction_count % 100 == 0:
-            self.save_q_table()
-
+        self.q_values[index] = new_q
+        self.visited[index] = True
         return new_q
 
     def get_best_action(self, state: str, available_actions: list) -> Tuple[str, float]:
@@ -155,17 +268,44 @@ class DeterministicRLAgent:
         Returns:
             Tuple of (best_action, q_value)
         """
-        best_action = available_actions[0]
-        best_q = -float('inf')
+        index = self._state_index(state, grow=False)
+        q_values = np.zeros(len(available_actions))
+        if index is not None:
+            row = self.q_values[index]
+            for i, action in enumerate(available_actions):
+                action_index = self._index[3].get(action)
+                if action_index is not None:
+                    q_values[i] = row[action_index]
+
+        best = int(np.argmax(q_values))
+        return available_actions[best], float(q_values[best])
+
+    def get_best_agent(self, query_intent: str, query_length: int, agents: list,
+                       action: str = "respond") -> Tuple[str, float]:
+        """
+        Agent with the highest Q-value for a query (one vectorized argmax).
 
-        for action in available_actions:
-            key = f"{state}:{action}"
-            q_value = self.q_table.get(key, 0.0)
-            if q_value > best_q:
-                best_q = q_value
-                best_action = action
+        Args:
+            query_intent: Detected intent
+            query_length: Query length in characters
+            agents: Candidate agent types (ties keep list order)
+            action: Action to compare
 
-        return best_action, best_q
+        Returns:
+            Tuple of (best_agent, q_value)
+        """
+        intent_index = self._index[0].get(query_intent)
+        length_index = self._index[2][self.length_bucket(query_length)]
+        action_index = self._index[3].get(action)
+
+        q_values = np.zeros(len(agents))
+        if intent_index is not None and action_index is not None:
+            agent_indices = [self._index[1].get(agent) for agent in agents]
+            known = [i for i, agent_index in enumerate(agent_indices) if agent_index is not None]
+            q_values[known] = self.q_values[intent_index, [agent_indices[i] for i in known], length_index, action_index]
+
+        best = int(np.argmax(q_values))
+        return agents[best], float(q_values[best])
 
     def format_feedback(self, score: float, agent: str, result: str) -> str:
         """
@@ -188,77 +328,64 @@ class DeterministicRLAgent:
         Returns:
             Dictionary with minimal statistics
         """
-        avg_score = sum(self.scores_history) / len(self.scores_history) if self.scores_history else 0
-
-        # Find best performing agent
-        agent_scores = {}
-        for key, value in self.q_table.items():
-            parts = key.split(':')
-            if len(parts) >= 2:
-                agent = parts[1]
-                if agent not in agent_scores:
-                    agent_scores[agent] = []
-                agent_scores[agent].append(value)
+        avg_score = self.scores_history.mean
+
+        # Find best performing agent (mean of visited Q-values per agent)
+        counts = self.visited.sum(axis=(0, 2, 3))
+        sums = np.where(self.visited, self.q_values, 0.0).sum(axis=(0, 2, 3))
+        averages = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
 
         best_agent = None
-        best_avg = 0
-        for agent, scores in agent_scores.items():
-            avg = sum(scores) / len(scores)
-            if avg > best_avg:
-                best_avg = avg
-                best_agent = agent
-
-        # Calculate improvement rate (last 20 vs first 20)
-        improvement = 0
-        if len(self.scores_history) >= 40:
-            first_20_avg = sum(self.scores_history[:20]) / 20
-            last_20_avg = sum(self.scores_history[-20:]) / 20
-            improvement = ((last_20_avg - first_20_avg) / first_20_avg * 100) if first_20_avg > 0 else 0
+        if len(averages) and averages.max() > 0:
+            best_agent = self._labels[1][int(np.argmax(averages))]
+
+        # Improvement rate (last 20 vs first 20, maintained on insert)
+        improvement = self.scores_history.improvement_rate()
 
         return {
             "avg_score": round(avg_score, 2),
+            "score_std": round(self.scores_history.variance ** 0.5, 3),
             "best_agent": best_agent,
             "total_interactions": self.interaction_count,
             "improvement_rate": f"+{improvement:.0f}%" if improvement > 0 else f"{improvement:.0f}%",
-            "q_table_size": len(self.q_table)
+            "q_table_size": int(self.visited.sum())
         }
 
-    def save_q_table(self):
-        """Save Q-table to JSON file."""
-        try:
-            # Create directory if it doesn't exist
-            Path(self.q_table_path).parent.mkdir(parents=True, exist_ok=True)
-
-            # Save Q-table with metadata
-            data = {
-                "q_table": self.q_table,
-                "metadata": {
-                    "interactions": self.interaction_count,
-                    "last_updated": datetime.now().isoformat(),
-                    "alpha": self.alpha,
-                    "gamma": self.gamma
-                }
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Q-table with metadata (JSON file format)"""
+        return {
+            "q_table": self.q_table,
+            "metadata": {
+                "interactions": self.interaction_count,
+                "last_updated": datetime.now().isoformat(),
+                "alpha": self.alpha,
+                "gamma": self.gamma
             }
+        }
 
-            with open(self.q_table_path, 'w') as f:
-                json.dump(data, f, indent=2)
+    def load_snapshot(self, data: Dict[str, Any]):
+        """Replace the Q-table with a snapshot (JSON file format)"""
+        self.q_table = data.get("q_table", {})
+        self.interaction_count = data.get("metadata", {}).get("interactions", 0)
 
+    def save_q_table(self) -> bool:
+        """Save Q-table to JSON file (atomic temp file + rename)."""
+        try:
+            write_json_atomic(self.q_table_path, self.to_snapshot())
+            return True
         except Exception as e:
-            # Silently fail (non-critical operation)
-            pass
+            print(f"⚠️  RL Q-table save failed: {e}")
+            return False
 
     def load_q_table(self):
         """Load Q-table from JSON file if exists."""
         try:
             if os.path.exists(self.q_table_path):
                 with open(self.q_table_path, 'r') as f:
-                    data = json.load(f)
-                    self.q_table = data.get("q_table", {})
-                    metadata = data.get("metadata", {})
-                    self.interaction_count = metadata.get("interactions", 0)
-        except Exception:
+                    self.load_snapshot(json.load(f))
+        except Exception as e:
             # Start with empty Q-table if load fails
-            pass
+            print(f"⚠️  RL Q-table load failed: {e}")
 
     def process_interaction(self,
                            query: str,
@@ -313,6 +440,220 @@ class DeterministicRLAgent:
         }
 
 
+class QTableLog:
+    """
+    Append-only Q update log shared by all workers, with compacted snapshots.
+
+    Every worker (uvicorn process) appends its updates (state, action,
+    reward, next_state) to one log file and replays the updates other
+    workers appended, so all workers converge on one learned table instead
+    of overwriting each other's snapshot. File work runs in a background
+    thread under an exclusive flock, which also makes the worker holding it
+    the single writer for compaction: once the log grows past compact_bytes
+    it is replayed onto the snapshot, written atomically (temp + rename)
+    and replaced by a new empty log file. The snapshot records the inode
+    and size of the log it folded in, so if a crash leaves that log in
+    place those bytes are skipped instead of being applied twice. Workers
+    notice the new snapshot (inode change) and reload it.
+    """
+
+    def __init__(self, agent: DeterministicRLAgent, flush_interval: float = 5.0,
+                 compact_bytes: int = 1_000_000):
+        """
+        Args:
+            agent: RL agent whose updates are logged (snapshot at agent.q_table_path)
+            flush_interval: Seconds between background syncs
+            compact_bytes: Log size that triggers a snapshot compaction
+        """
+        self.agent = agent
+        self.snapshot_path = agent.q_table_path
+        self.log_path = f"{agent.q_table_path}.log"
+        self.lock_path = f"{agent.q_table_path}.lock"
+        self.flush_interval = flush_interval
+        self.compact_bytes = compact_bytes
+
+        # Unique per process (pids are reused across container restarts)
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._pending: List[Dict[str, Any]] = []
+        self._offset = 0
+        self._snapshot_id: Optional[Tuple[int, int]] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.metrics = {"syncs": 0, "written": 0, "replayed": 0, "compactions": 0, "reloads": 0, "errors": 0}
+
+    def record(self, state: str, action: str, reward: float, next_state: Optional[str] = None):
+        """Queue an update (request path: in-memory append only)"""
+        self._pending.append({"w": self.worker_id, "s": state, "a": action, "r": reward, "n": next_state})
+
+    @contextmanager
+    def _locked(self):
+        Path(self.lock_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _current_snapshot_id(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.snapshot_path)
+            return stat.st_ino, stat.st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        try:
+            with open(self.snapshot_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def _folded_bytes(snapshot: Dict[str, Any], log_inode: Optional[int]) -> int:
+        """Leading bytes of the log (by inode) already contained in the snapshot"""
+        folded = snapshot.get("log") or {}
+        if log_inode is None or folded.get("inode") != log_inode:
+            return 0
+        return folded.get("bytes", 0)
+
+    def _replace_log(self):
+        """Swap in an empty log file (new inode, so no snapshot marker matches it)"""
+        temp_path = f"{self.log_path}.tmp"
+        open(temp_path, "wb").close()
+        os.replace(temp_path, self.log_path)
+
+    @staticmethod
+    def _parse(chunk: bytes) -> List[Dict[str, Any]]:
+        entries = []
+        for line in chunk.splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    def _exchange(self, pending: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        File side of a sync (runs in a worker thread, never touches the agent)
+
+        Returns:
+            (snapshot to reload or None, log entries to replay)
+        """
+        with self._locked():
+            if pending:
+                payload = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in pending).encode()
+                fd = os.open(self.log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    end = os.lseek(fd, 0, os.SEEK_END)
+                    if end and os.pread(fd, 1, end - 1) != b"\n":
+                        # Terminate a torn line left by a crash so it cannot swallow ours
+                        payload = b"\n" + payload
+                    os.write(fd, payload)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+            with open(self.log_path, "ab+") as log:
+                log.seek(0, os.SEEK_END)
+                size = log.tell()
+                log_inode: Optional[int] = os.fstat(log.fileno()).st_ino
+
+                if size >= self.compact_bytes:
+                    # Single writer: fold the log into the snapshot, then start a new log
+                    snapshot = self._read_snapshot()
+                    compacted = type(self.agent)(alpha=self.agent.alpha, gamma=self.agent.gamma,
+                                                 q_table_path=self.snapshot_path)
+                    compacted.load_snapshot(snapshot)
+                    log.seek(self._folded_bytes(snapshot, log_inode))
+                    for entry in self._parse(log.read()):
+                        compacted.apply_update(entry["s"], entry["a"], entry["r"], entry.get("n"))
+                        compacted.interaction_count += 1
+                    write_json_atomic(self.snapshot_path, {
+                        **compacted.to_snapshot(),
+                        "log": {"inode": log_inode, "bytes": size}
+                    })
+                    self._replace_log()
+                    size, log_inode = 0, None
+                    self.metrics["compactions"] += 1
+
+                snapshot_id = self._current_snapshot_id()
+                reload = None
+                if snapshot_id != self._snapshot_id:
+                    # New snapshot (first sync or another worker compacted): replay the log
+                    # past what the snapshot already contains
+                    reload = self._read_snapshot()
+                    self._snapshot_id = snapshot_id
+                    self._offset = self._folded_bytes(reload, log_inode)
+
+                log.seek(self._offset)
+                chunk = log.read(size - self._offset)
+                # Only complete lines (a crash can leave a partial last line)
+                chunk = chunk[:chunk.rfind(b"\n") + 1]
+                self._offset += len(chunk)
+
+        entries = self._parse(chunk)
+        if reload is None:
+            # Own updates are already applied locally
+            entries = [entry for entry in entries if entry.get("w") != self.worker_id]
+        return reload, entries
+
+    async def sync(self):
+        """Write queued updates, replay other workers' updates, compact when due"""
+        pending, self._pending = self._pending, []
+        try:
+            reload, entries = await asyncio.to_thread(self._exchange, pending)
+        except Exception as e:
+            # Keep the updates for the next attempt
+            self._pending = pending + self._pending
+            self.metrics["errors"] += 1
+            print(f"⚠️  RL update log sync failed: {e}")
+            return
+
+        # Apply on the event loop thread (the agent is only mutated here)
+        if reload is not None:
+            self.agent.load_snapshot(reload)
+            self.metrics["reloads"] += 1
+            # Updates recorded while the thread ran are not in the log yet
+            entries = entries + self._pending
+        for entry in entries:
+            self.agent.apply_update(entry["s"], entry["a"], entry["r"], entry.get("n"))
+            self.agent.interaction_count += 1
+
+        self.metrics["syncs"] += 1
+        self.metrics["written"] += len(pending)
+        self.metrics["replayed"] += len(entries)
+
+    async def _sync_loop(self):
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        """Start the periodic background sync"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        """Stop the periodic sync and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.sync()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Persistence metrics"""
+        return {
+            "path": self.snapshot_path,
+            "pending": len(self._pending),
+            **self.metrics
+        }
+
+
 class RLFeedbackIntegration:
     """
     Integration layer for RL feedback with existing agent system.
@@ -326,11 +667,28 @@ class RLFeedbackIntegration:
             enabled: Whether RL feedback is enabled
         """
         self.enabled = enabled
+        self.update_log: Optional[QTableLog] = None
         if self.enabled:
             self.rl_agent = DeterministicRLAgent()
+            self.update_log = QTableLog(
+                self.rl_agent,
+                flush_interval=float(os.getenv("RL_SYNC_INTERVAL", 5.0)),
+                compact_bytes=int(os.getenv("RL_LOG_COMPACT_BYTES", 1_000_000))
+            )
+            self.rl_agent.update_log = self.update_log
         else:
             self.rl_agent = None
 
+    def start(self):
+        """Start background Q-table persistence (needs a running event loop)"""
+        if self.update_log is not None:
+            self.update_log.start()
+
+    async def stop(self):
+        """Flush pending Q updates"""
+        if self.update_log is not None:
+            await self.update_log.stop()
+
     def track_response(self,
                        query: str,
                        intent: str,
@@ -384,20 +742,9 @@ class RLFeedbackIntegration:
         if not self.enabled or not self.rl_agent:
             return None
 
-        available_agents = ["Cinema", "Cultural", "Discovery"]
-        best_scores = {}
-
-        for agent in available_agents:
-            state = self.rl_agent.encode_state(query_intent, agent, len(query))
-            key = f"{state}:respond"
-            score = self.rl_agent.q_table.get(key, 0.0)
-            best_scores[agent] = score
-
-        # Return agent with highest Q-value
-        if best_scores:
-            return max(best_scores, key=best_scores.get)
-
-        return None
+        # Agent with highest Q-value
+        best_agent, _ = self.rl_agent.get_best_agent(query_intent, len(query), list(AGENT_TYPES))
+        return best_agent
 
     def get_stats(self) -> Dict[str, Any]:
         """Get RL statistics."""
@@ -406,4 +753,6 @@ class RLFeedbackIntegration:
 
         stats = self.rl_agent.get_stats()
         stats["enabled"] = True
+        if self.update_log is not None:
+            stats["persistence"] = self.update_log.get_stats()
         return stats
\ No newline at end of file
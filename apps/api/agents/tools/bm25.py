@@ -0,0 +1,111 @@
+"""
+Bitaca Cinema - BM25 Lexical Index
+Keyword retrieval over production titles, directors and synopses
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Portuguese function words that carry no retrieval signal
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "e", "ou", "de", "da", "do",
+    "das", "dos", "em", "no", "na", "nos", "nas", "ao", "aos", "para", "pra", "por",
+    "pelo", "pela", "com", "sem", "que", "se", "sobre", "como", "mais", "me", "eu",
+    "voce", "ce", "qual", "quais", "tem", "ha", "sua", "seu", "suas", "seus"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip accents, split on non-word chars and drop stopwords"""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [token for token in re.findall(r"\w+", text) if len(token) > 1 and token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index
+
+    Postings are stored as NumPy arrays (doc ids + term frequencies), so a
+    query costs one vectorized update per query term.
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Build index
+
+        Args:
+            documents: One text per document (row order is the doc id)
+            k1: Term-frequency saturation
+            b: Length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(documents)
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = np.zeros(self.doc_count, dtype=np.float32)
+        for doc_id, text in enumerate(documents):
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        self.avg_length = float(lengths.mean()) if self.doc_count else 0.0
+        # Length normalization term per document, precomputed
+        self._length_norm = k1 * (1 - b + b * lengths / (self.avg_length or 1.0))
+
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, entries in postings.items():
+            doc_ids = np.array([doc_id for doc_id, _ in entries], dtype=np.int32)
+            tfs = np.array([tf for _, tf in entries], dtype=np.float32)
+            df = len(entries)
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            self._postings[term] = (doc_ids, tfs, idf)
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def score(self, query: str) -> np.ndarray:
+        """BM25 score of every document (0 for documents without query terms)"""
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, tfs, idf = posting
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[doc_ids])
+        return scores
+
+    def search(self,
+               query: str,
+               top_k: int = 10,
+               indices: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k documents with a positive score
+
+        Args:
+            query: Query text
+            top_k: Number of results
+            indices: Candidate documents (default: all)
+
+        Returns:
+            List of (doc id, BM25 score), best first
+        """
+        if self.doc_count == 0 or top_k <= 0:
+            return []
+
+        scores = self.score(query)
+        if indices is not None:
+            allowed = np.zeros(self.doc_count, dtype=bool)
+            allowed[np.asarray(indices, dtype=np.int64)] = True
+            scores[~allowed] = 0
+        matched = np.flatnonzero(scores > 0)
+        top = matched[np.argsort(-scores[matched], kind="stable")][:top_k]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in top]
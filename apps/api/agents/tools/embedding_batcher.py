@@ -0,0 +1,228 @@
+"""
+Bitaca Cinema - Embedding Micro-Batcher
+Coalesces concurrent embedding requests into batched NVIDIA NIM calls
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from agents.prompts import count_tokens
+
+
+class EmbeddingRequestError(Exception):
+    """NIM embeddings call failed (carries the upstream status code)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class EmbeddingBatcher:
+    """
+    Async micro-batcher for the NIM /embeddings endpoint
+
+    Requests are grouped per (model, input_type). A group is flushed when
+    it reaches max_batch_size inputs or when its oldest request has waited
+    max_wait_ms, whichever comes first. One `input: [...]` call is sent per
+    flush and every caller's future is resolved from the shared response.
+    The batch's token usage is split between callers in proportion to
+    their texts' estimated token counts.
+    """
+
+    def __init__(self,
+                 api_key: str,
+                 api_url: str = "https://integrate.api.nvidia.com/v1",
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0,
+                 timeout: float = 30.0):
+        """
+        Initialize batcher
+
+        Args:
+            api_key: NVIDIA API key
+            api_url: NIM base URL
+            max_batch_size: Max inputs per upstream request
+            max_wait_ms: Max time a request waits for companions
+            timeout: Upstream request timeout (seconds)
+        """
+        self.api_key = api_key
+        self.embed_url = f"{api_url.rstrip('/')}/embeddings"
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+
+        # (model, input_type) -> pending [(text, future)]
+        self._pending: Dict[Tuple[str, str], List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        # In-flight upstream calls (referenced until done, awaited on close)
+        self._tasks: Set[asyncio.Task] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.metrics = {
+            "requests": 0,
+            "upstream_calls": 0,
+            "inputs_sent": 0
+        }
+
+    async def embed(self, text: str, model: str, input_type: str = "query") -> List[float]:
+        """
+        Embed a single text (batched with concurrent callers)
+
+        Args:
+            text: Text to embed
+            model: Embedding model
+            input_type: query or passage
+
+        Returns:
+            Embedding vector
+        """
+        embedding, _ = await self.embed_with_usage(text, model, input_type)
+        return embedding
+
+    async def embed_with_usage(self, text: str, model: str,
+                               input_type: str = "query") -> Tuple[List[float], Dict[str, int]]:
+        """
+        Embed a single text and report its share of the batch's token usage
+
+        Returns:
+            (embedding vector, {"prompt_tokens", "total_tokens"})
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        group = (model, input_type)
+
+        self._pending.setdefault(group, []).append((text, future))
+        self.metrics["requests"] += 1
+
+        if len(self._pending[group]) >= self.max_batch_size:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = loop.call_later(self.max_wait, self._flush, group)
+
+        return await future
+
+    async def embed_many(self, texts: List[str], model: str, input_type: str = "query") -> List[List[float]]:
+        """Embed several texts (they share batches with concurrent callers)"""
+        return list(await asyncio.gather(*(self.embed(text, model, input_type) for text in texts)))
+
+    def _flush(self, group: Tuple[str, str]):
+        timer = self._timers.pop(group, None)
+        if timer:
+            timer.cancel()
+
+        items = self._pending.pop(group, [])
+        if items:
+            task = asyncio.ensure_future(self._send_batch(group, items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, group: Tuple[str, str], items: List[Tuple[str, asyncio.Future]]):
+        model, input_type = group
+
+        # Identical texts in the same window are sent once
+        unique_texts = list(dict.fromkeys(text for text, _ in items))
+
+        try:
+            embeddings, total_tokens = await self._request(unique_texts, model, input_type)
+            estimates = [max(1, count_tokens(text)) for text in unique_texts]
+            scale = total_tokens / sum(estimates) if total_tokens else 1.0
+            by_text = {
+                text: (embedding, {"prompt_tokens": round(estimate * scale), "total_tokens": round(estimate * scale)})
+                for text, embedding, estimate in zip(unique_texts, embeddings, estimates)
+            }
+            for text, future in items:
+                if not future.done():
+                    future.set_result(by_text[text])
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _request(self, texts: List[str], model: str, input_type: str) -> Tuple[List[List[float]], int]:
+        """
+        One upstream call
+
+        Returns:
+            (embeddings in input order, total tokens reported by NIM or 0)
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+
+        self.metrics["upstream_calls"] += 1
+        self.metrics["inputs_sent"] += len(texts)
+
+        try:
+            response = await self._client.post(
+                self.embed_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": model,
+                    "input": texts,
+                    "input_type": input_type,
+                    "encoding_format": "float"
+                }
+            )
+        except httpx.RequestError as e:
+            raise EmbeddingRequestError(500, str(e))
+
+        if response.status_code != 200:
+            raise EmbeddingRequestError(response.status_code, response.text)
+
+        body = response.json()
+        data = sorted(body["data"], key=lambda item: item.get("index", 0))
+        usage: Dict[str, Any] = body.get("usage") or {}
+        return [item["embedding"] for item in data], int(usage.get("total_tokens") or 0)
+
+    async def close(self):
+        """Send the pending batches, wait for in-flight calls and close the HTTP client"""
+        for group in list(self._pending):
+            self._flush(group)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, float]:
+        """Batching efficiency metrics"""
+        calls = self.metrics["upstream_calls"]
+        return {
+            **self.metrics,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "avg_batch_size": round(self.metrics["inputs_sent"] / calls, 2) if calls else 0.0
+        }
+
+
+# Singleton instance
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+
+
+def get_embedding_batcher(api_key: Optional[str] = None) -> EmbeddingBatcher:
+    """
+    Get or create the process-wide embedding batcher
+
+    Args:
+        api_key: NVIDIA API key (defaults to NVIDIA_API_KEY)
+
+    Returns:
+        EmbeddingBatcher instance
+    """
+    global _embedding_batcher
+
+    if _embedding_batcher is None:
+        _embedding_batcher = EmbeddingBatcher(
+            api_key=api_key or os.getenv("NVIDIA_API_KEY"),
+            api_url=os.getenv("NVIDIA_API_URL", "https://integrate.api.nvidia.com/v1"),
+            max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 32)),
+            max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", 5))
+        )
+
+    return _embedding_batcher
@@ -0,0 +1,208 @@
+"""
+Bitaca Cinema - Query Embedding Cache
+Two-tier cache (process LRU + MongoDB) shared by RAGTool and /api/embeddings
+"""
+
+import hashlib
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from database import MONGODB_ENABLED, EmbeddingsCacheDB
+except ImportError:
+    MONGODB_ENABLED = False
+    EmbeddingsCacheDB = None
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing (unicode form, case and whitespace)"""
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+class EmbeddingCache:
+    """
+    Embedding cache with an in-process LRU in front of MongoDB
+
+    - Tier 1: OrderedDict of float32 arrays, bounded by total bytes
+    - Tier 2: MongoDB embeddings_cache collection (shared by workers),
+      keyed by a hash of the normalized text and expired by a TTL index
+    """
+
+    def __init__(self,
+                 max_bytes: int = 32 * 1024 * 1024,
+                 ttl_seconds: int = 7 * 24 * 3600,
+                 persist: bool = True):
+        """
+        Initialize embedding cache
+
+        Args:
+            max_bytes: Memory budget of the in-process tier
+            ttl_seconds: Entry lifetime in both tiers
+            persist: Use the MongoDB tier (when configured)
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist and MONGODB_ENABLED and EmbeddingsCacheDB is not None
+
+        # key -> (embedding, expires_at)
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._bytes = 0
+
+        self.metrics = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "evictions": 0
+        }
+
+    @staticmethod
+    def make_key(text: str, model: str, input_type: str = "query") -> str:
+        """Hash of model, input type and normalized text"""
+        raw = f"{model}:{input_type}:{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, model: str, input_type: str = "query") -> Optional[np.ndarray]:
+        """Get a single cached embedding"""
+        return self.get_many([text], model, input_type).get(0)
+
+    def get_many(self, texts: List[str], model: str, input_type: str = "query") -> Dict[int, np.ndarray]:
+        """
+        Batch lookup
+
+        Checks the process tier first, then resolves all remaining keys with
+        a single MongoDB query.
+
+        Args:
+            texts: Texts to look up
+            model: Embedding model
+            input_type: query or passage
+
+        Returns:
+            Dict mapping index in `texts` to the cached embedding (hits only)
+        """
+        found: Dict[int, np.ndarray] = {}
+        missing: Dict[str, List[int]] = {}
+        now = time.time()
+
+        for i, text in enumerate(texts):
+            key = self.make_key(text, model, input_type)
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                found[i] = entry[0]
+                self.metrics["memory_hits"] += 1
+            else:
+                if entry:
+                    self._evict(key)
+                missing.setdefault(key, []).append(i)
+
+        if missing and self.persist:
+            try:
+                docs = EmbeddingsCacheDB.get_cached_embeddings(list(missing.keys()))
+                for key, embedding in docs.items():
+                    vector = np.asarray(embedding, dtype=np.float32)
+                    self._store(key, vector, now + self.ttl_seconds)
+                    for i in missing.pop(key):
+                        found[i] = vector
+                        self.metrics["db_hits"] += 1
+            except Exception as e:
+                print(f"⚠️  Embedding cache lookup failed: {e}")
+
+        self.metrics["misses"] += sum(len(indexes) for indexes in missing.values())
+        return found
+
+    def put(self, text: str, model: str, embedding, input_type: str = "query"):
+        """Cache a single embedding"""
+        self.put_many([text], model, [embedding], input_type)
+
+    def put_many(self, texts: List[str], model: str, embeddings: list, input_type: str = "query"):
+        """
+        Cache several embeddings (one MongoDB bulk write)
+
+        Args:
+            texts: Embedded texts
+            model: Embedding model
+            embeddings: Embeddings in the same order as `texts`
+            input_type: query or passage
+        """
+        expires_at = time.time() + self.ttl_seconds
+        entries = []
+        for text, embedding in zip(texts, embeddings):
+            key = self.make_key(text, model, input_type)
+            vector = np.asarray(embedding, dtype=np.float32)
+            self._store(key, vector, expires_at)
+            entries.append({
+                "key": key,
+                "model": model,
+                "input_type": input_type,
+                "embedding": vector.tolist()
+            })
+
+        if entries and self.persist:
+            try:
+                EmbeddingsCacheDB.cache_embeddings(entries, ttl_seconds=self.ttl_seconds)
+            except Exception as e:
+                print(f"⚠️  Embedding cache write failed: {e}")
+
+    def _store(self, key: str, vector: np.ndarray, expires_at: float):
+        if key in self._entries:
+            self._evict(key)
+        if vector.nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = (vector, expires_at)
+        self._bytes += vector.nbytes
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._evict(oldest)
+            self.metrics["evictions"] += 1
+
+    def _evict(self, key: str):
+        vector, _ = self._entries.pop(key)
+        self._bytes -= vector.nbytes
+
+    def clear(self):
+        """Drop the in-process tier"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        """Hit-rate and memory metrics"""
+        hits = self.metrics["memory_hits"] + self.metrics["db_hits"]
+        lookups = hits + self.metrics["misses"]
+        return {
+            "entries": len(self._entries),
+            "memory_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "persistent": self.persist,
+            **self.metrics,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+# Singleton instance
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Get or create the process-wide embedding cache
+
+    Returns:
+        EmbeddingCache instance
+    """
+    global _embedding_cache
+
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            max_bytes=int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", 32)) * 1024 * 1024),
+            ttl_seconds=int(os.getenv("EMBEDDING_CACHE_TTL", 7 * 24 * 3600))
+        )
+
+    return _embedding_cache
@@ -0,0 +1,169 @@
+"""
+Bitaca Cinema - Facet Index
+Precomputed boolean masks per metadata value for filtered retrieval
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+
+FACET_FIELDS = ("tema", "eixo", "status", "diretor")
+
+# Query phrases that imply a tema value (normalized, accent-free)
+TEMA_ALIASES = {
+    "musica": ("musica", "musicas", "musical", "musicais", "viola", "violeiro", "violeiros", "cancao", "samba"),
+    "ambiente": ("meio ambiente", "ambiental", "ambientais", "natureza", "ecologia", "sustentabilidade"),
+    "patrimonio": ("patrimonio", "historico", "historicos", "historica", "memoria", "memorias", "tradicao", "tradicoes")
+}
+
+STATUS_ALIASES = {
+    "producao": ("em producao", "sendo produzido", "sendo produzidos"),
+    "finalizado": ("finalizado", "finalizados", "pronto", "prontos", "lancado", "lancados")
+}
+
+
+def normalize_value(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(re.findall(r"\w+", text))
+
+
+def _contains_phrase(text: str, phrase: str) -> bool:
+    return re.search(rf"\b{re.escape(phrase)}\b", text) is not None
+
+
+class FacetIndex:
+    """
+    Boolean masks over catalog rows, one per (field, value)
+
+    Masks are built once at load time; a filter is resolved with a few
+    vectorized AND/OR operations and the resulting row subset is all the
+    retrievers need to score.
+    """
+
+    def __init__(self, items: List[dict], fields: tuple = FACET_FIELDS):
+        """
+        Build masks
+
+        Args:
+            items: Catalog items (row order must match the vector index)
+            fields: Metadata fields to index
+        """
+        self.size = len(items)
+        self.fields = fields
+        self._masks: Dict[str, Dict[str, np.ndarray]] = {field: {} for field in fields}
+        self._labels: Dict[str, Dict[str, str]] = {field: {} for field in fields}
+        # Titles are names, not constraints ("Preservação do Patrimônio Arbóreo")
+        self._titles = sorted(
+            {normalize_value(item.get("titulo")) for item in items if item.get("titulo")},
+            key=len, reverse=True
+        )
+
+        for row, item in enumerate(items):
+            metadata = item.get("metadata", {})
+            for field in fields:
+                raw = metadata.get(field)
+                if not raw:
+                    continue
+                value = normalize_value(raw)
+                if value not in self._masks[field]:
+                    self._masks[field][value] = np.zeros(self.size, dtype=bool)
+                    self._labels[field][value] = raw
+                self._masks[field][value][row] = True
+
+    def values(self, field: str) -> List[str]:
+        """Distinct (original) values of a field"""
+        return list(self._labels.get(field, {}).values())
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Rows per facet value"""
+        return {
+            field: {self._labels[field][value]: int(mask.sum()) for value, mask in masks.items()}
+            for field, masks in self._masks.items()
+        }
+
+    def mask(self, filters: Optional[Dict[str, Union[str, List[str]]]]) -> Optional[np.ndarray]:
+        """
+        Resolve filters to a row mask
+
+        Values of one field are OR-ed, fields are AND-ed. Unknown fields
+        are ignored; unknown values match nothing.
+
+        Args:
+            filters: e.g. {"tema": "musica", "diretor": ["A", "B"]}
+
+        Returns:
+            Boolean mask, or None when there is nothing to filter on
+        """
+        if not filters:
+            return None
+
+        result = None
+        for field, wanted in filters.items():
+            if field not in self._masks or not wanted:
+                continue
+            field_mask = np.zeros(self.size, dtype=bool)
+            for value in ([wanted] if isinstance(wanted, str) else wanted):
+                found = self._masks[field].get(normalize_value(value))
+                if found is not None:
+                    field_mask |= found
+            result = field_mask if result is None else result & field_mask
+
+        return result
+
+    def candidates(self, filters: Optional[Dict[str, Union[str, List[str]]]]) -> Optional[np.ndarray]:
+        """Row indices matching the filters (None when unfiltered)"""
+        mask = self.mask(filters)
+        return None if mask is None else np.flatnonzero(mask)
+
+    def extract_filters(self, query: str) -> Dict[str, List[str]]:
+        """
+        Detect facet constraints mentioned in a free-text query
+
+        Temas and status are matched through alias phrases ("meio ambiente",
+        "musical"), directors by full name or by their first two names.
+        Production titles and director names mentioned in the query are
+        masked out first, so a word of a title never becomes a filter that
+        excludes that production.
+
+        Args:
+            query: User query
+
+        Returns:
+            Dict field -> list of catalog values (only fields that matched)
+        """
+        text = normalize_value(query)
+        filters: Dict[str, List[str]] = {}
+
+        for value, label in self._labels.get("diretor", {}).items():
+            short_name = " ".join(value.split()[:2])
+            if _contains_phrase(text, value) or (" " in short_name and _contains_phrase(text, short_name)):
+                filters.setdefault("diretor", []).append(label)
+
+        text = self._mask_names(text)
+
+        for field, aliases in (("tema", TEMA_ALIASES), ("status", STATUS_ALIASES)):
+            matched = []
+            for value in self._masks.get(field, {}):
+                phrases = aliases.get(value, (value,))
+                if any(_contains_phrase(text, phrase) for phrase in phrases):
+                    matched.append(self._labels[field][value])
+            if matched:
+                filters[field] = matched
+
+        for value, label in self._labels.get("eixo", {}).items():
+            if _contains_phrase(text, value):
+                filters.setdefault("eixo", []).append(label)
+
+        return filters
+
+    def _mask_names(self, text: str) -> str:
+        """Remove production titles and director names from a normalized query"""
+        for name in self._titles + list(self._labels.get("diretor", {})):
+            if name:
+                text = re.sub(rf"\b{re.escape(name)}\b", " ", text)
+        return text
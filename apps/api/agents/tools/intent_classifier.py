@@ -0,0 +1,395 @@
+"""
+Bitaca Cinema - Intent Classifier
+Compiled keyword automaton (Aho-Corasick) plus optional embedding centroids for agent routing
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+
+AGENT_LABELS = ("discovery", "cinema", "cultural")
+
+# Routing keywords per agent (matched as substrings of the lowercased query)
+AGENT_KEYWORDS = {
+    "cultural": (
+        'lei paulo gustavo', 'paulo gustavo', 'lpg',
+        'pnab', 'aldir blanc', 'política nacional',
+        'edital', 'financiamento', 'verba', 'recurso',
+        'lei de incentivo', 'lei cultural', 'política cultural',
+        'secretaria', 'ministério da cultura'
+    ),
+    "cinema": (
+        'diretor', 'dirigido por', 'quem dirigiu',
+        'sinopse', 'sobre o que', 'enredo', 'história',
+        'tema', 'eixo temático', 'produção',
+        'filme', 'documentário', 'curta'
+    ),
+    "discovery": (
+        'buscar', 'procurar', 'encontrar', 'pesquisar',
+        'recomendar', 'recomende', 'sugira', 'sugestão',
+        'similar', 'parecido', 'semelhante',
+        'sobre', 'fala de', 'mostra', 'trata'
+    )
+}
+
+# Labelled routing sets: TRAINING_QUERIES seeds the centroid classifier,
+# EVALUATION_QUERIES is held out (never embedded into centroids) and drives the benchmark
+TRAINING_QUERIES: List[Tuple[str, str]] = [
+    ("Quem dirigiu Ponteia Viola?", "cinema"),
+    ("Qual a sinopse do documentário sobre a viola caipira?", "cinema"),
+    ("Quem é o diretor do filme sobre o Rio Paranapanema?", "cinema"),
+    ("Sobre o que é o curta Memórias do Capão?", "cinema"),
+    ("Qual o enredo dessa produção?", "cinema"),
+    ("Qual o eixo temático do filme da Margarida?", "cinema"),
+    ("Me conta a história desse documentário", "cinema"),
+    ("Quanto tempo dura esse curta-metragem?", "cinema"),
+    ("Quem atua nesse longa?", "cinema"),
+    ("Onde foram as filmagens?", "cinema"),
+    ("O que é a Lei Paulo Gustavo?", "cultural"),
+    ("Como funciona a PNAB em Capão Bonito?", "cultural"),
+    ("Quando sai o resultado do edital 005/2024?", "cultural"),
+    ("Quanto de verba a cidade recebeu da LPG?", "cultural"),
+    ("Quem pode se inscrever na Aldir Blanc?", "cultural"),
+    ("A secretaria de cultura abriu inscrições?", "cultural"),
+    ("Como conseguir financiamento para meu projeto cultural?", "cultural"),
+    ("Quais documentos preciso para a prestação de contas?", "cultural"),
+    ("Artista de rua pode receber o fomento?", "cultural"),
+    ("Qual o prazo para pedir o benefício da lei?", "cultural"),
+    ("Recomende filmes sobre música", "discovery"),
+    ("Quero encontrar produções sobre meio ambiente", "discovery"),
+    ("Tem algo parecido com Ponteia Viola?", "discovery"),
+    ("Sugira um documentário para ver hoje", "discovery"),
+    ("Buscar produções sobre patrimônio histórico", "discovery"),
+    ("Quais produções falam de gastronomia?", "discovery"),
+    ("Quero ver algo sobre a cultura caipira", "discovery"),
+    ("Me mostra o que tem de hip hop", "discovery"),
+    ("O que tem para assistir no catálogo?", "discovery"),
+    ("Quais obras tratam de memória da cidade?", "discovery"),
+]
+
+EVALUATION_QUERIES: List[Tuple[str, str]] = [
+    ("Quem fez a direção de Os Cascatinhas?", "cinema"),
+    ("Qual é a sinopse de Reconstruction?", "cinema"),
+    ("Esse filme foi gravado onde?", "cinema"),
+    ("Quem dirigiu o documentário Grupo Êre?", "cinema"),
+    ("Me fala do elenco de A Crônica", "cinema"),
+    ("Qual o tema do curta Arte Urbana?", "cinema"),
+    ("Como me inscrevo no próximo edital da cidade?", "cultural"),
+    ("O que a Política Nacional Aldir Blanc financia?", "cultural"),
+    ("Posso usar a verba da LPG para comprar equipamento?", "cultural"),
+    ("Onde fica a secretaria de cultura de Capão Bonito?", "cultural"),
+    ("Quem aprova os projetos de fomento?", "cultural"),
+    ("Qual o valor máximo do prêmio da lei de incentivo?", "cultural"),
+    ("Recomende algo parecido com Batalha do Capão", "discovery"),
+    ("Quero procurar filmes de rap", "discovery"),
+    ("Tem alguma produção sobre skate?", "discovery"),
+    ("Sugira produções sobre a natureza da região", "discovery"),
+    ("Mostra documentários de rock", "discovery"),
+    ("Quais filmes falam de árvores?", "discovery"),
+]
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over labelled keywords
+
+    One pass over the text finds every (possibly overlapping) keyword, so
+    scoring is O(len(text)) regardless of how many keywords are registered.
+    Scores are the number of distinct keywords found per label, the same as
+    `sum(kw in text for kw in keywords)`.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        """
+        Build the trie and failure links
+
+        Args:
+            keywords: Label -> keywords
+        """
+        self.labels = tuple(keywords)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[str, str], ...]] = [()]
+
+        for label, words in keywords.items():
+            for word in words:
+                node = 0
+                for ch in word:
+                    child = self._goto[node].get(ch)
+                    if child is None:
+                        child = len(self._goto)
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._out.append(())
+                        self._goto[node][ch] = child
+                    node = child
+                self._out[node] += ((label, word),)
+
+        # Breadth-first failure links (outputs of the fallback state are inherited)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._out[child] += self._out[self._fail[child]]
+
+        # Dense transitions (goto + resolved failures) so scanning is one lookup per character
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])]
+        queue = deque(self._goto[0].values())
+        order = []
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            queue.extend(self._goto[node].values())
+        self._delta.extend({} for _ in range(len(self._goto) - 1))
+        for node in order:
+            self._delta[node] = {**self._delta[self._fail[node]], **self._goto[node]}
+
+    def matches(self, text: str) -> Set[Tuple[str, str]]:
+        """Distinct (label, keyword) pairs found in text"""
+        delta, out = self._delta, self._out
+        found: Set[Tuple[str, str]] = set()
+        node = 0
+        for ch in text:
+            node = delta[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """Distinct keyword count per label"""
+        scores = {label: 0 for label in self.labels}
+        for label, _ in self.matches(text):
+            scores[label] += 1
+        return scores
+
+
+class CentroidClassifier:
+    """
+    Nearest-centroid classifier over query embeddings
+
+    One normalized mean vector per label; prediction is a single matrix-vector
+    product against the embedding RAG already computes for the query.
+    """
+
+    def __init__(self, examples: Sequence[Tuple[str, np.ndarray]]):
+        """
+        Args:
+            examples: (label, embedding) pairs
+        """
+        grouped: Dict[str, List[np.ndarray]] = {}
+        for label, vector in examples:
+            vector = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                grouped.setdefault(label, []).append(vector / norm)
+
+        self.labels = tuple(grouped)
+        centroids = np.stack([np.mean(grouped[label], axis=0) for label in self.labels]) if grouped else np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True) if len(centroids) else 1
+        self.centroids = (centroids / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+    def similarities(self, vector: np.ndarray) -> Dict[str, float]:
+        """Cosine similarity to each label centroid"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0 or not self.labels:
+            return {}
+        sims = self.centroids @ (vector / norm)
+        return {label: float(sim) for label, sim in zip(self.labels, sims)}
+
+    def predict(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        """
+        Best label and its margin over the runner-up
+
+        Returns:
+            (label, margin) - (None, 0.0) when no centroids are available
+        """
+        sims = self.similarities(vector)
+        if not sims:
+            return None, 0.0
+        ranked = sorted(sims.values(), reverse=True)
+        best = max(sims, key=sims.get)
+        return best, ranked[0] - (ranked[1] if len(ranked) > 1 else 0.0)
+
+
+class IntentClassifier:
+    """
+    Agent routing: compiled keywords first, embedding centroids for the rest
+
+    Keyword routing keeps the historical rules (intent, cultural, cinema vs
+    search scores). Queries without any keyword hit ('low' confidence) can be
+    refined by the centroid classifier when it has been built.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]] = None, centroid_min_margin: float = 0.02):
+        self.automaton = KeywordAutomaton(keywords or AGENT_KEYWORDS)
+        self.centroid_min_margin = centroid_min_margin
+        self.centroids: Optional[CentroidClassifier] = None
+
+    @property
+    def has_centroids(self) -> bool:
+        return self.centroids is not None and len(self.centroids.labels) > 0
+
+    def route(self, query: str, intent: str = None) -> Dict[str, Any]:
+        """
+        Keyword routing
+
+        Returns:
+            Dict with 'primary' agent, ranked 'candidates', 'confidence' and
+            agent flags (use_rag / needs_search)
+        """
+        scores = self.automaton.scores(query.lower())
+        cultural_score = scores.get('cultural', 0)
+        cinema_score = scores.get('cinema', 0)
+        search_score = scores.get('discovery', 0)
+
+        # Agents by keyword score (ties keep discovery > cinema > cultural), used for fan-out
+        ranked = sorted(AGENT_LABELS, key=lambda name: -scores.get(name, 0))
+
+        def routed(primary: str, **info) -> Dict[str, Any]:
+            return {
+                'primary': primary,
+                'candidates': [primary] + [name for name in ranked if name != primary],
+                **info
+            }
+
+        # Intent-based routing
+        if intent in ('SEARCH', 'RECOMMEND'):
+            return routed('discovery', use_rag=True, confidence='high')
+
+        # Keyword-based routing
+        if cultural_score > 0:
+            return routed('cultural', confidence='high' if cultural_score >= 2 else 'medium')
+
+        if cinema_score > search_score and cinema_score > 0:
+            # Cinema agent may need production context
+            return routed('cinema', needs_search=True, confidence='medium')
+
+        if search_score > 0:
+            return routed('discovery', use_rag=True, confidence='high')
+
+        # Default: discovery agent with RAG
+        return routed('discovery', use_rag=True, confidence='low')
+
+    def needs_embedding(self, classification: Dict[str, Any]) -> bool:
+        """Whether the centroid classifier could improve this routing"""
+        return self.has_centroids and classification.get('confidence') == 'low'
+
+    def refine(self, classification: Dict[str, Any], query_embedding: Optional[np.ndarray]) -> Dict[str, Any]:
+        """
+        Re-route a low-confidence classification with the centroid classifier
+
+        Args:
+            classification: Result of route()
+            query_embedding: Embedding of the query (shared with RAG)
+        """
+        if query_embedding is None or not self.needs_embedding(classification):
+            return classification
+
+        sims = self.centroids.similarities(query_embedding)
+        label, margin = self.centroids.predict(query_embedding)
+        if label is None or margin < self.centroid_min_margin:
+            return classification
+
+        refined = {
+            'primary': label,
+            'candidates': sorted(sims, key=sims.get, reverse=True),
+            'confidence': 'centroid',
+            'centroid_margin': round(margin, 4)
+        }
+        if label == 'discovery':
+            refined['use_rag'] = True
+        elif label == 'cinema':
+            refined['needs_search'] = True
+        return refined
+
+    async def build_centroids(self, embed: Callable[[str], Any],
+                              examples: Sequence[Tuple[str, str]] = TRAINING_QUERIES) -> int:
+        """
+        Embed the labelled queries and build the centroid classifier
+
+        Args:
+            embed: Async query -> embedding (None on failure)
+            examples: (query, label) pairs
+
+        Returns:
+            Number of examples embedded
+        """
+        vectors = await asyncio.gather(*(embed(query) for query, _ in examples))
+        pairs = [(label, vector) for (_, label), vector in zip(examples, vectors) if vector is not None]
+        if pairs:
+            self.centroids = CentroidClassifier(pairs)
+        return len(pairs)
+
+
+def confusion_matrix(predict: Callable[[str], str],
+                     labelled: Sequence[Tuple[str, str]] = EVALUATION_QUERIES,
+                     labels: Sequence[str] = AGENT_LABELS) -> Dict[str, Any]:
+    """
+    Evaluate a routing function on a labelled set
+
+    Args:
+        predict: query -> agent label
+        labelled: (query, expected label) pairs
+        labels: Label order of the matrix
+
+    Returns:
+        Dict with 'matrix' (expected -> predicted -> count), 'accuracy' and
+        per-label 'precision' / 'recall'
+    """
+    matrix = {expected: {predicted: 0 for predicted in labels} for expected in labels}
+    for query, expected in labelled:
+        predicted = predict(query)
+        matrix.setdefault(expected, {}).setdefault(predicted, 0)
+        matrix[expected][predicted] += 1
+
+    total = sum(sum(row.values()) for row in matrix.values())
+    correct = sum(matrix[label].get(label, 0) for label in labels)
+    precision, recall = {}, {}
+    for label in labels:
+        predicted_as = sum(row.get(label, 0) for row in matrix.values())
+        expected_as = sum(matrix[label].values())
+        precision[label] = matrix[label].get(label, 0) / predicted_as if predicted_as else 0.0
+        recall[label] = matrix[label].get(label, 0) / expected_as if expected_as else 0.0
+
+    return {
+        'matrix': matrix,
+        'accuracy': correct / total if total else 0.0,
+        'precision': precision,
+        'recall': recall
+    }
+
+
+if __name__ == "__main__":
+    # Keyword routing benchmark on the held-out set: python -m agents.tools.intent_classifier
+    classifier = IntentClassifier()
+    report = confusion_matrix(lambda query: classifier.route(query)['primary'])
+
+    print(f"{'esperado / previsto':<22}" + "".join(f"{label:>11}" for label in AGENT_LABELS))
+    for expected in AGENT_LABELS:
+        print(f"{expected:<22}" + "".join(f"{report['matrix'][expected][label]:>11}" for label in AGENT_LABELS))
+    print(f"\n🎯 Accuracy: {report['accuracy']:.0%}")
+    for label in AGENT_LABELS:
+        print(f"   {label}: precision {report['precision'][label]:.0%}, recall {report['recall'][label]:.0%}")
+
+    queries = [query for query, _ in TRAINING_QUERIES + EVALUATION_QUERIES] * 200
+    start = time.perf_counter()
+    for query in queries:
+        classifier.route(query)
+    automaton_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+    start = time.perf_counter()
+    for query in queries:
+        lowered = query.lower()
+        {label: sum(1 for kw in words if kw in lowered) for label, words in AGENT_KEYWORDS.items()}
+    scan_us = (time.perf_counter() - start) / len(queries) * 1e6
+    print(f"⚡ Routing: {automaton_us:.1f}µs/query (keyword scan: {scan_us:.1f}µs/query)")
@@ -3,88 +3,247 @@ Bitaca Cinema - RAG Tool for Agno Agents
 Integrates with existing embeddings system
 """
 
-from typing import Optional
+import asyncio
+import os
+from typing import Dict, List, Optional
 
-import httpx
 import numpy as np
 
+from agents.tools.bm25 import BM25Index
+from agents.tools.embedding_batcher import get_embedding_batcher
+from agents.tools.embedding_cache import get_embedding_cache
+from agents.tools.facets import FacetIndex, normalize_value
+from agents.tools.similarity import SimilarityTable
+from agents.tools.vector_index import VectorIndex
+
 
 class RAGTool:
     """Tool for semantic search over Bitaca Cinema productions using RAG"""
 
-    def __init__(self, embeddings_data: list, nvidia_api_key: str):
-        self.embeddings = embeddings_data
+    # Reciprocal rank fusion constant (standard value from the RRF paper)
+    RRF_K = 60
+
+    def __init__(self, embeddings_data: list, nvidia_api_key: str,
+                 vector_dtype: Optional[str] = None, rerank_top: Optional[int] = None,
+                 latency_budget_ms: Optional[float] = None):
+        """
+        Args:
+            embeddings_data: Items from embeddings.json (id, titulo, embedding, metadata)
+            nvidia_api_key: NVIDIA API key
+            vector_dtype: Index storage dtype (float32, float16, int8)
+            rerank_top: Candidates re-scored in float32 for quantized dtypes
+            latency_budget_ms: Max wait for the query embedding before
+                falling back to lexical-only results
+        """
         self.nvidia_api_key = nvidia_api_key
-        self.embed_url = "https://integrate.api.nvidia.com/v1/embeddings"
+        self.embed_model = "nvidia/nv-embedqa-e5-v5"
+        self.embedding_cache = get_embedding_cache()
+        self.embedding_batcher = get_embedding_batcher(nvidia_api_key)
+
+        self.vector_dtype = vector_dtype or os.getenv('RAG_VECTOR_DTYPE', 'float16')
+        self.rerank_top = int(os.getenv('RAG_RERANK_TOP', 0)) if rerank_top is None else rerank_top
+        self.latency_budget = (
+            float(os.getenv('RAG_LATENCY_BUDGET_MS', 1500)) if latency_budget_ms is None else latency_budget_ms
+        ) / 1000
+
+        self.similarity: Optional[SimilarityTable] = None
+        self.load_catalog(embeddings_data)
+
+    def load_catalog(self, embeddings_data: list):
+        """
+        (Re)build every index from the catalog
+
+        The item-to-item similarity table is only recomputed when the
+        embeddings actually changed. Indexes are built first and swapped in
+        together, so searches running during a reload see either catalog.
+
+        Args:
+            embeddings_data: Items from embeddings.json (id, titulo, embedding, metadata)
+        """
+        # Metadata only - vectors live (quantized) in the index
+        indexed = [item for item in embeddings_data if item.get('embedding')]
+        items = [
+            {'id': item.get('id'), 'titulo': item.get('titulo'), 'metadata': item.get('metadata', {})}
+            for item in indexed
+        ]
+        vectors = np.array([item['embedding'] for item in indexed], dtype=np.float32)
+        if not indexed:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+
+        index = VectorIndex(vectors, dtype=self.vector_dtype, rerank_top=self.rerank_top)
+
+        # Lexical index (title and director weighted twice over the synopsis)
+        lexical_index = BM25Index([
+            " ".join([
+                item.get('titulo') or '', item.get('titulo') or '',
+                item['metadata'].get('diretor') or '', item['metadata'].get('diretor') or '',
+                item['metadata'].get('sinopse') or ''
+            ])
+            for item in items
+        ])
+
+        # Boolean masks per tema/eixo/status/diretor, applied before scoring
+        facets = FacetIndex(items)
+
+        # Item-to-item similarities (exact float32, before quantization)
+        similarity = self.similarity
+        if similarity is None or similarity.version != SimilarityTable.fingerprint(vectors):
+            similarity = SimilarityTable(vectors)
+            print(f"🔗 Similarity table built for {len(similarity)} productions ({similarity.version})")
+
+        rows_by_id = {str(item['id']): row for row, item in enumerate(items) if item['id'] is not None}
+        rows_by_title = {normalize_value(item['titulo']): row for row, item in enumerate(items)}
 
-    async def search_productions(self, query: str, top_k: int = 3) -> list:
+        (self.items, self.index, self.lexical_index, self.facets, self.similarity,
+         self._rows_by_id, self._rows_by_title) = (
+            items, index, lexical_index, facets, similarity, rows_by_id, rows_by_title
+        )
+
+    async def search_productions(self, query: str, top_k: int = 3,
+                                 filters: Optional[Dict[str, List[str]]] = None) -> list:
         """
-        Search for relevant productions using semantic similarity
+        Hybrid search: BM25 + vector similarity fused with reciprocal rank fusion
+
+        The lexical ranking is computed while the query embedding is in
+        flight. If the embedding does not arrive within the latency budget
+        (or fails), lexical-only results are returned; the embedding call
+        keeps running in the background and still fills the cache.
 
         Args:
             query: User query string
             top_k: Number of results to return
+            filters: Metadata constraints, e.g. {'tema': ['musica']};
+                only matching productions are scored. Filters are dropped
+                when nothing matches them, or when the query's words only
+                match productions the filters exclude (a misread filter)
 
         Returns:
-            List of relevant productions with metadata
+            List of relevant productions with metadata: 'score' is the fused
+            RRF score, 'similarity' the query's cosine similarity (None when
+            no embedding was available) and 'match' the retrievers that
+            found the production ('hybrid', 'vector', 'lexical' or 'filter')
         """
-        # Generate query embedding
-        query_embedding = await self._generate_embedding(query)
+        if len(self.items) == 0:
+            return []
+
+        candidates = self.facets.candidates(filters)
+        pool = max(top_k * 4, 20)
+        lexical = self.lexical_index.search(query, top_k=pool, indices=candidates)
+
+        if candidates is not None and (len(candidates) == 0 or not lexical):
+            unfiltered = self.lexical_index.search(query, top_k=pool)
+            if len(candidates) == 0 or unfiltered:
+                print(f"⚠️ Filters {filters} excluded every match - searching unfiltered")
+                candidates, lexical = None, unfiltered
+
+        embedding_task = asyncio.ensure_future(self._generate_embedding(query))
 
-        if not query_embedding:
+        try:
+            query_embedding = await asyncio.wait_for(asyncio.shield(embedding_task), timeout=self.latency_budget)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Embedding exceeded {self.latency_budget * 1000:.0f}ms budget - lexical results only")
+            query_embedding = None
+
+        vector = []
+        if query_embedding is not None:
+            vector = self.index.search(query_embedding, top_k=pool, indices=candidates)
+
+        if not vector and not lexical and candidates is not None:
+            # Filter-only query ("filmes sobre meio ambiente") without a ranking signal
+            return [dict(self._format_result(int(row), None), score=0.0, match='filter') for row in candidates[:top_k]]
+
+        return self._fuse(vector, lexical, query_embedding, top_k)
+
+    def _fuse(self, vector: list, lexical: list, query_embedding: Optional[np.ndarray], top_k: int) -> list:
+        """Reciprocal rank fusion of the vector and lexical rankings"""
+        fused = {}
+        for ranking in (vector, lexical):
+            for rank, (row, _) in enumerate(ranking):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (self.RRF_K + rank + 1)
+
+        if not fused:
             return []
 
-        # Calculate similarities
-        similarities = []
-        for item in self.embeddings:
-            prod_embedding = item.get('embedding')
-            if prod_embedding:
-                similarity = self._cosine_similarity(query_embedding, prod_embedding)
-                similarities.append({
-                    'titulo': item.get('titulo'),
-                    'diretor': item.get('metadata', {}).get('diretor'),
-                    'tema': item.get('metadata', {}).get('tema'),
-                    'sinopse': item.get('metadata', {}).get('sinopse'),
-                    'eixo': item.get('metadata', {}).get('eixo'),
-                    'similarity': similarity
-                })
-
-        # Sort by similarity and return top_k
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        return similarities[:top_k]
-
-    async def _generate_embedding(self, text: str) -> Optional[list]:
-        """Generate embedding for text using NVIDIA API"""
+        rows = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        vector_scores = dict(vector)
+        vector_rows, lexical_rows = set(vector_scores), {row for row, _ in lexical}
+        if query_embedding is not None:
+            # Rows found only lexically still report their cosine similarity
+            missing = np.array([row for row in rows if row not in vector_scores], dtype=np.int64)
+            if len(missing):
+                cosine = self.index.score(query_embedding, missing).tolist()
+                vector_scores.update(zip(missing.tolist(), cosine))
+
+        results = []
+        for row in rows:
+            in_vector, in_lexical = row in vector_rows, row in lexical_rows
+            similarity = vector_scores.get(row)
+            result = self._format_result(row, None if similarity is None else float(similarity))
+            result['score'] = round(fused[row], 5)
+            result['match'] = 'hybrid' if in_vector and in_lexical else 'vector' if in_vector else 'lexical'
+            results.append(result)
+        return results
+
+    def find_production(self, title: Optional[str] = None, production_id=None) -> Optional[int]:
+        """
+        Resolve a production row by id or title
+
+        Titles are compared accent/case-insensitively; a partial title is
+        accepted when it identifies a single production.
+
+        Returns:
+            Row index, or None when not found (or ambiguous)
+        """
+        if production_id is not None:
+            return self._rows_by_id.get(str(production_id))
+
+        wanted = normalize_value(title)
+        if not wanted:
+            return None
+        if wanted in self._rows_by_title:
+            return self._rows_by_title[wanted]
+
+        partial = [row for key, row in self._rows_by_title.items() if wanted in key]
+        return partial[0] if len(partial) == 1 else None
+
+    def similar_productions(self, row: int, top_k: int = 5) -> list:
+        """Precomputed nearest productions (no network call)"""
+        return [
+            dict(self._format_result(other, similarity), id=self.items[other]['id'])
+            for other, similarity in self.similarity.similar(row, top_k)
+        ]
+
+    def get_production(self, row: int) -> dict:
+        """Formatted production for a row"""
+        return dict(self._format_result(row, 1.0), id=self.items[row]['id'])
+
+    def _format_result(self, row: int, similarity: Optional[float]) -> dict:
+        item = self.items[row]
+        metadata = item['metadata']
+        return {
+            'titulo': item.get('titulo'),
+            'diretor': metadata.get('diretor'),
+            'tema': metadata.get('tema'),
+            'sinopse': metadata.get('sinopse'),
+            'eixo': metadata.get('eixo'),
+            'similarity': similarity
+        }
+
+    async def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """Public access to the query embedding (e.g. for semantic caching)"""
+        return await self._generate_embedding(query)
+
+    async def _generate_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Generate embedding for text using NVIDIA API (through the shared cache and batcher)"""
+        cached = self.embedding_cache.get(text, self.embed_model, "query")
+        if cached is not None:
+            return cached
+
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.embed_url,
-                    headers={
-                        "Authorization": f"Bearer {self.nvidia_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "nvidia/nv-embedqa-e5-v5",
-                        "input": text,
-                        "input_type": "query",
-                        "encoding_format": "float"
-                    },
-                    timeout=30.0
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    return data['data'][0]['embedding']
-                return None
+            # Batched with concurrent queries and /api/embeddings calls
+            embedding = await self.embedding_batcher.embed(text, self.embed_model, "query")
+            self.embedding_cache.put(text, self.embed_model, embedding, "query")
+            return np.asarray(embedding, dtype=np.float32)
         except Exception as e:
             print(f"Error generating embedding: {e}")
             return None
-
-    def _cosine_similarity(self, vec1: list, vec2: list) -> float:
-        """Calculate cosine similarity between two vectors"""
-        try:
-            a = np.array(vec1)
-            b = np.array(vec2)
-            return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
-        except:
-            return 0.0
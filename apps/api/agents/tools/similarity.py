@@ -0,0 +1,76 @@
+"""
+Bitaca Cinema - Item Similarity Table
+Precomputed production-to-production cosine similarities
+"""
+
+import hashlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class SimilarityTable:
+    """
+    N x N cosine similarity matrix plus a sorted neighbour list per row
+
+    Built once from the catalog embeddings, so "similar productions"
+    lookups are a row read with no embedding or LLM call. `version` is a
+    hash of the source vectors; callers rebuild the table when it changes.
+    """
+
+    def __init__(self, vectors: np.ndarray, top_n: int = 20):
+        """
+        Build table
+
+        Args:
+            vectors: float32 matrix (n x d), not necessarily normalized
+            top_n: Neighbours kept per production (sorted, self excluded)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(vectors), -1)
+
+        self.version = self.fingerprint(vectors)
+        size = vectors.shape[0]
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        normalized = vectors / np.where(norms > 0, norms, 1.0)
+
+        self.matrix = normalized @ normalized.T if size else np.zeros((0, 0), dtype=np.float32)
+
+        # Self-similarity is masked out of the neighbour lists
+        ranked = self.matrix.copy()
+        np.fill_diagonal(ranked, -np.inf)
+        self.top_n = min(top_n, max(size - 1, 0))
+        self.neighbors = np.argsort(-ranked, axis=1, kind="stable")[:, :self.top_n].astype(np.int32)
+
+    @staticmethod
+    def fingerprint(vectors: np.ndarray) -> str:
+        """Hash of the embedding matrix (changes whenever any vector changes)"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        return hashlib.sha1(vectors.tobytes() + str(vectors.shape).encode()).hexdigest()[:12]
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def similar(self, row: int, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Most similar productions to a row
+
+        Args:
+            row: Production row
+            top_k: Number of neighbours (capped at top_n)
+
+        Returns:
+            List of (row, cosine similarity), best first
+        """
+        if not 0 <= row < len(self):
+            return []
+        neighbors = self.neighbors[row, :top_k]
+        return [(int(other), float(self.matrix[row, other])) for other in neighbors]
+
+    def pair(self, row_a: int, row_b: int) -> Optional[float]:
+        """Similarity between two productions"""
+        if not (0 <= row_a < len(self) and 0 <= row_b < len(self)):
+            return None
+        return float(self.matrix[row_a, row_b])
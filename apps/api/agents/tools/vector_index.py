@@ -0,0 +1,188 @@
+"""
+Bitaca Cinema - Vector Index
+In-memory embedding matrix with float16/int8 scalar quantization
+"""
+
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector int8 quantization
+
+    Args:
+        matrix: float32 matrix (n x d)
+
+    Returns:
+        (int8 codes, float32 per-row scale) with row ≈ codes * scale
+    """
+    if matrix.size == 0:
+        return matrix.astype(np.int8), np.ones(matrix.shape[0], dtype=np.float32)
+
+    max_abs = np.abs(matrix).max(axis=1)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over L2-normalized vectors
+
+    Vectors are stored as float32, float16 or int8 (with a per-vector
+    scale). Scoring runs on the stored representation in row blocks, so
+    the only float32 temporaries are one block at a time. With
+    rerank_top > 0 the top-M candidates are re-scored exactly from a
+    memory-mapped float32 copy on disk, so only the pages of those rows
+    are read and the exact vectors do not count against process memory.
+    """
+
+    def __init__(self,
+                 vectors: np.ndarray,
+                 dtype: str = "float32",
+                 rerank_top: int = 0,
+                 block_rows: int = 4096,
+                 exact_dir: Optional[str] = None):
+        """
+        Build index
+
+        Args:
+            vectors: float32 matrix (n x d), not necessarily normalized
+            dtype: Storage dtype (float32, float16 or int8)
+            rerank_top: Candidates re-scored in float32 (0 disables)
+            block_rows: Rows dequantized per scoring block
+            exact_dir: Directory of the memory-mapped rerank vectors (default: temp dir)
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', use one of {SUPPORTED_DTYPES}")
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(vectors), -1)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        normalized = vectors / np.where(norms > 0, norms, 1.0)
+
+        self.dtype = dtype
+        self.dimensions = normalized.shape[1]
+        self.block_rows = block_rows
+        self.rerank_top = rerank_top if dtype != "float32" else 0
+        self.scales: Optional[np.ndarray] = None
+
+        if dtype == "int8":
+            self.matrix, self.scales = quantize_int8(normalized)
+        elif dtype == "float16":
+            self.matrix = normalized.astype(np.float16)
+        else:
+            self.matrix = normalized
+
+        self.exact: Optional[np.ndarray] = self._map_exact(normalized, exact_dir) if self.rerank_top else None
+
+    @staticmethod
+    def _map_exact(normalized: np.ndarray, directory: Optional[str]) -> np.ndarray:
+        """Write the exact vectors to disk and memory-map them read-only"""
+        fd, path = tempfile.mkstemp(suffix=".npy", prefix="vector_index_", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, normalized)
+            return np.load(path, mmap_mode="r")
+        finally:
+            # The mapping stays valid; the file disappears with the index
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the stored vectors (the memory-mapped rerank copy excluded)"""
+        total = self.matrix.nbytes
+        if self.scales is not None:
+            total += self.scales.nbytes
+        return total
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        """Dequantized (float32) rows"""
+        block = self.matrix[indices].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[indices, None]
+        return block
+
+    def score(self, query: np.ndarray, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Approximate cosine similarity of the query against stored vectors
+
+        Args:
+            query: Query vector (d,)
+            indices: Restrict scoring to these rows (default: all)
+
+        Returns:
+            Scores aligned with `indices` (or with all rows)
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            size = len(self) if indices is None else len(indices)
+            return np.zeros(size, dtype=np.float32)
+        query = query / norm
+
+        if indices is None:
+            indices = np.arange(len(self))
+
+        if self.dtype == "float32" and len(indices) == len(self):
+            return self.matrix @ query
+
+        scores = np.empty(len(indices), dtype=np.float32)
+        for start in range(0, len(indices), self.block_rows):
+            block_idx = indices[start:start + self.block_rows]
+            scores[start:start + len(block_idx)] = self.rows(block_idx) @ query
+        return scores
+
+    def search(self,
+               query: np.ndarray,
+               top_k: int = 3,
+               indices: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k rows by cosine similarity
+
+        Args:
+            query: Query vector (d,)
+            top_k: Number of results
+            indices: Candidate rows (default: all)
+
+        Returns:
+            List of (row index, similarity), best first
+        """
+        if len(self) == 0 or top_k <= 0:
+            return []
+
+        candidates = np.arange(len(self)) if indices is None else np.asarray(indices)
+        if len(candidates) == 0:
+            return []
+
+        scores = self.score(query, candidates)
+
+        keep = max(top_k, self.rerank_top)
+        if keep < len(scores):
+            top = np.argpartition(-scores, keep - 1)[:keep]
+        else:
+            top = np.arange(len(scores))
+
+        if self.exact is not None:
+            query = np.asarray(query, dtype=np.float32).ravel()
+            query = query / (np.linalg.norm(query) or 1.0)
+            scores = scores.copy()
+            scores[top] = self.exact[candidates[top]] @ query
+
+        top = top[np.argsort(-scores[top], kind="stable")][:top_k]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
@@ -8,8 +8,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
 
 load_dotenv()
 
@@ -81,11 +81,16 @@ COLLECTIONS = {
     "messages": "messages",
     "analytics": "analytics",
     "embeddings_cache": "embeddings_cache",
+    "response_cache": "response_cache",
     "wallets": "wallets",
     "coin_transactions": "coin_transactions",
     "daily_bonuses": "daily_bonuses",
     "bet_records": "bet_records",
+    "battle_pools": "battle_pools",
+    "settlement_jobs": "settlement_jobs",
+    "settlement_credits": "settlement_credits",
     "rl_audit_logs": "rl_audit_logs",
+    "rl_audit_snapshots": "rl_audit_snapshots",
     "rl_model_snapshots": "rl_model_snapshots"
 }
 
@@ -110,30 +115,84 @@ class ConversationDB:
 
     @staticmethod
     def add_message(conversation_id: str, role: str, content: str, intent: str = None, rag_results: int = 0):
-        """Add message to conversation"""
-        db = get_database()
+        """
+        Add message to conversation (single insert)
 
-        message = {
+        Conversation counters are maintained by save_session together
+        with the session window.
+        """
+        ConversationDB.add_messages([{
             "conversation_id": conversation_id,
             "role": role,
             "content": content,
             "intent": intent,
-            "rag_results": rag_results,
-            "timestamp": datetime.utcnow()
-        }
+            "rag_results": rag_results
+        }])
 
-        # Insert message
-        db[COLLECTIONS["messages"]].insert_one(message)
-
-        # Update conversation
-        db[COLLECTIONS["conversations"]].update_one(
-            {"_id": conversation_id},
-            {
-                "$set": {"updated_at": datetime.utcnow()},
-                "$inc": {"message_count": 1}
-            }
+    @staticmethod
+    def add_messages(messages: list):
+        """Insert many messages in one round trip"""
+        if not messages:
+            return
+        db = get_database()
+        now = datetime.utcnow()
+        db[COLLECTIONS["messages"]].insert_many(
+            [{**message, "timestamp": message.get("timestamp") or now} for message in messages],
+            ordered=False
         )
 
+    @staticmethod
+    def save_session(session: Dict[str, Any], expected_version: int) -> bool:
+        """
+        Replace a conversation's session state if nobody else changed it
+
+        The write only applies while the stored version still equals
+        expected_version (0 = not stored yet), so concurrent workers never
+        overwrite each other's turns; the loser reloads and retries.
+
+        Args:
+            session: Dict with conversation_id, user_id, summary, window,
+                summarized_count and new_messages (count since it was loaded)
+            expected_version: Version the session was loaded at
+
+        Returns:
+            True when written, False on a version conflict
+        """
+        db = get_database()
+        now = datetime.utcnow()
+        query = {"_id": session["conversation_id"]}
+        # Documents written before versioning have no version field
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+        try:
+            result = db[COLLECTIONS["conversations"]].update_one(
+                query,
+                {
+                    "$set": {
+                        "summary": session.get("summary", ""),
+                        "window": session.get("window", []),
+                        "summarized_count": session.get("summarized_count", 0),
+                        "updated_at": now
+                    },
+                    "$inc": {"version": 1, "message_count": session.get("new_messages", 0)},
+                    "$setOnInsert": {
+                        "user_id": session.get("user_id", "anonymous"),
+                        "created_at": now,
+                        "metadata": {}
+                    }
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Stored at another version: the upsert collided with the existing _id
+            return False
+        return result.matched_count > 0 or result.upserted_id is not None
+
+    @staticmethod
+    def load_session(conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Get persisted session state (summary + recent window)"""
+        db = get_database()
+        return db[COLLECTIONS["conversations"]].find_one({"_id": conversation_id})
+
     @staticmethod
     def get_conversation_history(conversation_id: str, limit: int = 50):
         """Get conversation messages"""
@@ -183,38 +242,95 @@ class AnalyticsDB:
 
 
 class EmbeddingsCacheDB:
-    """Cache embeddings to reduce API calls"""
+    """Cache embeddings to reduce API calls (keyed by normalized-text hash)"""
 
     @staticmethod
-    def get_cached_embedding(text: str, model: str):
+    def get_cached_embedding(key: str):
         """Get cached embedding"""
+        return EmbeddingsCacheDB.get_cached_embeddings([key]).get(key)
+
+    @staticmethod
+    def get_cached_embeddings(keys: list) -> dict:
+        """Get several cached embeddings in one query"""
         db = get_database()
 
-        cache = db[COLLECTIONS["embeddings_cache"]].find_one({
-            "text": text,
-            "model": model
-        })
+        docs = db[COLLECTIONS["embeddings_cache"]].find(
+            {"key": {"$in": keys}, "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0, "key": 1, "embedding": 1}
+        )
 
-        return cache["embedding"] if cache else None
+        return {doc["key"]: doc["embedding"] for doc in docs}
 
     @staticmethod
-    def cache_embedding(text: str, model: str, embedding: list):
-        """Cache embedding"""
+    def cache_embeddings(entries: list, ttl_seconds: int = 7 * 24 * 3600):
+        """Cache embeddings (entries: dicts with key, model, input_type, embedding)"""
         db = get_database()
 
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        operations = [
+            UpdateOne(
+                {"key": entry["key"]},
+                {"$set": {**entry, "created_at": now, "expires_at": expires_at}},
+                upsert=True
+            )
+            for entry in entries
+        ]
+
+        if operations:
+            db[COLLECTIONS["embeddings_cache"]].bulk_write(operations, ordered=False)
+
+
+class ResponseCacheDB:
+    """Cache agent answers shared between workers"""
+
+    @staticmethod
+    def get_response(key: str) -> Optional[dict]:
+        """Get cached response if not expired"""
+        db = get_database()
+
+        return db[COLLECTIONS["response_cache"]].find_one(
+            {"key": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0, "result": 1, "embedding": 1}
+        )
+
+    @staticmethod
+    def cache_response(key: str, catalog_version: str, agent: str, intent: str, query: str,
+                       result: dict, embedding: list = None, ttl_seconds: int = 3600):
+        """Cache response (expired entries are removed by the TTL index)"""
+        db = get_database()
+
+        now = datetime.utcnow()
         doc = {
-            "text": text,
-            "model": model,
+            "key": key,
+            "catalog_version": catalog_version,
+            "agent": agent,
+            "intent": intent,
+            "query": query,
+            "result": result,
             "embedding": embedding,
-            "created_at": datetime.utcnow()
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl_seconds)
         }
 
-        db[COLLECTIONS["embeddings_cache"]].update_one(
-            {"text": text, "model": model},
+        db[COLLECTIONS["response_cache"]].update_one(
+            {"key": key},
             {"$set": doc},
             upsert=True
         )
 
+    @staticmethod
+    def load_recent(catalog_version: str, limit: int = 512) -> list:
+        """Get most recent non-expired responses for a catalog version"""
+        db = get_database()
+
+        docs = db[COLLECTIONS["response_cache"]].find(
+            {"catalog_version": catalog_version, "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0}
+        ).sort("created_at", -1).limit(limit)
+
+        return list(docs)
+
 
 class WalletDB:
     """Handle wallet operations"""
@@ -242,35 +358,33 @@ class WalletDB:
 
     @staticmethod
     def update_balance(user_id: str, amount: int, transaction_type: str, description: str, metadata: dict = None) -> dict:
-        """Update wallet balance and create transaction record"""
+        """
+        Update wallet balance and create transaction record
+
+        The balance changes with a single atomic $inc; debits only apply
+        while the balance covers them, so concurrent updates (bets, bulk
+        settlement credits) are never lost or overdrawn.
+        """
         db = get_database()
 
-        # Get current wallet
-        wallet = WalletDB.get_or_create_wallet(user_id)
-        current_balance = wallet["balance"]
+        # Make sure the wallet exists (signup bonus)
+        WalletDB.get_or_create_wallet(user_id)
 
-        # Calculate new balance
-        new_balance = current_balance + amount
-
-        if new_balance < 0:
-            raise ValueError("Insufficient funds")
-
-        # Update wallet
-        update_data = {
-            "balance": new_balance,
-            "updated_at": datetime.utcnow()
-        }
+        query = {"user_id": user_id}
+        if amount < 0:
+            query["balance"] = {"$gte": -amount}
 
         # Track earnings and spending
-        if amount > 0:
-            update_data["total_earned"] = wallet.get("total_earned", 0) + amount
-        else:
-            update_data["total_spent"] = wallet.get("total_spent", 0) + abs(amount)
+        increments = {"balance": amount, "total_earned" if amount > 0 else "total_spent": abs(amount)}
 
-        db[COLLECTIONS["wallets"]].update_one(
-            {"user_id": user_id},
-            {"$set": update_data}
+        wallet = db[COLLECTIONS["wallets"]].find_one_and_update(
+            query,
+            {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
         )
+        if wallet is None:
+            raise ValueError("Insufficient funds")
+        new_balance = wallet["balance"]
 
         # Create transaction record
         transaction = {
@@ -396,6 +510,10 @@ class DailyBonusDB:
         }
 
 
+# A settlement run that stops renewing its lease (crash) can be taken over after this
+SETTLEMENT_LEASE = timedelta(minutes=5)
+
+
 class BettingDB:
     """Handle betting operations"""
 
@@ -487,6 +605,262 @@ class BettingDB:
                 }
             )
 
+    @staticmethod
+    def settle_battle(battle_id: str, winner: str, chunk_size: int = 500) -> dict:
+        """
+        Settle every pending bet of a finished battle
+
+        Bets are processed in chunks of `chunk_size`, each in a fixed number of
+        round trips: claim (bulk_write pending -> settling with the computed
+        outcome), credit winners (see _settle_chunk), insert one transaction
+        per user (insert_many) and mark the bets won/lost (bulk_write). Every
+        step is idempotent - credits and transactions have deterministic ids
+        - so an interrupted job is resumed by calling it again. Progress is
+        kept in the battle's settlement_jobs document; its counters are
+        running estimates, recomputed from bet_records when the job completes
+        (a run dying between resolving a chunk and counting it would
+        otherwise leave them short).
+
+        Returns:
+            Settlement job document (as is when completed or running elsewhere)
+        """
+        db = get_database()
+        bets = db[COLLECTIONS["bet_records"]]
+        jobs = db[COLLECTIONS["settlement_jobs"]]
+
+        now = datetime.utcnow()
+        job = jobs.find_one_and_update(
+            {"_id": battle_id},
+            {"$setOnInsert": {
+                "winner": winner,
+                "status": "pending",
+                "processed": 0,
+                "won": 0,
+                "lost": 0,
+                "payout_total": 0,
+                "created_at": now
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if job["winner"] != winner:
+            raise ValueError(f"Battle {battle_id} is being settled with winner {job['winner']}")
+
+        # Single runner per battle: take the job unless another run holds a live lease
+        remaining = bets.count_documents({"battle_id": battle_id, "status": {"$in": ["pending", "settling"]}})
+        job = jobs.find_one_and_update(
+            {"_id": battle_id, "$or": [
+                {"status": {"$in": ["pending", "failed"]}},
+                {"status": "running", "lease_until": {"$lt": now}}
+            ]},
+            {"$set": {
+                "status": "running",
+                "error": None,
+                "total": job.get("processed", 0) + remaining,
+                "started_at": now,
+                "lease_until": now + SETTLEMENT_LEASE,
+                "updated_at": now
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            # Completed, or running elsewhere
+            return jobs.find_one({"_id": battle_id})
+
+        try:
+            # Chunks claimed by an interrupted run first
+            for chunk_key in bets.distinct("settlement.chunk", {"battle_id": battle_id, "status": "settling"}):
+                BettingDB._settle_chunk(db, battle_id, chunk_key)
+
+            while True:
+                chunk = list(bets.find(
+                    {"battle_id": battle_id, "status": "pending"},
+                    {"_id": 1, "bet_on": 1, "bet_amount": 1, "odds": 1}
+                ).sort("_id", 1).limit(chunk_size))
+                if not chunk:
+                    break
+
+                chunk_key = f"{battle_id}:{chunk[0]['_id']}"
+                bets.bulk_write([
+                    UpdateOne(
+                        {"_id": bet["_id"], "status": "pending"},
+                        {"$set": {
+                            "status": "settling",
+                            "settlement": {
+                                "chunk": chunk_key,
+                                "outcome": "won" if bet["bet_on"] == winner else "lost",
+                                "payout": int(bet["bet_amount"] * bet["odds"]) if bet["bet_on"] == winner else 0
+                            }
+                        }}
+                    )
+                    for bet in chunk
+                ], ordered=False)
+                BettingDB._settle_chunk(db, battle_id, chunk_key)
+        except Exception as e:
+            jobs.update_one({"_id": battle_id}, {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}})
+            raise
+
+        return jobs.find_one_and_update(
+            {"_id": battle_id},
+            {"$set": {
+                **BettingDB._settlement_totals(db, battle_id),
+                "status": "completed",
+                "completed_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def _settlement_totals(db, battle_id: str) -> dict:
+        """Final job counters from the bets resolved by the settlement"""
+        pipeline = [
+            {"$match": {"battle_id": battle_id, "status": {"$in": ["won", "lost"]}, "settlement": {"$exists": True}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "payout": {"$sum": "$settlement.payout"}}}
+        ]
+        groups = {doc["_id"]: doc for doc in db[COLLECTIONS["bet_records"]].aggregate(pipeline)}
+        won = groups.get("won", {}).get("count", 0)
+        lost = groups.get("lost", {}).get("count", 0)
+        return {
+            "processed": won + lost,
+            "total": won + lost,
+            "won": won,
+            "lost": lost,
+            "payout_total": groups.get("won", {}).get("payout", 0)
+        }
+
+    @staticmethod
+    def _settle_chunk(db, battle_id: str, chunk_key: str):
+        """
+        Credit, record and resolve the bets claimed under one chunk key (idempotent)
+
+        Winnings are credited in two phases. One settlement_credits document
+        per (chunk, user) - unique _id - is inserted as pending; the wallet
+        $inc also pushes that id to the wallet's pending_credits, and is
+        skipped when the id is already there. The credit is then marked
+        applied and its id pulled from the wallet, so pending_credits only
+        holds credits in flight. A run dying at any step resumes without
+        paying twice.
+        """
+        bets = db[COLLECTIONS["bet_records"]]
+        wallets = db[COLLECTIONS["wallets"]]
+        credit_records = db[COLLECTIONS["settlement_credits"]]
+
+        claimed = list(bets.find(
+            {"settlement.chunk": chunk_key, "status": "settling"},
+            {"_id": 1, "user_id": 1, "bet_on": 1, "bet_amount": 1, "settlement": 1}
+        ))
+        if not claimed:
+            return
+
+        now = datetime.utcnow()
+        credits: Dict[str, int] = {}
+        won_bets: Dict[str, list] = {}
+        for bet in claimed:
+            if bet["settlement"]["outcome"] == "won":
+                credits[bet["user_id"]] = credits.get(bet["user_id"], 0) + bet["settlement"]["payout"]
+                won_bets.setdefault(bet["user_id"], []).append(str(bet["_id"]))
+
+        if credits:
+            credit_ids = [f"{chunk_key}:{user_id}" for user_id in credits]
+            try:
+                credit_records.insert_many([
+                    {
+                        "_id": f"{chunk_key}:{user_id}",
+                        "battle_id": battle_id,
+                        "chunk": chunk_key,
+                        "user_id": user_id,
+                        "amount": amount,
+                        "state": "pending",
+                        "created_at": now
+                    }
+                    for user_id, amount in credits.items()
+                ], ordered=False)
+            except BulkWriteError as e:
+                # Credits recorded by an interrupted run
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+
+            pending = list(credit_records.find(
+                {"_id": {"$in": credit_ids}, "state": "pending"},
+                {"_id": 1, "user_id": 1, "amount": 1}
+            ))
+            if pending:
+                wallets.bulk_write([
+                    UpdateOne(
+                        {"user_id": credit["user_id"], "pending_credits": {"$ne": credit["_id"]}},
+                        {
+                            "$inc": {"balance": credit["amount"], "total_earned": credit["amount"]},
+                            "$push": {"pending_credits": credit["_id"]},
+                            "$set": {"updated_at": now}
+                        }
+                    )
+                    for credit in pending
+                ], ordered=False)
+                credit_records.update_many(
+                    {"_id": {"$in": [credit["_id"] for credit in pending]}},
+                    {"$set": {"state": "applied", "applied_at": now}}
+                )
+            wallets.update_many(
+                {"user_id": {"$in": list(credits)}},
+                {"$pull": {"pending_credits": {"$in": credit_ids}}}
+            )
+
+            balances = {
+                wallet["user_id"]: wallet["balance"]
+                for wallet in wallets.find({"user_id": {"$in": list(credits)}}, {"user_id": 1, "balance": 1})
+            }
+            try:
+                db[COLLECTIONS["coin_transactions"]].insert_many([
+                    {
+                        "_id": f"{chunk_key}:{user_id}",
+                        "user_id": user_id,
+                        "transaction_type": "bet_won",
+                        "amount": amount,
+                        "balance_after": balances.get(user_id),
+                        "description": f"Won {len(won_bets[user_id])} bet(s) on battle {battle_id}",
+                        "metadata": {"battle_id": battle_id, "bet_ids": won_bets[user_id], "payout": amount},
+                        "created_at": now
+                    }
+                    for user_id, amount in credits.items()
+                ], ordered=False)
+            except BulkWriteError as e:
+                # Transactions written by an interrupted run are duplicates
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+
+        result = bets.bulk_write([
+            UpdateOne(
+                {"_id": bet["_id"], "status": "settling"},
+                {"$set": {
+                    "status": bet["settlement"]["outcome"],
+                    "result_amount": bet["settlement"]["payout"] if bet["settlement"]["outcome"] == "won" else -bet["bet_amount"],
+                    "resolved_at": now
+                }}
+            )
+            for bet in claimed
+        ], ordered=False)
+
+        won = sum(1 for bet in claimed if bet["settlement"]["outcome"] == "won")
+        db[COLLECTIONS["settlement_jobs"]].update_one(
+            {"_id": battle_id},
+            {
+                "$inc": {
+                    "processed": result.modified_count,
+                    "won": won,
+                    "lost": len(claimed) - won,
+                    "payout_total": sum(credits.values())
+                },
+                "$set": {"updated_at": now, "lease_until": now + SETTLEMENT_LEASE}
+            }
+        )
+
+    @staticmethod
+    def get_settlement(battle_id: str) -> Optional[dict]:
+        """Settlement job (progress) of a battle"""
+        db = get_database()
+        return db[COLLECTIONS["settlement_jobs"]].find_one({"_id": battle_id})
+
     @staticmethod
     def get_user_bets(user_id: str, limit: int = 50) -> list:
         """Get user's betting history"""
@@ -511,6 +885,195 @@ class BettingDB:
         return list(bets)
 
 
+def _pool_field(contestant: str) -> str:
+    """Contestant name usable as a document field ('.' and '$' are reserved)"""
+    return contestant.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _pool_name(field: str) -> str:
+    """Inverse of _pool_field"""
+    return field.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+class BattlePoolDB:
+    """Running betting pool totals per battle ($inc counters, no bet_records scans)"""
+
+    @staticmethod
+    def _decode(doc: Optional[dict]) -> Optional[dict]:
+        if not doc:
+            return None
+        return {
+            "battle_id": doc["battle_id"],
+            "totals": {_pool_name(k): v for k, v in doc.get("totals", {}).items()},
+            "counts": {_pool_name(k): v for k, v in doc.get("counts", {}).items()},
+            "total_amount": doc.get("total_amount", 0),
+            "total_bets": doc.get("total_bets", 0),
+            "updated_at": doc.get("updated_at")
+        }
+
+    @staticmethod
+    def get_pool(battle_id: str) -> Optional[dict]:
+        """Current totals of a battle (None when no bet was placed yet)"""
+        db = get_database()
+        return BattlePoolDB._decode(db[COLLECTIONS["battle_pools"]].find_one({"battle_id": battle_id}))
+
+    @staticmethod
+    def get_pools_updated_since(battle_ids: list, since: datetime) -> list:
+        """Pools of the given battles changed after `since` (cross-worker odds fan-out)"""
+        db = get_database()
+        docs = db[COLLECTIONS["battle_pools"]].find(
+            {"battle_id": {"$in": battle_ids}, "updated_at": {"$gt": since}}
+        )
+        return [BattlePoolDB._decode(doc) for doc in docs]
+
+    @staticmethod
+    def add_bet(battle_id: str, bet_on: str, bet_amount: int) -> dict:
+        """Atomically add a bet to the pool and return the updated totals"""
+        db = get_database()
+
+        field = _pool_field(bet_on)
+        doc = db[COLLECTIONS["battle_pools"]].find_one_and_update(
+            {"battle_id": battle_id},
+            {
+                "$inc": {
+                    f"totals.{field}": bet_amount,
+                    f"counts.{field}": 1,
+                    "total_amount": bet_amount,
+                    "total_bets": 1
+                },
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return BattlePoolDB._decode(doc)
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_audit_cursor(doc: dict) -> str:
+    """Keyset token of an audit record: '<timestamp ms>_<_id>'"""
+    millis = (doc["timestamp"] - _EPOCH) // timedelta(milliseconds=1)
+    return f"{millis}_{doc['_id']}"
+
+
+def decode_audit_cursor(token: str) -> tuple:
+    """(timestamp, ObjectId) of a keyset token (ValueError when malformed)"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+
+    millis, _, object_id = token.partition("_")
+    try:
+        return _EPOCH + timedelta(milliseconds=int(millis)), ObjectId(object_id)
+    except (InvalidId, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+
+class RLDB:
+    """Handle RL training data and model snapshots"""
+
+    @staticmethod
+    def get_audit_logs(battle_id: str, after: Optional[str] = None, limit: int = 0):
+        """
+        Audit records of a battle in (timestamp, _id) order, keyset-paginated
+
+        Args:
+            battle_id: Battle identifier
+            after: Token of the last record already read (encode_audit_cursor)
+            limit: Max records (0 = all)
+
+        Returns:
+            pymongo cursor (streams; nothing is materialized here)
+        """
+        db = get_database()
+
+        query: Dict[str, Any] = {"battle_id": battle_id}
+        if after:
+            timestamp, object_id = decode_audit_cursor(after)
+            query["$or"] = [
+                {"timestamp": {"$gt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$gt": object_id}}
+            ]
+
+        return db[COLLECTIONS["rl_audit_logs"]].find(query).sort(
+            [("timestamp", 1), ("_id", 1)]
+        ).limit(limit)
+
+    @staticmethod
+    def get_decision_logs(since: datetime = None) -> list:
+        """Logged odds decisions sorted by battle and time (training replay)"""
+        db = get_database()
+
+        query = {"timestamp": {"$gte": since}} if since else {}
+        # Records of one insert_many can share a millisecond timestamp; their
+        # client-generated ObjectIds keep insertion order
+        cursor = db[COLLECTIONS["rl_audit_logs"]].find(
+            query,
+            {"_id": 0, "battle_id": 1, "timestamp": 1, "decision": 1}
+        ).sort([("battle_id", 1), ("timestamp", 1), ("_id", 1)])
+
+        return list(cursor)
+
+    @staticmethod
+    def get_battle_outcomes() -> Dict[str, Dict[str, Any]]:
+        """Settled bets per battle: winner and won/total counts"""
+        db = get_database()
+
+        pipeline = [
+            {"$match": {"status": {"$in": ["won", "lost"]}}},
+            {"$group": {
+                "_id": "$battle_id",
+                "total": {"$sum": 1},
+                "won": {"$sum": {"$cond": [{"$eq": ["$status", "won"]}, 1, 0]}},
+                "winners": {"$addToSet": {"$cond": [{"$eq": ["$status", "won"]}, "$bet_on", None]}}
+            }}
+        ]
+
+        outcomes = {}
+        for doc in db[COLLECTIONS["bet_records"]].aggregate(pipeline):
+            winners = [w for w in doc["winners"] if w is not None]
+            outcomes[doc["_id"]] = {
+                "winner": winners[0] if len(winners) == 1 else None,
+                "won": doc["won"],
+                "total": doc["total"]
+            }
+        return outcomes
+
+    @staticmethod
+    def get_latest_model_snapshot() -> Optional[dict]:
+        """Most recent RL model snapshot"""
+        db = get_database()
+        return db[COLLECTIONS["rl_model_snapshots"]].find_one(sort=[("created_at", -1)])
+
+    @staticmethod
+    def get_latest_snapshot_ref() -> Optional[dict]:
+        """_id / created_at of the most recent snapshot (cheap change check)"""
+        db = get_database()
+        return db[COLLECTIONS["rl_model_snapshots"]].find_one(
+            {}, {"_id": 1, "created_at": 1}, sort=[("created_at", -1)]
+        )
+
+    @staticmethod
+    def get_model_snapshot(snapshot_id) -> Optional[dict]:
+        """Full snapshot document by _id"""
+        db = get_database()
+        return db[COLLECTIONS["rl_model_snapshots"]].find_one({"_id": snapshot_id})
+
+    @staticmethod
+    def save_model_snapshot(model_data: dict, version: str = "1.0.0") -> str:
+        """Store a model snapshot (BettingRLAgent.export_model format)"""
+        db = get_database()
+
+        snapshot = {
+            "version": version,
+            "created_at": datetime.utcnow(),
+            "decision_count": model_data.get("decision_count", 0),
+            "model_data": model_data
+        }
+        return str(db[COLLECTIONS["rl_model_snapshots"]].insert_one(snapshot).inserted_id)
+
+
 # Initialize indexes
 def init_indexes():
     """Create database indexes for performance"""
@@ -531,7 +1094,17 @@ def init_indexes():
         db[COLLECTIONS["analytics"]].create_index("user_id")
 
         # Embeddings cache indexes
-        db[COLLECTIONS["embeddings_cache"]].create_index([("text", 1), ("model", 1)], unique=True)
+        # (legacy raw-text entries and their unique index are replaced by the hash key)
+        if "text_1_model_1" in db[COLLECTIONS["embeddings_cache"]].index_information():
+            db[COLLECTIONS["embeddings_cache"]].drop_index("text_1_model_1")
+            db[COLLECTIONS["embeddings_cache"]].delete_many({"key": {"$exists": False}})
+        db[COLLECTIONS["embeddings_cache"]].create_index("key", unique=True)
+        db[COLLECTIONS["embeddings_cache"]].create_index("expires_at", expireAfterSeconds=0)
+
+        # Response cache indexes (expires_at drives the TTL index)
+        db[COLLECTIONS["response_cache"]].create_index("key", unique=True)
+        db[COLLECTIONS["response_cache"]].create_index([("catalog_version", 1), ("created_at", -1)])
+        db[COLLECTIONS["response_cache"]].create_index("expires_at", expireAfterSeconds=0)
 
         # Wallet indexes
         db[COLLECTIONS["wallets"]].create_index("user_id", unique=True)
@@ -552,11 +1125,21 @@ def init_indexes():
         db[COLLECTIONS["bet_records"]].create_index("battle_id")
         db[COLLECTIONS["bet_records"]].create_index("status")
         db[COLLECTIONS["bet_records"]].create_index("created_at")
+        db[COLLECTIONS["bet_records"]].create_index([("battle_id", 1), ("status", 1), ("_id", 1)])
+        db[COLLECTIONS["bet_records"]].create_index("settlement.chunk", sparse=True)
+
+        # Settlement credits indexes (_id = chunk key + user id)
+        db[COLLECTIONS["settlement_credits"]].create_index("battle_id")
+
+        # Battle pools indexes
+        db[COLLECTIONS["battle_pools"]].create_index("battle_id", unique=True)
+        db[COLLECTIONS["battle_pools"]].create_index([("battle_id", 1), ("updated_at", 1)])
 
         # RL audit logs indexes
         db[COLLECTIONS["rl_audit_logs"]].create_index("battle_id")
         db[COLLECTIONS["rl_audit_logs"]].create_index("timestamp")
-        db[COLLECTIONS["rl_audit_logs"]].create_index([("battle_id", 1), ("timestamp", 1)])
+        db[COLLECTIONS["rl_audit_logs"]].create_index([("battle_id", 1), ("timestamp", 1), ("_id", 1)])
+        db[COLLECTIONS["rl_audit_logs"]].create_index([("battle_id", 1), ("chain.writer", 1), ("chain.seq", 1)])
 
         # RL model snapshots indexes
         db[COLLECTIONS["rl_model_snapshots"]].create_index("version")
@@ -6,6 +6,7 @@ Alternative LLM provider with thinking capabilities and Google Search
 import os
 import json
 import asyncio
+import threading
 from typing import Dict, Any, Optional, List, AsyncIterator
 from datetime import datetime
 
@@ -52,7 +53,8 @@ class GeminiIntegration:
         search_enabled: bool = False,
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        stream: bool = False
+        stream: bool = False,
+        system_instruction: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Generate content using Gemini models
@@ -65,9 +67,12 @@ class GeminiIntegration:
             temperature: Temperature for generation
             max_tokens: Maximum tokens to generate
             stream: Enable streaming response
+            system_instruction: Static instructions sent apart from the prompt
+                (stable prefix, eligible for Gemini's implicit caching)
 
         Returns:
-            Dict with response and metadata
+            Dict with response and metadata (with stream=True, 'response'
+            is None and 'stream' is an async iterator of text chunks)
         """
         try:
             # Select model
@@ -81,33 +86,24 @@ class GeminiIntegration:
                 )
             ]
 
-            # Configure generation
-            config_params = {
-                "temperature": temperature,
-                "max_output_tokens": max_tokens,
-            }
-
-            # Add thinking config if enabled and supported
-            if thinking_enabled and model in ["pro", "flash-thinking"]:
-                config_params["thinking_config"] = types.ThinkingConfig(
-                    thinking_budget=-1  # Unlimited thinking
-                )
-
-            # Add tools if needed
-            tools = []
-            if search_enabled:
-                tools.append(types.Tool(googleSearch=types.GoogleSearch()))
-
-            generate_config = types.GenerateContentConfig(
-                **config_params,
-                tools=tools if tools else None
+            generate_config = self._build_config(
+                model, thinking_enabled, search_enabled, temperature, max_tokens, system_instruction
             )
 
             # Generate response
             if stream:
-                return await self._stream_response(
-                    model_name, contents, generate_config
-                )
+                # Same dict shape; text arrives through the async iterator
+                return {
+                    "response": None,
+                    "stream": self._stream_response(model_name, contents, generate_config),
+                    "model": model_name,
+                    "thinking": None,
+                    "metadata": {
+                        "thinking_enabled": thinking_enabled,
+                        "search_enabled": search_enabled,
+                        "model_type": model
+                    }
+                }
             else:
                 response = await asyncio.to_thread(
                     self.client.models.generate_content,
@@ -136,6 +132,63 @@ class GeminiIntegration:
             print(f"❌ Gemini generation error: {e}")
             raise
 
+    def _build_config(
+        self,
+        model: str,
+        thinking_enabled: bool,
+        search_enabled: bool,
+        temperature: float,
+        max_tokens: int,
+        system_instruction: Optional[str] = None
+    ) -> types.GenerateContentConfig:
+        """Generation config (thinking budget and Google Search tool when requested)"""
+        config_params = {
+            "temperature": temperature,
+            "max_output_tokens": max_tokens,
+        }
+
+        if system_instruction:
+            config_params["system_instruction"] = system_instruction
+
+        # Add thinking config if enabled and supported
+        if thinking_enabled and model in ["pro", "flash-thinking"]:
+            config_params["thinking_config"] = types.ThinkingConfig(
+                thinking_budget=-1  # Unlimited thinking
+            )
+
+        # Add tools if needed
+        tools = []
+        if search_enabled:
+            tools.append(types.Tool(googleSearch=types.GoogleSearch()))
+
+        return types.GenerateContentConfig(
+            **config_params,
+            tools=tools if tools else None
+        )
+
+    def stream_content(
+        self,
+        prompt: str,
+        model: str = "flash",
+        thinking_enabled: bool = False,
+        search_enabled: bool = False,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text chunks
+
+        Closing the iterator (or cancelling the task consuming it) closes
+        the upstream stream.
+
+        Returns:
+            Async iterator of text chunks
+        """
+        contents = [types.Content(role="user", parts=[types.Part.from_text(text=prompt)])]
+        config = self._build_config(model, thinking_enabled, search_enabled, temperature, max_tokens, system_instruction)
+        return self._stream_response(self.models.get(model, self.models["flash"]), contents, config)
+
     async def _stream_response(
         self,
         model_name: str,
@@ -143,35 +196,103 @@ class GeminiIntegration:
         config: types.GenerateContentConfig
     ) -> AsyncIterator[str]:
         """
-        Stream response from Gemini
+        Stream response from Gemini without blocking the event loop
+
+        Uses the SDK's async client when available, otherwise pumps the
+        synchronous stream from a worker thread.
 
         Yields:
             Chunks of generated text
         """
+        aio = getattr(self.client, "aio", None)
+        if aio is None:
+            async for text in self._threaded_stream(model_name, contents, config):
+                yield text
+            return
+
+        stream = await aio.models.generate_content_stream(
+            model=model_name,
+            contents=contents,
+            config=config
+        )
         try:
-            # Run in thread pool for async compatibility
-            def generate():
-                return self.client.models.generate_content_stream(
-                    model=model_name,
-                    contents=contents,
-                    config=config
-                )
-
-            stream = await asyncio.to_thread(generate)
-
-            for chunk in stream:
+            async for chunk in stream:
                 if chunk and chunk.text:
                     yield chunk.text
-
         except Exception as e:
             print(f"❌ Gemini streaming error: {e}")
-            yield f"Error: {str(e)}"
+            raise
+        finally:
+            # Runs on normal end, errors, aclose() and task cancellation
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def _threaded_stream(
+        self,
+        model_name: str,
+        contents: List[types.Content],
+        config: types.GenerateContentConfig
+    ) -> AsyncIterator[str]:
+        """
+        Bridge the synchronous SDK stream to an async iterator
+
+        A worker thread iterates the blocking stream and hands chunks to the
+        loop through a bounded queue; the loop only awaits the queue. When
+        the consumer stops, the worker is told to stop at the next chunk.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # Blocks the worker (not the loop) when the consumer is slow
+            try:
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+            except RuntimeError:
+                stop.set()  # loop closed
+
+        def pump():
+            try:
+                for chunk in self.client.models.generate_content_stream(
+                    model=model_name,
+                    contents=contents,
+                    config=config
+                ):
+                    if stop.is_set():
+                        return
+                    if chunk and chunk.text:
+                        put(chunk.text)
+            except BaseException as e:
+                if not stop.is_set():
+                    put(e)
+            finally:
+                if not stop.is_set():
+                    put(done)
+
+        loop.run_in_executor(None, pump)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    print(f"❌ Gemini streaming error: {item}")
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # Unblock a worker waiting on a full queue
+            while not queue.empty():
+                queue.get_nowait()
 
     async def generate_with_thinking(
         self,
         prompt: str,
         context: Optional[str] = None,
-        search: bool = False
+        search: bool = False,
+        system_instruction: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Generate response with deep thinking mode
@@ -180,6 +301,7 @@ class GeminiIntegration:
             prompt: User query
             context: Additional context
             search: Enable Google Search
+            system_instruction: Static instructions (sent apart from the prompt)
 
         Returns:
             Response with thinking process
@@ -196,7 +318,8 @@ class GeminiIntegration:
             thinking_enabled=True,
             search_enabled=search,
             temperature=0.5,  # Lower for reasoning
-            max_tokens=2000
+            max_tokens=2000,
+            system_instruction=system_instruction
         )
 
     async def analyze_production(
@@ -268,14 +391,15 @@ class GeminiIntegration:
                 )
             )
 
-        # Generate response
-        result = await self.generate_content(
-            prompt="",  # Prompt is in contents
-            model=model,
-            thinking_enabled=thinking
+        # Generate response from the full history (blocking SDK call off the event loop)
+        response = await asyncio.to_thread(
+            self.client.models.generate_content,
+            model=self.models.get(model, self.models["flash"]),
+            contents=contents,
+            config=self._build_config(model, thinking, False, 0.7, 1000)
         )
 
-        return result["response"]
+        return response.text if response else ""
 
     def get_model_info(self) -> Dict[str, Any]:
         """
@@ -323,6 +447,9 @@ class GeminiStreamHandler:
     """
     Handler for streaming responses from Gemini
     Compatible with FastAPI StreamingResponse
+
+    Holds no per-request state: every stream_sse call opens its own
+    upstream stream, so concurrent requests only share the SDK client.
     """
 
     def __init__(self, gemini: GeminiIntegration):
@@ -333,31 +460,35 @@ class GeminiStreamHandler:
         prompt: str,
         model: str = "flash",
         thinking: bool = False,
-        search: bool = False
+        search: bool = False,
+        request=None
     ):
         """
         Stream Server-Sent Events format
 
+        Args:
+            prompt: User prompt
+            model: Model to use (flash, pro, flash-thinking)
+            thinking: Enable thinking mode
+            search: Enable Google Search
+            request: Optional FastAPI Request; generation stops as soon as
+                the client disconnects
+
         Yields:
             SSE formatted chunks
         """
+        stream = self.gemini.stream_content(
+            prompt,
+            model=model,
+            thinking_enabled=thinking,
+            search_enabled=search
+        )
         try:
-            # Start streaming
-            async for chunk in self.gemini._stream_response(
-                model_name=self.gemini.models[model],
-                contents=[
-                    types.Content(
-                        role="user",
-                        parts=[types.Part.from_text(text=prompt)]
-                    )
-                ],
-                config=types.GenerateContentConfig(
-                    temperature=0.7,
-                    max_output_tokens=1000,
-                    thinking_config=types.ThinkingConfig(thinking_budget=-1) if thinking else None,
-                    tools=[types.Tool(googleSearch=types.GoogleSearch())] if search else None
-                )
-            ):
+            async for chunk in stream:
+                if request is not None and await request.is_disconnected():
+                    print("🔌 Client disconnected - stopping Gemini stream")
+                    return
+
                 # Format as SSE
                 data = {
                     "choices": [{
@@ -374,6 +505,13 @@ class GeminiStreamHandler:
             error_data = {"error": str(e)}
             yield f"data: {json.dumps(error_data)}\n\n"
 
+        finally:
+            # Closes the upstream Gemini stream on disconnect/cancellation
+            await stream.aclose()
+
+
+# Singleton instance
+
 
 # Singleton instance
 _gemini_instance: Optional[GeminiIntegration] = None
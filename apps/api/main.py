@@ -4,6 +4,7 @@ Powered by Agno + FastAPI + NVIDIA NIM
 """
 
 import asyncio
+import itertools
 import json
 import os
 import tempfile
@@ -13,7 +14,7 @@ from typing import List, Dict, Any, Optional
 
 import httpx
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from pydantic import BaseModel, Field
@@ -25,7 +26,7 @@ load_dotenv()
 try:
     from database import (
         get_mongo_client, close_mongo_connection, init_indexes,
-        ConversationDB, AnalyticsDB, EmbeddingsCacheDB,
+        ConversationDB, AnalyticsDB,
         WalletDB, DailyBonusDB, BettingDB
     )
 
@@ -46,9 +47,56 @@ except ImportError as e:
     print(f"⚠️  R2 not available: {e}")
     R2_ENABLED = False
 
+# Shared query-embedding cache (process LRU + MongoDB) and NIM micro-batcher
+try:
+    from agents.tools.embedding_cache import get_embedding_cache
+    from agents.tools.embedding_batcher import get_embedding_batcher, EmbeddingRequestError
+
+    EMBEDDING_TOOLS_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️  Embedding tools not available: {e}")
+    EMBEDDING_TOOLS_AVAILABLE = False
+
+# Server-side conversation sessions
+try:
+    from agents.conversation_memory import ConversationAccessError, get_conversation_memory
+
+    CONVERSATION_MEMORY_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️  Conversation memory not available: {e}")
+    CONVERSATION_MEMORY_AVAILABLE = False
+
+# Process-wide betting RL model (hot-swapped snapshots)
+try:
+    from agents.betting_service import get_betting_service
+
+    BETTING_SERVICE_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️  Betting model service not available: {e}")
+    BETTING_SERVICE_AVAILABLE = False
+
+# Pool-based odds (in-memory totals, RL-adjusted)
+try:
+    from agents.odds_engine import get_odds_engine
+
+    ODDS_ENGINE_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️  Odds engine not available: {e}")
+    ODDS_ENGINE_AVAILABLE = False
+
+# Gemini direct streaming (SSE)
+try:
+    from gemini_integration import GeminiStreamHandler, get_gemini_client
+
+    GEMINI_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️  Gemini not available: {e}")
+    GEMINI_AVAILABLE = False
+
 # AGI Multi-Agent System
 try:
     from agents.agent_manager import AgentManager
+    from agents.llm_router import get_llm_router
 
     AGI_AVAILABLE = True
 except ImportError as e:
@@ -78,7 +126,6 @@ RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", 60))
 
 # Global AGI manager (initialized on startup)
 agent_manager = None
-embeddings_data = []
 
 
 # Pydantic models
@@ -94,6 +141,17 @@ class ChatCompletionRequest(BaseModel):
     max_tokens: int = Field(500, ge=1, le=4096)
     top_p: float = Field(0.9, ge=0.0, le=1.0)
     stream: bool = Field(True, description="Enable streaming")
+    conversation_id: Optional[str] = Field(
+        None, description="Server-side session id - send only new messages, history is kept by the server"
+    )
+    user_id: str = Field("anonymous", description="Owner of the server-side session")
+
+
+class GeminiStreamRequest(BaseModel):
+    prompt: str = Field(..., description="User prompt")
+    model: str = Field("flash", description="Gemini model: flash, pro or flash-thinking")
+    thinking: bool = Field(False, description="Enable thinking mode")
+    search: bool = Field(False, description="Enable Google Search grounding")
 
 
 class EmbeddingRequest(BaseModel):
@@ -113,6 +171,8 @@ class AGIChatRequest(BaseModel):
     query: str = Field(..., description="User query text")
     intent: Optional[str] = Field(None, description="Detected intent (CHAT, SEARCH, RECOMMEND, INFO)")
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context")
+    conversation_id: Optional[str] = Field(None, description="Server-side session id (history kept by the server)")
+    user_id: str = Field("anonymous", description="Owner of the server-side session")
 
 
 class AGIChatResponse(BaseModel):
@@ -123,6 +183,9 @@ class AGIChatResponse(BaseModel):
 
 class AGIRecommendRequest(BaseModel):
     production_title: str = Field(..., description="Production title for recommendations")
+    top_k: int = Field(3, ge=1, le=20, description="Number of similar productions")
+    narrative: bool = Field(True, description="Generate an LLM narrative (false = instant list only)")
+    stream: bool = Field(False, description="Stream productions first, then the narrative (SSE)")
 
 
 class TTSRequest(BaseModel):
@@ -169,11 +232,32 @@ def check_rate_limit(client_ip: str) -> bool:
     return True
 
 
+# Embeddings file locations, tried in order
+EMBEDDINGS_PATHS = [
+    "embeddings.json",  # VPS path (same directory)
+    "../assets/data/embeddings.json",  # Local development path
+    "/opt/bitaca-cinema/embeddings.json"  # Absolute VPS path
+]
+
+
+def load_embeddings_file() -> list:
+    """Read the catalog embeddings from the first existing path ([] when none)"""
+    for embeddings_path in EMBEDDINGS_PATHS:
+        if os.path.exists(embeddings_path):
+            with open(embeddings_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            print(f"✅ Loaded {len(data)} embeddings from {embeddings_path}")
+            return data
+
+    print(f"⚠️  Embeddings file not found in any of: {EMBEDDINGS_PATHS}")
+    return []
+
+
 # Startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
-    global agent_manager, embeddings_data
+    global agent_manager
 
     print("🚀 Starting Bitaca Cinema API...")
     print(f"📡 NVIDIA Model: {NVIDIA_MODEL}")
@@ -192,39 +276,47 @@ async def lifespan(app: FastAPI):
     # Initialize AGI Multi-Agent System
     if AGI_AVAILABLE:
         try:
-            # Load embeddings data - try multiple paths
-            embeddings_paths = [
-                "embeddings.json",  # VPS path (same directory)
-                "../assets/data/embeddings.json",  # Local development path
-                "/opt/bitaca-cinema/embeddings.json"  # Absolute VPS path
-            ]
-
-            embeddings_data = []
-            for embeddings_path in embeddings_paths:
-                if os.path.exists(embeddings_path):
-                    with open(embeddings_path, 'r', encoding='utf-8') as f:
-                        embeddings_data = json.load(f)
-                    print(f"✅ Loaded {len(embeddings_data)} embeddings from {embeddings_path}")
-                    break
-
-            if not embeddings_data:
-                print(f"⚠️  Embeddings file not found in any of: {embeddings_paths}")
-
-            # Initialize AgentManager
+            # Initialize AgentManager (the parsed JSON is not kept: vectors
+            # live quantized in the RAG index once it is built)
             agent_manager = AgentManager(
                 nvidia_api_key=NVIDIA_API_KEY,
-                embeddings_data=embeddings_data
+                embeddings_data=load_embeddings_file()
             )
             print("✅ AGI Multi-Agent System initialized")
             print(f"   🤖 Agents: CinemaAgent, CulturalAgent, DiscoveryAgent")
+
+            # Optional embedding-centroid routing for queries without keyword hits
+            if os.getenv("INTENT_CENTROIDS_ENABLED", "false").lower() == "true":
+                await agent_manager.build_intent_centroids()
         except Exception as e:
             print(f"⚠️  AGI initialization failed: {e}")
             agent_manager = None
 
+    if CONVERSATION_MEMORY_AVAILABLE:
+        get_conversation_memory().start()
+    if agent_manager is not None:
+        agent_manager.rl_feedback.start()
+    if BETTING_SERVICE_AVAILABLE:
+        await get_betting_service().start()
+    if ODDS_ENGINE_AVAILABLE:
+        get_odds_engine().start()
+
     yield
 
     # Cleanup
     print("🛑 Shutting down Bitaca Cinema API...")
+    if CONVERSATION_MEMORY_AVAILABLE:
+        await get_conversation_memory().stop()
+    if agent_manager is not None:
+        await agent_manager.rl_feedback.stop()
+    if ODDS_ENGINE_AVAILABLE:
+        await get_odds_engine().stop()
+    if BETTING_SERVICE_AVAILABLE:
+        await get_betting_service().stop()
+    if AGI_AVAILABLE:
+        await get_llm_router().close()
+    if EMBEDDING_TOOLS_AVAILABLE:
+        await get_embedding_batcher(NVIDIA_API_KEY).close()
     if MONGODB_AVAILABLE:
         try:
             close_mongo_connection()
@@ -288,6 +380,20 @@ async def chat_completions(request: ChatCompletionRequest, req: Request):
     # Prepare request for NVIDIA API
     messages_dict = [msg.dict() for msg in request.messages]
 
+    # Server-side session: client sends only new turns, the server adds
+    # the summary of older turns plus the token-bounded recent window
+    session = None
+    if request.conversation_id and CONVERSATION_MEMORY_AVAILABLE:
+        memory = get_conversation_memory()
+        session = await _get_conversation(request.conversation_id, request.user_id)
+        system_messages = [m for m in messages_dict if m["role"] == "system"]
+        new_messages = [m for m in messages_dict if m["role"] != "system"]
+        if session.summary:
+            system_messages.append({"role": "system", "content": f"Resumo da conversa até aqui:\n{session.summary}"})
+        history = [{"role": m["role"], "content": m["content"]} for m in session.window]
+        messages_dict = system_messages + history + new_messages
+        await memory.add_turns(session, new_messages)
+
     # Use model from request or fallback to environment default
     selected_model = request.model if request.model else NVIDIA_MODEL
 
@@ -309,6 +415,8 @@ async def chat_completions(request: ChatCompletionRequest, req: Request):
 
     if request.stream:
         # Streaming response with SSE
+        reply_parts: List[str] = []
+
         async def event_generator():
             async with httpx.AsyncClient(timeout=120.0) as client:
                 try:
@@ -328,6 +436,8 @@ async def chat_completions(request: ChatCompletionRequest, req: Request):
                                 if line.startswith("data: "):
                                     # Forward SSE data
                                     yield f"{line}\n\n"
+                                    if session is not None:
+                                        reply_parts.append(_delta_content(line))
                                 elif line == "data: [DONE]":
                                     yield "data: [DONE]\n\n"
                                     break
@@ -336,6 +446,9 @@ async def chat_completions(request: ChatCompletionRequest, req: Request):
                     print(f"❌ Streaming error: {e}")
                     yield f"data: {json.dumps({'error': str(e)})}\n\n"
 
+            if session is not None and any(reply_parts):
+                await get_conversation_memory().add_turn(session, "assistant", "".join(reply_parts))
+
         return StreamingResponse(
             event_generator(),
             media_type="text/event-stream",
@@ -343,6 +456,7 @@ async def chat_completions(request: ChatCompletionRequest, req: Request):
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
                 "X-Accel-Buffering": "no",  # Disable Nginx buffering
+                **({"X-Conversation-Id": session.conversation_id} if session else {}),
             },
         )
 
@@ -362,16 +476,78 @@ async def chat_completions(request: ChatCompletionRequest, req: Request):
                         detail=response.text
                     )
 
-                return JSONResponse(content=response.json())
+                data = response.json()
+                if session is not None:
+                    reply = (data.get("choices") or [{}])[0].get("message", {}).get("content")
+                    if reply:
+                        await get_conversation_memory().add_turn(session, "assistant", reply)
+                    data["conversation_id"] = session.conversation_id
+
+                return JSONResponse(content=data)
 
             except httpx.RequestError as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/gemini/stream")
+async def gemini_stream(request: GeminiStreamRequest, req: Request):
+    """
+    Stream a Gemini answer as SSE (OpenAI-style delta chunks)
+
+    The upstream stream is closed as soon as the client disconnects.
+    """
+    if not check_rate_limit(req.client.host):
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Try again in 1 minute."
+        )
+
+    if not GEMINI_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Gemini not available")
+    try:
+        gemini = get_gemini_client()
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    handler = GeminiStreamHandler(gemini)
+    return StreamingResponse(
+        handler.stream_sse(
+            request.prompt,
+            model=request.model,
+            thinking=request.thinking,
+            search=request.search,
+            request=req
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+async def _get_conversation(conversation_id: str, user_id: str):
+    """Server-side session of the requesting user (403 for someone else's)"""
+    try:
+        return await get_conversation_memory().get_session(conversation_id, user_id=user_id)
+    except ConversationAccessError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+
+def _delta_content(line: str) -> str:
+    """Text delta of one OpenAI-style SSE chunk ('' for control lines)"""
+    try:
+        chunk = json.loads(line[len("data: "):])
+        return (chunk.get("choices") or [{}])[0].get("delta", {}).get("content") or ""
+    except (ValueError, AttributeError):
+        return ""
+
+
 @app.post("/api/embeddings")
 async def generate_embeddings(request: EmbeddingRequest, req: Request):
     """
-    Generate embeddings using NVIDIA API with MongoDB caching
+    Generate embeddings using NVIDIA API with caching and micro-batching
     """
     # Rate limiting
     client_ip = req.client.host
@@ -381,19 +557,38 @@ async def generate_embeddings(request: EmbeddingRequest, req: Request):
             detail="Rate limit exceeded. Try again in 1 minute."
         )
 
-    # Check cache first (only for query type)
-    if MONGODB_AVAILABLE and request.input_type == "query":
+    # Check cache first (only for query type): process LRU, then MongoDB
+    embedding_cache = get_embedding_cache() if EMBEDDING_TOOLS_AVAILABLE else None
+    if embedding_cache and request.input_type == "query":
+        cached = embedding_cache.get(request.input, request.model, request.input_type)
+        if cached is not None:
+            print(f"✅ Cache hit for query: {request.input[:50]}...")
+            return JSONResponse(content={
+                "data": [{"embedding": cached.tolist()}],
+                "model": request.model,
+                "usage": {"total_tokens": 0}
+            })
+
+    if EMBEDDING_TOOLS_AVAILABLE:
+        # Coalesced with concurrent requests into one batched NIM call
         try:
-            cached = EmbeddingsCacheDB.get_cached_embedding(request.input, request.model)
-            if cached:
-                print(f"✅ Cache hit for query: {request.input[:50]}...")
-                return JSONResponse(content={
-                    "data": [{"embedding": cached}],
-                    "model": request.model,
-                    "usage": {"total_tokens": 0}
-                })
-        except Exception as e:
-            print(f"⚠️  Cache lookup failed: {e}")
+            embedding, usage = await get_embedding_batcher(NVIDIA_API_KEY).embed_with_usage(
+                request.input, request.model, request.input_type
+            )
+        except EmbeddingRequestError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+        # Cache the embedding (only for query type)
+        if embedding_cache and request.input_type == "query":
+            embedding_cache.put(request.input, request.model, embedding, request.input_type)
+            print(f"✅ Cached query: {request.input[:50]}...")
+
+        return JSONResponse(content={
+            "object": "list",
+            "data": [{"object": "embedding", "embedding": embedding, "index": 0}],
+            "model": request.model,
+            "usage": usage
+        })
 
     payload = {
         "model": request.model,
@@ -421,18 +616,7 @@ async def generate_embeddings(request: EmbeddingRequest, req: Request):
                     detail=response.text
                 )
 
-            result = response.json()
-
-            # Cache the embedding (only for query type)
-            if MONGODB_AVAILABLE and request.input_type == "query" and "data" in result:
-                try:
-                    embedding = result["data"][0]["embedding"]
-                    EmbeddingsCacheDB.cache_embedding(request.input, request.model, embedding)
-                    print(f"✅ Cached query: {request.input[:50]}...")
-                except Exception as e:
-                    print(f"⚠️  Cache write failed: {e}")
-
-            return JSONResponse(content=result)
+            return JSONResponse(content=response.json())
 
         except httpx.RequestError as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -542,16 +726,33 @@ async def agi_chat(request: AGIChatRequest, req: Request):
             detail="Rate limit exceeded. Try again in 1 minute."
         )
 
+    session = None
+    if request.conversation_id and CONVERSATION_MEMORY_AVAILABLE:
+        session = await _get_conversation(request.conversation_id, request.user_id)
+
     try:
         print(f"📨 AGI Chat Request - Query: '{request.query[:50]}...'")
         print(f"📍 Intent: {request.intent}")
 
+        context = request.context
+        if session is not None:
+            if session.window or session.summary:
+                # Server-side window replaces any client-sent history
+                context = {**(request.context or {}), **session.to_context()}
+
         result = await agent_manager.process_query(
             query=request.query,
             intent=request.intent,
-            context=request.context
+            context=context
         )
 
+        if session is not None:
+            await get_conversation_memory().add_turns(session, [
+                {"role": "user", "content": request.query, "intent": request.intent},
+                {"role": "assistant", "content": result.get("response", ""), "agent": result.get("agent")}
+            ])
+            result["conversation_id"] = session.conversation_id
+
         print(f"✅ AGI Response - Agent: {result.get('agent')}, Length: {len(result.get('response', ''))}")
         return JSONResponse(content=result)
 
@@ -591,8 +792,37 @@ async def agi_recommend(request: AGIRecommendRequest, req: Request):
             detail="Rate limit exceeded. Try again in 1 minute."
         )
 
+    if not request.narrative or request.stream:
+        found = agent_manager.find_similar(request.production_title, top_k=request.top_k)
+        if found is None:
+            raise HTTPException(status_code=404, detail=f"Production '{request.production_title}' not found")
+
+        if not request.narrative:
+            return JSONResponse(content={**found, "response": None, "agent": "DiscoveryAgent"})
+
+        # Productions go out immediately, the narrative streams afterwards
+        async def event_generator():
+            yield f"data: {json.dumps({'type': 'productions', **found})}\n\n"
+            try:
+                async for chunk in agent_manager.stream_recommendation(found["production"], found["similar"]):
+                    yield f"data: {json.dumps({'type': 'narrative', 'content': chunk})}\n\n"
+            except Exception as e:
+                print(f"❌ Recommendation streaming error: {e}")
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(
+            event_generator(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
+            },
+        )
+
     try:
-        result = await agent_manager.recommend_similar(request.production_title)
+        result = await agent_manager.recommend_similar(request.production_title, top_k=request.top_k)
         return JSONResponse(content=result)
 
     except Exception as e:
@@ -600,6 +830,28 @@ async def agi_recommend(request: AGIRecommendRequest, req: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/agi/similar")
+async def agi_similar(title: Optional[str] = None, id: Optional[str] = None, top_k: int = 5):
+    """
+    Similar Productions (precomputed)
+    Instant top-k lookup by title or id - no embedding or LLM call
+    """
+    if not AGI_AVAILABLE or agent_manager is None:
+        raise HTTPException(
+            status_code=503,
+            detail="AGI system not available"
+        )
+
+    if not title and not id:
+        raise HTTPException(status_code=400, detail="Provide 'title' or 'id'")
+
+    found = agent_manager.find_similar(title, production_id=id, top_k=max(1, min(top_k, 20)))
+    if found is None:
+        raise HTTPException(status_code=404, detail="Production not found")
+
+    return JSONResponse(content=found)
+
+
 @app.get("/api/agi/info")
 async def agi_system_info():
     """
@@ -648,6 +900,60 @@ async def agi_health():
         })
 
 
+@app.get("/api/agi/cache/stats")
+async def agi_cache_stats():
+    """
+    AGI Response Cache Statistics
+    Hit rate and size of the agent answer cache
+    """
+    if not AGI_AVAILABLE or agent_manager is None:
+        return JSONResponse(content={
+            "enabled": False,
+            "message": "AGI system not available"
+        })
+
+    return JSONResponse(content=agent_manager.get_cache_stats())
+
+
+@app.post("/api/agi/catalog/reload")
+async def agi_catalog_reload():
+    """
+    Reload the production catalog (admin endpoint - should be protected)
+    Re-reads embeddings.json after regeneration: RAG indexes, similarity
+    table and the response cache's catalog version are updated in place
+    """
+    if not AGI_AVAILABLE or agent_manager is None:
+        raise HTTPException(status_code=503, detail="AGI system not available")
+
+    try:
+        data = await asyncio.to_thread(load_embeddings_file)
+        if not data:
+            raise HTTPException(status_code=404, detail="Embeddings file not found")
+        result = await asyncio.to_thread(agent_manager.reload_catalog, data)
+        print(f"🔄 Catalog reloaded: {result['productions']} productions ({result['catalog_version']})")
+        return JSONResponse(content={"success": True, **result})
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Catalog reload error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/agi/router/stats")
+async def agi_router_stats():
+    """
+    LLM Router Statistics
+    Per-backend latency, time-to-first-token, error rate and hedging
+    """
+    if not AGI_AVAILABLE:
+        return JSONResponse(content={
+            "enabled": False,
+            "message": "AGI system not available"
+        })
+
+    return JSONResponse(content=get_llm_router().get_stats())
+
+
 # RL Feedback System Endpoints
 
 
@@ -755,8 +1061,8 @@ async def get_rl_scores(limit: int = 100):
                 "message": "RL feedback system is disabled"
             })
 
-        # Get scores from RL agent
-        scores = agent_manager.rl_feedback.rl_agent.scores_history[-limit:]
+        # Get scores from RL agent (ScoreRing, chronological)
+        scores = agent_manager.rl_feedback.rl_agent.scores_history.values()[-limit:].tolist() if limit > 0 else []
 
         return JSONResponse(content={
             "enabled": True,
@@ -977,8 +1283,8 @@ async def place_bet(request: PlaceBetRequest, req: Request):
         )
 
     try:
-        # Calculate odds (simple 2.0x for now, could be dynamic based on betting pool)
-        odds = 2.0
+        # Odds from the live pool totals (flat 2.0x without the odds engine)
+        odds = get_odds_engine().quote(request.battle_id, request.bet_on) if ODDS_ENGINE_AVAILABLE else 2.0
 
         result = BettingDB.place_bet(
             user_id=request.user_id,
@@ -988,6 +1294,11 @@ async def place_bet(request: PlaceBetRequest, req: Request):
             odds=odds
         )
 
+        # Update the pool and push the new odds to subscribers
+        if ODDS_ENGINE_AVAILABLE:
+            pool = get_odds_engine().record_bet(request.battle_id, request.bet_on, request.bet_amount)
+            result["pool_odds"] = pool["odds"]
+
         return JSONResponse(content=result)
 
     except ValueError as e:
@@ -997,6 +1308,59 @@ async def place_bet(request: PlaceBetRequest, req: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/coins/odds/{battle_id}")
+async def get_battle_odds(battle_id: str):
+    """
+    Current odds and pool totals of a battle
+    """
+    if not ODDS_ENGINE_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="Odds engine not available"
+        )
+
+    return JSONResponse(content=get_odds_engine().get_pool(battle_id).to_dict())
+
+
+@app.get("/api/coins/odds/{battle_id}/stream")
+async def stream_battle_odds(battle_id: str, req: Request):
+    """
+    Live odds updates of a battle (Server-Sent Events)
+    Sends the current pool first, then one event per placed bet
+    """
+    if not ODDS_ENGINE_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="Odds engine not available"
+        )
+
+    engine = get_odds_engine()
+    queue = engine.subscribe(battle_id)
+
+    async def event_generator():
+        try:
+            yield f"data: {json.dumps(engine.get_pool(battle_id).to_dict())}\n\n"
+            while not await req.is_disconnected():
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=15.0)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(update)}\n\n"
+        finally:
+            engine.unsubscribe(battle_id, queue)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @app.get("/api/coins/bets")
 async def get_user_bets(user_id: str, limit: int = 50):
     """
@@ -1093,13 +1457,90 @@ async def resolve_bet_endpoint(bet_id: str, won: bool, req: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _serialize_settlement(job: dict) -> dict:
+    """Settlement job with ISO dates"""
+    job = dict(job)
+    job["battle_id"] = job.pop("_id")
+    for key, value in job.items():
+        if isinstance(value, datetime):
+            job[key] = value.isoformat()
+    return job
+
+
+def _run_settlement(battle_id: str, winner: str):
+    """Background settlement (errors are kept in the job document)"""
+    try:
+        job = BettingDB.settle_battle(battle_id, winner)
+        print(f"✅ Battle {battle_id} settled: {job.get('processed', 0)} bets, {job.get('payout_total', 0)} coins paid")
+    except Exception as e:
+        print(f"❌ Settlement error for battle {battle_id}: {e}")
+
+
+@app.post("/api/coins/settle-battle/{battle_id}")
+async def settle_battle_endpoint(battle_id: str, winner: str, background_tasks: BackgroundTasks, req: Request):
+    """
+    Settle all pending bets of a finished battle (admin endpoint - should be protected)
+    Runs in the background; poll GET /api/coins/settle-battle/{battle_id} for progress.
+    Calling it again resumes an interrupted settlement.
+    """
+    if not MONGODB_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="Database not available"
+        )
+
+    try:
+        job = BettingDB.get_settlement(battle_id)
+        if job and job["winner"] != winner:
+            raise HTTPException(status_code=409, detail=f"Battle already settled with winner {job['winner']}")
+        if job and job["status"] == "completed":
+            return JSONResponse(content=_serialize_settlement(job))
+
+        background_tasks.add_task(_run_settlement, battle_id, winner)
+
+        return JSONResponse(status_code=202, content={
+            "battle_id": battle_id,
+            "winner": winner,
+            "status": job["status"] if job else "scheduled"
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Settle battle error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/coins/settle-battle/{battle_id}")
+async def get_settlement_status(battle_id: str):
+    """
+    Progress of a battle settlement
+    """
+    if not MONGODB_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="Database not available"
+        )
+
+    job = BettingDB.get_settlement(battle_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No settlement for this battle")
+
+    return JSONResponse(content=_serialize_settlement(job))
+
+
 # RL Auditing Endpoints
 
 @app.get("/api/rl/audit/{battle_id}")
-async def get_rl_audit_trail(battle_id: str, limit: int = 100):
+async def get_rl_audit_trail(battle_id: str, limit: int = 100, after: Optional[str] = None,
+                             format: str = "json"):
     """
     Get RL decision audit trail for a battle
     Provides full transparency of AI decisions
+
+    Keyset-paginated on (timestamp, _id): pass the returned `next_cursor`
+    as `after` for the next page. format=ndjson streams one record per line
+    (limit=0 streams the whole trail); every record carries its `cursor`.
     """
     if not MONGODB_AVAILABLE:
         raise HTTPException(
@@ -1107,26 +1548,52 @@ async def get_rl_audit_trail(battle_id: str, limit: int = 100):
             detail="Database not available"
         )
 
+    from database import RLDB, encode_audit_cursor
+
+    def serialize(log: dict) -> dict:
+        log["cursor"] = encode_audit_cursor(log)
+        log["_id"] = str(log["_id"])
+        log["timestamp"] = log["timestamp"].isoformat()
+        return log
+
+    # Only NDJSON streams unbounded trails
+    if limit <= 0 and format != "ndjson":
+        limit = 100
+
     try:
-        from database import get_database
+        cursor = RLDB.get_audit_logs(battle_id, after=after, limit=max(limit, 0))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        db = get_database()
+    if format == "ndjson":
+        async def ndjson_generator():
+            try:
+                while True:
+                    # Fetch in chunks off the event loop; memory stays bounded by the chunk
+                    chunk = await asyncio.to_thread(lambda: list(itertools.islice(cursor, 500)))
+                    if not chunk:
+                        break
+                    yield "".join(json.dumps(serialize(log), default=str) + "\n" for log in chunk)
+            except Exception as e:
+                print(f"❌ RL audit streaming error: {e}")
+                yield json.dumps({"error": str(e)}) + "\n"
+            finally:
+                cursor.close()
 
-        # Get audit logs for battle
-        audit_logs = db["rl_audit_logs"].find(
-            {"battle_id": battle_id}
-        ).sort("timestamp", 1).limit(limit)
+        return StreamingResponse(
+            ndjson_generator(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
-        logs = []
-        for log in audit_logs:
-            log["_id"] = str(log["_id"])
-            log["timestamp"] = log["timestamp"].isoformat()
-            logs.append(log)
+    try:
+        logs = [serialize(log) for log in cursor]
 
         return JSONResponse(content={
             "battle_id": battle_id,
             "audit_trail": logs,
             "count": len(logs),
+            "next_cursor": logs[-1]["cursor"] if logs and len(logs) == limit else None,
             "auditable": True
         })
 
@@ -1141,26 +1608,15 @@ async def get_fairness_report():
     Get comprehensive fairness report
     Shows RL agent performance metrics
     """
-    try:
-        # Load RL agent (in production, this would be a singleton)
-        from agents.betting_rl_agent import BettingRLAgent
-
-        agent = BettingRLAgent()
-
-        # Try to load latest model
-        if MONGODB_AVAILABLE:
-            from database import get_database
-            db = get_database()
-
-            latest_snapshot = db["rl_model_snapshots"].find_one(
-                sort=[("created_at", -1)]
-            )
-
-            if latest_snapshot:
-                agent.import_model(latest_snapshot["model_data"])
+    if not BETTING_SERVICE_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="Betting model service not available"
+        )
 
-        # Generate report
-        report = agent.get_fairness_report()
+    try:
+        # Live model (latest snapshot, swapped in by the background poller)
+        report = get_betting_service().get_fairness_report()
 
         return JSONResponse(content=report)
 
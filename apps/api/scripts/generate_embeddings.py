@@ -1,19 +1,46 @@
 #!/usr/bin/env python3
 """
 Script para gerar embeddings dos filmes do Bitaca Cinema
-Usa a API da NVIDIA NIM através do backend proxy
+Usa a API da NVIDIA NIM (em lote, direto) ou o backend proxy (sem chave)
+
+Pipeline:
+- Requisições em lote (input: [...]) com concorrência limitada
+- Backoff adaptativo em 429 (rate limit), 5xx e erros de conexão
+- Regeneração incremental por hash de conteúdo (só sinopses alteradas)
+- Checkpoint para retomar execuções interrompidas
+- Saída em JSON + matriz binária compacta (.npz float16/int8 quantizada)
 """
 
+import argparse
+import asyncio
+import hashlib
 import json
-import httpx
+import os
+import random
+import sys
 import time
 from pathlib import Path
 
+import httpx
+import numpy as np
+
+# Mesma quantização do índice vetorial da API
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from agents.tools.vector_index import SUPPORTED_DTYPES, quantize_int8  # noqa: E402
+
 # Configuração
 API_URL = "https://api.abitaca.com.br/api/embeddings"
+NVIDIA_API_URL = os.getenv("NVIDIA_API_URL", "https://integrate.api.nvidia.com/v1")
+NVIDIA_API_KEY = os.getenv("NVIDIA_API_KEY")
 EMBEDDING_MODEL = "nvidia/nv-embedqa-e5-v5"
+EMBEDDING_DIMENSIONS = 1024
 OUTPUT_FILE = Path(__file__).parent.parent / "assets" / "data" / "embeddings.json"
 
+# Lotes e concorrência
+BATCH_SIZE = 16
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 6
+
 # Dados dos 23 filmes
 FILMES_DATA = [
     {
@@ -236,91 +263,329 @@ Sinopse: {filme['sinopse']}
 Status: {filme['status']}""".strip()
 
 
-def generate_embedding(text):
-    """Gera embedding usando a API"""
-    try:
-        response = httpx.post(
+def content_hash(text):
+    """Hash do conteúdo embedado (modelo + texto) para regeneração incremental"""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}:{text}".encode("utf-8")).hexdigest()
+
+
+def checkpoint_path(output_file):
+    return output_file.with_suffix(".checkpoint.jsonl")
+
+
+def matrix_path(output_file):
+    return output_file.with_suffix(".npz")
+
+
+def load_known_embeddings(output_file):
+    """
+    Carrega embeddings já gerados (saída anterior + checkpoint)
+
+    Returns:
+        Dict content_hash -> embedding
+    """
+    known = {}
+
+    if output_file.exists():
+        try:
+            with open(output_file, "r", encoding="utf-8") as f:
+                for item in json.load(f):
+                    if item.get("content_hash") and item.get("embedding"):
+                        known[item["content_hash"]] = item["embedding"]
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️  Saída anterior ignorada: {e}")
+
+    checkpoint = checkpoint_path(output_file)
+    if checkpoint.exists():
+        with open(checkpoint, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Última linha truncada por interrupção
+                known[entry["content_hash"]] = entry["embedding"]
+
+    return known
+
+
+class AdaptiveBackoff:
+    """
+    Controle de ritmo compartilhado entre as tarefas
+
+    Cada falha (429, 5xx, conexão) dobra o intervalo mínimo entre
+    requisições (respeitando Retry-After); cada sucesso o reduz gradualmente.
+    """
+
+    def __init__(self, base_delay=0.5, max_delay=30.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = 0.0
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait_for = max(0.0, self._next_slot - now)
+            self._next_slot = max(now, self._next_slot) + self.delay
+        if wait_for:
+            await asyncio.sleep(wait_for)
+
+    def on_rate_limited(self, retry_after=None):
+        self.delay = min(self.max_delay, max(self.base_delay, self.delay * 2))
+        if retry_after:
+            self.delay = min(self.max_delay, max(self.delay, retry_after))
+
+    def on_success(self):
+        self.delay = self.delay * 0.5 if self.delay > 0.05 else 0.0
+
+
+async def request_embeddings(client, texts, backoff):
+    """
+    Gera embeddings para um lote de textos
+
+    Usa a NIM diretamente (input em lote) quando NVIDIA_API_KEY está
+    definida; caso contrário usa o backend proxy, um texto por requisição.
+    """
+    if NVIDIA_API_KEY:
+        return await _post_with_retry(
+            client,
+            f"{NVIDIA_API_URL}/embeddings",
+            {
+                "model": EMBEDDING_MODEL,
+                "input": texts,
+                "input_type": "passage",
+                "encoding_format": "float"
+            },
+            backoff,
+            headers={"Authorization": f"Bearer {NVIDIA_API_KEY}"}
+        )
+
+    embeddings = []
+    for text in texts:
+        embeddings.extend(await _post_with_retry(
+            client,
             API_URL,
-            json={
+            {
                 "model": EMBEDDING_MODEL,
                 "input": text,
                 "input_type": "passage",
                 "encoding_format": "float"
             },
-            timeout=30.0
-        )
+            backoff
+        ))
+    return embeddings
+
+
+async def _post_with_retry(client, url, payload, backoff, headers=None):
+    """
+    POST com retentativas em 429, 5xx e erros de conexão/timeout
+
+    Raises:
+        RuntimeError: Quando todas as tentativas falham (com o último erro)
+    """
+    last_error = None
+    for attempt in range(MAX_RETRIES):
+        await backoff.wait()
+        try:
+            response = await client.post(url, json=payload, headers=headers)
+        except httpx.RequestError as e:
+            last_error = f"{type(e).__name__}: {e}"
+            backoff.on_rate_limited()
+            await asyncio.sleep(backoff.delay * random.uniform(0.5, 1.0))
+            continue
+
+        if response.status_code == 429 or response.status_code >= 500:
+            last_error = "rate limit (429)" if response.status_code == 429 else f"HTTP {response.status_code}"
+            retry_after = response.headers.get("Retry-After")
+            backoff.on_rate_limited(float(retry_after) if retry_after and retry_after.isdigit() else None)
+            # Jitter evita que as tarefas retomem todas ao mesmo tempo
+            await asyncio.sleep(backoff.delay * random.uniform(0.5, 1.0))
+            continue
+
         response.raise_for_status()
-        data = response.json()
-        return data["data"][0]["embedding"]
-    except Exception as e:
-        print(f"❌ Erro ao gerar embedding: {e}")
-        raise
+        backoff.on_success()
+        data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in data]
+
+    raise RuntimeError(f"Falha após {MAX_RETRIES} tentativas (último erro: {last_error})")
+
+
+async def embed_pending(pending, output_file, batch_size, concurrency):
+    """
+    Embeda os itens pendentes em lotes concorrentes
+
+    Cada lote concluído é anexado ao checkpoint, então uma execução
+    interrompida retoma de onde parou.
+
+    Returns:
+        Dict content_hash -> embedding dos itens gerados
+    """
+    generated = {}
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    semaphore = asyncio.Semaphore(concurrency)
+    backoff = AdaptiveBackoff()
+    checkpoint = checkpoint_path(output_file)
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        with open(checkpoint, "a", encoding="utf-8") as checkpoint_file:
+
+            async def run_batch(index, batch):
+                async with semaphore:
+                    try:
+                        embeddings = await request_embeddings(client, [item["text"] for item in batch], backoff)
+                    except Exception as e:
+                        print(f"❌ Lote {index + 1}/{len(batches)} falhou: {e}")
+                        return
+
+                for item, embedding in zip(batch, embeddings):
+                    if len(embedding) != EMBEDDING_DIMENSIONS:
+                        print(f"⚠️  AVISO: \"{item['filme']['titulo']}\" tem {len(embedding)} dimensões (esperado {EMBEDDING_DIMENSIONS})")
+                    generated[item["content_hash"]] = embedding
+                    checkpoint_file.write(json.dumps({"content_hash": item["content_hash"], "embedding": embedding}) + "\n")
+                checkpoint_file.flush()
+
+                print(f"[{index + 1}/{len(batches)}] ✅ {len(batch)} filmes: {', '.join(item['filme']['titulo'] for item in batch)}")
+
+            await asyncio.gather(*(run_batch(i, batch) for i, batch in enumerate(batches)))
+
+    return generated
+
+
+def quantize_matrix(matrix, dtype):
+    """
+    Matriz no formato de armazenamento do índice vetorial
+
+    float32 mantém os vetores exatos; float16 e int8 guardam os vetores
+    normalizados (L2), como o VectorIndex, e int8 leva uma escala por linha.
+
+    Returns:
+        (matriz, escalas ou None)
+    """
+    if dtype == "float32":
+        return matrix, None
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    normalized = matrix / np.where(norms > 0, norms, 1.0)
+    if dtype == "int8":
+        return quantize_int8(normalized)
+    return normalized.astype(np.float16), None
+
+
+def write_outputs(embeddings, output_file, dtype="float16"):
+    """
+    Grava JSON e matriz binária (.npz) atomicamente (temp + rename)
+
+    O JSON (catálogo lido pela API) mantém os vetores float32; o .npz guarda
+    a matriz quantizada em `dtype` (com `scales` por linha para int8).
+    """
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_json = output_file.with_suffix(".json.tmp")
+    with open(tmp_json, "w", encoding="utf-8") as f:
+        json.dump(embeddings, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_json, output_file)
+
+    npz_file = matrix_path(output_file)
+    tmp_npz = npz_file.with_suffix(".tmp.npz")
+    matrix = np.array([e["embedding"] for e in embeddings], dtype=np.float32)
+    if not embeddings:
+        matrix = np.zeros((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+    matrix, scales = quantize_matrix(matrix, dtype)
+    arrays = {
+        "ids": np.array([e["id"] for e in embeddings], dtype=np.int32),
+        "content_hashes": np.array([e["content_hash"] for e in embeddings]),
+        "matrix": matrix,
+        "dtype": np.array(dtype)
+    }
+    if scales is not None:
+        arrays["scales"] = scales
+    np.savez(tmp_npz, **arrays)
+    os.replace(tmp_npz, npz_file)
+
+    return npz_file
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gera embeddings dos filmes do Bitaca Cinema")
+    parser.add_argument("--output", type=Path, default=OUTPUT_FILE, help="Arquivo JSON de saída")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Textos por requisição")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Requisições simultâneas")
+    parser.add_argument("--force", action="store_true", help="Regenera tudo, ignorando hashes e checkpoint")
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default=os.getenv("RAG_VECTOR_DTYPE", "float16"),
+                        help="Formato da matriz no .npz (float32, float16 ou int8)")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    output_file = args.output
+
     print("🎬 Bitaca Cinema - Gerador de Embeddings")
     print("=" * 60)
     print(f"Total de filmes: {len(FILMES_DATA)}")
-    print(f"API: {API_URL}")
+    print(f"API: {NVIDIA_API_URL + '/embeddings (lote)' if NVIDIA_API_KEY else API_URL + ' (proxy)'}")
     print(f"Modelo: {EMBEDDING_MODEL}")
-    print(f"Output: {OUTPUT_FILE}")
+    print(f"Lote: {args.batch_size} | Concorrência: {args.concurrency}")
+    print(f"Output: {output_file}")
     print("=" * 60)
     print()
 
+    if args.force:
+        checkpoint_path(output_file).unlink(missing_ok=True)
+    known = {} if args.force else load_known_embeddings(output_file)
+
+    items = []
+    for filme in FILMES_DATA:
+        text = prepare_text_for_embedding(filme)
+        items.append({"filme": filme, "text": text, "content_hash": content_hash(text)})
+
+    pending = [item for item in items if item["content_hash"] not in known]
+    print(f"♻️  Reaproveitados: {len(items) - len(pending)} | 🆕 A gerar: {len(pending)}")
+    print()
+
+    started = time.perf_counter()
+    if pending:
+        known.update(asyncio.run(embed_pending(pending, output_file, args.batch_size, args.concurrency)))
+
     embeddings = []
+    for item in items:
+        filme = item["filme"]
+        embedding = known.get(item["content_hash"])
+        if embedding is None:
+            continue
 
-    for i, filme in enumerate(FILMES_DATA, 1):
-        try:
-            # Prepara texto
-            text = prepare_text_for_embedding(filme)
-
-            print(f"[{i}/{len(FILMES_DATA)}] Gerando: \"{filme['titulo']}\"...", end=" ")
-
-            # Gera embedding
-            embedding = generate_embedding(text)
-
-            # Valida dimensões (deve ser 1024)
-            if len(embedding) != 1024:
-                print(f"⚠️  AVISO: Embedding tem {len(embedding)} dimensões (esperado 1024)")
-
-            # Adiciona ao resultado
-            embeddings.append({
-                "id": filme["id"],
-                "titulo": filme["titulo"],
-                "embedding": embedding,
-                "metadata": {
-                    "diretor": filme["diretor"],
-                    "tema": filme["tema"],
-                    "eixo": filme["eixo"],
-                    "sinopse": filme["sinopse"],
-                    "status": filme["status"]
-                }
-            })
-
-            print("✅")
-
-            # Rate limiting (evitar throttle)
-            if i < len(FILMES_DATA):
-                time.sleep(0.5)
-
-        except Exception as e:
-            print(f"❌ ERRO: {e}")
-            print(f"Continuando com os próximos filmes...")
+        embeddings.append({
+            "id": filme["id"],
+            "titulo": filme["titulo"],
+            "content_hash": item["content_hash"],
+            "embedding": embedding,
+            "metadata": {
+                "diretor": filme["diretor"],
+                "tema": filme["tema"],
+                "eixo": filme["eixo"],
+                "sinopse": filme["sinopse"],
+                "status": filme["status"]
+            }
+        })
 
     print()
     print("=" * 60)
-    print(f"✅ Embeddings gerados: {len(embeddings)}/{len(FILMES_DATA)}")
+    print(f"✅ Embeddings gerados: {len(embeddings)}/{len(FILMES_DATA)} em {time.perf_counter() - started:.1f}s")
 
-    # Salva arquivo
-    OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(embeddings, f, indent=2, ensure_ascii=False)
+    if len(embeddings) < len(items):
+        # Checkpoint mantido: a próxima execução tenta só os que faltam
+        print(f"⚠️  {len(items) - len(embeddings)} filmes falharam - rode novamente para retomar")
+
+    npz_file = write_outputs(embeddings, output_file, dtype=args.dtype)
+    if len(embeddings) == len(items):
+        checkpoint_path(output_file).unlink(missing_ok=True)
 
     # Calcula tamanho
-    file_size_mb = OUTPUT_FILE.stat().st_size / (1024 * 1024)
+    file_size_mb = output_file.stat().st_size / (1024 * 1024)
+    npz_size_mb = npz_file.stat().st_size / (1024 * 1024)
 
-    print(f"📁 Arquivo salvo: {OUTPUT_FILE}")
-    print(f"📊 Tamanho: {file_size_mb:.2f} MB")
+    print(f"📁 Arquivo salvo: {output_file}")
+    print(f"📊 Tamanho: {file_size_mb:.2f} MB (JSON) | {npz_size_mb:.2f} MB (matriz {args.dtype} {npz_file.name})")
     print()
 
     # Estatísticas
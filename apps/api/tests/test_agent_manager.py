@@ -0,0 +1,231 @@
+"""
+AgentManager Tests
+Routing tests for the multi-agent orchestrator (no network calls)
+"""
+
+import asyncio
+import time
+
+from agents import llm_router
+from agents.agent_manager import AgentManager
+from agents.cinema_agent import CinemaAgent
+from agents.llm_router import LLMRouter
+from agents.rl_feedback import RLFeedbackIntegration
+
+
+PRODUCTIONS = [{
+    "titulo": "Ponteia Viola",
+    "diretor": "Margarida Chaves de Oliveira Scuoteguazza",
+    "tema": "musica",
+    "eixo": "Lei Paulo Gustavo",
+    "sinopse": "Documentário sobre a tradição da viola caipira em Capão Bonito.",
+    "similarity": 0.91
+}]
+
+
+def build_manager() -> AgentManager:
+    """Create a manager with RL disabled so routing is keyword based"""
+    manager = AgentManager(nvidia_api_key="test-key", embeddings_data=[])
+    manager.rl_feedback = RLFeedbackIntegration(enabled=False)
+    return manager
+
+
+class TestCinemaRouting:
+    """Cinema queries must cost a single LLM call"""
+
+    def test_cinema_query_uses_retrieval_only(self, monkeypatch):
+        """Discovery is used for retrieval, never for generation"""
+        manager = build_manager()
+        calls = {"retrieve": 0, "discovery_llm": 0}
+        seen_context = {}
+
+        async def fake_retrieve(query, top_k=3, filters=None):
+            calls["retrieve"] += 1
+            return PRODUCTIONS
+
+        async def fake_discovery_query(query, search_enabled=True, filters=None):
+            calls["discovery_llm"] += 1
+            return {"response": "unused", "productions": []}
+
+        async def fake_cinema_query(query, context=None):
+            seen_context.update(context or {})
+            return "Ponteia Viola foi dirigido por Margarida."
+
+        monkeypatch.setattr(manager.discovery_agent, "retrieve_productions", fake_retrieve)
+        monkeypatch.setattr(manager.discovery_agent, "process_query", fake_discovery_query)
+        monkeypatch.setattr(manager.cinema_agent, "process_query", fake_cinema_query)
+
+        result = asyncio.run(manager.process_query("Quem dirigiu o filme Ponteia Viola?", intent="INFO"))
+
+        assert result["agent"] == "CinemaAgent"
+        assert calls == {"retrieve": 1, "discovery_llm": 0}
+        assert seen_context["productions"] == PRODUCTIONS
+
+
+class TestFanOut:
+    """Low-confidence queries race the top two agents"""
+
+    def build_fanout_manager(self, monkeypatch, discovery_delay, cinema_delay, cinema_response):
+        manager = build_manager()
+        manager.fanout_enabled = True
+        manager.response_cache.enabled = False
+        monkeypatch.setattr(llm_router.get_llm_router(), "enabled", True)
+        state = {"cancelled": []}
+
+        async def fake_discovery_query(query, search_enabled=True, filters=None):
+            try:
+                await asyncio.sleep(discovery_delay)
+            except asyncio.CancelledError:
+                state["cancelled"].append("discovery")
+                raise
+            return {"response": "Resposta da descoberta com produções do catálogo.", "productions": PRODUCTIONS, "generated": True}
+
+        async def fake_retrieve(query, top_k=3, filters=None):
+            return PRODUCTIONS
+
+        async def fake_cinema_query(query, context=None):
+            try:
+                await asyncio.sleep(cinema_delay)
+            except asyncio.CancelledError:
+                state["cancelled"].append("cinema")
+                raise
+            return cinema_response
+
+        monkeypatch.setattr(manager.discovery_agent, "process_query", fake_discovery_query)
+        monkeypatch.setattr(manager.discovery_agent, "retrieve_productions", fake_retrieve)
+        monkeypatch.setattr(manager.cinema_agent, "process_query", fake_cinema_query)
+        return manager, state
+
+    def test_fastest_good_answer_wins(self, monkeypatch):
+        """The slower agent is cancelled once a good answer arrives"""
+        manager, state = self.build_fanout_manager(
+            monkeypatch, discovery_delay=5, cinema_delay=0.01,
+            cinema_response="Ponteia Viola é um documentário sobre a viola caipira."
+        )
+
+        result = asyncio.run(manager.process_query("oi, tudo bem?"))
+
+        assert result["agent"] == "CinemaAgent"
+        assert result["metadata"]["fanout"]["candidates"] == ["discovery", "cinema"]
+        assert result["metadata"]["fanout"]["cancelled"] == ["discovery"]
+        assert state["cancelled"] == ["discovery"]
+
+    def test_losing_router_call_is_cancelled(self, monkeypatch):
+        """Through the router the loser's model stream is closed, not left running"""
+        class Backend:
+            def __init__(self, name, delay, text):
+                self.name, self.provider = name, "nim"
+                self.delay, self.text = delay, text
+                self.cancelled = False
+
+            async def stream(self, messages, **params):
+                try:
+                    await asyncio.sleep(self.delay)
+                except asyncio.CancelledError:
+                    self.cancelled = True
+                    raise
+                yield self.text
+
+            async def close(self):
+                pass
+
+        slow = Backend("nim:slow", 5, "Resposta lenta da descoberta.")
+        fast = Backend("nim:fast", 0, "Ponteia Viola é um documentário sobre a viola caipira.")
+        router = LLMRouter(backends=[slow, fast], routes={"discovery": ["nim:slow"], "cinema": ["nim:fast"]})
+        monkeypatch.setattr(llm_router, "_llm_router", router)
+
+        manager = build_manager()
+        manager.fanout_enabled = True
+        manager.response_cache.enabled = False
+
+        async def fake_retrieve(query, top_k=3, filters=None):
+            return PRODUCTIONS
+        monkeypatch.setattr(manager.discovery_agent, "retrieve_productions", fake_retrieve)
+
+        started = time.perf_counter()
+        result = asyncio.run(manager.process_query("oi, tudo bem?"))
+
+        assert result["agent"] == "CinemaAgent"
+        assert result["metadata"]["fanout"]["cancelled"] == ["discovery"]
+        assert slow.cancelled
+        assert time.perf_counter() - started < 2
+
+    def test_disabled_router_does_not_fan_out(self, monkeypatch):
+        """A threaded agent.run cannot be cancelled, so only the primary agent runs"""
+        from types import SimpleNamespace
+
+        manager = build_manager()
+        manager.fanout_enabled = True
+        manager.response_cache.enabled = False
+        monkeypatch.setattr(llm_router.get_llm_router(), "enabled", False)
+        calls = []
+
+        async def fake_retrieve(query, top_k=3, filters=None):
+            return PRODUCTIONS
+
+        def run(name):
+            def agent_run(prompt):
+                calls.append(name)
+                return SimpleNamespace(content=f"Resposta do agente {name} sobre o catálogo.")
+            return agent_run
+
+        monkeypatch.setattr(manager.discovery_agent, "retrieve_productions", fake_retrieve)
+        monkeypatch.setattr(manager.discovery_agent.agent, "run", run("discovery"))
+        monkeypatch.setattr(manager.cinema_agent.agent, "run", run("cinema"))
+
+        result = asyncio.run(manager.process_query("oi, tudo bem?"))
+
+        assert result["agent"] == "DiscoveryAgent"
+        assert "fanout" not in result["metadata"]
+        assert calls == ["discovery"]
+        assert manager.fanout_stats["router_disabled"] == 1
+
+    def test_fallback_answer_is_not_accepted(self, monkeypatch):
+        """A canned fallback does not win over a slower generated answer"""
+        manager, state = self.build_fanout_manager(
+            monkeypatch, discovery_delay=0.05, cinema_delay=0,
+            cinema_response=CinemaAgent.FALLBACK_RESPONSE
+        )
+
+        result = asyncio.run(manager.process_query("oi, tudo bem?"))
+
+        assert result["agent"] == "DiscoveryAgent"
+        assert result["metadata"]["fanout"]["winner"] == "discovery"
+        assert state["cancelled"] == []
+
+    def test_cost_cap_keeps_single_agent(self, monkeypatch):
+        """Candidates beyond the token cap are not started"""
+        manager, _ = self.build_fanout_manager(
+            monkeypatch, discovery_delay=0, cinema_delay=0,
+            cinema_response="unused"
+        )
+        manager.fanout_max_tokens = 10
+
+        result = asyncio.run(manager.process_query("oi, tudo bem?"))
+
+        assert result["agent"] == "DiscoveryAgent"
+        assert "fanout" not in result["metadata"]
+        assert manager.fanout_stats["budget_skipped"] >= 1
+
+    def test_cost_includes_completion_tokens(self, monkeypatch):
+        """The cap counts each agent's max_tokens, not only its prompt"""
+        manager, _ = self.build_fanout_manager(
+            monkeypatch, discovery_delay=0, cinema_delay=0,
+            cinema_response="unused"
+        )
+        prompt_only = manager.discovery_agent.system_prompt.tokens + manager.discovery_agent.context_tokens
+
+        assert manager._estimate_cost("discovery", "") == prompt_only + manager.discovery_agent.agent.model.max_tokens
+        assert manager._estimate_cost("cinema", "") >= manager.cinema_agent.system_prompt.tokens + 1024
+
+    def test_confident_routing_uses_one_agent(self, monkeypatch):
+        """High-confidence queries never fan out"""
+        manager, _ = self.build_fanout_manager(
+            monkeypatch, discovery_delay=0, cinema_delay=0,
+            cinema_response="unused"
+        )
+
+        result = asyncio.run(manager.process_query("recomende um filme", intent="RECOMMEND"))
+
+        assert result["agent"] == "DiscoveryAgent"
+        assert manager.fanout_stats["runs"] == 0
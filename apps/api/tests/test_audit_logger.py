@@ -0,0 +1,214 @@
+"""
+Audit Logger Tests
+Tests for batched audit writes, snapshot deduplication and hash chains
+"""
+
+import copy
+
+import pytest
+
+from agents.betting_rl_agent import AuditLogger, BettingRLAgent, content_hash
+
+
+class FakeResult:
+    def __init__(self, upserted_id=None):
+        self.upserted_id = upserted_id
+
+
+def field(doc, path):
+    for part in path.split("."):
+        doc = doc.get(part, {}) if isinstance(doc, dict) else {}
+    return doc
+
+
+def matches(doc, query):
+    for key, value in query.items():
+        if isinstance(value, dict) and "$exists" in value:
+            if (key in doc) != value["$exists"]:
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        return FakeCursor(sorted(self, key=lambda doc: tuple(field(doc, k) for k, _ in keys)))
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection (documents are copied like a round trip)"""
+
+    def __init__(self):
+        self.docs = []
+        self.insert_calls = 0
+        self.fail_next = False
+        self.projections = []
+
+    def insert_many(self, docs, ordered=True):
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError("write failed")
+        self.insert_calls += 1
+        for doc in docs:
+            self.docs.append({"_id": len(self.docs), **copy.deepcopy(doc)})
+
+    def update_one(self, query, update, upsert=False):
+        if self.find_one(query):
+            return FakeResult()
+        self.docs.append({**query, **copy.deepcopy(update["$setOnInsert"])})
+        return FakeResult(upserted_id=query["_id"])
+
+    def find_one(self, query):
+        return next((copy.deepcopy(d) for d in self.docs if matches(d, query)), None)
+
+    def find(self, query, projection=None):
+        self.projections.append(projection)
+        return FakeCursor(copy.deepcopy(d) for d in self.docs if matches(d, query))
+
+
+def decisions(n, battle_id="b1"):
+    agent = BettingRLAgent(epsilon=0.0)
+    state_id, _ = agent._get_state({"total_bets": 3})
+    return [agent.select_action(state_id, 2.0, battle_id=battle_id)[2] for _ in range(n)]
+
+
+def make_logger(**kwargs):
+    logs, snapshots = FakeCollection(), FakeCollection()
+    return AuditLogger(logs, snapshots, **kwargs), logs, snapshots
+
+
+class TestBatching:
+    """Buffered insert_many writes"""
+
+    def test_flushes_in_batches(self):
+        logger, logs, _ = make_logger(batch_size=100, max_delay=3600)
+        for decision in decisions(250):
+            logger.log_decision("b1", decision)
+
+        assert logs.insert_calls == 2
+        assert len(logs.docs) == 200
+        logger.flush()
+        assert len(logs.docs) == 250
+        assert logger.get_stats()["buffered"] == 0
+
+    def test_failed_flush_keeps_records(self):
+        logger, logs, _ = make_logger(batch_size=10, max_delay=3600)
+        logs.fail_next = True
+        with pytest.raises(RuntimeError):
+            logger.log_decisions(decisions(10))
+
+        assert logger.get_stats()["buffered"] == 10
+        logger.flush()
+        assert len(logs.docs) == 10
+
+
+class TestSnapshots:
+    """Content-addressed model snapshots"""
+
+    def test_snapshot_stored_once(self):
+        logger, logs, snapshots = make_logger(batch_size=1)
+        model = BettingRLAgent().export_model()
+        for decision in decisions(3):
+            logger.log_decision("b1", decision, model_snapshot=model)
+
+        assert len(snapshots.docs) == 1
+        assert {doc["snapshot_id"] for doc in logs.docs} == {content_hash(model)}
+        assert all("model_snapshot" not in doc for doc in logs.docs)
+        assert logger.get_snapshot(content_hash(model)) == model
+
+    def test_deduplicated_across_loggers(self):
+        """A second writer finds the existing snapshot"""
+        logger, _, snapshots = make_logger()
+        other = AuditLogger(FakeCollection(), snapshots)
+        model = {"q_table": {"1": {"maintain_odds": 0.5}}}
+
+        assert logger.store_snapshot(model) == other.store_snapshot(model)
+        assert len(snapshots.docs) == 1
+        assert other.metrics["snapshots_deduplicated"] == 1
+
+    def test_tampered_snapshot_is_rejected(self):
+        logger, _, snapshots = make_logger()
+        snapshot_id = logger.store_snapshot({"q_table": {}})
+        snapshots.docs[0]["model_snapshot"]["q_table"] = {"1": {"maintain_odds": 9.0}}
+        assert logger.get_snapshot(snapshot_id) is None
+
+
+class TestHashChain:
+    """Tamper-evident audit trail"""
+
+    def chained_trail(self):
+        logger, logs, _ = make_logger(batch_size=100, hash_chain=True)
+        logger.log_decisions(decisions(5) + decisions(2, battle_id="b2"))
+        logger.flush()
+        return logger, logs
+
+    def test_intact_chain_verifies(self):
+        logger, _ = self.chained_trail()
+        report = logger.verify_fairness("b1")
+        assert report["verified"] is True
+        assert report["chained_decisions"] == 5
+
+    def test_modified_record_is_detected(self):
+        logger, logs = self.chained_trail()
+        logs.docs[2]["decision"]["new_odds"] = 9.99
+        report = logger.verify_fairness("b1")
+        assert report["verified"] is False
+        assert any("modified" in anomaly for anomaly in report["anomalies"])
+
+    def test_deleted_record_is_detected(self):
+        logger, logs = self.chained_trail()
+        del logs.docs[1]
+        report = logger.verify_fairness("b1")
+        assert report["verified"] is False
+        assert any("breaks the chain" in anomaly for anomaly in report["anomalies"])
+        assert logger.verify_fairness("b2")["verified"] is True
+
+
+class TestStreamingVerification:
+    """verify_fairness streams projected records"""
+
+    def test_projects_checked_fields_only(self):
+        logger, logs, _ = make_logger(batch_size=1)
+        logger.log_decisions(decisions(3))
+        report = logger.verify_fairness("b1")
+
+        assert report["verified"] is True
+        assert report["chained_decisions"] == 0
+        # Single projected pass when nothing is chained
+        assert logs.projections == [{"_id": 0, "auditable": 1, "decision.q_value": 1, "chain.seq": 1}]
+
+    def test_anomaly_messages_are_capped(self):
+        logger, logs, _ = make_logger(batch_size=1000)
+        batch = decisions(50)
+        for decision in batch:
+            decision["q_value"] = 500.0
+        logger.log_decisions(batch)
+        logger.flush()
+
+        report = logger.verify_fairness("b1", max_anomalies=10)
+        assert report["verified"] is False
+        assert report["anomaly_count"] == 50
+        assert len(report["anomalies"]) == 10
+        assert report["anomalies"][0] == "Decision 0 has abnormal Q-value: 500.0"
+
+
+class TestAuditCursor:
+    """Keyset tokens of the audit endpoint"""
+
+    def test_round_trip(self):
+        from datetime import datetime
+
+        from bson import ObjectId
+
+        from database import decode_audit_cursor, encode_audit_cursor
+
+        doc = {"timestamp": datetime(2026, 3, 4, 5, 6, 7, 123000), "_id": ObjectId()}
+        assert decode_audit_cursor(encode_audit_cursor(doc)) == (doc["timestamp"], doc["_id"])
+
+    def test_malformed_token(self):
+        from database import decode_audit_cursor
+
+        with pytest.raises(ValueError):
+            decode_audit_cursor("abc_def")
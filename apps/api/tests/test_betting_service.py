@@ -0,0 +1,221 @@
+"""
+Betting Model Service Tests
+Tests for the process-wide BettingRLAgent and snapshot hot-swapping
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from agents import betting_service
+from agents.betting_rl_agent import BettingRLAgent
+from agents.betting_service import BettingModelService
+
+
+class FakeRLDB:
+    """In-memory rl_model_snapshots"""
+
+    def __init__(self):
+        self.snapshots = []
+        self.full_fetches = 0
+
+    def add(self, model_data):
+        self.snapshots.append({
+            "_id": f"snap{len(self.snapshots)}",
+            "created_at": datetime(2026, 1, 1, len(self.snapshots)),
+            "model_data": model_data
+        })
+
+    def get_latest_snapshot_ref(self):
+        if not self.snapshots:
+            return None
+        latest = self.snapshots[-1]
+        return {"_id": latest["_id"], "created_at": latest["created_at"]}
+
+    def get_model_snapshot(self, snapshot_id):
+        self.full_fetches += 1
+        return next(s for s in self.snapshots if s["_id"] == snapshot_id)
+
+
+def trained_model(q_value):
+    agent = BettingRLAgent()
+    state_id, _ = agent._get_state({"total_bets": 3})
+    agent.q_table[state_id]["increase_odds_5"] = q_value
+    return agent.export_model()
+
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeRLDB()
+    monkeypatch.setattr(betting_service, "RLDB", fake)
+    return fake
+
+
+class TestBettingModelService:
+    """Snapshot loading and swapping"""
+
+    def test_loads_snapshot_once(self, store):
+        """Unchanged snapshots are not fetched or imported again"""
+        store.add(trained_model(0.5))
+        service = BettingModelService(poll_interval=0, audit_sink=lambda decision: None)
+
+        assert asyncio.run(service.refresh()) is True
+        assert asyncio.run(service.refresh()) is False
+        assert store.full_fetches == 1
+        assert service.snapshot_id == "snap0"
+        assert service.metrics == {"checks": 2, "swaps": 1, "errors": 0}
+
+    def test_swaps_new_snapshot_and_keeps_history(self, store):
+        """A newer snapshot replaces the agent; the audit trail carries over"""
+        store.add(trained_model(0.5))
+        service = BettingModelService(poll_interval=0, audit_sink=lambda decision: None)
+        asyncio.run(service.refresh())
+
+        old_agent = service.agent
+        state_id, _ = old_agent._get_state({"total_bets": 3})
+        old_agent.select_action(state_id, 2.0, battle_id="b1")
+
+        store.add(trained_model(2.0))
+        assert asyncio.run(service.refresh()) is True
+
+        assert service.agent is not old_agent
+        assert service.agent.q_table[state_id]["increase_odds_5"] == pytest.approx(2.0)
+        assert old_agent.q_table[state_id]["increase_odds_5"] == pytest.approx(0.5)
+        assert service.agent.decision_history.total == 1
+        assert service.snapshot_id == "snap1"
+
+    def test_refresh_errors_keep_current_model(self, store, monkeypatch):
+        """A failing check leaves the live agent in place"""
+        service = BettingModelService(poll_interval=0, audit_sink=lambda decision: None)
+        agent = service.agent
+
+        def broken():
+            raise RuntimeError("connection lost")
+        monkeypatch.setattr(store, "get_latest_snapshot_ref", broken)
+
+        assert asyncio.run(service.refresh()) is False
+        assert service.agent is agent
+        assert service.metrics["errors"] == 1
+
+    def test_fairness_report_includes_model(self, store):
+        """Report comes from the live agent plus the loaded snapshot info"""
+        store.add(trained_model(0.5))
+        service = BettingModelService(poll_interval=0, audit_sink=lambda decision: None)
+        asyncio.run(service.refresh())
+        state_id, _ = service.agent._get_state({"total_bets": 3})
+        service.agent.select_action(state_id, 2.0)
+
+        report = service.get_fairness_report()
+        assert report["total_decisions"] == 1
+        assert report["model"]["snapshot_id"] == "snap0"
+
+
+class TestRunningQAggregates:
+    """Fairness Q statistics are maintained on write"""
+
+    def test_matches_full_scan(self):
+        """Running mean / std equal numpy over the whole table"""
+        import numpy as np
+
+        agent = BettingRLAgent(epsilon=0.5)
+        rng = np.random.default_rng(1)
+        for _ in range(300):
+            state_id, _ = agent._get_state({"total_bets": int(rng.integers(0, 80)), "bet_split": float(rng.random())})
+            action, _, _ = agent.select_action(state_id, 2.0, mode="explore")
+            next_id, _ = agent._get_state({"total_bets": int(rng.integers(0, 80))})
+            agent.update_q_value(state_id, action, float(rng.normal()), next_id)
+
+        values = [q for state in agent.q_table.values() for q in state.values()]
+        report = agent.get_fairness_report()
+        assert report["avg_q_value"] == pytest.approx(round(np.mean(values), 3))
+        assert report["q_value_std"] == pytest.approx(round(np.std(values), 3))
+
+    def test_recomputed_on_import(self):
+        """import_model rebuilds the aggregates"""
+        agent = BettingRLAgent()
+        agent.import_model(trained_model(1.5))
+        agent.select_action(agent._get_state({"total_bets": 3})[0], 2.0)
+
+        assert agent.get_fairness_report()["avg_q_value"] == pytest.approx(1.5)
+
+
+class TestAuditWriteThrough:
+    """Decisions reach rl_audit_logs when they are made, not when evicted"""
+
+    def test_decisions_are_logged_and_flushed_on_stop(self, store, monkeypatch):
+        """Nothing waits for ring eviction; stop() writes the buffered records"""
+        written = []
+
+        class FakeAuditCollection:
+            def insert_many(self, docs, ordered=True):
+                written.extend(docs)
+
+        monkeypatch.setattr(betting_service, "MONGODB_ENABLED", True)
+        monkeypatch.setattr(betting_service, "COLLECTIONS", {"rl_audit_logs": "rl_audit_logs"})
+        monkeypatch.setattr(betting_service, "get_database", lambda: {"rl_audit_logs": FakeAuditCollection()})
+        monkeypatch.setenv("RL_AUDIT_BATCH_SIZE", "1000")
+        service = BettingModelService(poll_interval=0, history_capacity=1000)
+
+        state_id, _ = service.agent._get_state({"total_bets": 3})
+        for i in range(5):
+            service.agent.select_action(state_id, 2.0, battle_id="b1", context={"contestant": "A"})
+
+        assert len(service.audit_logger._buffer) == 5
+        asyncio.run(service.stop())
+
+        assert [record["battle_id"] for record in written] == ["b1"] * 5
+        assert written[0]["decision"]["contestant"] == "A"
+        assert len(service.agent.decision_history) == 5
+
+    def test_quiet_periods_are_flushed_on_a_timer(self, store, monkeypatch):
+        """Buffered records are written every audit_max_delay, off the event loop"""
+        import threading
+
+        threads = []
+
+        class FakeAuditCollection:
+            def insert_many(self, docs, ordered=True):
+                threads.append(threading.current_thread())
+
+        monkeypatch.setattr(betting_service, "MONGODB_ENABLED", True)
+        monkeypatch.setattr(betting_service, "COLLECTIONS", {"rl_audit_logs": "rl_audit_logs"})
+        monkeypatch.setattr(betting_service, "get_database", lambda: {"rl_audit_logs": FakeAuditCollection()})
+        monkeypatch.setenv("RL_AUDIT_BATCH_SIZE", "1000")
+        monkeypatch.setenv("RL_AUDIT_MAX_DELAY", "0.05")
+        service = BettingModelService(poll_interval=0)
+
+        async def scenario():
+            await service.start()
+            state_id, _ = service.agent._get_state({"total_bets": 3})
+            service.agent.select_action(state_id, 2.0, battle_id="b1")
+            await asyncio.sleep(0.2)
+            buffered = service.audit_logger.get_stats()["buffered"]
+            await service.stop()
+            return buffered
+
+        assert asyncio.run(scenario()) == 0
+        assert len(threads) == 1
+        assert threads[0] is not threading.main_thread()
+
+    def test_failed_flush_is_not_reported_as_lost(self, store, monkeypatch, capsys):
+        """A write error keeps the records buffered and says so"""
+        class FailingAuditCollection:
+            def insert_many(self, docs, ordered=True):
+                raise RuntimeError("write failed")
+
+        monkeypatch.setattr(betting_service, "MONGODB_ENABLED", True)
+        monkeypatch.setattr(betting_service, "COLLECTIONS", {"rl_audit_logs": "rl_audit_logs"})
+        monkeypatch.setattr(betting_service, "get_database", lambda: {"rl_audit_logs": FailingAuditCollection()})
+        monkeypatch.setenv("RL_AUDIT_BATCH_SIZE", "2")
+        service = BettingModelService(poll_interval=0)
+
+        state_id, _ = service.agent._get_state({"total_bets": 3})
+        for _ in range(2):
+            service.agent.select_action(state_id, 2.0, battle_id="b1")
+
+        output = capsys.readouterr().out
+        assert "2 records kept for retry" in output
+        assert "sink failed" not in output
+        assert service.agent.decision_history.sink_errors == 0
+        assert service.audit_logger.get_stats()["buffered"] == 2
@@ -0,0 +1,127 @@
+"""
+Betting Trainer Tests
+Tests for columnar transitions and vectorized offline Q-learning
+"""
+
+import numpy as np
+import pytest
+
+from agents.betting_rl_agent import BettingRLAgent
+from agents.betting_trainer import BatchQTrainer, TransitionBatch
+
+
+def random_transitions(agent, n=400, n_states=12, seed=3):
+    rng = np.random.default_rng(seed)
+    states = [f"s{i}" for i in rng.integers(0, n_states, n)]
+    actions = [agent.actions[i] for i in rng.integers(0, len(agent.actions), n)]
+    rewards = rng.normal(size=n)
+    next_states = [None if rng.random() < 0.2 else f"s{i}" for i in rng.integers(0, n_states, n)]
+    return states, actions, rewards, next_states
+
+
+class TestTransitionBatch:
+    """Integer encoding of logged transitions"""
+
+    def test_encodes_states_and_actions(self):
+        agent = BettingRLAgent()
+        batch = TransitionBatch.from_columns(
+            ["a", "b", "a"], ["maintain_odds", "increase_odds_5", "maintain_odds"],
+            [1.0, 0.5, -1.0], ["b", None, "c"], agent.actions
+        )
+
+        assert batch.state_keys == ["a", "b", "c"]
+        assert batch.states.tolist() == [0, 1, 0]
+        assert batch.next_states.tolist() == [1, -1, 2]
+        assert batch.action_ids.tolist() == [2, 1, 2]
+
+    def test_from_audit_logs_chains_battles(self):
+        """Next state is the battle's following decision; rewards follow the agent rules"""
+        agent = BettingRLAgent()
+        docs = [
+            {"battle_id": "b1", "decision": {"state_hash": "x", "action_taken": "maintain_odds", "new_odds": 2.0, "predicted_outcome": "mc1"}},
+            {"battle_id": "b1", "decision": {"state_hash": "y", "action_taken": "increase_odds_5", "new_odds": 2.1}},
+            {"battle_id": "b2", "decision": {"state_hash": "x", "action_taken": "maintain_odds", "reward": 0.7}},
+        ]
+        outcomes = {"b1": {"winner": "mc1", "won": 3, "total": 4}}
+
+        batch = TransitionBatch.from_audit_logs(docs, outcomes, agent)
+
+        assert [batch.state_keys[s] for s in batch.states] == ["x", "y", "x"]
+        assert batch.next_states[0] == batch.state_keys.index("y")
+        assert batch.next_states[1] == -1 and batch.next_states[2] == -1
+        expected_first = 1.0 - abs(0.5 - 0.05) * 10 + 0.75 * 0.5
+        assert batch.rewards[0] == pytest.approx(expected_first)
+        assert batch.rewards[2] == pytest.approx(0.7)
+
+
+class TestBatchQTrainer:
+    """Vectorized sweeps"""
+
+    def test_sequential_mode_matches_online_updates(self):
+        """batch_size=1 without shuffling reproduces update_q_value exactly"""
+        online = BettingRLAgent()
+        states, actions, rewards, next_states = random_transitions(online)
+        for s, a, r, n in zip(states, actions, rewards, next_states):
+            online.update_q_value(s, a, r, n if n is not None else "__terminal__")
+
+        batch = TransitionBatch.from_columns(states, actions, rewards, next_states, online.actions)
+        model = BatchQTrainer(BettingRLAgent(), epochs=1, batch_size=1, shuffle=False).train(batch)
+
+        expected = {k: dict(v) for k, v in online.q_table.items() if v}
+        assert model["q_table"].keys() == expected.keys()
+        for state, values in expected.items():
+            assert model["q_table"][state] == pytest.approx(values)
+
+    def test_learns_best_action_and_imports(self):
+        """A trained snapshot loads into a fresh agent and drives select_action"""
+        agent = BettingRLAgent()
+        n = 2000
+        actions = [agent.actions[i % len(agent.actions)] for i in range(n)]
+        rewards = [1.0 if a == "decrease_odds_5" else -0.2 for a in actions]
+        batch = TransitionBatch.from_columns(["s"] * n, actions, rewards, [None] * n, agent.actions)
+
+        model = BatchQTrainer(agent, epochs=10, batch_size=256).train(batch)
+
+        fresh = BettingRLAgent()
+        fresh.import_model(model)
+        action, _, _ = fresh.select_action("s", 2.0)
+        assert action == "decrease_odds_5"
+        assert model["training"]["transitions"] == n
+        assert model["decision_count"] == n
+
+    def test_warm_start_keeps_untouched_states(self):
+        """States absent from the replay keep their previous values"""
+        agent = BettingRLAgent()
+        agent.q_table["old"]["maintain_odds"] = 0.42
+        batch = TransitionBatch.from_columns(["new"], ["maintain_odds"], [1.0], [None], agent.actions)
+
+        model = BatchQTrainer(agent, epochs=1).train(batch)
+
+        assert model["q_table"]["old"] == {"maintain_odds": 0.42}
+        assert model["q_table"]["new"]["maintain_odds"] == pytest.approx(0.1)
+
+
+class TestDecisionLogQuery:
+    """Replay order of logged decisions"""
+
+    def test_ties_on_timestamp_are_broken_by_insertion_order(self, monkeypatch):
+        """A batch sharing one millisecond timestamp replays in insertion order"""
+        import database
+
+        seen = {}
+
+        class FakeCursor(list):
+            def sort(self, keys):
+                seen["sort"] = keys
+                return self
+
+        class FakeCollection:
+            def find(self, query, projection):
+                seen["projection"] = projection
+                return FakeCursor()
+
+        monkeypatch.setattr(database, "get_database", lambda: {"rl_audit_logs": FakeCollection()})
+
+        assert database.RLDB.get_decision_logs() == []
+        assert seen["sort"] == [("battle_id", 1), ("timestamp", 1), ("_id", 1)]
+        assert seen["projection"]["_id"] == 0
@@ -0,0 +1,207 @@
+"""
+Conversation Memory Tests
+Tests for token-bounded sessions and versioned persistence (no MongoDB)
+"""
+
+import asyncio
+
+import pytest
+
+from agents import conversation_memory
+from agents.conversation_memory import (
+    ConversationAccessError, ConversationMemory, estimate_tokens, render_history
+)
+
+
+def long_text(word: str, words: int = 60) -> str:
+    return " ".join([word] * words)
+
+
+class TestConversationWindow:
+    """Rolling window and summarization"""
+
+    def test_window_stays_within_budget(self):
+        """Old turns move to the summary, the window stays bounded"""
+        memory = ConversationMemory(max_window_tokens=200, persist=False)
+        session = asyncio.run(memory.get_session("abc"))
+
+        async def chat():
+            for i in range(20):
+                await memory.add_turn(session, "user", long_text(f"pergunta{i}", 20))
+                await memory.add_turn(session, "assistant", long_text(f"resposta{i}", 20))
+
+        asyncio.run(chat())
+
+        assert session.window_tokens <= 200
+        assert session.window[-1]["content"].startswith("resposta19")
+        assert session.summarized_count == 40 - len(session.window)
+        assert estimate_tokens(session.summary) <= memory.max_summary_tokens
+
+    def test_custom_summarizer_receives_evicted_turns(self):
+        """Pluggable (e.g. LLM) summarizer gets the previous summary and the evicted turns"""
+        calls = []
+
+        async def summarizer(summary, turns):
+            calls.append([t["content"][:9] for t in turns])
+            return f"{summary}|{len(turns)}"
+
+        memory = ConversationMemory(max_window_tokens=40, min_window_messages=1,
+                                    summarizer=summarizer, persist=False)
+        session = asyncio.run(memory.get_session("abc"))
+        asyncio.run(memory.add_turn(session, "user", long_text("primeira", 20)))
+        asyncio.run(memory.add_turn(session, "user", long_text("segundaaa", 20)))
+
+        assert calls == [["primeira "]]
+        assert session.summary == "|1"
+
+    def test_sessions_are_reused_and_evicted(self):
+        """Same id returns the same session; LRU bound applies"""
+        memory = ConversationMemory(max_sessions=2, persist=False)
+
+        def get(conversation_id):
+            return asyncio.run(memory.get_session(conversation_id))
+
+        first = get("a")
+
+        assert get("a") is first
+        get("b")
+        get("c")
+        assert memory.get_stats()["sessions"] == 2
+        assert get("a") is not first
+
+    def test_sessions_are_bound_to_their_owner(self):
+        """Another user cannot read or extend a conversation"""
+        memory = ConversationMemory(persist=False)
+        session = asyncio.run(memory.get_session("abc", user_id="ana"))
+
+        assert asyncio.run(memory.get_session("abc", user_id="ana")) is session
+        with pytest.raises(ConversationAccessError):
+            asyncio.run(memory.get_session("abc", user_id="bruno"))
+
+
+class FakeConversationDB:
+    """In-memory conversations collection with MongoDB's versioned save semantics"""
+
+    def __init__(self):
+        self.docs = {}
+        self.messages = []
+        self.saves = 0
+
+    def load_session(self, conversation_id):
+        doc = self.docs.get(conversation_id)
+        return None if doc is None else {**doc, "window": list(doc["window"])}
+
+    def save_session(self, session, expected_version):
+        stored = self.docs.get(session["conversation_id"])
+        if (stored["version"] if stored else 0) != expected_version:
+            return False
+        self.saves += 1
+        self.docs[session["conversation_id"]] = {
+            "user_id": stored["user_id"] if stored else session["user_id"],
+            "summary": session["summary"],
+            "window": list(session["window"]),
+            "summarized_count": session["summarized_count"],
+            "message_count": (stored["message_count"] if stored else 0) + session["new_messages"],
+            "version": expected_version + 1
+        }
+        return True
+
+    def add_messages(self, messages):
+        self.messages.append(len(messages))
+
+
+def persistent_memory(**kwargs) -> ConversationMemory:
+    """Memory using the (monkeypatched) ConversationDB"""
+    memory = ConversationMemory(persist=False, **kwargs)
+    memory.persist = True
+    return memory
+
+
+class TestPersistence:
+    """Versioned session state shared by workers, batched message log"""
+
+    def test_flush_batches_messages(self, monkeypatch):
+        """Session state is saved per request, the message log in one insert_many"""
+        db = FakeConversationDB()
+        monkeypatch.setattr(conversation_memory, "ConversationDB", db)
+        memory = persistent_memory()
+
+        async def chat():
+            for conversation_id in ("a", "b"):
+                session = await memory.get_session(conversation_id)
+                await memory.add_turns(session, [{"role": "user", "content": "oi"},
+                                                 {"role": "assistant", "content": "eae"}])
+            await memory.flush()
+            await memory.flush()
+
+        asyncio.run(chat())
+
+        assert db.messages == [4]
+        assert db.saves == 2
+        assert db.docs["a"]["message_count"] == 2
+        assert [m["content"] for m in db.docs["b"]["window"]] == ["oi", "eae"]
+
+    def test_workers_do_not_overwrite_each_others_turns(self, monkeypatch):
+        """A stale worker reloads and re-applies its turns instead of overwriting"""
+        db = FakeConversationDB()
+        monkeypatch.setattr(conversation_memory, "ConversationDB", db)
+        first, second = persistent_memory(), persistent_memory()
+
+        async def chat():
+            a = await first.get_session("abc")
+            b = await second.get_session("abc")
+            await first.add_turn(a, "user", "pergunta do worker 1")
+            # b was loaded before the first worker's turn
+            await second.add_turn(b, "user", "pergunta do worker 2")
+            return await first.get_session("abc")
+
+        session = asyncio.run(chat())
+
+        assert [m["content"] for m in session.window] == ["pergunta do worker 1", "pergunta do worker 2"]
+        assert db.docs["abc"]["message_count"] == 2
+        assert second.get_stats()["save_conflicts"] == 1
+
+    def test_stored_owner_is_enforced(self, monkeypatch):
+        """Ownership comes from the stored session on every worker"""
+        db = FakeConversationDB()
+        monkeypatch.setattr(conversation_memory, "ConversationDB", db)
+        first, second = persistent_memory(), persistent_memory()
+
+        async def chat():
+            session = await first.get_session("abc", user_id="ana")
+            await first.add_turn(session, "user", "oi")
+            await second.get_session("abc", user_id="bruno")
+
+        with pytest.raises(ConversationAccessError):
+            asyncio.run(chat())
+
+    def test_lru_stays_within_capacity(self, monkeypatch):
+        """Persisted sessions are evicted without exceeding max_sessions"""
+        db = FakeConversationDB()
+        monkeypatch.setattr(conversation_memory, "ConversationDB", db)
+        memory = persistent_memory(max_sessions=2)
+
+        async def chat():
+            for conversation_id in ("a", "b", "c", "d"):
+                session = await memory.get_session(conversation_id)
+                await memory.add_turn(session, "user", "oi")
+            return await memory.get_session("a")
+
+        session = asyncio.run(chat())
+
+        assert memory.get_stats()["sessions"] == 2
+        assert [m["content"] for m in session.window] == ["oi"]
+
+
+class TestRenderHistory:
+    """Prompt rendering of the session context"""
+
+    def test_render_trims_oldest_turns(self):
+        """Client-sent histories are bounded by tokens"""
+        history = [{"role": "user", "content": long_text(f"msg{i}", 40)} for i in range(10)]
+        text = render_history({"history": history, "summary": "falamos de viola"}, max_tokens=200)
+
+        assert "falamos de viola" in text
+        assert "msg9" in text
+        assert "msg0" not in text
+        assert render_history(None) == ""
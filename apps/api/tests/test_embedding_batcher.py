@@ -0,0 +1,124 @@
+"""
+Embedding Batcher Tests
+Tests for request coalescing (upstream NIM call is faked)
+"""
+
+import asyncio
+
+from agents.tools.embedding_batcher import EmbeddingBatcher, EmbeddingRequestError
+
+
+MODEL = "nvidia/nv-embedqa-e5-v5"
+
+
+def build_batcher(calls: list, **kwargs) -> EmbeddingBatcher:
+    """Batcher whose upstream call records batches and embeds text length"""
+    batcher = EmbeddingBatcher(api_key="test-key", **kwargs)
+
+    async def fake_request(texts, model, input_type):
+        calls.append((list(texts), model, input_type))
+        return [[float(len(text))] for text in texts], 10 * len(texts)
+
+    batcher._request = fake_request
+    return batcher
+
+
+class TestEmbeddingBatcher:
+    """Test suite for EmbeddingBatcher"""
+
+    def test_concurrent_requests_share_one_call(self):
+        """Requests inside the wait window become one batched call"""
+        calls = []
+        batcher = build_batcher(calls, max_wait_ms=20)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.embed("a", MODEL),
+                batcher.embed("bb", MODEL),
+                batcher.embed("a", MODEL)
+            )
+
+        results = asyncio.run(run())
+
+        assert results == [[1.0], [2.0], [1.0]]
+        assert calls == [(["a", "bb"], MODEL, "query")]
+
+    def test_groups_by_model_and_input_type(self):
+        """Query and passage inputs are never mixed in one call"""
+        calls = []
+        batcher = build_batcher(calls, max_wait_ms=5)
+
+        async def run():
+            await asyncio.gather(
+                batcher.embed("a", MODEL, "query"),
+                batcher.embed("b", MODEL, "passage")
+            )
+
+        asyncio.run(run())
+
+        assert sorted(call[2] for call in calls) == ["passage", "query"]
+
+    def test_max_batch_size_flushes_early(self):
+        """A full batch is sent without waiting for the timer"""
+        calls = []
+        batcher = build_batcher(calls, max_batch_size=2, max_wait_ms=10000)
+
+        async def run():
+            return await asyncio.wait_for(
+                batcher.embed_many(["a", "b", "c", "d"], MODEL),
+                timeout=1.0
+            )
+
+        assert asyncio.run(run()) == [[1.0]] * 4
+        assert [len(call[0]) for call in calls] == [2, 2]
+
+    def test_errors_propagate_to_every_caller(self):
+        """An upstream failure rejects all futures of the batch"""
+        batcher = EmbeddingBatcher(api_key="test-key", max_wait_ms=5)
+
+        async def failing_request(texts, model, input_type):
+            raise EmbeddingRequestError(429, "rate limited")
+
+        batcher._request = failing_request
+
+        async def run():
+            return await asyncio.gather(
+                batcher.embed("a", MODEL),
+                batcher.embed("b", MODEL),
+                return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, EmbeddingRequestError) and r.status_code == 429 for r in results)
+
+    def test_usage_is_split_between_callers(self):
+        """Each caller gets its share of the batch's reported tokens"""
+        batcher = build_batcher([], max_wait_ms=20)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.embed_with_usage("viola caipira", MODEL),
+                batcher.embed_with_usage("viola caipira", MODEL),
+                batcher.embed_with_usage("ferrovia", MODEL)
+            )
+
+        results = asyncio.run(run())
+
+        assert results[0] == results[1]
+        assert results[0][1]["total_tokens"] + results[2][1]["total_tokens"] == 20
+        assert results[2][1]["prompt_tokens"] == results[2][1]["total_tokens"] > 0
+
+    def test_close_sends_pending_and_waits_for_in_flight(self):
+        """Callers waiting on the timer or on the upstream call are answered before close returns"""
+        calls = []
+        batcher = build_batcher(calls, max_wait_ms=10000)
+
+        async def run():
+            pending = asyncio.ensure_future(batcher.embed("a", MODEL))
+            await asyncio.sleep(0)
+            await batcher.close()
+            assert not batcher._tasks
+            return await asyncio.wait_for(pending, timeout=1.0)
+
+        assert asyncio.run(run()) == [1.0]
+        assert calls == [(["a"], MODEL, "query")]
@@ -0,0 +1,60 @@
+"""
+Embedding Cache Tests
+Tests for the in-process tier of the shared query-embedding cache
+"""
+
+import numpy as np
+
+from agents.tools.embedding_cache import EmbeddingCache
+
+
+MODEL = "nvidia/nv-embedqa-e5-v5"
+
+
+class TestEmbeddingCache:
+    """Test suite for EmbeddingCache (MongoDB tier disabled)"""
+
+    def test_normalized_key(self):
+        """Whitespace and case variations share one entry"""
+        assert EmbeddingCache.make_key("Filmes  de Música", MODEL) == EmbeddingCache.make_key(" filmes de música ", MODEL)
+        assert EmbeddingCache.make_key("filmes", MODEL, "query") != EmbeddingCache.make_key("filmes", MODEL, "passage")
+
+    def test_put_and_get_float32(self):
+        """Embeddings are stored as float32 arrays"""
+        cache = EmbeddingCache(persist=False)
+        cache.put("filmes de musica", MODEL, [0.1, 0.2, 0.3])
+
+        cached = cache.get("Filmes de musica", MODEL)
+        assert cached.dtype == np.float32
+        assert np.allclose(cached, [0.1, 0.2, 0.3])
+        assert cache.get_stats()["memory_hits"] == 1
+
+    def test_batch_lookup(self):
+        """get_many returns hits by index and counts misses"""
+        cache = EmbeddingCache(persist=False)
+        cache.put_many(["a", "b"], MODEL, [[1.0], [2.0]])
+
+        found = cache.get_many(["b", "x", "a"], MODEL)
+        assert set(found.keys()) == {0, 2}
+        assert found[0][0] == 2.0
+        assert cache.get_stats()["misses"] == 1
+
+    def test_byte_budget_eviction(self):
+        """The process tier never exceeds its byte budget"""
+        vector = np.zeros(1024, dtype=np.float32)
+        cache = EmbeddingCache(max_bytes=vector.nbytes * 2, persist=False)
+        for text in ["a", "b", "c"]:
+            cache.put(text, MODEL, vector)
+
+        stats = cache.get_stats()
+        assert stats["entries"] == 2
+        assert stats["memory_bytes"] <= stats["max_bytes"]
+        assert cache.get("a", MODEL) is None
+
+    def test_ttl_expiry(self):
+        """Expired entries are dropped on read"""
+        cache = EmbeddingCache(ttl_seconds=-1, persist=False)
+        cache.put("a", MODEL, [1.0])
+
+        assert cache.get("a", MODEL) is None
+        assert cache.get_stats()["entries"] == 0
@@ -0,0 +1,126 @@
+"""
+Facet Filter Tests
+Tests for metadata masks, filter extraction and filtered retrieval
+"""
+
+import asyncio
+
+import numpy as np
+
+from agents.agent_manager import AgentManager
+from agents.rl_feedback import RLFeedbackIntegration
+from agents.tools.facets import FacetIndex
+from agents.tools.rag_tool import RAGTool
+
+
+CATALOG = [
+    {"id": 1, "titulo": "Ponteia Viola", "embedding": [1.0, 0.0, 0.0],
+     "metadata": {"diretor": "Margarida Chaves de Oliveira", "tema": "musica",
+                  "eixo": "Lei Paulo Gustavo", "status": "producao", "sinopse": "Violeiros do interior."}},
+    {"id": 2, "titulo": "Rio Paranapanema", "embedding": [0.9, 0.1, 0.0],
+     "metadata": {"diretor": "Carlos Lima", "tema": "ambiente",
+                  "eixo": "Lei Paulo Gustavo", "status": "finalizado", "sinopse": "As águas do rio e a mata ciliar."}},
+    {"id": 3, "titulo": "Estação Velha", "embedding": [0.0, 1.0, 0.0],
+     "metadata": {"diretor": "Ana Souza", "tema": "patrimonio",
+                  "eixo": "PNAB", "status": "producao", "sinopse": "A antiga ferrovia."}},
+]
+
+
+def build_tool(embedding=(1.0, 0.0, 0.0)) -> RAGTool:
+    tool = RAGTool(CATALOG, "test-key", vector_dtype="float32")
+
+    async def fake_embedding(text):
+        return None if embedding is None else np.asarray(embedding, dtype=np.float32)
+
+    tool._generate_embedding = fake_embedding
+    return tool
+
+
+class TestFacetIndex:
+    """Test suite for FacetIndex"""
+
+    def test_mask_or_within_field_and_across_fields(self):
+        """Values of a field are OR-ed, fields are AND-ed"""
+        facets = FacetIndex(CATALOG)
+
+        assert facets.mask({"tema": ["musica", "ambiente"]}).tolist() == [True, True, False]
+        assert facets.mask({"tema": ["musica", "ambiente"], "status": "producao"}).tolist() == [True, False, False]
+        assert facets.mask({"tema": "inexistente"}).tolist() == [False, False, False]
+        assert facets.mask({}) is None
+
+    def test_extract_tema_aliases(self):
+        """Natural phrasing maps to catalog temas"""
+        facets = FacetIndex(CATALOG)
+
+        assert facets.extract_filters("documentários de música") == {"tema": ["musica"]}
+        assert facets.extract_filters("filmes sobre meio ambiente") == {"tema": ["ambiente"]}
+        assert facets.extract_filters("quem dirigiu o filme?") == {}
+
+    def test_extract_director_by_short_name(self):
+        """Directors match by full name or first two names"""
+        facets = FacetIndex(CATALOG)
+
+        assert facets.extract_filters("filmes da Margarida Chaves") == {"diretor": ["Margarida Chaves de Oliveira"]}
+        assert facets.extract_filters("o que o Carlos Lima fez?") == {"diretor": ["Carlos Lima"]}
+
+    def test_title_words_are_not_filters(self):
+        """Words of a production's own title never become facet filters"""
+        catalog = CATALOG + [
+            {"id": 4, "titulo": "Preservação do Patrimônio Arbóreo", "embedding": [0.0, 0.0, 1.0],
+             "metadata": {"diretor": "Paula Reis", "tema": "ambiente", "eixo": "PNAB", "status": "finalizado"}}
+        ]
+        facets = FacetIndex(catalog)
+
+        assert facets.extract_filters("Quem dirigiu Preservação do Patrimônio Arbóreo?") == {}
+        assert facets.extract_filters("filmes de patrimônio histórico") == {"tema": ["patrimonio"]}
+
+
+class TestFilteredSearch:
+    """Filtered RAGTool retrieval"""
+
+    def test_filter_excludes_closer_vectors(self):
+        """Only rows matching the filter are scored"""
+        tool = build_tool(embedding=(1.0, 0.0, 0.0))
+        results = asyncio.run(tool.search_productions("filmes", top_k=3, filters={"tema": ["ambiente"]}))
+
+        assert [r["titulo"] for r in results] == ["Rio Paranapanema"]
+
+    def test_filter_only_query_without_embedding(self):
+        """Filter still lists matching productions when no ranking signal exists"""
+        tool = build_tool(embedding=None)
+        results = asyncio.run(tool.search_productions("produções", top_k=3, filters={"status": ["producao"]}))
+
+        assert [r["titulo"] for r in results] == ["Ponteia Viola", "Estação Velha"]
+        assert results[0]["match"] == "filter"
+
+    def test_empty_filter_falls_back_to_unfiltered(self):
+        """Filters that match nothing are dropped instead of returning nothing"""
+        tool = build_tool()
+        results = asyncio.run(tool.search_productions("viola", top_k=1, filters={"tema": ["inexistente"]}))
+
+        assert [r["titulo"] for r in results] == ["Ponteia Viola"]
+
+    def test_filter_excluding_every_lexical_match_is_dropped(self):
+        """A misread filter does not hide the production the query names"""
+        tool = build_tool(embedding=(0.0, 1.0, 0.0))
+        results = asyncio.run(tool.search_productions("Rio Paranapanema", top_k=1, filters={"tema": ["patrimonio"]}))
+
+        assert [r["titulo"] for r in results] == ["Rio Paranapanema"]
+
+    def test_classifier_passes_filters_to_discovery(self, monkeypatch):
+        """AgentManager extracts the filter and hands it to retrieval"""
+        manager = AgentManager(nvidia_api_key="test-key", embeddings_data=CATALOG)
+        manager.rl_feedback = RLFeedbackIntegration(enabled=False)
+        manager.response_cache.enabled = False
+        seen = {}
+
+        async def fake_discovery_query(query, search_enabled=True, filters=None):
+            seen["filters"] = filters
+            return {"response": "ok", "productions": []}
+
+        monkeypatch.setattr(manager.discovery_agent, "process_query", fake_discovery_query)
+
+        result = asyncio.run(manager.process_query("recomende algo sobre natureza", intent="RECOMMEND"))
+
+        assert seen["filters"] == {"tema": ["ambiente"]}
+        assert result["metadata"]["filters"] == {"tema": ["ambiente"]}
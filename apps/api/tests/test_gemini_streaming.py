@@ -0,0 +1,228 @@
+"""
+Gemini Streaming Tests
+Async streaming, thread bridge and cancellation with a fake SDK client
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from gemini_integration import GeminiIntegration, GeminiStreamHandler
+
+
+class FakeAsyncStream:
+    """Async SDK stream that records whether it was closed"""
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.texts:
+            raise StopAsyncIteration
+        await asyncio.sleep(0)
+        return SimpleNamespace(text=self.texts.pop(0))
+
+    async def aclose(self):
+        self.closed = True
+
+
+def build_gemini(stream=None, sync_texts=None, delay=0.0):
+    gemini = GeminiIntegration(api_key="test-key")
+
+    async def generate_content_stream(model, contents, config):
+        return stream
+
+    def sync_stream(model, contents, config):
+        for text in sync_texts or []:
+            time.sleep(delay)
+            yield SimpleNamespace(text=text)
+
+    if stream is not None:
+        gemini.client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(
+            generate_content_stream=generate_content_stream
+        )))
+    else:
+        gemini.client = SimpleNamespace(models=SimpleNamespace(generate_content_stream=sync_stream))
+    return gemini
+
+
+async def collect(iterator, limit=None):
+    chunks = []
+    async for chunk in iterator:
+        chunks.append(chunk)
+        if limit and len(chunks) >= limit:
+            break
+    return chunks
+
+
+class TestAsyncStreaming:
+    """SDK async client path"""
+
+    def test_stream_content_yields_chunks(self):
+        """Text chunks arrive in order"""
+        gemini = build_gemini(stream=FakeAsyncStream(["Eae", " parceiro"]))
+        assert asyncio.run(collect(gemini.stream_content("oi"))) == ["Eae", " parceiro"]
+
+    def test_generate_content_stream_returns_dict(self):
+        """stream=True keeps the dict contract with an async iterator inside"""
+        gemini = build_gemini(stream=FakeAsyncStream(["a", "b"]))
+
+        async def run():
+            result = await gemini.generate_content("oi", stream=True)
+            return result, await collect(result["stream"])
+
+        result, chunks = asyncio.run(run())
+        assert result["response"] is None
+        assert result["model"] == gemini.models["flash"]
+        assert chunks == ["a", "b"]
+
+    def test_early_close_closes_upstream(self):
+        """Stopping the consumer closes the SDK stream"""
+        upstream = FakeAsyncStream(["a", "b", "c"])
+        gemini = build_gemini(stream=upstream)
+
+        async def run():
+            stream = gemini.stream_content("oi")
+            chunks = await collect(stream, limit=1)
+            await stream.aclose()
+            return chunks
+
+        assert asyncio.run(run()) == ["a"]
+        assert upstream.closed
+
+
+class TestThreadedStreaming:
+    """Thread-pumped fallback for clients without the async API"""
+
+    def test_loop_is_not_blocked(self):
+        """Other tasks keep running while the sync stream waits"""
+        gemini = build_gemini(sync_texts=["a", "b", "c"], delay=0.05)
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            chunks = await collect(gemini.stream_content("oi"))
+            task.cancel()
+            return chunks, ticks
+
+        chunks, ticks = asyncio.run(run())
+        assert chunks == ["a", "b", "c"]
+        assert ticks >= 5
+
+
+class TestChatWithHistory:
+    """Multi-turn generation"""
+
+    def test_runs_off_the_event_loop(self):
+        """The blocking SDK call runs in a worker thread with the whole history"""
+        import threading
+
+        seen = {}
+        gemini = GeminiIntegration(api_key="test-key")
+
+        def generate_content(model, contents, config):
+            seen["thread"] = threading.current_thread()
+            seen["roles"] = [content.role for content in contents]
+            return SimpleNamespace(text="eae")
+
+        gemini.client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+        messages = [{"role": "user", "content": "oi"}, {"role": "assistant", "content": "eae"},
+                    {"role": "user", "content": "quem dirigiu?"}]
+
+        assert asyncio.run(gemini.chat_with_history(messages)) == "eae"
+        assert seen["roles"] == ["user", "model", "user"]
+        assert seen["thread"] is not threading.main_thread()
+
+
+class TestStreamHandler:
+    """SSE formatting and client disconnects"""
+
+    def test_stops_when_client_disconnects(self):
+        """No more chunks after the request is disconnected"""
+        upstream = FakeAsyncStream(["a", "b", "c"])
+        handler = GeminiStreamHandler(build_gemini(stream=upstream))
+        state = {"checks": 0}
+
+        class FakeRequest:
+            async def is_disconnected(self):
+                state["checks"] += 1
+                return state["checks"] > 1
+
+        events = asyncio.run(collect(handler.stream_sse("oi", request=FakeRequest())))
+
+        assert len(events) == 1
+        assert '"content": "a"' in events[0]
+        assert upstream.closed
+
+    def test_closing_the_response_closes_upstream(self):
+        """A cancelled response (generator closed mid-stream) closes the Gemini stream"""
+        upstream = FakeAsyncStream(["a", "b", "c"])
+        handler = GeminiStreamHandler(build_gemini(stream=upstream))
+
+        async def run():
+            events = handler.stream_sse("oi")
+            first = await events.__anext__()
+            await events.aclose()
+            return first
+
+        assert '"content": "a"' in asyncio.run(run())
+        assert upstream.closed
+        # The rest of the answer is never pulled from Gemini
+        assert "c" in upstream.texts
+
+    def test_concurrent_streams_are_independent(self):
+        """Each request gets its own upstream stream"""
+        streams = {"x": FakeAsyncStream(["x1", "x2"]), "y": FakeAsyncStream(["y1", "y2"])}
+        gemini = GeminiIntegration(api_key="test-key")
+
+        async def generate_content_stream(model, contents, config):
+            return streams[contents[0].parts[0].text]
+
+        gemini.client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(
+            generate_content_stream=generate_content_stream
+        )))
+        handler = GeminiStreamHandler(gemini)
+
+        async def run():
+            return await asyncio.gather(collect(handler.stream_sse("x")), collect(handler.stream_sse("y")))
+
+        x_events, y_events = asyncio.run(run())
+        assert '"content": "x2"' in x_events[1] and '"content": "y2"' in y_events[1]
+        assert all(stream.closed for stream in streams.values())
+
+    def test_done_event(self):
+        """Completed streams end with [DONE]"""
+        handler = GeminiStreamHandler(build_gemini(stream=FakeAsyncStream(["a"])))
+        events = asyncio.run(collect(handler.stream_sse("oi")))
+
+        assert events[-1] == "data: [DONE]\n\n"
+
+
+class TestStreamEndpoint:
+    """POST /api/gemini/stream"""
+
+    def test_streams_sse(self, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        import main
+
+        monkeypatch.setattr(main, "GEMINI_AVAILABLE", True)
+        monkeypatch.setattr(main, "get_gemini_client", lambda: build_gemini(stream=FakeAsyncStream(["Eae", " parceiro"])))
+
+        response = TestClient(main.app).post("/api/gemini/stream", json={"prompt": "oi"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert '"content": "Eae"' in response.text
+        assert response.text.endswith("data: [DONE]\n\n")
@@ -0,0 +1,145 @@
+"""
+Embedding Generation Script Tests
+Tests for retries, incremental regeneration, checkpoint resume and the .npz matrix
+"""
+
+import asyncio
+import json
+import sys
+
+import httpx
+import numpy as np
+import pytest
+
+from scripts import generate_embeddings as script
+
+
+def fake_vector(text):
+    """Deterministic embedding per text"""
+    seed = sum(text.encode("utf-8")) % 1000
+    return np.full(script.EMBEDDING_DIMENSIONS, seed / 1000, dtype=np.float32).tolist()
+
+
+@pytest.fixture
+def requested(monkeypatch):
+    """Texts sent to the embeddings API (no network)"""
+    texts = []
+
+    async def request_embeddings(client, batch, backoff):
+        texts.extend(batch)
+        return [fake_vector(text) for text in batch]
+
+    monkeypatch.setattr(script, "request_embeddings", request_embeddings)
+    return texts
+
+
+def run_script(monkeypatch, output, *args):
+    monkeypatch.setattr(sys, "argv", ["generate_embeddings.py", "--output", str(output), *args])
+    script.main()
+    return json.loads(output.read_text(encoding="utf-8"))
+
+
+class TestRetries:
+    """_post_with_retry"""
+
+    def post(self, handler):
+        async def run():
+            backoff = script.AdaptiveBackoff(base_delay=0.0, max_delay=0.0)
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await script._post_with_retry(client, "http://nim/embeddings", {"input": ["a"]}, backoff)
+        return asyncio.run(run())
+
+    def test_connection_errors_are_retried(self):
+        """Transport errors (timeouts, resets) get the same retries as 429/5xx"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 3:
+                raise httpx.ConnectTimeout("timed out", request=request)
+            return httpx.Response(200, json={"data": [{"index": 0, "embedding": [0.5]}]})
+
+        assert self.post(handler) == [[0.5]]
+        assert len(calls) == 3
+
+    def test_exhausted_retries_report_the_last_error(self):
+        """Server errors are not reported as a rate limit"""
+        with pytest.raises(RuntimeError) as error:
+            self.post(lambda request: httpx.Response(503))
+
+        assert "HTTP 503" in str(error.value)
+        assert "rate limit" not in str(error.value)
+
+
+class TestIncrementalRuns:
+    """Content hashes, checkpoint resume and outputs"""
+
+    def test_only_changed_synopses_are_regenerated(self, tmp_path, monkeypatch, requested):
+        output = tmp_path / "embeddings.json"
+        first = run_script(monkeypatch, output)
+        assert len(requested) == len(first) == len(script.FILMES_DATA)
+
+        changed = dict(script.FILMES_DATA[0], sinopse="Nova sinopse sobre viola caipira.")
+        monkeypatch.setattr(script, "FILMES_DATA", [changed] + script.FILMES_DATA[1:])
+        requested.clear()
+        second = run_script(monkeypatch, output)
+
+        assert requested == [script.prepare_text_for_embedding(changed)]
+        assert second[1:] == first[1:]
+        assert second[0]["content_hash"] != first[0]["content_hash"]
+
+    def test_resumes_from_checkpoint(self, tmp_path, monkeypatch, requested):
+        """Checkpointed items are not requested again; a truncated last line is ignored"""
+        output = tmp_path / "embeddings.json"
+        done = script.FILMES_DATA[:5]
+        with open(script.checkpoint_path(output), "w", encoding="utf-8") as f:
+            for filme in done:
+                text = script.prepare_text_for_embedding(filme)
+                f.write(json.dumps({"content_hash": script.content_hash(text), "embedding": fake_vector(text)}) + "\n")
+            f.write('{"content_hash": "trunc')
+
+        embeddings = run_script(monkeypatch, output)
+
+        assert len(requested) == len(script.FILMES_DATA) - len(done)
+        assert len(embeddings) == len(script.FILMES_DATA)
+        assert not script.checkpoint_path(output).exists()
+
+    def test_npz_matches_json(self, tmp_path, monkeypatch, requested):
+        """The binary matrix holds the same rows, ids and hashes as the JSON"""
+        output = tmp_path / "embeddings.json"
+        embeddings = run_script(monkeypatch, output, "--dtype", "float32")
+
+        with np.load(script.matrix_path(output)) as data:
+            assert str(data["dtype"]) == "float32"
+            assert data["matrix"].dtype == np.float32
+            assert data["matrix"].shape == (len(embeddings), script.EMBEDDING_DIMENSIONS)
+            assert data["ids"].tolist() == [e["id"] for e in embeddings]
+            assert data["content_hashes"].tolist() == [e["content_hash"] for e in embeddings]
+            np.testing.assert_allclose(data["matrix"][3], embeddings[3]["embedding"])
+
+        script.write_outputs([], output)
+        with np.load(script.matrix_path(output)) as data:
+            assert data["matrix"].shape == (0, script.EMBEDDING_DIMENSIONS)
+
+    def test_npz_is_stored_quantized(self, tmp_path):
+        """float16 and int8 (with per-row scales) hold the normalized vectors"""
+        output = tmp_path / "embeddings.json"
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(4, script.EMBEDDING_DIMENSIONS)).astype(np.float32)
+        embeddings = [{"id": i, "content_hash": str(i), "embedding": vector.tolist()} for i, vector in enumerate(vectors)]
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        script.write_outputs(embeddings, output, dtype="float16")
+        with np.load(script.matrix_path(output)) as data:
+            assert data["matrix"].dtype == np.float16
+            assert "scales" not in data
+            np.testing.assert_allclose(data["matrix"], normalized, atol=1e-3)
+
+        script.write_outputs(embeddings, output, dtype="int8")
+        with np.load(script.matrix_path(output)) as data:
+            assert data["matrix"].dtype == np.int8
+            assert data["scales"].shape == (4,)
+            np.testing.assert_allclose(data["matrix"] * data["scales"][:, None], normalized, atol=1e-3)
+
+        # The JSON catalog keeps the exact vectors
+        assert json.loads(output.read_text())[0]["embedding"] == pytest.approx(vectors[0].tolist())
@@ -0,0 +1,101 @@
+"""
+Hybrid Search Tests
+Tests for BM25 and the fused lexical + vector retrieval in RAGTool
+"""
+
+import asyncio
+
+import numpy as np
+
+from agents.tools.bm25 import BM25Index, tokenize
+from agents.tools.rag_tool import RAGTool
+
+
+CATALOG = [
+    {"id": 1, "titulo": "Ponteia Viola", "embedding": [1.0, 0.0, 0.0],
+     "metadata": {"diretor": "Margarida Chaves", "tema": "musica", "sinopse": "Violeiros do interior paulista."}},
+    {"id": 2, "titulo": "Memórias da Estação", "embedding": [0.0, 1.0, 0.0],
+     "metadata": {"diretor": "Carlos Lima", "tema": "patrimonio", "sinopse": "A antiga ferrovia de Capão Bonito."}},
+    {"id": 3, "titulo": "Raízes", "embedding": [0.0, 0.0, 1.0],
+     "metadata": {"diretor": "Ana Souza", "tema": "cultura", "sinopse": "Quilombolas e a festa do divino."}},
+]
+
+
+def build_tool(embedding=None, delay=0.0, budget_ms=200) -> RAGTool:
+    tool = RAGTool(CATALOG, "test-key", vector_dtype="float32", latency_budget_ms=budget_ms)
+
+    async def fake_embedding(text):
+        await asyncio.sleep(delay)
+        return None if embedding is None else np.asarray(embedding, dtype=np.float32)
+
+    tool._generate_embedding = fake_embedding
+    return tool
+
+
+class TestBM25Index:
+    """Test suite for BM25Index"""
+
+    def test_tokenize_strips_accents_and_stopwords(self):
+        """Accents are folded and function words dropped"""
+        assert tokenize("Memórias da Estação") == ["memorias", "estacao"]
+
+    def test_rare_term_ranks_first(self):
+        """Exact keyword match ranks above documents without it"""
+        index = BM25Index(["viola caipira", "trem e estacao", "festa do divino"])
+
+        results = index.search("estação")
+        assert results[0][0] == 1
+        assert len(results) == 1
+
+    def test_empty_index(self):
+        """Searching an empty index returns nothing"""
+        assert BM25Index([]).search("viola") == []
+
+
+class TestHybridSearch:
+    """Test suite for RAGTool hybrid retrieval"""
+
+    def test_exact_title_match_wins(self):
+        """A title keyword outranks an unrelated vector neighbour"""
+        tool = build_tool(embedding=[0.0, 0.0, 1.0])
+        results = asyncio.run(tool.search_productions("Ponteia Viola", top_k=2))
+
+        assert results[0]["titulo"] == "Ponteia Viola"
+        assert results[0]["match"] == "hybrid"
+        assert results[0]["similarity"] == 0.0
+
+    def test_match_reflects_each_results_retrievers(self):
+        """Only rows found by both rankings are 'hybrid'"""
+        tool = build_tool(embedding=[0.0, 0.0, 1.0])
+        results = asyncio.run(tool.search_productions("Ponteia Viola", top_k=3))
+
+        assert [r["match"] for r in results] == ["hybrid", "vector", "vector"]
+        assert results[1]["similarity"] == 1.0
+        assert results[0]["score"] > results[1]["score"]
+
+    def test_vector_only_when_no_keywords_match(self):
+        """Paraphrases with no shared terms still use the vector ranking"""
+        tool = build_tool(embedding=[0.0, 1.0, 0.0])
+        results = asyncio.run(tool.search_productions("trens antigos", top_k=1))
+
+        assert results[0]["titulo"] == "Memórias da Estação"
+        assert results[0]["match"] == "vector"
+
+    def test_lexical_fallback_on_slow_embedding(self):
+        """Embedding slower than the budget degrades to lexical results"""
+        tool = build_tool(embedding=[1.0, 0.0, 0.0], delay=0.5, budget_ms=20)
+        results = asyncio.run(tool.search_productions("quilombolas", top_k=3))
+
+        assert [r["titulo"] for r in results] == ["Raízes"]
+        assert results[0]["match"] == "lexical"
+        # No embedding: no cosine similarity is reported, the BM25 rank only feeds the fused score
+        assert results[0]["similarity"] is None
+        assert results[0]["score"] > 0
+
+    def test_lexical_fallback_on_embedding_failure(self):
+        """Embedding errors still return keyword matches"""
+        tool = build_tool(embedding=None)
+        results = asyncio.run(tool.search_productions("Carlos Lima"))
+
+        assert results[0]["diretor"] == "Carlos Lima"
+        assert results[0]["match"] == "lexical"
@@ -0,0 +1,105 @@
+"""
+Intent Classifier Tests
+Tests for the compiled keyword automaton, centroid routing and the routing benchmark
+"""
+
+import asyncio
+
+import numpy as np
+
+from agents.tools.intent_classifier import (
+    AGENT_KEYWORDS,
+    AGENT_LABELS,
+    EVALUATION_QUERIES,
+    TRAINING_QUERIES,
+    CentroidClassifier,
+    IntentClassifier,
+    KeywordAutomaton,
+    confusion_matrix,
+)
+
+
+class TestKeywordAutomaton:
+    """Aho-Corasick keyword scoring"""
+
+    def test_matches_substring_scan(self):
+        """Scores equal the per-keyword substring scan they replace"""
+        automaton = KeywordAutomaton(AGENT_KEYWORDS)
+        queries = [query for query, _ in TRAINING_QUERIES + EVALUATION_QUERIES] + [
+            "Lei Paulo Gustavo e PNAB: sobre o que trata o edital?",
+            "sobre sobre o que o filme fala de",
+            ""
+        ]
+
+        for query in queries:
+            lowered = query.lower()
+            expected = {label: sum(1 for kw in words if kw in lowered) for label, words in AGENT_KEYWORDS.items()}
+            assert automaton.scores(lowered) == expected, query
+
+    def test_overlapping_keywords(self):
+        """Overlapping and nested keywords are all reported"""
+        automaton = KeywordAutomaton({"a": ("he", "she", "hers"), "b": ("his",)})
+
+        assert automaton.matches("ushers") == {("a", "he"), ("a", "she"), ("a", "hers")}
+
+
+class TestIntentRouting:
+    """Keyword routing rules and centroid refinement"""
+
+    def test_routing_rules(self):
+        """Intent and keyword rules are preserved"""
+        classifier = IntentClassifier()
+
+        assert classifier.route("qualquer coisa", intent="RECOMMEND")["primary"] == "discovery"
+        assert classifier.route("O que é a Lei Paulo Gustavo?")["confidence"] == "high"
+        assert classifier.route("Quem dirigiu Ponteia Viola?")["needs_search"] is True
+        low = classifier.route("oi, tudo bem?")
+        assert low["confidence"] == "low"
+        assert low["candidates"] == ["discovery", "cinema", "cultural"]
+
+    def test_centroids_refine_low_confidence(self):
+        """Queries without keywords are routed by the nearest centroid"""
+        classifier = IntentClassifier()
+        vectors = {"cinema": [1.0, 0.0, 0.0], "cultural": [0.0, 1.0, 0.0], "discovery": [0.0, 0.0, 1.0]}
+
+        async def embed(query):
+            return np.array(vectors[dict(TRAINING_QUERIES)[query]])
+
+        assert asyncio.run(classifier.build_centroids(embed)) == len(TRAINING_QUERIES)
+
+        low = classifier.route("Onde foi gravado?")
+        refined = classifier.refine(low, np.array([0.1, 0.9, 0.2]))
+        assert refined["primary"] == "cultural"
+        assert refined["confidence"] == "centroid"
+
+        # Confident keyword routes are left alone
+        confident = classifier.route("Quem dirigiu Ponteia Viola?")
+        assert classifier.refine(confident, np.array([0.0, 1.0, 0.0])) is confident
+
+    def test_small_margin_keeps_keyword_route(self):
+        """Ambiguous embeddings do not override the default route"""
+        classifier = IntentClassifier(centroid_min_margin=0.1)
+        classifier.centroids = CentroidClassifier([("cinema", np.array([1.0, 0.0])), ("cultural", np.array([0.0, 1.0]))])
+
+        low = classifier.route("oi")
+        assert classifier.refine(low, np.array([1.0, 1.0]))["primary"] == "discovery"
+
+
+class TestRoutingBenchmark:
+    """Confusion matrix on the held-out labelled set"""
+
+    def test_evaluation_set_is_held_out(self):
+        """No evaluation query is used to build the centroids"""
+        training = {query for query, _ in TRAINING_QUERIES}
+
+        assert not training & {query for query, _ in EVALUATION_QUERIES}
+        assert {label for _, label in EVALUATION_QUERIES} == set(AGENT_LABELS)
+
+    def test_keyword_routing_accuracy(self):
+        """Keyword routing stays accurate on queries it was not written against"""
+        classifier = IntentClassifier()
+        report = confusion_matrix(lambda query: classifier.route(query)["primary"])
+
+        assert sum(sum(row.values()) for row in report["matrix"].values()) == len(EVALUATION_QUERIES)
+        assert report["accuracy"] >= 0.75
+        assert report["precision"]["cultural"] == 1.0
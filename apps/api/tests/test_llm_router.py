@@ -0,0 +1,194 @@
+"""
+LLM Router Tests
+Ranking, hedging, failover and circuit breaking with fake backends
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agents.llm_router import BackendStats, LLMBackendError, LLMRouter, LLMRouterError
+
+
+class FakeBackend:
+    """Backend that waits `delay` before its first chunk, or fails"""
+
+    def __init__(self, name, delay=0.0, fail=False, chunks=("ok",)):
+        self.name = name
+        self.provider = name.split(":")[0]
+        self.delay = delay
+        self.fail = fail
+        self.chunks = chunks
+        self.calls = 0
+        self.cancelled = False
+
+    async def stream(self, messages, **params):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise LLMBackendError(self.name, "boom", 500)
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+MESSAGES = [{"role": "user", "content": "oi"}]
+
+
+def build_router(*backends, hedge_after_ms=50):
+    return LLMRouter(
+        backends=list(backends),
+        routes={"chat": [backend.name for backend in backends]},
+        hedge_after_ms=hedge_after_ms
+    )
+
+
+class TestRouting:
+    """Backend selection and failover"""
+
+    def test_primary_answers(self):
+        """Fast primary answers without hedging"""
+        primary = FakeBackend("nim:a", chunks=("Eae", " parceiro"))
+        backup = FakeBackend("gemini:flash")
+        router = build_router(primary, backup)
+
+        assert asyncio.run(router.complete(MESSAGES)) == "Eae parceiro"
+        assert backup.calls == 0
+        assert router.stats["nim:a"].requests == 1
+
+    def test_hedge_after_deadline(self):
+        """Slow primary is hedged and the faster backup wins"""
+        primary = FakeBackend("nim:a", delay=1.0, chunks=("lento",))
+        backup = FakeBackend("gemini:flash", chunks=("rapido",))
+        router = build_router(primary, backup, hedge_after_ms=30)
+
+        assert asyncio.run(router.complete(MESSAGES)) == "rapido"
+        assert router.metrics["hedged"] == 1
+        assert router.stats["gemini:flash"].hedges_won == 1
+        assert primary.cancelled
+
+    def test_failover_on_error(self):
+        """Errors before the first token move to the next backend"""
+        primary = FakeBackend("nim:a", fail=True)
+        backup = FakeBackend("nim:b", chunks=("salvo",))
+        router = build_router(primary, backup, hedge_after_ms=1000)
+
+        assert asyncio.run(router.complete(MESSAGES)) == "salvo"
+        assert router.metrics["failovers"] == 1
+        assert router.stats["nim:a"].error_rate == 1.0
+
+    def test_all_backends_fail(self):
+        """Router error lists every backend failure"""
+        router = build_router(FakeBackend("nim:a", fail=True), FakeBackend("nim:b", fail=True))
+
+        with pytest.raises(LLMRouterError) as error:
+            asyncio.run(router.complete(MESSAGES))
+        assert len(error.value.errors) == 2
+
+    def test_rank_prefers_faster_and_skips_tripped(self):
+        """Lower TTFT ranks first; open circuits are skipped"""
+        a, b, c = FakeBackend("nim:a"), FakeBackend("nim:b"), FakeBackend("nim:c")
+        router = build_router(a, b, c)
+        for _ in range(5):
+            router.stats["nim:a"].record_success(900, 800)
+            router.stats["nim:b"].record_success(300, 100)
+        for _ in range(3):
+            router.stats["nim:c"].record_failure()
+
+        assert [backend.name for backend in router.rank("chat")] == ["nim:b", "nim:a"]
+
+
+class TestBackendStats:
+    """Rolling statistics"""
+
+    def test_circuit_reopens_after_cooldown(self):
+        """Breaker opens after consecutive failures and closes after cooldown"""
+        stats = BackendStats(failure_threshold=2, cooldown=0.0)
+        stats.record_failure()
+        stats.record_failure()
+        assert stats.healthy
+
+        stats = BackendStats(failure_threshold=2, cooldown=60.0)
+        stats.record_failure()
+        assert stats.healthy
+        stats.record_failure()
+        assert not stats.healthy
+
+    def test_percentiles(self):
+        """TTFT percentiles come from the rolling window"""
+        stats = BackendStats()
+        for ttft in (100, 200, 300, 400, 500):
+            stats.record_success(ttft * 2, ttft)
+
+        assert stats.ttft_percentile(0.5) == 300
+        assert stats.mean_latency() == 600
+
+
+class TestRunAgent:
+    """Agents go through the router only when it is enabled"""
+
+    def test_enabled_router_receives_agent_prompt(self, monkeypatch):
+        """System prompt comes from the agent's instructions"""
+        from types import SimpleNamespace
+        from agents import llm_router
+
+        seen = {}
+
+        class CapturingBackend(FakeBackend):
+            async def stream(self, messages, **params):
+                seen["messages"] = messages
+                seen["params"] = params
+                yield "roteado"
+
+        router = build_router(CapturingBackend("nim:a"))
+        router.routes["cinema"] = ["nim:a"]
+        monkeypatch.setattr(llm_router, "_llm_router", router)
+
+        agent = SimpleNamespace(
+            description="Deronas",
+            instructions=["Seja visceral."],
+            model=SimpleNamespace(temperature=0.3, top_p=0.8, max_tokens=512),
+            run=lambda prompt: pytest.fail("agent.run must not be called")
+        )
+
+        assert asyncio.run(llm_router.run_agent(agent, "quem dirigiu?", task="cinema")) == "roteado"
+        assert seen["messages"][0] == {"role": "system", "content": "Deronas\n\nSeja visceral."}
+        assert seen["params"]["temperature"] == 0.3
+
+        router.enabled = False
+        agent.run = lambda prompt: SimpleNamespace(content="direto")
+        assert asyncio.run(llm_router.run_agent(agent, "quem dirigiu?", task="cinema")) == "direto"
+
+    def test_disabled_router_does_not_block_event_loop(self, monkeypatch):
+        """The agent's blocking run happens off the event loop"""
+        from types import SimpleNamespace
+        from agents import llm_router
+
+        router = build_router(FakeBackend("nim:a"))
+        router.enabled = False
+        monkeypatch.setattr(llm_router, "_llm_router", router)
+
+        def blocking_run(prompt):
+            time.sleep(0.3)
+            return SimpleNamespace(content="direto")
+
+        agent = SimpleNamespace(run=blocking_run)
+
+        async def scenario():
+            task = asyncio.create_task(llm_router.run_agent(agent, "quem dirigiu?", task="cinema"))
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            ticked = time.perf_counter() - started
+            return ticked, await task
+
+        ticked, result = asyncio.run(scenario())
+
+        assert result == "direto"
+        assert ticked < 0.2
@@ -0,0 +1,179 @@
+"""
+Odds Engine Tests
+Tests for pool-based odds, RL adjustment and live updates
+"""
+
+import asyncio
+import copy
+from datetime import datetime
+
+import pytest
+
+from agents import odds_engine
+from agents.betting_rl_agent import BettingRLAgent
+from agents.odds_engine import OddsEngine
+
+
+def make_engine(agent=None, **kwargs):
+    agent = agent or BettingRLAgent()
+    return OddsEngine(agent_provider=lambda: agent, persist=False, **kwargs), agent
+
+
+class TestPoolOdds:
+    """Parimutuel base odds from running totals"""
+
+    def test_empty_pool_is_even(self):
+        """Without bets both sides get (1 - edge) * 2"""
+        engine, agent = make_engine()
+        assert engine.quote("b1", "alice") == pytest.approx(round(2 * (1 - agent.target_house_edge), 2))
+
+    def test_odds_follow_the_pool(self):
+        """The side with more money gets shorter odds"""
+        engine, _ = make_engine(prior=10)
+        engine.record_bet("b1", "alice", 300)
+        update = engine.record_bet("b1", "bob", 100)
+
+        assert update["total_bets"] == 2
+        assert update["totals"] == {"alice": 300, "bob": 100}
+        assert update["odds"]["alice"] < update["odds"]["bob"]
+        assert engine.quote("b1", "alice") == update["odds"]["alice"]
+
+    def test_rl_action_adjusts_odds(self):
+        """The greedy action of the pool state is applied to the base odds"""
+        agent = BettingRLAgent()
+        engine, _ = make_engine(agent)
+        baseline = engine.quote("b1", "alice")
+
+        pool = engine.get_pool("b1")
+        state_id = agent.discretizer.encode_features("ai_vs_ai", 0, 0.5, 0.5)
+        agent.q_table[state_id]["increase_odds_10"] = 5.0
+        pool.odds.clear()
+
+        assert engine.quote("b1", "alice") == pytest.approx(round(baseline * 1.10, 2))
+        assert agent.get_audit_trail(battle_id="b1")[-1]["contestant"] == "alice"
+
+    def test_odds_stay_within_agent_bounds(self):
+        """Lopsided pools are clamped to min/max odds"""
+        engine, agent = make_engine(prior=1)
+        update = engine.record_bet("b1", "alice", 10000)
+        assert update["odds"]["alice"] >= agent.min_odds
+        assert engine.quote("b1", "bob") <= agent.max_odds
+
+
+class TestPersistenceAndUpdates:
+    """$inc backing and subscriber updates"""
+
+    def test_stored_totals_are_authoritative(self, monkeypatch):
+        """Pools load once and take the $inc result (bets from other workers)"""
+        calls = {"get": 0}
+
+        class FakePoolDB:
+            @staticmethod
+            def get_pool(battle_id):
+                calls["get"] += 1
+                return {"totals": {"alice": 50}, "counts": {"alice": 1}, "total_amount": 50, "total_bets": 1}
+
+            @staticmethod
+            def add_bet(battle_id, bet_on, amount):
+                return {"totals": {"alice": 50 + 70, bet_on: amount}, "counts": {}, "total_amount": 50 + 70 + amount,
+                        "total_bets": 3}
+
+        monkeypatch.setattr(odds_engine, "BattlePoolDB", FakePoolDB)
+        monkeypatch.setattr(odds_engine, "MONGODB_ENABLED", True)
+        agent = BettingRLAgent()
+        engine = OddsEngine(agent_provider=lambda: agent)
+
+        assert engine.get_pool("b1").total_amount == 50
+        update = engine.record_bet("b1", "bob", 20)
+        assert update["total_bets"] == 3
+        assert update["totals"] == {"alice": 120, "bob": 20}
+        assert calls["get"] == 1
+
+    def test_subscribers_receive_latest_odds(self):
+        """Updates are queued per battle; full queues keep the newest"""
+        async def scenario():
+            engine, _ = make_engine()
+            queue = engine.subscribe("b1", maxsize=1)
+            other = engine.subscribe("b2")
+            engine.record_bet("b1", "alice", 10)
+            engine.record_bet("b1", "alice", 10)
+            update = queue.get_nowait()
+            engine.unsubscribe("b1", queue)
+            return engine, update, other
+
+        engine, update, other = asyncio.run(scenario())
+        assert update["version"] == 2
+        assert other.empty()
+        assert engine.get_stats()["subscribers"] == 1
+
+    def test_pool_cache_is_bounded(self):
+        """Least recently updated battles are dropped"""
+        engine, _ = make_engine(max_pools=2)
+        engine.record_bet("b1", "alice", 10)
+        engine.record_bet("b2", "alice", 10)
+        engine.record_bet("b1", "alice", 10)
+        engine.record_bet("b3", "alice", 10)
+        assert set(engine.pools) == {"b1", "b3"}
+
+
+class SharedPoolStore:
+    """battle_pools shared by several workers"""
+
+    def __init__(self):
+        self.pools = {}
+
+    def get_pool(self, battle_id):
+        pool = self.pools.get(battle_id)
+        return copy.deepcopy(pool) if pool else None
+
+    def add_bet(self, battle_id, bet_on, amount):
+        pool = self.pools.setdefault(battle_id, {"battle_id": battle_id, "totals": {}, "counts": {},
+                                                 "total_amount": 0, "total_bets": 0})
+        pool["totals"][bet_on] = pool["totals"].get(bet_on, 0) + amount
+        pool["counts"][bet_on] = pool["counts"].get(bet_on, 0) + 1
+        pool["total_amount"] += amount
+        pool["total_bets"] += 1
+        pool["updated_at"] = datetime.utcnow()
+        return copy.deepcopy(pool)
+
+    def get_pools_updated_since(self, battle_ids, since):
+        return [copy.deepcopy(p) for b, p in self.pools.items() if b in battle_ids and p["updated_at"] > since]
+
+
+class TestMultipleWorkers:
+    """Engines of different workers share battle_pools"""
+
+    def workers(self, monkeypatch):
+        store = SharedPoolStore()
+        monkeypatch.setattr(odds_engine, "BattlePoolDB", store)
+        monkeypatch.setattr(odds_engine, "MONGODB_ENABLED", True)
+        agent = BettingRLAgent()
+        first = OddsEngine(agent_provider=lambda: agent)
+        second = OddsEngine(agent_provider=lambda: agent)
+        return first, second
+
+    def test_quotes_follow_bets_on_other_workers(self, monkeypatch):
+        """A worker that priced the battle earlier does not quote stale odds"""
+        first, second = self.workers(monkeypatch)
+        first.record_bet("b1", "alice", 10)
+        second.quote("b1", "alice")
+
+        first.record_bet("b1", "alice", 10000)
+        assert second.quote("b1", "alice") == first.quote("b1", "alice")
+        assert second.quote("b1", "alice") < 1.5
+
+    def test_poll_publishes_bets_from_other_workers(self, monkeypatch):
+        """SSE subscribers on one worker see bets placed on another"""
+        async def scenario():
+            first, second = self.workers(monkeypatch)
+            queue = second.subscribe("b1")
+            first.record_bet("b1", "alice", 500)
+            await second.poll()
+            update = queue.get_nowait()
+            # Unchanged pools are not published again
+            await second.poll()
+            return update, queue.empty()
+
+        update, drained = asyncio.run(scenario())
+        assert update["totals"] == {"alice": 500}
+        assert drained
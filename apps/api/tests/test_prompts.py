@@ -0,0 +1,103 @@
+"""
+Prompt Compilation Tests
+Tests for compiled system prompts, token counts and context budgets
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from agents.cinema_agent import CinemaAgent
+from agents.cultural_agent import CulturalAgent
+from agents.discovery_agent import DiscoveryAgent
+from agents.llm_router import GeminiBackend
+from agents.prompts import compile_prompt, count_tokens, fit_blocks, get_prompt_stats
+
+
+class TestCompiledPrompts:
+    """Static prompt assembly"""
+
+    def test_compiled_once_and_registered(self):
+        """Same parts return the same instance with a stable fingerprint"""
+        first = compile_prompt("test", "Você é a Deronas.", "Seja visceral.")
+        second = compile_prompt("test", "Você é a Deronas.", "Seja visceral.")
+
+        assert first is second
+        assert first.text == "Você é a Deronas.\n\nSeja visceral."
+        assert get_prompt_stats()["test"]["tokens"] == first.tokens > 0
+
+    def test_agents_share_prompt_across_instances(self):
+        """Every DiscoveryAgent reuses the same byte-identical system prompt"""
+        first = DiscoveryAgent("test-key", [])
+        second = DiscoveryAgent("test-key", [])
+
+        assert first.system_prompt is second.system_prompt
+        assert "DERONAS" in first.system_prompt.text
+
+    def test_agno_agents_use_compiled_prompt(self):
+        """The agent's own model call sends the compiled prompt, not Agno's default"""
+        discovery = DiscoveryAgent("test-key", [])
+        cinema = CinemaAgent("test-key")
+        cultural = CulturalAgent("test-key")
+
+        for agent in (discovery, cinema, cultural):
+            assert agent.agent.system_message == agent.system_prompt.text
+
+    def test_token_count_cached(self):
+        """Counting the same text twice hits the cache"""
+        count_tokens.cache_clear()
+        count_tokens("Ponteia Viola")
+        count_tokens("Ponteia Viola")
+
+        assert count_tokens.cache_info().hits == 1
+
+
+class TestContextBudget:
+    """Dynamic RAG context trimming"""
+
+    def test_fit_blocks_keeps_best_blocks_within_budget(self):
+        """Blocks are kept in order until the budget is used"""
+        blocks = ["a" * 40, "b" * 40, "c" * 40]
+        text = fit_blocks(blocks, max_tokens=25, header="H:")
+
+        assert text.startswith("H:")
+        assert "a" * 40 in text and "b" * 40 in text
+        assert "c" * 40 not in text
+        assert fit_blocks(blocks, max_tokens=1) == ""
+
+    def test_recommendation_prompt_respects_budget(self):
+        """Low budgets drop the least similar productions"""
+        agent = DiscoveryAgent("test-key", [])
+        agent.context_tokens = 80
+        production = {"titulo": "Ponteia Viola", "tema": "musica"}
+        similar = [
+            {"titulo": f"Filme {i}", "diretor": "Ana", "sinopse": "x" * 200, "similarity": 0.9 - i / 10}
+            for i in range(5)
+        ]
+
+        prompt = agent._recommendation_prompt(production, similar)
+
+        assert "Filme 0" in prompt
+        assert "Filme 4" not in prompt
+
+
+class TestGeminiPrefix:
+    """Gemini receives system messages as a separate system instruction"""
+
+    def test_system_messages_become_system_instruction(self):
+        """Static prefix is not mixed into the user prompt"""
+        seen = {}
+
+        async def stream_content(prompt, **kwargs):
+            seen["prompt"] = prompt
+            seen.update(kwargs)
+            yield "ok"
+
+        backend = GeminiBackend("flash", SimpleNamespace(stream_content=stream_content))
+        messages = [{"role": "system", "content": "Você é a Deronas."}, {"role": "user", "content": "oi"}]
+
+        async def run():
+            return [chunk async for chunk in backend.stream(messages)]
+
+        assert asyncio.run(run()) == ["ok"]
+        assert seen["system_instruction"] == "Você é a Deronas."
+        assert seen["prompt"] == "oi"
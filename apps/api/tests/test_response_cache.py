@@ -0,0 +1,107 @@
+"""
+Response Cache Tests
+Tests for the agent answer cache (in-memory, no MongoDB)
+"""
+
+import time
+
+from agents.response_cache import ResponseCache, normalize_query, compute_catalog_version
+
+
+RESULT = {"response": "Margarida Chaves dirigiu Ponteia Viola.", "agent": "CinemaAgent", "metadata": {}}
+
+
+def build_cache(**kwargs) -> ResponseCache:
+    return ResponseCache(catalog_version="v1", persist=False, **kwargs)
+
+
+class TestResponseCache:
+    """Test suite for ResponseCache"""
+
+    def test_normalize_query(self):
+        """Case, accents and punctuation do not change the key"""
+        assert normalize_query("Quem dirigiu  Ponteia Viola?") == "quem dirigiu ponteia viola"
+        assert normalize_query("Documentário") == normalize_query("documentario")
+
+    def test_exact_hit_after_normalization(self):
+        """Repeated questions hit the cache"""
+        cache = build_cache()
+        cache.set("Quem dirigiu Ponteia Viola?", "INFO", "cinema", RESULT)
+
+        assert cache.get("quem dirigiu ponteia viola", "INFO", "cinema") == RESULT
+        assert cache.get("quem dirigiu ponteia viola", "SEARCH", "cinema") is None
+        assert cache.get("quem dirigiu ponteia viola", "INFO", "discovery") is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_stored_result_is_isolated(self):
+        """Mutating the caller's result does not change the cached entry"""
+        cache = build_cache()
+        result = dict(RESULT)
+        cache.set("pergunta", "INFO", "cinema", result)
+        result["rl_score"] = 0.9
+
+        assert "rl_score" not in cache.get("pergunta", "INFO", "cinema")
+
+    def test_ttl_expiry(self):
+        """Expired entries are not served"""
+        cache = build_cache(ttl_seconds=0)
+        cache.set("pergunta", "INFO", "cinema", RESULT)
+        time.sleep(0.01)
+
+        assert cache.get("pergunta", "INFO", "cinema") is None
+
+    def test_lru_eviction(self):
+        """Least recently used entry is evicted first"""
+        cache = build_cache(max_entries=2)
+        cache.set("a", None, "cinema", RESULT)
+        cache.set("b", None, "cinema", RESULT)
+        cache.get("a", None, "cinema")
+        cache.set("c", None, "cinema", RESULT)
+
+        assert cache.get("b", None, "cinema") is None
+        assert cache.get("a", None, "cinema") is not None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_semantic_hit_respects_threshold_and_scope(self):
+        """Similar embeddings reuse answers only within the same agent scope"""
+        cache = build_cache(semantic_enabled=True, semantic_threshold=0.9)
+        cache.set("quem dirigiu ponteia viola", "INFO", "cinema", RESULT, [1.0, 0.0, 0.0])
+
+        assert cache.get("quem fez ponteia viola", "INFO", "cinema", [0.99, 0.05, 0.0]) == RESULT
+        assert cache.get("outra pergunta", "INFO", "cinema", [0.0, 1.0, 0.0]) is None
+        assert cache.get("quem fez ponteia viola", "INFO", "cultural", [0.99, 0.05, 0.0]) is None
+        assert cache.get_stats()["semantic_hits"] == 1
+
+    def test_catalog_version_changes_with_catalog(self):
+        """Changing a synopsis changes the catalog version"""
+        catalog = [{"id": 1, "titulo": "Ponteia Viola", "metadata": {"sinopse": "a"}}]
+        changed = [{"id": 1, "titulo": "Ponteia Viola", "metadata": {"sinopse": "b"}}]
+
+        assert compute_catalog_version(catalog) != compute_catalog_version(changed)
+
+    def test_warm_up_reads_mongo_times_as_utc(self, monkeypatch):
+        """Naive UTC expiry times are not shifted by the server's timezone"""
+        from datetime import datetime, timedelta
+
+        from agents import response_cache
+
+        class FakeResponseCacheDB:
+            @staticmethod
+            def load_recent(catalog_version, limit):
+                return [{"key": "k", "agent": "cinema", "result": RESULT,
+                         "expires_at": datetime.utcnow() + timedelta(seconds=600)}]
+
+        monkeypatch.setattr(response_cache, "ResponseCacheDB", FakeResponseCacheDB)
+        monkeypatch.setenv("TZ", "America/Sao_Paulo")
+        time.tzset()
+        try:
+            cache = build_cache(ttl_seconds=3600)
+            cache._warm_from_db()
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+        assert abs(cache._entries["k"]["expires_at"] - (time.time() + 600)) < 5
@@ -0,0 +1,109 @@
+"""
+Ring Buffer Tests
+Tests for bounded RL score/decision histories and their running statistics
+"""
+
+import numpy as np
+import pytest
+
+from agents.betting_rl_agent import BettingRLAgent
+from agents.ring_buffer import DecisionRing, RunningStats, ScoreRing
+
+
+class TestScoreRing:
+    """Bounded score history with incremental statistics"""
+
+    def test_statistics_match_recomputation(self):
+        """Running mean/variance/improvement equal a full recomputation"""
+        rng = np.random.default_rng(7)
+        ring = ScoreRing(capacity=100, window=20)
+        history = []
+
+        for value in rng.random(537):
+            ring.append(value)
+            history.append(value)
+            window = np.array(history[-100:])
+
+            assert len(ring) == len(window)
+            assert ring.mean == pytest.approx(window.mean())
+            assert ring.variance == pytest.approx(window.var(), abs=1e-9)
+            if len(window) >= 40:
+                first, last = window[:20].mean(), window[-20:].mean()
+                assert ring.improvement_rate() == pytest.approx((last - first) / first * 100)
+            else:
+                assert ring.improvement_rate() == 0.0
+
+        np.testing.assert_allclose(ring.values(), history[-100:])
+        assert ring.total.count == 537
+        assert ring.total.mean == pytest.approx(np.mean(history))
+
+    def test_window_must_fit_twice(self):
+        with pytest.raises(ValueError):
+            ScoreRing(capacity=30, window=20)
+
+
+class TestRunningStats:
+    def test_welford(self):
+        values = [0.2, 0.4, 0.9, 1.5]
+        stats = RunningStats()
+        for value in values:
+            stats.push(value)
+
+        assert stats.mean == pytest.approx(np.mean(values))
+        assert stats.std == pytest.approx(np.std(values))
+
+
+class TestDecisionRing:
+    """Bounded decision history written through to the audit log"""
+
+    def test_every_decision_reaches_the_sink(self):
+        """Memory stays bounded and every record is handed over when appended"""
+        logged = []
+        ring = DecisionRing(capacity=10, sink=logged.append)
+
+        for i in range(27):
+            ring.append({"id": i, "battle_id": f"b{i % 2}", "exploration": i % 3 == 0, "q_value": i})
+
+        assert len(ring) == 10
+        assert [d["id"] for d in logged] == list(range(27))
+        assert ring.total == 27
+        assert ring.exploration_rate == pytest.approx(9 / 27)
+
+    def test_sink_errors_do_not_drop_records_from_memory(self):
+        """A failing sink is counted; the ring still records the decision"""
+        def broken(record):
+            raise RuntimeError("audit down")
+
+        ring = DecisionRing(capacity=10, sink=broken)
+        ring.append({"id": 1})
+
+        assert ring.sink_errors == 1
+        assert [d["id"] for d in ring.recent()] == [1]
+
+    def test_recent_filters_by_battle(self):
+        """Audit trail is chronological and filterable"""
+        ring = DecisionRing(capacity=10)
+        for i in range(15):
+            ring.append({"id": i, "battle_id": f"b{i % 2}"})
+
+        assert [d["id"] for d in ring.recent(limit=3)] == [12, 13, 14]
+        assert [d["id"] for d in ring.recent(limit=100, battle_id="b1")] == [5, 7, 9, 11, 13]
+        assert ring.recent(limit=2, battle_id="missing") == []
+
+
+class TestBettingAgentHistory:
+    """BettingRLAgent keeps a bounded audit trail"""
+
+    def test_decisions_are_bounded(self):
+        logged = []
+        agent = BettingRLAgent(history_capacity=50, audit_sink=logged.append)
+
+        for i in range(300):
+            agent.select_action("state", 2.0, battle_id=f"battle-{i % 3}")
+
+        assert len(agent.decision_history) == 50
+        assert len(logged) == 300
+        assert len(agent.get_audit_trail("battle-1", limit=10)) == 10
+        report = agent.get_fairness_report()
+        assert report["total_decisions"] == 300
+        assert report["exploration_rate"] == 0
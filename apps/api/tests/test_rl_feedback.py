@@ -0,0 +1,227 @@
+"""
+RL Feedback Tests
+Tests for the array-backed Q-table of DeterministicRLAgent and its shared update log
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from agents.rl_feedback import DeterministicRLAgent, QTableLog
+
+
+def reference_update(q_table, state, action, reward, next_state=None, alpha=0.1, gamma=0.9):
+    """Dict-based Q-learning update the array version must reproduce"""
+    key = f"{state}:{action}"
+    max_next_q = 0.0
+    if next_state:
+        next_actions = [k for k in q_table if k.startswith(f"{next_state}:")]
+        if next_actions:
+            max_next_q = max(q_table[k] for k in next_actions)
+    q_table[key] = (1 - alpha) * q_table.get(key, 0.0) + alpha * (reward + gamma * max_next_q)
+    return q_table[key]
+
+
+@pytest.fixture
+def agent(tmp_path):
+    return DeterministicRLAgent(q_table_path=str(tmp_path / "q_table.json"))
+
+
+class TestQArray:
+    """Dense Q-array behaviour"""
+
+    def test_updates_match_dict_implementation(self, agent):
+        """Same Q-values as the string-keyed table, including next-state max"""
+        reference = {}
+        steps = [
+            ("INFO:Cinema:short", "respond", 0.8, None),
+            ("INFO:Cultural:short", "respond", 0.5, "INFO:Cinema:short"),
+            ("SEARCH:Discovery:long", "respond", 1.0, "INFO:Cultural:short"),
+            ("INFO:Cinema:short", "clarify", 0.3, "SEARCH:Discovery:long"),
+            ("INFO:Cinema:short", "respond", 0.6, "UNSEEN:Cinema:short"),
+        ]
+
+        for state, action, reward, next_state in steps:
+            expected = reference_update(reference, state, action, reward, next_state)
+            assert agent.update_q_value(state, action, reward, next_state) == pytest.approx(expected)
+
+        assert agent.q_table == pytest.approx(reference)
+
+    def test_new_axis_values_grow_the_array(self, agent):
+        """Unknown intents/agents are appended without losing values"""
+        agent.update_q_value("INFO:Cinema:short", "respond", 1.0)
+        agent.update_q_value("CHAT:FallbackAgent:medium", "respond", 0.5)
+
+        assert agent.get_q_value("INFO:Cinema:short", "respond") == pytest.approx(0.1)
+        assert agent.get_q_value("CHAT:FallbackAgent:medium", "respond") == pytest.approx(0.05)
+        assert agent.get_stats()["q_table_size"] == 2
+
+    def test_best_action_and_agent(self, agent):
+        """Argmax keeps the first candidate on ties"""
+        assert agent.get_best_action("INFO:Cinema:short", ["respond", "clarify"]) == ("respond", 0.0)
+        agent.update_q_value("INFO:Cinema:short", "clarify", 1.0)
+        assert agent.get_best_action("INFO:Cinema:short", ["respond", "clarify"])[0] == "clarify"
+
+        assert agent.get_best_agent("INFO", 10, ["Cinema", "Cultural", "Discovery"])[0] == "Cinema"
+        agent.update_q_value(agent.encode_state("INFO", "Cultural", 10), "respond", 1.0)
+        assert agent.get_best_agent("INFO", 10, ["Cinema", "Cultural", "Discovery"])[0] == "Cultural"
+        # A different length bucket is a different state
+        assert agent.get_best_agent("INFO", 400, ["Cinema", "Cultural", "Discovery"])[0] == "Cinema"
+
+    def test_stats_best_agent(self, agent):
+        """Best agent is the highest mean of visited Q-values"""
+        agent.update_q_value("INFO:Cinema:short", "respond", 0.2)
+        agent.update_q_value("INFO:Discovery:short", "respond", 0.9)
+        agent.update_q_value("SEARCH:Discovery:long", "respond", 0.7)
+
+        stats = agent.get_stats()
+        assert stats["best_agent"] == "Discovery"
+        assert stats["q_table_size"] == 3
+
+
+class TestJSONCompatibility:
+    """Import/export keeps the string-keyed JSON format"""
+
+    def test_round_trip(self, tmp_path):
+        """Legacy files load into the array and save back unchanged"""
+        path = tmp_path / "q_table.json"
+        legacy = {
+            "INFO:Cultural:short:respond": 0.42,
+            "SEARCH:Discovery:medium:respond": 0.17,
+            "GENERAL:Fallback:long:respond": 0.05
+        }
+        path.write_text(json.dumps({"q_table": legacy, "metadata": {"interactions": 7}}))
+
+        agent = DeterministicRLAgent(q_table_path=str(path))
+        assert agent.interaction_count == 7
+        assert agent.get_q_value("INFO:Cultural:short", "respond") == pytest.approx(0.42)
+
+        agent.save_q_table()
+        saved = json.loads(path.read_text())
+        assert saved["q_table"] == pytest.approx(legacy)
+        assert saved["metadata"]["interactions"] == 7
+
+
+def make_worker(path, compact_bytes=1_000_000):
+    """One uvicorn worker: its own agent + log handle on the shared files"""
+    worker = DeterministicRLAgent(q_table_path=str(path))
+    worker.update_log = QTableLog(worker, compact_bytes=compact_bytes)
+    return worker
+
+
+class TestSharedUpdateLog:
+    """Append-only log shared by workers + compacted snapshots"""
+
+    def test_updates_stay_off_disk_until_sync(self, tmp_path):
+        """The request path only queues the update"""
+        worker = make_worker(tmp_path / "q.json")
+        worker.update_q_value("INFO:Cinema:short", "respond", 1.0)
+
+        assert not (tmp_path / "q.json.log").exists()
+        asyncio.run(worker.update_log.sync())
+        assert (tmp_path / "q.json.log").read_text().count("\n") == 1
+
+    def test_workers_converge(self, tmp_path):
+        """Each worker replays the updates the others logged"""
+        path = tmp_path / "q.json"
+        first, second = make_worker(path), make_worker(path)
+
+        async def run():
+            first.update_q_value("INFO:Cinema:short", "respond", 1.0)
+            await first.update_log.sync()
+            await second.update_log.sync()
+            second.update_q_value("INFO:Cinema:short", "respond", 0.5)
+            second.update_q_value("SEARCH:Discovery:long", "respond", 0.8)
+            await second.update_log.sync()
+            await first.update_log.sync()
+
+        asyncio.run(run())
+
+        assert first.q_table == pytest.approx(second.q_table)
+        assert first.get_q_value("INFO:Cinema:short", "respond") == pytest.approx(0.9 * 0.1 + 0.1 * 0.5)
+        assert first.interaction_count == second.interaction_count == 3
+
+    def test_compaction_writes_snapshot_and_truncates(self, tmp_path):
+        """Compaction folds the log into an atomic snapshot other workers reload"""
+        path = tmp_path / "q.json"
+        first, second = make_worker(path, compact_bytes=1), make_worker(path)
+
+        async def run():
+            first.update_q_value("INFO:Cinema:short", "respond", 1.0)
+            first.update_q_value("INFO:Cultural:short", "respond", 0.4)
+            await first.update_log.sync()
+            await second.update_log.sync()
+
+        asyncio.run(run())
+
+        snapshot = json.loads(path.read_text())
+        assert snapshot["q_table"] == pytest.approx(first.q_table)
+        assert snapshot["metadata"]["interactions"] == 2
+        assert (tmp_path / "q.json.log").read_text() == ""
+        assert second.q_table == pytest.approx(first.q_table)
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_crash_before_log_reset_does_not_replay(self, tmp_path, monkeypatch):
+        """A log already folded into the snapshot is skipped after a crash"""
+        path = tmp_path / "q.json"
+        first = make_worker(path, compact_bytes=1)
+
+        def crash():
+            raise OSError("killed")
+        monkeypatch.setattr(first.update_log, "_replace_log", crash)
+        first.update_q_value("INFO:Cinema:short", "respond", 1.0)
+        asyncio.run(first.update_log.sync())
+        assert json.loads(path.read_text())["q_table"] == {"INFO:Cinema:short:respond": pytest.approx(0.1)}
+
+        # Restarted worker: compacts the leftover log again, another one just reloads
+        restarted, reader = make_worker(path, compact_bytes=1), make_worker(path)
+        asyncio.run(reader.update_log.sync())
+        asyncio.run(restarted.update_log.sync())
+        asyncio.run(reader.update_log.sync())
+
+        for worker in (restarted, reader):
+            assert worker.q_table == {"INFO:Cinema:short:respond": pytest.approx(0.1)}
+            assert worker.interaction_count == 1
+        assert (tmp_path / "q.json.log").read_text() == ""
+
+    def test_partial_line_is_ignored(self, tmp_path):
+        """A torn final line (crash mid-write) is not replayed"""
+        path = tmp_path / "q.json"
+        (tmp_path / "q.json.log").write_text(
+            '{"w":"old","s":"INFO:Cinema:short","a":"respond","r":1.0,"n":null}\n{"w":"old","s":"INF'
+        )
+        worker, other = make_worker(path), make_worker(path)
+        worker.update_q_value("INFO:Cultural:short", "respond", 1.0)
+
+        asyncio.run(worker.update_log.sync())
+        asyncio.run(other.update_log.sync())
+
+        expected = {"INFO:Cinema:short:respond": 0.1, "INFO:Cultural:short:respond": 0.1}
+        assert worker.q_table == pytest.approx(expected)
+        assert other.q_table == pytest.approx(expected)
+
+
+class TestScoresEndpoint:
+    """GET /api/rl/scores reads the score ring"""
+
+    def test_returns_last_scores(self, monkeypatch, agent):
+        """The last `limit` scores are returned in chronological order"""
+        from types import SimpleNamespace
+
+        from fastapi.testclient import TestClient
+
+        import main
+
+        for score in (0.1, 0.2, 0.3, 0.4):
+            agent.scores_history.append(score)
+        manager = SimpleNamespace(rl_feedback=SimpleNamespace(enabled=True, rl_agent=agent))
+        monkeypatch.setattr(main, "AGI_AVAILABLE", True)
+        monkeypatch.setattr(main, "agent_manager", manager)
+
+        data = TestClient(main.app).get("/api/rl/scores", params={"limit": 3}).json()
+
+        assert data["enabled"] is True
+        assert data["scores"] == [0.2, 0.3, 0.4]
+        assert data["count"] == 3
+        assert data["average"] == pytest.approx(0.3)
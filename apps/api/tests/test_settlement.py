@@ -0,0 +1,335 @@
+"""
+Battle Settlement Tests
+Tests for bulk, idempotent and resumable bet settlement
+"""
+
+import copy
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import database
+from database import BettingDB
+
+
+def get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in cond):
+                return False
+            continue
+        value = get_path(doc, key)
+        if isinstance(cond, dict) and any(op.startswith("$") for op in cond):
+            for op, arg in cond.items():
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$exists" and (value is not None) != arg:
+                    return False
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+                if op == "$gte" and not (value is not None and value >= arg):
+                    return False
+                if op == "$ne" and (arg in value if isinstance(value, list) else value == arg):
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+def apply_update(doc, update):
+    for key, value in update.get("$set", {}).items():
+        doc[key] = copy.deepcopy(value)
+    for key, value in update.get("$inc", {}).items():
+        doc[key] = doc.get(key, 0) + value
+    for key, value in update.get("$push", {}).items():
+        if not (isinstance(value, dict) and "$each" in value):
+            value = {"$each": [value]}
+        items = doc.get(key, []) + value["$each"]
+        doc[key] = items[value["$slice"]:] if value.get("$slice") else items
+    for key, value in update.get("$pull", {}).items():
+        doc[key] = [item for item in doc.get(key, []) if item not in value["$in"]]
+
+
+class Result:
+    def __init__(self, modified_count=0):
+        self.modified_count = modified_count
+
+
+class Cursor(list):
+    def sort(self, key, direction=1):
+        return Cursor(sorted(self, key=lambda d: d[key], reverse=direction == -1))
+
+    def limit(self, n):
+        return Cursor(self[:n]) if n else self
+
+
+class Collection:
+    """In-memory subset of a pymongo collection"""
+
+    def __init__(self):
+        self.docs = []
+        self.calls = defaultdict(int)
+        self.fail_bulk_after = None
+
+    def find(self, query=None, projection=None):
+        self.calls["find"] += 1
+        return Cursor(copy.deepcopy(d) for d in self.docs if matches(d, query or {}))
+
+    def find_one(self, query):
+        return next((copy.deepcopy(d) for d in self.docs if matches(d, query)), None)
+
+    def count_documents(self, query):
+        return sum(1 for d in self.docs if matches(d, query))
+
+    def distinct(self, key, query):
+        return sorted({get_path(d, key) for d in self.docs if matches(d, query)})
+
+    def update_one(self, query, update, upsert=False):
+        self.calls["update_one"] += 1
+        for doc in self.docs:
+            if matches(doc, query):
+                apply_update(doc, update)
+                return Result(1)
+        return Result(0)
+
+    def update_many(self, query, update):
+        self.calls["update_many"] += 1
+        matched = [doc for doc in self.docs if matches(doc, query)]
+        for doc in matched:
+            apply_update(doc, update)
+        return Result(len(matched))
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                apply_update(doc, update)
+                return copy.deepcopy(doc)
+        if not upsert:
+            return None
+        doc = {"_id": query["_id"], **copy.deepcopy(update.get("$setOnInsert", {}))}
+        apply_update(doc, update)
+        self.docs.append(doc)
+        return copy.deepcopy(doc)
+
+    def bulk_write(self, requests, ordered=True):
+        self.calls["bulk_write"] += 1
+        self._maybe_fail()
+        modified = 0
+        for request in requests:
+            modified += self.update_one(request._filter, request._doc).modified_count
+        return Result(modified)
+
+    def _maybe_fail(self):
+        if self.fail_bulk_after is not None:
+            if self.fail_bulk_after == 0:
+                self.fail_bulk_after = None
+                raise RuntimeError("connection lost")
+            self.fail_bulk_after -= 1
+
+    def aggregate(self, pipeline):
+        """$match + $group with $sum of 1 or a field path"""
+        match, group = pipeline[0]["$match"], pipeline[1]["$group"]
+        groups = {}
+        for doc in self.docs:
+            if not matches(doc, match):
+                continue
+            out = groups.setdefault(get_path(doc, group["_id"][1:]), {"_id": get_path(doc, group["_id"][1:])})
+            for field, spec in group.items():
+                if field != "_id":
+                    arg = spec["$sum"]
+                    out[field] = out.get(field, 0) + (get_path(doc, arg[1:]) or 0 if isinstance(arg, str) else arg)
+        return list(groups.values())
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(copy.deepcopy(doc))
+
+    def insert_many(self, docs, ordered=True):
+        self.calls["insert_many"] += 1
+        errors = []
+        for i, doc in enumerate(docs):
+            if any(d["_id"] == doc["_id"] for d in self.docs):
+                errors.append({"index": i, "code": 11000})
+            else:
+                self.docs.append(copy.deepcopy(doc))
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = defaultdict(Collection)
+    monkeypatch.setattr(database, "get_database", lambda: fake)
+    return fake
+
+
+def seed(db, bets):
+    """bets: (user_id, bet_on, amount, odds)"""
+    for user_id in {bet[0] for bet in bets}:
+        db["wallets"].docs.append({"user_id": user_id, "balance": 0, "total_earned": 0})
+    for user_id, bet_on, amount, odds in bets:
+        db["bet_records"].docs.append({
+            "_id": ObjectId(), "user_id": user_id, "battle_id": "b1", "bet_on": bet_on,
+            "bet_amount": amount, "odds": odds, "status": "pending"
+        })
+
+
+def balances(db):
+    return {w["user_id"]: w["balance"] for w in db["wallets"].docs}
+
+
+class TestSettleBattle:
+    """Bulk settlement"""
+
+    def test_settles_all_bets(self, db):
+        seed(db, [("u1", "alice", 100, 2.0), ("u1", "alice", 50, 1.5), ("u2", "bob", 80, 2.0),
+                  ("u3", "alice", 10, 3.0)])
+        job = BettingDB.settle_battle("b1", "alice", chunk_size=2)
+
+        assert job["status"] == "completed"
+        assert (job["processed"], job["won"], job["lost"], job["payout_total"]) == (4, 3, 1, 305)
+        assert balances(db) == {"u1": 275, "u2": 0, "u3": 30}
+        assert {b["status"] for b in db["bet_records"].docs} == {"won", "lost"}
+        lost = next(b for b in db["bet_records"].docs if b["status"] == "lost")
+        assert lost["result_amount"] == -80
+
+    def test_one_transaction_per_user_and_chunk(self, db):
+        seed(db, [("u1", "alice", 100, 2.0)] * 3 + [("u2", "alice", 10, 2.0)])
+        BettingDB.settle_battle("b1", "alice", chunk_size=500)
+
+        transactions = db["coin_transactions"].docs
+        assert len(transactions) == 2
+        u1 = next(t for t in transactions if t["user_id"] == "u1")
+        assert u1["amount"] == 600 and len(u1["metadata"]["bet_ids"]) == 3
+        assert u1["balance_after"] == 600
+        # Constant number of round trips per chunk
+        assert db["bet_records"].calls["bulk_write"] == 2
+        assert db["wallets"].calls["bulk_write"] == 1
+
+    def test_idempotent(self, db):
+        seed(db, [("u1", "alice", 100, 2.0), ("u2", "bob", 10, 2.0)])
+        BettingDB.settle_battle("b1", "alice")
+        job = BettingDB.settle_battle("b1", "alice")
+
+        assert job["status"] == "completed"
+        assert balances(db)["u1"] == 200
+        assert len(db["coin_transactions"].docs) == 1
+
+    def test_winner_cannot_change(self, db):
+        seed(db, [("u1", "alice", 100, 2.0)])
+        BettingDB.settle_battle("b1", "alice")
+        with pytest.raises(ValueError):
+            BettingDB.settle_battle("b1", "bob")
+
+    def test_resumes_after_interruption(self, db):
+        """A run dying after the wallet credit resumes without paying twice"""
+        seed(db, [("u1", "alice", 100, 2.0), ("u2", "alice", 50, 2.0), ("u3", "bob", 10, 2.0)])
+        # Claim and credit succeed, marking the bets resolved fails
+        db["bet_records"].fail_bulk_after = 1
+        with pytest.raises(RuntimeError):
+            BettingDB.settle_battle("b1", "alice")
+
+        assert db["settlement_jobs"].docs[0]["status"] == "failed"
+        assert balances(db) == {"u1": 200, "u2": 100, "u3": 0}
+
+        job = BettingDB.settle_battle("b1", "alice")
+        assert job["status"] == "completed"
+        assert balances(db) == {"u1": 200, "u2": 100, "u3": 0}
+        assert len(db["coin_transactions"].docs) == 2
+        assert {b["status"] for b in db["bet_records"].docs} == {"won", "lost"}
+
+    def test_counters_survive_interruption_after_resolve(self, db):
+        """Bets resolved by a run that died before counting them are still counted"""
+        seed(db, [("u1", "alice", 100, 2.0), ("u2", "bob", 10, 2.0), ("u3", "alice", 10, 3.0)])
+        jobs = db["settlement_jobs"]
+        update_one = jobs.update_one
+
+        def dies_before_counting(query, update, upsert=False):
+            if "$inc" in update:
+                jobs.update_one = update_one
+                raise RuntimeError("connection lost")
+            return update_one(query, update, upsert)
+        jobs.update_one = dies_before_counting
+
+        with pytest.raises(RuntimeError):
+            BettingDB.settle_battle("b1", "alice", chunk_size=2)
+        job = BettingDB.settle_battle("b1", "alice", chunk_size=2)
+
+        assert job["status"] == "completed"
+        assert (job["processed"], job["total"], job["won"], job["lost"], job["payout_total"]) == (3, 3, 2, 1, 230)
+        assert balances(db) == {"u1": 200, "u2": 0, "u3": 30}
+
+    def test_live_lease_blocks_second_runner(self, db):
+        seed(db, [("u1", "alice", 100, 2.0)])
+        db["settlement_jobs"].docs.append({
+            "_id": "b1", "winner": "alice", "status": "running", "processed": 0,
+            "lease_until": datetime.utcnow() + timedelta(minutes=5)
+        })
+
+        job = BettingDB.settle_battle("b1", "alice")
+        assert job["status"] == "running"
+        assert balances(db)["u1"] == 0
+
+    def test_credit_interrupted_before_marked_applied(self, db):
+        """A wallet credited but not yet marked applied is not credited again"""
+        seed(db, [("u1", "alice", 100, 2.0)])
+        db["settlement_credits"].update_many = lambda query, update: (_ for _ in ()).throw(RuntimeError("connection lost"))
+        with pytest.raises(RuntimeError):
+            BettingDB.settle_battle("b1", "alice")
+        assert balances(db) == {"u1": 200}
+        assert db["wallets"].docs[0]["pending_credits"] == [db["settlement_credits"].docs[0]["_id"]]
+
+        del db["settlement_credits"].update_many
+        job = BettingDB.settle_battle("b1", "alice")
+
+        assert job["status"] == "completed"
+        assert balances(db) == {"u1": 200}
+        assert db["settlement_credits"].docs[0]["state"] == "applied"
+        assert db["wallets"].docs[0]["pending_credits"] == []
+
+    def test_guard_does_not_depend_on_wallet_history(self, db):
+        """Many chunks credited to one wallet cannot push an old chunk out of the guard"""
+        seed(db, [("u1", "alice", 10, 2.0)] * 60)
+        BettingDB.settle_battle("b1", "alice", chunk_size=1)
+        credits = len(db["settlement_credits"].docs)
+
+        for bet in db["bet_records"].docs[:1]:
+            bet["status"] = "settling"
+        BettingDB._settle_chunk(database.get_database(), "b1", db["bet_records"].docs[0]["settlement"]["chunk"])
+
+        assert credits == 60
+        assert balances(db) == {"u1": 1200}
+        assert db["wallets"].docs[0]["pending_credits"] == []
+
+
+class TestUpdateBalance:
+    """Atomic wallet updates"""
+
+    def test_debit_and_credit_use_inc(self, db):
+        db["wallets"].docs.append({"user_id": "u1", "balance": 100, "total_earned": 100, "total_spent": 0})
+
+        assert database.WalletDB.update_balance("u1", -30, "bet_placed", "bet")["balance"] == 70
+        # A concurrent credit lands between the two calls
+        db["wallets"].docs[0]["balance"] += 50
+        assert database.WalletDB.update_balance("u1", 10, "bet_won", "won")["balance"] == 130
+        wallet = db["wallets"].docs[0]
+        assert (wallet["total_spent"], wallet["total_earned"]) == (30, 110)
+
+    def test_insufficient_funds_changes_nothing(self, db):
+        db["wallets"].docs.append({"user_id": "u1", "balance": 20, "total_spent": 0})
+
+        with pytest.raises(ValueError):
+            database.WalletDB.update_balance("u1", -30, "bet_placed", "bet")
+        assert db["wallets"].docs[0]["balance"] == 20
+        assert db["coin_transactions"].docs == []
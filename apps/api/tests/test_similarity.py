@@ -0,0 +1,128 @@
+"""
+Similarity Table Tests
+Tests for precomputed item-to-item recommendations
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from agents.discovery_agent import DiscoveryAgent
+from agents.tools.similarity import SimilarityTable
+
+
+CATALOG = [
+    {"id": 1, "titulo": "Ponteia Viola", "embedding": [1.0, 0.0, 0.0],
+     "metadata": {"diretor": "Margarida", "tema": "musica", "sinopse": "Violeiros."}},
+    {"id": 2, "titulo": "Moda de Viola", "embedding": [0.9, 0.1, 0.0],
+     "metadata": {"diretor": "Carlos", "tema": "musica", "sinopse": "Duplas caipiras."}},
+    {"id": 3, "titulo": "Estação Velha", "embedding": [0.0, 1.0, 0.0],
+     "metadata": {"diretor": "Ana", "tema": "patrimonio", "sinopse": "A antiga ferrovia."}},
+]
+
+
+class TestSimilarityTable:
+    """Test suite for SimilarityTable"""
+
+    def test_neighbors_exclude_self_and_are_sorted(self):
+        """Top neighbour is the closest other production"""
+        table = SimilarityTable(np.array([item["embedding"] for item in CATALOG]))
+
+        similar = table.similar(0, top_k=2)
+        assert [row for row, _ in similar] == [1, 2]
+        assert similar[0][1] > similar[1][1]
+        assert table.pair(0, 0) == 1.0
+
+    def test_version_tracks_embeddings(self):
+        """Changing one vector changes the table version"""
+        vectors = np.array([item["embedding"] for item in CATALOG], dtype=np.float32)
+        changed = vectors.copy()
+        changed[2, 2] = 0.5
+
+        assert SimilarityTable(vectors).version == SimilarityTable(vectors.copy()).version
+        assert SimilarityTable(vectors).version != SimilarityTable(changed).version
+
+    def test_empty_catalog(self):
+        """Empty catalog builds an empty table"""
+        table = SimilarityTable(np.zeros((0, 0), dtype=np.float32))
+        assert len(table) == 0
+        assert table.similar(0) == []
+
+
+class TestFindSimilar:
+    """Instant recommendations through DiscoveryAgent"""
+
+    def test_lookup_by_title_and_id(self):
+        """Titles match case/accent-insensitively; ids work too"""
+        agent = DiscoveryAgent("test-key", CATALOG)
+
+        by_title = agent.find_similar("estacao velha", top_k=1)
+        by_id = agent.find_similar(production_id=3, top_k=1)
+
+        assert by_title["production"]["titulo"] == "Estação Velha"
+        assert by_title["similar"] == by_id["similar"]
+        assert agent.find_similar("inexistente") is None
+
+    def test_reload_only_rebuilds_on_change(self):
+        """Reloading identical embeddings keeps the existing table"""
+        agent = DiscoveryAgent("test-key", CATALOG)
+        table = agent.rag_tool.similarity
+
+        agent.rag_tool.load_catalog(CATALOG)
+        assert agent.rag_tool.similarity is table
+
+        agent.rag_tool.load_catalog(CATALOG[:2])
+        assert agent.rag_tool.similarity is not table
+
+    def test_manager_reload_moves_cache_to_new_catalog(self):
+        """A reloaded catalog is searchable and old cached answers are not served"""
+        from agents.agent_manager import AgentManager
+
+        manager = AgentManager(nvidia_api_key="test-key", embeddings_data=CATALOG)
+        manager.response_cache.set("filmes de viola", None, "discovery", {"response": "antiga"})
+        version = manager.response_cache.catalog_version
+
+        unchanged = manager.reload_catalog(CATALOG)
+        assert unchanged["catalog_changed"] is False
+
+        renamed = [dict(CATALOG[0], titulo="Ponteia Viola (versão final)")] + CATALOG[1:]
+        result = manager.reload_catalog(renamed)
+
+        assert result["catalog_changed"] is True
+        assert result["catalog_version"] != version
+        assert manager.response_cache.get("filmes de viola", None, "discovery") is None
+        assert manager.discovery_agent.find_similar("ponteia viola versao final")["production"]["id"] == 1
+
+    def test_recommend_similar_skips_embedding(self, monkeypatch):
+        """Known titles never call the embedding endpoint"""
+        agent = DiscoveryAgent("test-key", CATALOG)
+
+        async def fail_embedding(text):
+            raise AssertionError("embedding should not be requested")
+
+        monkeypatch.setattr(agent.rag_tool, "_generate_embedding", fail_embedding)
+        monkeypatch.setattr(agent.agent, "run", lambda prompt: SimpleNamespace(content="Se liga nessa!"))
+
+        result = asyncio.run(agent.recommend_similar("Ponteia Viola", top_k=1))
+
+        assert result["response"] == "Se liga nessa!"
+        assert [p["titulo"] for p in result["productions"]] == ["Moda de Viola"]
+
+    def test_stream_recommendation_yields_content_chunks(self, monkeypatch):
+        """Only content events are forwarded"""
+        agent = DiscoveryAgent("test-key", CATALOG)
+
+        async def fake_arun(prompt, stream=False):
+            yield SimpleNamespace(event="RunStarted", content=None)
+            yield SimpleNamespace(event="RunContent", content="Eae, ")
+            yield SimpleNamespace(event="RunContent", content="parceiro!")
+            yield SimpleNamespace(event="RunCompleted", content="Eae, parceiro!")
+
+        monkeypatch.setattr(agent.agent, "arun", fake_arun)
+        found = agent.find_similar("Ponteia Viola")
+
+        async def collect():
+            return [chunk async for chunk in agent.stream_recommendation(found["production"], found["similar"])]
+
+        assert asyncio.run(collect()) == ["Eae, ", "parceiro!"]
@@ -0,0 +1,151 @@
+"""
+Tests for the BettingRLAgent state discretizer
+Run with: pytest tests/test_state_discretizer.py -v
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from agents.betting_rl_agent import BettingRLAgent, StateDiscretizer
+
+
+def legacy_hash(battle_type="ai_vs_ai", total_bets=0, bet_split=0.5, accuracy=0.5):
+    """State key as written by the previous json.dumps encoding"""
+    return json.dumps({
+        "battle_type": battle_type,
+        "total_bets": min(total_bets, 100),
+        "bet_split": round(bet_split, 2),
+        "historical_accuracy": round(accuracy, 2)
+    }, sort_keys=True)
+
+
+class TestStateDiscretizer:
+    """Encoding, decoding and bucket edges"""
+
+    def test_state_space_is_bounded(self):
+        """Default buckets: 4 types x 7 x 7 x 6"""
+        assert StateDiscretizer().n_states == 4 * 7 * 7 * 6
+
+    def test_ids_are_dense_and_unique(self):
+        """Every bucket combination maps to a distinct id in [0, n_states)"""
+        discretizer = StateDiscretizer()
+        ids = {
+            discretizer.encode_features(battle_type, bets, split, accuracy)
+            for battle_type in ("ai_vs_ai", "human_vs_ai", "human_vs_human", "other")
+            for bets in (0, 1, 5, 10, 25, 50, 100)
+            for split in (0.1, 0.2, 0.35, 0.45, 0.55, 0.65, 0.8)
+            for accuracy in (0.3, 0.4, 0.5, 0.6, 0.7, 0.8)
+        }
+        assert ids == set(range(discretizer.n_states))
+
+    def test_decode_round_trip(self):
+        """Decoded ranges contain the encoded feature values"""
+        discretizer = StateDiscretizer()
+        state_id = discretizer.encode_features("human_vs_ai", 12, 0.5, 0.65)
+        state = discretizer.decode(state_id)
+
+        assert state["state_id"] == state_id
+        assert state["battle_type"] == "human_vs_ai"
+        assert state["total_bets"] == [10, 25]
+        assert state["bet_split"] == [0.45, 0.55]
+        assert state["historical_accuracy"] == [0.6, 0.7]
+
+    def test_bucket_edges_are_inclusive_low(self):
+        """A value on an edge belongs to the bucket starting there"""
+        discretizer = StateDiscretizer()
+        assert discretizer.decode(discretizer.encode_features("ai_vs_ai", 0, 0.5, 0.5))["total_bets"] == [None, 1]
+        assert discretizer.decode(discretizer.encode_features("ai_vs_ai", 100, 0.5, 0.5))["total_bets"] == [100, None]
+        assert discretizer.decode(discretizer.encode_features("ai_vs_ai", 5000, 0.5, 0.5))["total_bets"] == [100, None]
+
+    def test_unknown_battle_type_maps_to_other(self):
+        """Unlisted battle types share the 'other' bucket"""
+        discretizer = StateDiscretizer()
+        first = discretizer.encode_features("team_battle", 3, 0.5, 0.5)
+        second = discretizer.encode_features("tournament", 3, 0.5, 0.5)
+        assert first == second
+        assert discretizer.decode(first)["battle_type"] == "other"
+
+    def test_custom_edges(self):
+        """Configurable edges change the state space"""
+        discretizer = StateDiscretizer(battle_types=("ai_vs_ai",), total_bets_edges=(10,),
+                                       bet_split_edges=(0.5,), accuracy_edges=(0.5,))
+        assert discretizer.n_states == 2 * 2 * 2 * 2
+        assert StateDiscretizer(**discretizer.get_config()).get_config() == discretizer.get_config()
+
+
+class TestMigration:
+    """Legacy snapshot keys"""
+
+    def test_migrate_key_formats(self):
+        """Ints and digit strings are ids, legacy JSON is re-bucketed, others pass through"""
+        discretizer = StateDiscretizer()
+        assert discretizer.migrate_key(42) == 42
+        assert discretizer.migrate_key("42") == 42
+        assert discretizer.migrate_key(legacy_hash("human_vs_ai", 12, 0.5, 0.65)) == \
+            discretizer.encode_features("human_vs_ai", 12, 0.5, 0.65)
+        assert discretizer.migrate_key("s0") == "s0"
+
+    def test_collisions_are_averaged(self):
+        """Legacy states in the same bucket merge by averaging per action"""
+        discretizer = StateDiscretizer()
+        q_table = {
+            legacy_hash(total_bets=11): {"maintain_odds": 1.0, "increase_odds_5": 4.0},
+            legacy_hash(total_bets=20): {"maintain_odds": 3.0},
+            legacy_hash(total_bets=60): {"maintain_odds": -1.0}
+        }
+        migrated = discretizer.migrate_q_table(q_table)
+
+        merged = discretizer.encode_features("ai_vs_ai", 11, 0.5, 0.5)
+        assert len(migrated) == 2
+        assert migrated[merged] == {"maintain_odds": 2.0, "increase_odds_5": 4.0}
+
+    def test_import_legacy_snapshot(self):
+        """import_model re-keys a json.dumps snapshot to integer ids"""
+        agent = BettingRLAgent()
+        agent.import_model({"q_table": {legacy_hash("human_vs_ai", 3): {"decrease_odds_5": 0.7}}})
+
+        state_id, _ = agent._get_state({"type": "human_vs_ai", "total_bets": 3})
+        assert list(agent.q_table) == [state_id]
+        assert agent.q_table[state_id]["decrease_odds_5"] == pytest.approx(0.7)
+
+    def test_import_with_other_bucket_config(self):
+        """Ids from a different bucket layout are re-bucketed"""
+        source = BettingRLAgent(discretizer=StateDiscretizer(total_bets_edges=(10,)))
+        state_id, _ = source._get_state({"type": "ai_vs_ai", "total_bets": 30})
+        source.q_table[state_id]["maintain_odds"] = 1.5
+
+        target = BettingRLAgent()
+        target.import_model(source.export_model())
+        expected = target.discretizer.encode_features("ai_vs_ai", 10, 0.5, 0.5)
+        assert dict(target.q_table) == {expected: {"maintain_odds": 1.5}}
+
+
+class TestAgentIntegration:
+    """BettingRLAgent uses integer state ids"""
+
+    def test_get_state_returns_int(self):
+        """State ids are plain ints (no JSON on the odds path)"""
+        agent = BettingRLAgent()
+        state_id, features = agent._get_state({"type": "ai_vs_ai", "total_bets": 7, "bet_split": 0.6})
+        assert isinstance(state_id, int)
+        assert features["total_bets"] == 7
+        assert agent.describe_state(state_id)["bet_split"] == [0.55, 0.65]
+
+    def test_export_import_round_trip(self):
+        """Exported keys are strings (BSON) and import back to ints"""
+        agent = BettingRLAgent(epsilon=0.0)
+        state_id, _ = agent._get_state({"total_bets": 30})
+        agent.update_q_value(state_id, "increase_odds_5", 1.0, state_id)
+
+        model = agent.export_model()
+        assert all(isinstance(key, str) for key in model["q_table"])
+        assert model["config"]["state_encoding"] == agent.discretizer.get_config()
+
+        restored = BettingRLAgent()
+        restored.import_model(json.loads(json.dumps(model)))
+        assert restored.q_table[state_id]["increase_odds_5"] == pytest.approx(agent.q_table[state_id]["increase_odds_5"])
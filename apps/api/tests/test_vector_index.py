@@ -0,0 +1,77 @@
+"""
+Vector Index Tests
+Tests for quantized storage and exact re-ranking
+"""
+
+import numpy as np
+import pytest
+
+from agents.tools.vector_index import VectorIndex, quantize_int8
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(42)
+    return rng.normal(size=(200, 1024)).astype(np.float32)
+
+
+def exact_top(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)[:k]), scores
+
+
+class TestVectorIndex:
+    """Test suite for VectorIndex"""
+
+    def test_int8_roundtrip_error_is_small(self, vectors):
+        """Per-vector scale keeps quantization error within half a step"""
+        codes, scales = quantize_int8(vectors)
+        assert codes.dtype == np.int8
+        assert np.all(np.abs(codes * scales[:, None] - vectors) <= scales[:, None] * 0.5 + 1e-6)
+
+    @pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+    def test_scores_match_float32(self, vectors, dtype):
+        """Quantized scores stay close to exact cosine similarity"""
+        query = vectors[7] + 0.1
+        _, exact_scores = exact_top(vectors, query, 3)
+
+        index = VectorIndex(vectors, dtype=dtype)
+        assert np.allclose(index.score(query), exact_scores, atol=0.01)
+        assert index.search(query, top_k=1)[0][0] == 7
+
+    def test_memory_footprint(self, vectors):
+        """float16 halves and int8 quarters the stored bytes"""
+        full = VectorIndex(vectors, dtype="float32").nbytes
+        assert VectorIndex(vectors, dtype="float16").nbytes == full // 2
+        assert VectorIndex(vectors, dtype="int8").nbytes < full // 3
+
+    def test_rerank_returns_exact_scores(self, vectors):
+        """Re-ranked candidates carry exact float32 similarities"""
+        query = vectors[3]
+        expected, exact_scores = exact_top(vectors, query, 5)
+
+        results = VectorIndex(vectors, dtype="int8", rerank_top=20).search(query, top_k=5)
+
+        assert [row for row, _ in results] == expected
+        assert np.allclose([s for _, s in results], exact_scores[expected], atol=1e-5)
+
+    def test_rerank_vectors_are_memory_mapped(self, vectors, tmp_path):
+        """The exact rerank copy lives on disk, not in process memory"""
+        index = VectorIndex(vectors, dtype="int8", rerank_top=20, exact_dir=str(tmp_path))
+
+        assert isinstance(index.exact, np.memmap)
+        assert index.nbytes == VectorIndex(vectors, dtype="int8").nbytes
+        assert list(tmp_path.iterdir()) == []
+
+    def test_search_restricted_to_candidates(self, vectors):
+        """Only the given rows are scored"""
+        index = VectorIndex(vectors, dtype="int8")
+        results = index.search(vectors[7], top_k=3, indices=np.array([1, 2, 3]))
+        assert {row for row, _ in results} == {1, 2, 3}
+
+    def test_empty_index(self):
+        """An empty catalog returns no results"""
+        index = VectorIndex(np.zeros((0, 0), dtype=np.float32), dtype="int8")
+        assert len(index) == 0
+        assert index.search(np.ones(4), top_k=3) == []